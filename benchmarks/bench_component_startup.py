@@ -0,0 +1,132 @@
+"""Container startup time of the pipeline components, with and without prebuilt images.
+
+For each image set in `src/pipeline_2025/component_images.py`, the script
+times a container that reaches the point where component code can run:
+  * before: `python:3.10` running the pip preamble that KFP generates for
+    lightweight components (kfp, then `packages_to_install`), then importing
+    the component's libraries
+  * after: the digest-pinned prebuilt image from component_images.lock.json,
+    importing the same libraries
+`--cold` removes the images before every run, so image pull time is
+included, as it is on a fresh Vertex AI node. With `--spec`, per-image
+results are multiplied by the number of steps in a compiled pipeline that
+use that image, giving the startup time per run.
+
+Per-task durations of real runs are in the run store
+(`python -m src.pipeline_2025.run_store durations`) for comparing runs
+compiled before and after the images were locked.
+
+Usage (needs Docker; the "after" column needs a built lock file):
+    python benchmarks/bench_component_startup.py --repeats 3
+    python benchmarks/bench_component_startup.py --cold --spec compiled_pipeline_specs/<spec>.json --output bench_output.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.pipeline_2025 import component_images  # noqa: E402
+
+# Libraries each image set must import before component code runs
+IMPORTS = {
+    "base": "kfp",
+    "bigquery": "kfp, google.cloud.bigquery, google.cloud.storage, numpy, pandas",
+    "aiplatform": "kfp, google.cloud.aiplatform, google.cloud.bigquery, numpy",
+}
+
+
+def pip_preamble(name: str) -> str:
+    """The pip commands KFP prepends to a lightweight component's container command."""
+    packages = [req for req in component_images.IMAGES[name] if req != component_images.KFP_REQUIREMENT]
+    install = "PIP_DISABLE_PIP_VERSION_CHECK=1 python3 -m pip install --quiet --no-warn-script-location"
+    command = f"{install} '{component_images.KFP_REQUIREMENT}' '--no-deps'"
+    if packages:
+        command += f" && {install} " + " ".join(f"'{package}'" for package in packages)
+    return command
+
+
+def time_container(image: str, command: str, repeats: int, cold: bool):
+    durations = []
+    for _ in range(repeats):
+        if cold:
+            subprocess.run(["docker", "rmi", "-f", image], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        start = time.perf_counter()
+        result = subprocess.run(["docker", "run", "--rm", image, "sh", "-c", command],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        durations.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else ""
+            print(f"{image} failed: {last_line}")
+            return None
+    return durations
+
+
+def steps_per_image(spec_path: str) -> Counter:
+    """Number of steps in a compiled spec that run in each component image set."""
+    with open(spec_path) as f:
+        executors = json.load(f)["deploymentSpec"]["executors"]
+    lock = component_images.load_lock()
+    by_image = {entry["image"]: name for name, entry in lock.items()}
+    counts = Counter()
+    for executor in executors.values():
+        container = executor.get("container", {})
+        command = " ".join(container.get("command", []))
+        if container.get("image") in by_image:
+            counts[by_image[container["image"]]] += 1
+        elif container.get("image") == component_images.BASE_PYTHON_IMAGE:
+            # Not prebuilt: match the pip preamble to its image set
+            for name, requirements in component_images.IMAGES.items():
+                packages = [req for req in requirements if req != component_images.KFP_REQUIREMENT]
+                if all(f"'{package}'" in command for package in packages) and \
+                        command.count("pip install") == (2 if packages else 1):
+                    counts[name] += 1
+                    break
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure component container startup before/after prebuilt images.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--cold", action="store_true", help="Remove images before each run to include pulls.")
+    parser.add_argument("--spec", default="", help="Compiled pipeline spec, to total the startup time per run.")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this path.")
+    args = parser.parse_args()
+
+    lock = component_images.load_lock()
+    steps = steps_per_image(args.spec) if args.spec else Counter()
+    results = {}
+    for name in component_images.IMAGES:
+        check = f"python3 -c 'import {IMPORTS[name]}'"
+        row = {"steps": steps.get(name, 0)}
+        before = time_container(component_images.BASE_PYTHON_IMAGE, f"{pip_preamble(name)} && {check}",
+                                args.repeats, args.cold)
+        row["before_s"] = statistics.median(before) if before else None
+        if name in lock:
+            after = time_container(lock[name]["image"], check, args.repeats, args.cold)
+            row["after_s"] = statistics.median(after) if after else None
+        else:
+            print(f"{name}: no prebuilt image in {component_images.lock_path()}; run component_images build")
+            row["after_s"] = None
+        results[name] = row
+
+    print(f"{'image':<12}{'steps':>6}{'before s':>10}{'after s':>10}{'saved/run s':>13}")
+    for name, row in results.items():
+        before, after = row["before_s"], row["after_s"]
+        saved = (before - after) * row["steps"] if before is not None and after is not None else None
+        row["saved_per_run_s"] = saved
+        print(f"{name:<12}{row['steps']:>6}{before if before is not None else float('nan'):>10.1f}"
+              f"{after if after is not None else float('nan'):>10.1f}"
+              f"{saved if saved is not None else float('nan'):>13.1f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Concurrency benchmark for the Streamlit app's prediction path.
+
+Simulates `--users` sessions submitting predictions at the same time against
+`FakeEndpoint` with a slow-outlier tail, and reports end-to-end latency
+percentiles for:
+  * blocking: each session calls `endpoint.predict()` on its own thread, as
+    the app did before the shared executor
+  * executor: each session submits to `PredictionExecutor` (deadline plus a
+    hedged attempt after the recent p95) and polls the future like the UI
+
+Usage (from the repository root):
+    python benchmarks/bench_prediction_concurrency.py --users 50 --requests-per-user 20
+    python benchmarks/bench_prediction_concurrency.py --max-p99-ms 400
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.serving.fake_endpoint import FakeEndpoint  # noqa: E402
+from src.serving.prediction_executor import PredictionExecutor, percentile  # noqa: E402
+
+INSTANCE = {"is_male": "1", "mother_age": "30", "gestation_weeks": "39", "plurality_category": "Single(1)",
+            "cigarette_use_str": "False", "alcohol_use_str": "False"}
+
+
+def _predict(endpoint):
+    return endpoint.predict(instances=[INSTANCE]).predictions[0]
+
+
+def _run_users(users: int, requests_per_user: int, request_fn):
+    latencies, errors = [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(users)
+
+    def session(user: int):
+        barrier.wait()
+        for _ in range(requests_per_user):
+            start = time.perf_counter()
+            try:
+                request_fn(user)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+
+    threads = [threading.Thread(target=session, args=(user,)) for user in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    return {
+        "requests": len(latencies) + len(errors),
+        "errors": len(errors),
+        "wall_s": round(wall, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+    }
+
+
+def bench_blocking(endpoint, users, requests_per_user):
+    return _run_users(users, requests_per_user, lambda user: _predict(endpoint))
+
+
+def bench_executor(endpoint, users, requests_per_user, max_workers, deadline_s):
+    executor = PredictionExecutor(max_workers=max_workers, deadline_s=deadline_s, initial_hedge_delay_s=0.2)
+
+    def request(user):
+        future = executor.submit(_predict, endpoint, session_key=user)
+        while not future.done():
+            time.sleep(0.005)
+        return future.result()
+
+    try:
+        result = _run_users(users, requests_per_user, request)
+        result["executor"] = executor.stats()
+        return result
+    finally:
+        executor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests-per-user", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=60.0, help="Base endpoint latency.")
+    parser.add_argument("--jitter-ms", type=float, default=30.0)
+    parser.add_argument("--tail-rate", type=float, default=0.03, help="Fraction of slow outlier calls.")
+    parser.add_argument("--tail-ms", type=float, default=1500.0, help="Extra latency of outlier calls.")
+    parser.add_argument("--max-workers", type=int, default=128)
+    parser.add_argument("--deadline-s", type=float, default=10.0)
+    parser.add_argument("--max-p99-ms", type=float, help="Exit non-zero if the executor p99 exceeds this.")
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    args = parser.parse_args()
+
+    def endpoint():
+        return FakeEndpoint(latency_s=args.latency_ms / 1000, jitter_s=args.jitter_ms / 1000,
+                            tail_rate=args.tail_rate, tail_latency_s=args.tail_ms / 1000, seed=7)
+
+    results = {
+        "blocking": bench_blocking(endpoint(), args.users, args.requests_per_user),
+        "executor": bench_executor(endpoint(), args.users, args.requests_per_user,
+                                   args.max_workers, args.deadline_s),
+    }
+    for name, values in results.items():
+        print(f"{name:<9} " + "  ".join(f"{key}={value}" for key, value in values.items() if key != "executor"))
+    print(f"executor stats: {results['executor']['executor']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    if args.max_p99_ms is not None and results["executor"]["p99_ms"] > args.max_p99_ms:
+        print(f"executor p99 {results['executor']['p99_ms']}ms exceeds {args.max_p99_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Overhead benchmark for sampled request/response logging.
+
+Measures the time `PredictionLogger.log()` adds to the request path while
+`--threads` request threads log concurrently, for:
+  * a local JSONL (or Parquet) file sink, and
+  * a deliberately slow sink (`--slow-sink-ms` per batch write), to show that
+    backpressure drops records instead of blocking callers.
+
+Usage (from the repository root):
+    python benchmarks/bench_prediction_logging.py --requests 20000 --sample-rate 1.0
+    python benchmarks/bench_prediction_logging.py --format parquet --max-p99-us 1000
+"""
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.serving.prediction_executor import percentile  # noqa: E402
+from src.serving.prediction_logger import FileSink, PredictionLogger  # noqa: E402
+
+INSTANCE = {"is_male": "true", "mother_age": "30", "gestation_weeks": "39", "plurality_category": "Single(1)",
+            "cigarette_use_str": "false", "alcohol_use_str": "false"}
+
+
+class SlowSink:
+    """Sink that takes `delay_s` per batch write."""
+
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+
+    def write(self, records):
+        time.sleep(self.delay_s)
+
+
+def bench(logger: PredictionLogger, threads: int, requests: int):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def request_thread():
+        local = []
+        barrier.wait()
+        for i in range(requests // threads):
+            start = time.perf_counter()
+            logger.log(INSTANCE, 7.25, 12.5, "fake://local", "v1")
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=request_thread) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    logger.close()
+    return {
+        "calls": len(latencies),
+        "p50_us": round(percentile(latencies, 50) * 1e6, 1),
+        "p99_us": round(percentile(latencies, 99) * 1e6, 1),
+        "max_us": round(max(latencies) * 1e6, 1),
+        **logger.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--sample-rate", type=float, default=1.0)
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--max-buffer", type=int, default=10000)
+    parser.add_argument("--slow-sink-ms", type=float, default=200.0)
+    parser.add_argument("--max-p99-us", type=float, help="Exit non-zero if a p99 log() time exceeds this.")
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = {
+            "file": bench(PredictionLogger(FileSink(directory, args.format), sample_rate=args.sample_rate,
+                                           max_buffer=args.max_buffer, seed=0), args.threads, args.requests),
+            "slow_sink": bench(PredictionLogger(SlowSink(args.slow_sink_ms / 1000), sample_rate=args.sample_rate,
+                                                max_buffer=args.max_buffer // 10, batch_size=100, seed=0),
+                               args.threads, args.requests),
+        }
+        results["file"]["files"] = len(list(Path(directory).iterdir()))
+    for name, values in results.items():
+        print(f"{name:<9} " + "  ".join(f"{key}={value}" for key, value in values.items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    worst = max(result["p99_us"] for result in results.values())
+    if args.max_p99_us is not None and worst > args.max_p99_us:
+        print(f"log() p99 {worst}us exceeds {args.max_p99_us}us")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
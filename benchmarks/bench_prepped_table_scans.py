@@ -0,0 +1,126 @@
+"""Bytes scanned by each reader of the prepped table, before and after clustering.
+
+The script copies an existing prepped table twice into a scratch dataset:
+an unclustered copy (the old layout) and a copy clustered on `data_split`
+(the layout `data_prep_comp` now writes). `--copies` repeats the rows so the
+tables are big enough for block pruning to show; BigQuery prunes clustered
+blocks of roughly a few hundred MB and bills at least 10 MB per query. Each
+downstream reader then runs its old query against the unclustered copy and
+its current query, built from `feature_registry`, against the clustered
+copy, with the query cache disabled. The script reports bytes processed and
+billed per reader.
+
+The Vertex AI dataset import and AutoML training read the whole table
+through their own services and are not measured here.
+
+Usage (needs BigQuery access; creates and, unless --keep, deletes two tables):
+    python benchmarks/bench_prepped_table_scans.py \\
+        --table my-project.baby_mlops_data_staging.natality_features_prepped \\
+        --scratch-dataset my-project.scratch --copies 50 --output bench_output.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from google.cloud import bigquery  # noqa: E402
+
+from src.pipeline_2025 import feature_registry as registry  # noqa: E402
+
+SAMPLE_SIZE = 2000
+
+
+def reader_queries(table: str, clustered: bool) -> dict:
+    """reader -> query; the old queries when `clustered` is False, the current ones otherwise."""
+    features = registry.select_list(registry.FEATURES)
+    if not clustered:
+        return {
+            "bqml_train": f"""
+                SELECT * EXCEPT(data_split),
+                    CASE WHEN data_split = 'VALIDATE' THEN 'EVAL' ELSE data_split END AS custom_splits
+                FROM `{table}`""",
+            "evaluate_test_split": f"SELECT * FROM `{table}` WHERE data_split = 'TEST'",
+            "serving_validation_sample": f"""
+                SELECT {features} FROM (
+                    SELECT *, ROW_NUMBER() OVER (
+                        PARTITION BY plurality_category, is_male ORDER BY FARM_FINGERPRINT(TO_JSON_STRING(t))
+                    ) AS stratum_rank
+                    FROM `{table}` AS t WHERE data_split = 'TEST')
+                WHERE stratum_rank <= {SAMPLE_SIZE // 10}""",
+            "skew_sample": f"""
+                SELECT {features} FROM `{table}` AS t WHERE data_split = 'TEST'
+                ORDER BY FARM_FINGERPRINT(TO_JSON_STRING(t)) LIMIT {SAMPLE_SIZE}""",
+        }
+    return {
+        "bqml_train": f"""
+            SELECT {registry.select_list(registry.training_columns())},
+                CASE WHEN data_split = 'VALIDATE' THEN 'EVAL' ELSE data_split END AS custom_splits
+            FROM `{table}`""",
+        "evaluate_test_split": f"""
+            SELECT {registry.select_list(registry.training_columns())}
+            FROM `{table}` WHERE {registry.split_filter('TEST')}""",
+        "serving_validation_sample": f"""
+            SELECT {features} FROM (
+                SELECT {features}, ROW_NUMBER() OVER (
+                    PARTITION BY plurality_category, is_male ORDER BY FARM_FINGERPRINT(TO_JSON_STRING(STRUCT({features})))
+                ) AS stratum_rank
+                FROM `{table}` WHERE {registry.split_filter('TEST')})
+            WHERE stratum_rank <= {SAMPLE_SIZE // 10}""",
+        "skew_sample": f"""
+            SELECT {features} FROM `{table}` WHERE {registry.split_filter('TEST')}
+            ORDER BY FARM_FINGERPRINT(TO_JSON_STRING(STRUCT({features}))) LIMIT {SAMPLE_SIZE}""",
+    }
+
+
+def run(client: bigquery.Client, query: str, location: str) -> dict:
+    job = client.query(query, location=location, job_config=bigquery.QueryJobConfig(use_query_cache=False))
+    job.result()
+    return {"bytes_processed": job.total_bytes_processed or 0, "bytes_billed": job.total_bytes_billed or 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure prepped-table reads before and after clustering.")
+    parser.add_argument("--table", required=True, help="Existing prepped table (project.dataset.table).")
+    parser.add_argument("--scratch-dataset", required=True, help="Dataset for the two copies (project.dataset).")
+    parser.add_argument("--copies", type=int, default=1, help="Repeat the rows this many times in each copy.")
+    parser.add_argument("--location", default="US")
+    parser.add_argument("--keep", action="store_true", help="Keep the copies after measuring.")
+    parser.add_argument("--output", default="", help="Write the results as JSON to this path.")
+    args = parser.parse_args()
+
+    client = bigquery.Client(project=args.scratch_dataset.split(".")[0])
+    name = args.table.split(".")[-1]
+    columns = registry.select_list(registry.PREPPED_COLUMNS)
+    repeat = f"CROSS JOIN UNNEST(GENERATE_ARRAY(1, {args.copies}))" if args.copies > 1 else ""
+    layouts = {"before": (f"{args.scratch_dataset}.{name}_unclustered", ""),
+               "after": (f"{args.scratch_dataset}.{name}_clustered",
+                         f"CLUSTER BY {', '.join(registry.CLUSTER_COLUMNS)}")}
+
+    results = {}
+    try:
+        for layout, (table, cluster) in layouts.items():
+            client.query(f"CREATE OR REPLACE TABLE `{table}` {cluster} AS SELECT {columns} FROM `{args.table}` {repeat}",
+                         location=args.location).result()
+            size = client.get_table(table).num_bytes
+            print(f"{layout}: {table} ({size / 1024 ** 2:.1f} MiB)")
+            for reader, query in reader_queries(table, clustered=layout == "after").items():
+                results.setdefault(reader, {})[layout] = run(client, query, args.location)
+    finally:
+        if not args.keep:
+            for table, _ in layouts.values():
+                client.delete_table(table, not_found_ok=True)
+
+    print(f"{'reader':<28}{'before MiB':>12}{'after MiB':>12}{'saved':>8}")
+    for reader, row in results.items():
+        before, after = row["before"]["bytes_processed"], row.get("after", {}).get("bytes_processed", 0)
+        row["saved_fraction"] = 1 - after / before if before else 0.0
+        print(f"{reader:<28}{before / 1024 ** 2:>12.1f}{after / 1024 ** 2:>12.1f}{row['saved_fraction']:>8.0%}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Cold-start benchmark for run_modernized_pipeline.py subcommands.
+
+Each scenario is launched in a fresh interpreter so module caches do not carry
+over between measurements. For every scenario the script reports the median and
+best wall clock over several runs, plus the slowest top-level imports reported
+by `python -X importtime`.
+
+Usage (from the repository root, with the pipeline .env variables set):
+    python benchmarks/bench_runner_startup.py --repeats 5
+    python benchmarks/bench_runner_startup.py --output bench_output.json --max-seconds help=0.5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+RUNNER = str(REPO_ROOT / "run_modernized_pipeline.py")
+
+# name -> runner arguments
+SCENARIOS = {
+    "help": ["--help"],
+    "compile_cache_hit": ["compile"],
+    "compile_cache_miss": ["--no-spec-cache", "compile"],
+    "run_dry_run": ["run", "--dry-run"],
+}
+
+
+def time_scenario(args, repeats: int):
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, RUNNER, *args], cwd=REPO_ROOT,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        durations.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            # e.g. `run --dry-run` without application default credentials
+            last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else ""
+            print(f"{' '.join(args)} failed: {last_line}")
+            return None
+    return durations
+
+
+def top_imports(args, limit: int):
+    """Returns [(module, cumulative_seconds)] for the slowest top-level imports."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", RUNNER, *args], cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented below their parent; keep top-level ones only
+        if cumulative.strip().isdigit() and not name[1:].startswith(" "):
+            imports.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest imports to list per scenario.")
+    parser.add_argument("--scenarios", nargs="*", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    parser.add_argument("--max-seconds", nargs="*", default=[],
+                        help="Budgets like help=0.5; exit non-zero if a scenario median exceeds its budget.")
+    args = parser.parse_args()
+
+    if "compile_cache_hit" in args.scenarios:
+        # Warm the spec cache so the hit scenario measures a hit
+        time_scenario(SCENARIOS["compile_cache_hit"], repeats=1)
+
+    results = {}
+    for name in args.scenarios:
+        durations = time_scenario(SCENARIOS[name], args.repeats)
+        if durations is None:
+            continue
+        results[name] = {
+            "median_s": round(statistics.median(durations), 3),
+            "best_s": round(min(durations), 3),
+            "top_imports": [[module, round(seconds, 3)] for module, seconds in top_imports(SCENARIOS[name], args.top)],
+        }
+        print(f"{name:<20} median={results[name]['median_s']:.3f}s best={results[name]['best_s']:.3f}s")
+        for module, seconds in results[name]["top_imports"]:
+            print(f"    {module:<45} {seconds:.3f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+
+    over_budget = []
+    for budget in args.max_seconds:
+        name, limit = budget.split("=")
+        if name in results and results[name]["median_s"] > float(limit):
+            over_budget.append(f"{name}: {results[name]['median_s']:.3f}s > {limit}s")
+    if over_budget:
+        print("Over budget: " + "; ".join(over_budget))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
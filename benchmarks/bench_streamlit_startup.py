@@ -0,0 +1,110 @@
+"""Cold-start and memory benchmark for the Streamlit serving app.
+
+Measures, each in a fresh process:
+  * app_import: importing streamlit_app_dynamic.py (what every container pays)
+  * vertex_sdk_import: importing google.cloud.aiplatform (deferred to first use)
+  * server_ready: `streamlit run` until /_stcore/health answers, plus the
+    server's resident set size (RSS) at that point
+
+Cloud Run cold starts are part of the app's tail latency, so run this before
+and after changing the serving dependencies or module-level work in the app.
+
+Usage (from the repository root):
+    python benchmarks/bench_streamlit_startup.py --repeats 3 --output bench_output.json
+"""
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+APP = "streamlit_app_dynamic.py"
+
+# Prints wall clock and peak RSS (KiB on Linux) of the import as JSON
+_IMPORT_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+__import__(sys.argv[1])
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def measure_import(module: str):
+    result = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE, module], cwd=REPO_ROOT,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def measure_server(timeout_s: float = 60.0):
+    port = _free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP, "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout_s:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return {"seconds": time.perf_counter() - start, "rss_mb": _rss_mb(process.pid)}
+            except OSError:
+                time.sleep(0.05)
+        raise TimeoutError(f"Streamlit did not become healthy within {timeout_s}s")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def summarize(samples, keys):
+    return {key: round(statistics.median(sample[key] for sample in samples), 3) for key in keys}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--skip-server", action="store_true", help="Only measure imports.")
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    args = parser.parse_args()
+
+    results = {
+        "app_import": summarize([measure_import(Path(APP).stem) for _ in range(args.repeats)],
+                                ["seconds", "max_rss_mb"]),
+        "vertex_sdk_import": summarize([measure_import("google.cloud.aiplatform") for _ in range(args.repeats)],
+                                       ["seconds", "max_rss_mb"]),
+    }
+    if not args.skip_server:
+        results["server_ready"] = summarize([measure_server() for _ in range(args.repeats)], ["seconds", "rss_mb"])
+
+    for name, values in results.items():
+        print(f"{name:<18} " + "  ".join(f"{key}={value}" for key, value in values.items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 #!pip install ipython-autotime
 # %load_ext autotime
+import json
+import logging
 import os
 from tabulate import tabulate
 import numpy as np
@@ -13,9 +15,12 @@ import plotly.graph_objects as go
 import plotly.express as px
 import matplotlib.pyplot as plt
 import seaborn as sns
-import time
 import plotly.graph_objects as go
 
+from src.serving.attribution_frame import AttributionBatch
+from src.serving.attribution_table import AttributionTable, endpoint_model_identity
+from src.serving.explanation_service import ExplanationService
+
 ####################
 NOTEBOOK = 'Vertex_AI_Streamlit'
 REGION = "us-central1"
@@ -24,6 +29,8 @@ BUCKET = 'b_w_bucket'
 BQ_DATASET = "bw_dataset"
 APPNAME = "bw-prediction"
 GOOGLE_APPLICATION_CREDENTIALS = 'key/babyweight-prediction-ff79f406c099.json'
+# Built with `python -m src.serving.attribution_table build`; optional
+ATTRIBUTION_TABLE_PATH = os.getenv("ATTRIBUTION_TABLE_PATH", "attributions.npy")
 
 os.environ["REGION"] = REGION
 os.environ["PROJECT"] = PROJECT
@@ -44,6 +51,32 @@ endpoint = aip.Endpoint(
     location=REGION,
     endpoint_name=ENDPOINT_NAME
 )
+
+
+@st.cache_resource
+def get_explanation_service():
+    # Shared across reruns and sessions: memoizes and batches explain() calls
+    return ExplanationService(endpoint)
+
+
+@st.cache_data(ttl=60)
+def get_model_identity():
+    # Part of every memoized explanation's key, so within a minute of a
+    # redeploy the shared service stops serving the previous model's results
+    return json.dumps(endpoint_model_identity(endpoint), sort_keys=True)
+
+
+@st.cache_resource(ttl=600)
+def get_attribution_table():
+    # Memory-mapped precomputed grid; None when it has not been built or was
+    # built for another deployment. The TTL re-checks after a redeploy.
+    if not os.path.exists(ATTRIBUTION_TABLE_PATH):
+        return None
+    try:
+        return AttributionTable(ATTRIBUTION_TABLE_PATH, expected_identity=endpoint_model_identity(endpoint))
+    except ValueError as e:
+        logging.warning(f"Ignoring attribution table: {e}")
+        return None
 ########################
 # config
 st.set_page_config(
@@ -111,7 +144,12 @@ instance = [
 predicted_value = ''
 
 # *************EXPLAINATION RESULT*************#
-explain = endpoint.explain(instance)
+# Precomputed grid lookup first; otherwise one explain call returns the
+# prediction, baseline and attributions
+attribution_table = get_attribution_table()
+explain = attribution_table.lookup(instance[0]) if attribution_table is not None else None
+if explain is None:
+    explain = get_explanation_service().explain(instance[0], model_version=get_model_identity())
 
 FEATURE_COLUMNS = [
     'is_male',
@@ -124,52 +162,13 @@ FEATURE_COLUMNS = [
 
 
 # ************************FUNCTION**********************
-def get_feature_attributions(
-        prediction_expl, instance_index, feature_columns=FEATURE_COLUMNS):
-    """Returns the feature attributions with the baseline for a prediction example"""
-
-    rows = []
-    attribution = prediction_expl.explanations[instance_index].attributions[0]
-    baseline_score = attribution.baseline_output_value
-    total_att_val = baseline_score
-    for key in feature_columns:
-        feature_val = instance[instance_index][key]
-        att_val = attribution.feature_attributions[key]
-        total_att_val += att_val
-        rows.append([key, feature_val, att_val])
-
-    feature_attributions_rows = sorted(rows, key=lambda row: row[2], reverse=True)
-    feature_attributions_rows.insert(0, ["Baseline_Score", "--", baseline_score])
-    feature_attributions_rows.append(["Final_Prediction", "--", total_att_val])
-
-    return feature_attributions_rows
-
-feature_attributions_rows = get_feature_attributions(explain, 0)
-
-def generate_dataframe():
-    feature_list = []
-    feature_values = []
-    feature_contributions = []
-    feature_attributions_rows = get_feature_attributions(explain, 0)
-
-    for i in range(len(feature_attributions_rows)):
-        feature = feature_attributions_rows[i][0]
-        feature_list.append(feature)
-
-    for i in range(len(feature_attributions_rows)):
-        feature = feature_attributions_rows[i][1]
-        feature_values.append(feature)
-
-    for i in range(len(feature_attributions_rows)):
-        feature = feature_attributions_rows[i][2]
-        feature_contributions.append(feature)
-
-    zipped = list(zip(feature_list, feature_values, feature_contributions))
-    df = pd.DataFrame(zipped, columns=['Feature', 'Value', 'Contribution'])
-
-    return df, feature_list, feature_values, feature_contributions
+def generate_dataframe(explanations, instances, instance_index=0, feature_columns=FEATURE_COLUMNS):
+    """Returns the baseline/attribution/prediction waterfall rows for one instance of a batch"""
+    batch = AttributionBatch.from_explanations(explanations, feature_columns)
+    df = batch.waterfall_frame(instance_index, instances[instance_index])
+    return df, df['Feature'].tolist(), df['Value'].tolist(), df['Contribution'].tolist()
 
-df, feature_list, feature_values, feature_contributions = generate_dataframe()
+df, feature_list, feature_values, feature_contributions = generate_dataframe([explain], instance)
 
 ###############
 
@@ -211,9 +210,7 @@ col3.metric("Maternal smoking status", cigarette_use.upper(), df3.loc['cigarette
 col3.metric("Maternal drinking status", alcohol_use.upper(), df3.loc['alcohol_use', 'Contribution'])
 
 # Display the Prediction in LBs
-predicted_value = round(endpoint.predict(instance).predictions[0]['value'], 2)
-with st.spinner('Generating Result...'):
-    time.sleep(1)
+predicted_value = round(explain.prediction, 2)
 
 with col5:
     st.subheader("Baby Weight Prediction:")
@@ -3,49 +3,20 @@ import json
 import logging
 from datetime import datetime
 import argparse # For command-line arguments
+import tempfile
 import time
-
-from dotenv import load_dotenv, dotenv_values
-import kfp
-from kfp import dsl
-from kfp.dsl import Artifact, Metrics, importer_node
-from kfp import compiler
-from google.cloud import aiplatform as vertex_ai
-# Import pre-built Google Cloud Pipeline Components (GCPC)
-from google_cloud_pipeline_components.v1 import bigquery as gcpc_bq
-# Import BigqueryCreateModelJobOp and BigqueryEvaluateModelJobOp specifically
-from google_cloud_pipeline_components.v1.bigquery import BigqueryCreateModelJobOp, BigqueryEvaluateModelJobOp
-from google_cloud_pipeline_components.v1 import dataset as gcpc_dataset
-from google_cloud_pipeline_components.v1 import endpoint as gcpc_endpoint
-from google_cloud_pipeline_components.v1 import model as gcpc_model
-# from google_cloud_pipeline_components.v1 import automl as gcpc_automl # Removed incorrect import
-# Correct import for AutoML training job components
-from google_cloud_pipeline_components.v1.automl.training_job import AutoMLTabularTrainingJobRunOp
-# Import ModelDeployOp from endpoint module
-from google_cloud_pipeline_components.v1.endpoint import ModelDeployOp
-# from google_cloud_pipeline_components.v1.model.export_model import ModelExportOp
-# from google_cloud_pipeline_components.v1.model.upload_model import ModelUploadOp
-from google_cloud_pipeline_components.v1.dataset import TabularDatasetCreateOp
-from google_cloud_pipeline_components.types import artifact_types
-# Remove import for notification email component
-
-# Import your custom components
-# Ensure src/ is in PYTHONPATH or adjust import accordingly if running from elsewhere
-from src.pipeline_2025 import data_prep_comp
-# from src.pipeline_2025 import bqml_training_comp # Placeholder
-# from src.pipeline_2025 import automl_training_comp # Placeholder
-# from src.pipeline_2025 import model_eval_comp # Placeholder
-# Import the BQML component module
-from src.pipeline_2025 import create_bqml_comp
-# Import the AutoML component module
-from src.pipeline_2025 import create_automl_comp
-# Import the Model Selection component
-from src.pipeline_2025 import select_best_model_comp
-# Import helper component
-from src.pipeline_2025 import helper_components
-# Import the new endpoint management and model registry components
-from src.pipeline_2025 import endpoint_management_comp
-from src.pipeline_2025 import model_registry_comp
+from pathlib import Path
+
+# Heavy imports are deferred: kfp, GCPC and the component modules live in
+# create_pipeline_definition(), python-dotenv in load_config() and the Vertex AI
+# SDK in run_command() and resume_command(), so `--help` and spec cache hits stay fast.
+from src.pipeline_2025 import capacity_planner
+from src.pipeline_2025 import component_images
+from src.pipeline_2025 import feature_registry
+from src.pipeline_2025 import pipeline_rules
+from src.pipeline_2025 import query_guard
+from src.pipeline_2025 import run_store
+from src.pipeline_2025 import spec_cache
 
 # --- Configure Logging ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -53,8 +24,7 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # --- Environment and Pipeline Configuration Loading ---
 def load_config():
     """Loads configuration from .env file and sets up derived variables."""
-    from pathlib import Path
-    import os
+    from dotenv import load_dotenv, dotenv_values
 
     # Construct an absolute path to .env relative to this script file
     script_dir = Path(__file__).parent
@@ -105,6 +75,12 @@ def load_config():
     config["PREPPED_DATA_TABLE_NAME"] = os.getenv("PREPPED_DATA_TABLE_NAME")
     config["DATA_EXTRACTION_YEAR"] = int(os.getenv("DATA_EXTRACTION_YEAR", "2000"))
     config["DATA_PREPROCESSING_LIMIT"] = int(os.getenv("DATA_PREPROCESSING_LIMIT", "100000"))
+    # "fused": one BigQuery statement writes only the prepped table; "split": separate extract and preprocess steps
+    config["DATA_PREP_MODE"] = os.getenv("DATA_PREP_MODE", "fused").lower()
+    if config["DATA_PREP_MODE"] not in ("fused", "split"):
+        raise ValueError(f"DATA_PREP_MODE must be 'fused' or 'split', got {config['DATA_PREP_MODE']}")
+    # Fused mode only: also materialize the extract table for debugging
+    config["DATA_PREP_DEBUG_EXTRACT_TABLE"] = os.getenv("DATA_PREP_DEBUG_EXTRACT_TABLE", "false").lower() == "true"
 
     # BQML Configuration (add these)
     config["BQML_MODEL_NAME"] = os.getenv("BQML_MODEL_NAME", "bqml_babyweight_dnn_combined")
@@ -150,9 +126,52 @@ def load_config():
 
     # Deployment Configuration
     config["ENDPOINT_DISPLAY_NAME"] = os.getenv("ENDPOINT_DISPLAY_NAME", f"{pipeline_name_for_defaults}-endpoint")
-    config["DEPLOY_MACHINE_TYPE"] = os.getenv("DEPLOY_MACHINE_TYPE", "n1-standard-2")
-    config["DEPLOY_MIN_REPLICA_COUNT"] = int(os.getenv("DEPLOY_MIN_REPLICA_COUNT", "1"))
-    config["DEPLOY_MAX_REPLICA_COUNT"] = int(os.getenv("DEPLOY_MAX_REPLICA_COUNT", "1"))
+    # Capacity plan from src/pipeline_2025/capacity_planner.py; explicit DEPLOY_* variables take precedence
+    config["DEPLOY_CAPACITY_PLAN"] = os.getenv("DEPLOY_CAPACITY_PLAN", "")
+    capacity_plan = capacity_planner.load_deploy_params(config["DEPLOY_CAPACITY_PLAN"])
+    if capacity_plan:
+        logging.info(f"Deployment defaults from capacity plan {config['DEPLOY_CAPACITY_PLAN']}: {capacity_plan}")
+    config["DEPLOY_MACHINE_TYPE"] = os.getenv("DEPLOY_MACHINE_TYPE", capacity_plan.get("DEPLOY_MACHINE_TYPE", "n1-standard-2"))
+    config["DEPLOY_MIN_REPLICA_COUNT"] = int(os.getenv("DEPLOY_MIN_REPLICA_COUNT", capacity_plan.get("DEPLOY_MIN_REPLICA_COUNT", 1)))
+    config["DEPLOY_MAX_REPLICA_COUNT"] = int(os.getenv("DEPLOY_MAX_REPLICA_COUNT", capacity_plan.get("DEPLOY_MAX_REPLICA_COUNT", 1)))
+
+    # Post-deployment serving validation (see src/pipeline_2025/serving_validation_comp.py)
+    config["SERVING_VALIDATION_SAMPLE_SIZE"] = int(os.getenv("SERVING_VALIDATION_SAMPLE_SIZE", "200"))
+    config["SERVING_VALIDATION_BATCH_SIZE"] = int(os.getenv("SERVING_VALIDATION_BATCH_SIZE", "32"))
+    config["SERVING_PARITY_ABS_TOLERANCE"] = float(os.getenv("SERVING_PARITY_ABS_TOLERANCE", "0.05"))
+    config["SERVING_MAX_MISMATCH_RATE"] = float(os.getenv("SERVING_MAX_MISMATCH_RATE", "0.0"))
+    config["SERVING_MAX_ERROR_RATE"] = float(os.getenv("SERVING_MAX_ERROR_RATE", "0.0"))
+    config["SERVING_MAX_P95_LATENCY_MS"] = float(os.getenv("SERVING_MAX_P95_LATENCY_MS", "2000"))
+
+    # Offline/online prediction skew gate (see src/pipeline_2025/skew_detection_comp.py)
+    config["SKEW_SAMPLE_SIZE"] = int(os.getenv("SKEW_SAMPLE_SIZE", "2000"))
+    config["SKEW_MAX_MEAN_SHIFT"] = float(os.getenv("SKEW_MAX_MEAN_SHIFT", "0.05"))
+    config["SKEW_MAX_KS_STATISTIC"] = float(os.getenv("SKEW_MAX_KS_STATISTIC", "0.05"))
+    config["SKEW_MAX_GROUP_MEAN_SHIFT"] = float(os.getenv("SKEW_MAX_GROUP_MEAN_SHIFT", "0.1"))
+    config["SKEW_MAX_FAILED_RATE"] = float(os.getenv("SKEW_MAX_FAILED_RATE", "0.0"))
+
+    # Pre-training data quality gate (see src/pipeline_2025/data_quality.py); empty uses the built-in expectations
+    config["DATA_QUALITY_EXPECTATIONS_PATH"] = os.getenv("DATA_QUALITY_EXPECTATIONS_PATH", "")
+
+    # Pre-training data drift gate (see src/pipeline_2025/drift_detection_comp.py)
+    config["DRIFT_REFERENCE_URI"] = os.getenv(
+        "DRIFT_REFERENCE_URI", f"gs://{config['BUCKET_NAME']}/drift_reference/{config['PIPELINE_NAME']}/reference_sketches.json")
+    config["DRIFT_PSI_THRESHOLD"] = float(os.getenv("DRIFT_PSI_THRESHOLD", "0.2"))
+    config["DRIFT_KS_THRESHOLD"] = float(os.getenv("DRIFT_KS_THRESHOLD", "0.1"))
+    config["DRIFT_MAX_DRIFTED_FEATURES"] = int(os.getenv("DRIFT_MAX_DRIFTED_FEATURES", "0"))
+    config["DRIFT_FORCE_RETRAIN"] = os.getenv("DRIFT_FORCE_RETRAIN", "false").lower() == "true"
+
+    # Bytes-billed guardrails for every generated query (see src/pipeline_2025/query_guard.py).
+    # Each step is dry-run first and fails before billing anything if the estimate is over its budget;
+    # QUERY_MAX_BYTES_BILLED_JSON overrides per step, e.g. {"bqml_train": "50GiB"}. 0 disables a cap.
+    config["QUERY_DEFAULT_MAX_BYTES_BILLED"] = int(
+        float(os.getenv("QUERY_DEFAULT_MAX_BYTES_BILLED_GIB", "25")) * query_guard.GIB)
+    config["QUERY_MAX_BYTES_BILLED"] = query_guard.parse_budgets(os.getenv("QUERY_MAX_BYTES_BILLED_JSON", ""))
+
+    # Local run history (see src/pipeline_2025/run_store.py)
+    config["RUN_STORE_PATH"] = os.getenv("RUN_STORE_PATH", str(script_dir / "run_history" / "runs.sqlite"))
+    # Number of compiled specs kept in compiled_pipeline_specs/ (see src/pipeline_2025/spec_cache.py)
+    config["SPEC_CACHE_MAX_ENTRIES"] = int(os.getenv("SPEC_CACHE_MAX_ENTRIES", "5"))
     
     # For column_specs, it's better to define it in Python or load from a dedicated JSON file if complex.
     # For simplicity here, we'll assume a simple default or expect it to be well-formed if set via .env.
@@ -167,15 +186,7 @@ def load_config():
         # Define a default if not provided, or make it mandatory in validation
         # Generate default 'auto' specs for known features if not provided
         logging.info("AUTOML_COLUMN_SPECS_JSON not found in .env. Generating default 'auto' specs.")
-        feature_columns = [
-            "is_male", 
-            "mother_age", 
-            "plurality_category", 
-            "gestation_weeks", 
-            "cigarette_use_str", 
-            "alcohol_use_str"
-        ]
-        config["AUTOML_COLUMN_SPECS"] = {col: "auto" for col in feature_columns}
+        config["AUTOML_COLUMN_SPECS"] = {col: "auto" for col in feature_registry.FEATURES}
         logging.info(f"Generated default AUTOML_COLUMN_SPECS: {config['AUTOML_COLUMN_SPECS']}")
 
     # Use fixed table names by removing the timestamp
@@ -198,6 +209,38 @@ def load_config():
 # --- KFP v2 Pipeline Definition ---
 def create_pipeline_definition(config: dict):
     """Defines the KFP v2 pipeline structure including data prep, BQML and AutoML training, and evaluation."""
+    from kfp import dsl
+    from kfp.dsl import importer_node
+    # Import pre-built Google Cloud Pipeline Components (GCPC)
+    from google_cloud_pipeline_components.v1 import bigquery as gcpc_bq
+    from google_cloud_pipeline_components.v1 import dataset as gcpc_dataset
+    from google_cloud_pipeline_components.v1 import endpoint as gcpc_endpoint
+    # Correct import for AutoML training job components
+    from google_cloud_pipeline_components.v1.automl.training_job import AutoMLTabularTrainingJobRunOp
+    # Import ModelDeployOp from endpoint module
+    from google_cloud_pipeline_components.v1.endpoint import ModelDeployOp
+    from google_cloud_pipeline_components.types import artifact_types
+
+    # Import your custom components
+    # Ensure src/ is in PYTHONPATH or adjust import accordingly if running from elsewhere
+    from src.pipeline_2025 import data_prep_comp
+    from src.pipeline_2025 import data_quality
+    from src.pipeline_2025 import data_quality_comp
+    from src.pipeline_2025 import drift_detection_comp
+    from src.pipeline_2025 import drift_sketches
+    from src.pipeline_2025 import query_cost_comp
+    # Import the BQML component module
+    from src.pipeline_2025 import create_bqml_comp
+    # Import the AutoML component module
+    from src.pipeline_2025 import create_automl_comp
+    # Import the Model Selection component
+    from src.pipeline_2025 import select_best_model_comp
+    # Import the new endpoint management and model registry components
+    from src.pipeline_2025 import endpoint_management_comp
+    from src.pipeline_2025 import model_registry_comp
+    from src.pipeline_2025 import serving_validation_comp
+    from src.pipeline_2025 import skew_detection_comp
+
     @dsl.pipeline(
         name=config["PIPELINE_NAME"] + "-bqml-automl-train-eval",
         description="Modernized baby weight pipeline with data prep, BQML & AutoML training, and evaluation.",
@@ -231,277 +274,460 @@ def create_pipeline_definition(config: dict):
         deploy_machine_type: str = config["DEPLOY_MACHINE_TYPE"],
         deploy_min_replica_count: int = config["DEPLOY_MIN_REPLICA_COUNT"],
         deploy_max_replica_count: int = config["DEPLOY_MAX_REPLICA_COUNT"],
+        # Serving validation Parameters
+        serving_validation_sample_size: int = config["SERVING_VALIDATION_SAMPLE_SIZE"],
+        serving_validation_batch_size: int = config["SERVING_VALIDATION_BATCH_SIZE"],
+        serving_parity_abs_tolerance: float = config["SERVING_PARITY_ABS_TOLERANCE"],
+        serving_max_mismatch_rate: float = config["SERVING_MAX_MISMATCH_RATE"],
+        serving_max_error_rate: float = config["SERVING_MAX_ERROR_RATE"],
+        serving_max_p95_latency_ms: float = config["SERVING_MAX_P95_LATENCY_MS"],
+        # Skew detection Parameters
+        skew_sample_size: int = config["SKEW_SAMPLE_SIZE"],
+        skew_max_mean_shift: float = config["SKEW_MAX_MEAN_SHIFT"],
+        skew_max_ks_statistic: float = config["SKEW_MAX_KS_STATISTIC"],
+        skew_max_group_mean_shift: float = config["SKEW_MAX_GROUP_MEAN_SHIFT"],
+        skew_max_failed_rate: float = config["SKEW_MAX_FAILED_RATE"],
+        # Drift gate Parameters
+        drift_reference_uri: str = config["DRIFT_REFERENCE_URI"],
+        drift_psi_threshold: float = config["DRIFT_PSI_THRESHOLD"],
+        drift_ks_threshold: float = config["DRIFT_KS_THRESHOLD"],
+        drift_max_drifted_features: int = config["DRIFT_MAX_DRIFTED_FEATURES"],
+        drift_force_retrain: bool = config["DRIFT_FORCE_RETRAIN"],
+        # Per-run value supplied at submission so a cached spec can be reused across runs
+        run_timestamp: str = config["TIMESTAMP"],
     ):
-        # Data extraction component - use the existing extract_source_data component
-        extract_task = data_prep_comp.extract_source_data(
-            project_id=project_id,
-            source_bq_table_id=source_bq_table,
-            extracted_bq_table_id=extracted_bq_table_full_id,
-            filter_year=data_extraction_year,
-            region="US"  # Explicitly set to "US" to match where the data table is located
-        ).set_display_name("Extract Source Data")
-
-        preprocess_task = data_prep_comp.preprocess_data_and_split(
-            project_id=project_id,
-            input_bq_table_id=extract_task.outputs["extracted_table_id"],
-            preprocessed_bq_table_id=prepped_bq_table_full_id,
-            data_limit=data_preprocessing_limit,
-            region=bq_location # Using bq_location for the preprocess task since it works with the new table
-        ).set_display_name("Preprocess and Split Data")
-
-        # --- BQML Branch ---
-        # --- Add BQML Training Step --- 
-        # Create a deterministic model ID for caching purposes, or unique ID for production
-        if config["ENABLE_CACHING"]:
-            # When caching is enabled, use a stable identifier to allow task caching
-            vertex_model_id = f"{bqml_model_name}-cached"
+        def max_bytes_billed(step):
+            return config["QUERY_MAX_BYTES_BILLED"].get(step, config["QUERY_DEFAULT_MAX_BYTES_BILLED"])
+
+        if config["DATA_PREP_MODE"] == "split":
+            # Data extraction component - use the existing extract_source_data component
+            extract_task = data_prep_comp.extract_source_data(
+                project_id=project_id,
+                source_bq_table_id=source_bq_table,
+                extracted_bq_table_id=extracted_bq_table_full_id,
+                filter_year=data_extraction_year,
+                region="US",  # Explicitly set to "US" to match where the data table is located
+                max_bytes_billed=max_bytes_billed("extract_source_data"),
+            ).set_display_name("Extract Source Data")
+
+            preprocess_task = data_prep_comp.preprocess_data_and_split(
+                project_id=project_id,
+                input_bq_table_id=extract_task.outputs["extracted_table_id"],
+                preprocessed_bq_table_id=prepped_bq_table_full_id,
+                data_limit=data_preprocessing_limit,
+                region=bq_location, # Using bq_location for the preprocess task since it works with the new table
+                max_bytes_billed=max_bytes_billed("preprocess_data_and_split"),
+            ).set_display_name("Preprocess and Split Data")
         else:
-            # When caching is disabled or in production, use a unique identifier
-            vertex_model_id = f"{bqml_model_name}-{config['TIMESTAMP']}"
-        
-        train_query = create_bqml_comp.create_query_build_bqml_model(
-            project=project_id,
-            bq_dataset=config["BQ_DATASET_STAGING"],
-            bq_model_name=bqml_model_name,
-            formatted_bq_version_aliases=formatted_bqml_model_version_aliases,
-            var_target=var_target,
-            bq_train_table_id=preprocess_task.outputs["preprocessed_table_id"],
-            model_registry="vertex_ai",  # Add this to register directly with Vertex AI
-            vertex_ai_model_id=vertex_model_id  # Use our cache-friendly or unique ID
-        )
-
-        bqml_train_task = gcpc_bq.BigqueryCreateModelJobOp(
-            project=project_id,
-            location=bq_location,
-            query=train_query,
-        ).set_display_name("Train BQML Model").after(preprocess_task)
-
-        # Construct the Vertex AI Model resource name string using the helper component
-        construct_name_task = helper_components.construct_vertex_model_resource_name(
+            # Extract and preprocess in one statement; the extract table is written only for debugging
+            preprocess_task = data_prep_comp.extract_and_preprocess_data(
+                project_id=project_id,
+                source_bq_table_id=source_bq_table,
+                preprocessed_bq_table_id=prepped_bq_table_full_id,
+                filter_year=data_extraction_year,
+                data_limit=data_preprocessing_limit,
+                debug_extracted_bq_table_id=extracted_bq_table_full_id if config["DATA_PREP_DEBUG_EXTRACT_TABLE"] else "",
+                max_bytes_billed=max_bytes_billed("extract_and_preprocess_data"),
+            ).set_display_name("Extract, Preprocess and Split Data")
+
+        # --- Data quality gate: one profile query, fails the run on violated expectations ---
+        quality_expectations = data_quality.load_expectations(config["DATA_QUALITY_EXPECTATIONS_PATH"])
+        quality_task = data_quality_comp.validate_data_quality(
             project_id=project_id,
-            region=region, # Ensure this is the region where the Vertex AI model is registered
-            vertex_model_id=vertex_model_id # This is already defined based on caching settings
-        ).set_display_name("Construct Vertex Model Name").after(bqml_train_task) # Runs after BQML training ensures model exists
-
-        # Import the BQML model (now in Vertex AI Registry) as a VertexModel artifact for KFP
-        bqml_model_importer_task = importer_node.importer(
-            artifact_uri=construct_name_task.outputs["vertex_model_resource_name_str"],
-            artifact_class=artifact_types.VertexModel,
-            metadata={'resourceName': construct_name_task.outputs["vertex_model_resource_name_str"]} 
-        ).set_display_name("Import BQML as VertexModel Artifact").after(construct_name_task)
-
-        # --- Add BQML Evaluation Step --- 
-        bqml_evaluate_task = gcpc_bq.BigqueryEvaluateModelJobOp(
-            project=project_id, 
-            location=bq_location, 
-            model=bqml_train_task.outputs["model"] 
-        ).set_display_name('Evaluate BQML Model').after(bqml_train_task)
-
-        # --- Add BQML Metrics Collection Step --- 
-        collect_bqml_metrics_task = create_bqml_comp.collect_eval_metrics_bqml(
-            eval_metrics_artifact=bqml_evaluate_task.outputs["evaluation_metrics"]
-        ).set_display_name('Collect BQML Metrics').after(bqml_evaluate_task)
-
-        # --- AutoML Branch ---
-        # --- Create Vertex AI Dataset for AutoML --- 
-        vertex_dataset_task = gcpc_dataset.TabularDatasetCreateOp(
-            project=project_id,
-            display_name=vertex_dataset_display_name,
-            bq_source=f'bq://{preprocess_task.outputs["preprocessed_table_id"]}',
-            location=region # Use the main region for Vertex AI resources
-        ).set_display_name("Create Vertex AI Dataset").after(preprocess_task)
-
-        # --- Train AutoML Model ---
-        automl_train_task = AutoMLTabularTrainingJobRunOp(
-            project=project_id,
-            # Use the pipeline parameter for the job display name
-            display_name=automl_training_job_display_name,
-            optimization_prediction_type="regression",
-            optimization_objective="minimize-rmse",
-            budget_milli_node_hours=automl_budget_milli_node_hours,
-            # Use the pipeline parameter for the model display name itself
-            model_display_name=automl_model_display_name_param, 
-            dataset=vertex_dataset_task.outputs["dataset"],
-            target_column=var_target, 
-            column_specs=automl_column_specs,
-            location=region # Use the main region for Vertex AI resources
-        ).set_display_name("Train AutoML Model").after(vertex_dataset_task)
-
-        # Collect AutoML Model evaluation metrics
-        collect_automl_metrics_task = create_automl_comp.collect_eval_metrics_automl(
+            bq_location=bq_location,
+            profile_query=data_quality.profile_query(preprocess_task.outputs["preprocessed_table_id"],
+                                                     quality_expectations),
+            expectations_json=json.dumps(quality_expectations),
+            max_bytes_billed=max_bytes_billed("validate_data_quality"),
+        ).set_display_name("Validate Data Quality").after(preprocess_task)
+
+        # --- Drift gate: sketch the new data and compare with the last training set ---
+        drift_task = drift_detection_comp.detect_data_drift(
             project_id=project_id,
-            region=region,
-            model_artifact=automl_train_task.outputs["model"],
-        ).set_display_name("Collect AutoML Metrics").after(automl_train_task)
-
-        # --- Model Selection - Compare BQML and AutoML models ---
-        select_model_task = select_best_model_comp.select_best_model(
-            automl_metrics=collect_automl_metrics_task.outputs["metrics_output"],
-            automl_model=automl_train_task.outputs["model"],
-            bqml_metrics=collect_bqml_metrics_task.outputs["metrics"],
-            bqml_model=bqml_train_task.outputs["model"],
-            reference_metric_name=comparison_metric,
-            thresholds_dict=model_thresholds
-        ).set_display_name("Select Best Model").after(collect_bqml_metrics_task, collect_automl_metrics_task)
+            bq_location=bq_location,
+            sketch_query=drift_sketches.sketch_query(preprocess_task.outputs["preprocessed_table_id"]),
+            reference_uri=drift_reference_uri,
+            psi_threshold=drift_psi_threshold,
+            ks_threshold=drift_ks_threshold,
+            max_drifted_features=drift_max_drifted_features,
+            force_retrain=drift_force_retrain,
+            max_bytes_billed=max_bytes_billed("detect_data_drift"),
+        ).set_display_name("Detect Data Drift").after(quality_task)
+
+        # Training, selection and deployment only run when the data moved
+        with dsl.If(drift_task.outputs["retrain_needed"] == "true", name="drift_retrain_gate"):
+            # --- BQML Branch ---
+            # --- Add BQML Training Step --- 
+            # Create a deterministic model ID for caching purposes, or unique ID for production
+            if config["ENABLE_CACHING"]:
+                # When caching is enabled, use a stable identifier to allow task caching
+                vertex_model_id = f"{bqml_model_name}-cached"
+            else:
+                # When caching is disabled or in production, use a unique identifier
+                vertex_model_id = f"{bqml_model_name}-{run_timestamp}"
         
-        # Log the outputs from the selection task for visibility
-        logging.info(f"Model selection task added with outputs: {select_model_task.outputs}")
+            train_query = create_bqml_comp.create_query_build_bqml_model(
+                project=project_id,
+                bq_dataset=config["BQ_DATASET_STAGING"],
+                bq_model_name=bqml_model_name,
+                formatted_bq_version_aliases=formatted_bqml_model_version_aliases,
+                var_target=var_target,
+                bq_train_table_id=preprocess_task.outputs["preprocessed_table_id"],
+                model_registry="vertex_ai",  # Add this to register directly with Vertex AI
+                vertex_ai_model_id=vertex_model_id  # Use our cache-friendly or unique ID
+            )
+
+            # Dry-run the training statement so an over-budget model fails before training starts
+            train_cost_task = query_cost_comp.preflight_query_cost(
+                project_id=project_id,
+                location=bq_location,
+                step="bqml_train",
+                query=train_query,
+                max_bytes_billed=max_bytes_billed("bqml_train"),
+            ).set_display_name("Estimate BQML Training Cost").after(preprocess_task)
+
+            bqml_train_task = gcpc_bq.BigqueryCreateModelJobOp(
+                project=project_id,
+                location=bq_location,
+                query=train_query,
+                job_configuration_query=(
+                    {"maximumBytesBilled": str(max_bytes_billed("bqml_train"))} if max_bytes_billed("bqml_train") else {}
+                ),
+            ).set_display_name("Train BQML Model").after(train_cost_task)
+
+            # --- Add BQML Evaluation Step --- 
+            bqml_evaluate_task = gcpc_bq.BigqueryEvaluateModelJobOp(
+                project=project_id, 
+                location=bq_location, 
+                model=bqml_train_task.outputs["model"],
+                job_configuration_query=(
+                    {"maximumBytesBilled": str(max_bytes_billed("bqml_evaluate"))} if max_bytes_billed("bqml_evaluate") else {}
+                ),
+            ).set_display_name('Evaluate BQML Model').after(bqml_train_task)
+
+            # --- Add BQML Metrics Collection Step --- 
+            collect_bqml_metrics_task = create_bqml_comp.collect_eval_metrics_bqml(
+                eval_metrics_artifact=bqml_evaluate_task.outputs["evaluation_metrics"],
+                # The Vertex AI model resource name is formatted here rather than in a pod of its own
+                project_id=project_id,
+                region=region, # Ensure this is the region where the Vertex AI model is registered
+                vertex_model_id=vertex_model_id # This is already defined based on caching settings
+            ).set_display_name('Collect BQML Metrics').after(bqml_evaluate_task)
+
+            # Import the BQML model (now in Vertex AI Registry) as a VertexModel artifact for KFP.
+            # The importer needs its URI as a single channel: KFP 2.6 compiles an f-string URI to a literal
+            bqml_model_importer_task = importer_node.importer(
+                artifact_uri=collect_bqml_metrics_task.outputs["vertex_model_resource_name"],
+                artifact_class=artifact_types.VertexModel,
+                metadata={'resourceName': collect_bqml_metrics_task.outputs["vertex_model_resource_name"]}
+            ).set_display_name("Import BQML as VertexModel Artifact").after(collect_bqml_metrics_task)
+
+            # --- AutoML Branch ---
+            # --- Create Vertex AI Dataset for AutoML --- 
+            vertex_dataset_task = gcpc_dataset.TabularDatasetCreateOp(
+                project=project_id,
+                display_name=vertex_dataset_display_name,
+                bq_source=f'bq://{preprocess_task.outputs["preprocessed_table_id"]}',
+                location=region # Use the main region for Vertex AI resources
+            ).set_display_name("Create Vertex AI Dataset").after(preprocess_task)
+
+            # --- Train AutoML Model ---
+            automl_train_task = AutoMLTabularTrainingJobRunOp(
+                project=project_id,
+                # Use the pipeline parameter for the job display name
+                display_name=automl_training_job_display_name,
+                optimization_prediction_type="regression",
+                optimization_objective="minimize-rmse",
+                budget_milli_node_hours=automl_budget_milli_node_hours,
+                # Use the pipeline parameter for the model display name itself
+                model_display_name=automl_model_display_name_param, 
+                dataset=vertex_dataset_task.outputs["dataset"],
+                target_column=var_target, 
+                column_specs=automl_column_specs,
+                location=region # Use the main region for Vertex AI resources
+            ).set_display_name("Train AutoML Model").after(vertex_dataset_task)
+
+            # Collect AutoML Model evaluation metrics
+            collect_automl_metrics_task = create_automl_comp.collect_eval_metrics_automl(
+                project_id=project_id,
+                region=region,
+                model_artifact=automl_train_task.outputs["model"],
+            ).set_display_name("Collect AutoML Metrics").after(automl_train_task)
+
+            # --- Model Selection - Compare BQML and AutoML models ---
+            select_model_task = select_best_model_comp.select_best_model(
+                automl_metrics=collect_automl_metrics_task.outputs["metrics_output"],
+                automl_model=automl_train_task.outputs["model"],
+                bqml_metrics=collect_bqml_metrics_task.outputs["metrics"],
+                bqml_model=bqml_train_task.outputs["model"],
+                reference_metric_name=comparison_metric,
+                thresholds_dict=model_thresholds
+            ).set_display_name("Select Best Model").after(collect_bqml_metrics_task, collect_automl_metrics_task)
         
-        # Log which model was selected and the deployment decision
-        best_model_name = select_model_task.outputs["best_model_name"]
-        deploy_decision = select_model_task.outputs["deploy_decision"]
-        best_metric = select_model_task.outputs["best_metric_value"]
+            # Log the outputs from the selection task for visibility
+            logging.info(f"Model selection task added with outputs: {select_model_task.outputs}")
         
-        # Fix: Use string literals for logging instead of pipeline parameters directly
-        logging.info("Pipeline will select best model based on configured metric")
-        logging.info("Deployment decision will be based on model performance threshold")
-
-        # --- Deployment - Create Endpoint and Deploy Best Model ---
-        # Create endpoint for model deployment using standard component (unmodified)
-        standard_endpoint_task = gcpc_endpoint.EndpointCreateOp(
-            project=project_id,
-            location=region,
-            display_name=endpoint_display_name
-        ).set_display_name("Create Endpoint")
+            # Log which model was selected and the deployment decision
+            best_model_name = select_model_task.outputs["best_model_name"]
+            deploy_decision = select_model_task.outputs["deploy_decision"]
+            best_metric = select_model_task.outputs["best_metric_value"]
         
-        # Add separate endpoint check task that runs in parallel and doesn't affect the original flow
-        endpoint_check_task = endpoint_management_comp.get_or_create_endpoint(
-            project_id=project_id,
-            location=region,
-            display_name=endpoint_display_name
-        ).set_display_name("Check Existing Endpoint")
-
-        # Only deploy if the model meets the threshold criteria
-        with dsl.If(
-            select_model_task.outputs["deploy_decision"] == "true",
-            name="deployment_qualification_check"
-        ):
-            # For AutoML model
+            # Fix: Use string literals for logging instead of pipeline parameters directly
+            logging.info("Pipeline will select best model based on configured metric")
+            logging.info("Deployment decision will be based on model performance threshold")
+
+            # --- Deployment - Create Endpoint and Deploy Best Model ---
+            # Create endpoint for model deployment using standard component (unmodified)
+            standard_endpoint_task = gcpc_endpoint.EndpointCreateOp(
+                project=project_id,
+                location=region,
+                display_name=endpoint_display_name
+            ).set_display_name("Create Endpoint")
+        
+            # Add separate endpoint check task that runs in parallel and doesn't affect the original flow
+            endpoint_check_task = endpoint_management_comp.get_or_create_endpoint(
+                project_id=project_id,
+                location=region,
+                display_name=endpoint_display_name
+            ).set_display_name("Check Existing Endpoint")
+
+            # Only deploy if the model meets the threshold criteria
             with dsl.If(
-                select_model_task.outputs["best_model_name"] == "AutoML",
-                name="model_type_selector"
+                select_model_task.outputs["deploy_decision"] == "true",
+                name="deployment_qualification_check"
             ):
-                # Register AutoML model
-                register_automl_task = model_registry_comp.register_best_model_in_registry(
-                    model=automl_train_task.outputs["model"],
-                    model_name=f"{config['PIPELINE_NAME']}-automl-model",
-                    model_version=config['TIMESTAMP'],
-                    metrics=collect_automl_metrics_task.outputs["metrics_output"],
-                    project_id=project_id,
-                    location=region,
-                    description=f"AutoML model selected by pipeline run at {config['TIMESTAMP']}",
-                    additional_metadata={
-                        "pipeline_run_id": dsl.PIPELINE_JOB_ID_PLACEHOLDER,
-                        "model_type": "AutoML",
-                        "comparison_metric": config["COMPARISON_METRIC"],
-                        "metric_source": "automl_metrics"
-                    }
-                ).set_display_name("Register AutoML Model").after(select_model_task)
-                
-                # Deploy AutoML model - now using the registered model ID and version
-                automl_deploy_task = ModelDeployOp(
-                    model=automl_train_task.outputs["model"],
-                    endpoint=standard_endpoint_task.outputs["endpoint"],
-                    dedicated_resources_machine_type=deploy_machine_type,
-                    dedicated_resources_min_replica_count=deploy_min_replica_count,
-                    dedicated_resources_max_replica_count=deploy_max_replica_count,
-                    traffic_split={"0": 100},
-                    # Adding display metadata to track model info 
-                    deployed_model_display_name=f"AutoML-Model-{config['TIMESTAMP']}"
-                ).set_display_name("Deploy AutoML Model").after(standard_endpoint_task, register_automl_task)
-                
-                # Log model registration info
-                log_model_info_task = helper_components.log_model_details(
-                    model_id=register_automl_task.outputs["registered_model_id"],
-                    model_version=register_automl_task.outputs["model_version_id"],
-                    model_type="AutoML"
-                ).set_display_name("Log AutoML Model Info").after(register_automl_task)
-                
-                # Add traffic management without modifying the original flow
-                with dsl.If(endpoint_check_task.outputs["is_new_endpoint"] == False,
-                           name="traffic_update_decision"):
-                    update_traffic_task = endpoint_management_comp.update_traffic_split(
+                # For AutoML model
+                with dsl.If(
+                    select_model_task.outputs["best_model_name"] == "AutoML",
+                    name="model_type_selector"
+                ):
+                    # Register AutoML model
+                    register_automl_task = model_registry_comp.register_best_model_in_registry(
+                        model=automl_train_task.outputs["model"],
+                        model_name=f"{config['PIPELINE_NAME']}-automl-model",
+                        model_version=run_timestamp,
+                        metrics=collect_automl_metrics_task.outputs["metrics_output"],
                         project_id=project_id,
                         location=region,
-                        endpoint_resource_name=endpoint_check_task.outputs["endpoint_resource_name"],
-                        deployed_model_id="PLACEHOLDER_ID", # We'll update this in the component
-                        traffic_percentage=100,  # Give full traffic to new model
-                        # Pass registered model information for better tracking
-                        registered_model_id=register_automl_task.outputs["registered_model_id"],
-                        model_version_id=register_automl_task.outputs["model_version_id"]
-                    ).set_display_name("Update Traffic Split").after(automl_deploy_task)
-            
-            # For BQML model
-            with dsl.Elif(
-                select_model_task.outputs["best_model_name"] == "BQML",
-                name="register_bqml"
-            ):
-                # Register BQML model
-                register_bqml_task = model_registry_comp.register_best_model_in_registry(
-                    model=bqml_model_importer_task.outputs["artifact"],
-                    model_name=f"{config['PIPELINE_NAME']}-bqml-model",
-                    model_version=config['TIMESTAMP'],
-                    metrics=collect_bqml_metrics_task.outputs["metrics"],
-                    project_id=project_id,
-                    location=region,
-                    description=f"BQML model selected by pipeline run at {config['TIMESTAMP']}",
-                    additional_metadata={
-                        "pipeline_run_id": dsl.PIPELINE_JOB_ID_PLACEHOLDER,
-                        "model_type": "BQML",
-                        "comparison_metric": config["COMPARISON_METRIC"],
-                        "metric_source": "bqml_metrics"
-                    }
-                ).set_display_name("Register BQML Model").after(select_model_task)
+                        description=f"AutoML model selected by pipeline run at {run_timestamp}",
+                        additional_metadata={
+                            "pipeline_run_id": dsl.PIPELINE_JOB_ID_PLACEHOLDER,
+                            "model_type": "AutoML",
+                            "comparison_metric": config["COMPARISON_METRIC"],
+                            "metric_source": "automl_metrics"
+                        }
+                    ).set_display_name("Register AutoML Model").after(select_model_task)
                 
-                # Log model registration info
-                log_model_info_task = helper_components.log_model_details(
-                    model_id=register_bqml_task.outputs["registered_model_id"],
-                    model_version=register_bqml_task.outputs["model_version_id"],
-                    model_type="BQML"
-                ).set_display_name("Log BQML Model Info").after(register_bqml_task)
+                    # Deploy AutoML model - now using the registered model ID and version
+                    automl_deploy_task = ModelDeployOp(
+                        model=automl_train_task.outputs["model"],
+                        endpoint=standard_endpoint_task.outputs["endpoint"],
+                        dedicated_resources_machine_type=deploy_machine_type,
+                        dedicated_resources_min_replica_count=deploy_min_replica_count,
+                        dedicated_resources_max_replica_count=deploy_max_replica_count,
+                        traffic_split={"0": 100},
+                        # Adding display metadata to track model info 
+                        deployed_model_display_name=f"AutoML-Model-{run_timestamp}"
+                    ).set_display_name("Deploy AutoML Model").after(standard_endpoint_task, register_automl_task)
+
+                    # Smoke/load probe of the deployed model; AutoML has no cheap offline scorer,
+                    # so parity is skipped and only errors and latency are gated
+                    automl_serving_validation_task = serving_validation_comp.validate_serving_endpoint(
+                        project_id=project_id,
+                        location=region,
+                        bq_location=bq_location,
+                        endpoint=standard_endpoint_task.outputs["endpoint"],
+                        prepped_table_id=preprocess_task.outputs["preprocessed_table_id"],
+                        sample_size=serving_validation_sample_size,
+                        batch_size=serving_validation_batch_size,
+                        max_error_rate=serving_max_error_rate,
+                        max_p95_latency_ms=serving_max_p95_latency_ms,
+                        max_bytes_billed=max_bytes_billed("validate_serving_endpoint"),
+                    ).set_display_name("Validate AutoML Serving").after(automl_deploy_task)
+
+                    # The deployed model was trained on this data: compare the next run against it
+                    drift_detection_comp.promote_drift_reference(
+                        project_id=project_id,
+                        drift_report=drift_task.outputs["drift_report"],
+                        reference_uri=drift_reference_uri,
+                    ).set_display_name("Promote Drift Reference").after(automl_serving_validation_task)
                 
-                # Deploy BQML model - now using the registered model ID and version
-                bqml_deploy_task = ModelDeployOp(
-                    model=bqml_model_importer_task.outputs["artifact"], # Use the imported VertexModel artifact
-                    endpoint=standard_endpoint_task.outputs["endpoint"],
-                    dedicated_resources_machine_type=deploy_machine_type,
-                    dedicated_resources_min_replica_count=deploy_min_replica_count,
-                    dedicated_resources_max_replica_count=deploy_max_replica_count,
-                    traffic_split={"0": 100},
-                    # Adding display metadata to track model info
-                    deployed_model_display_name=f"BQML-Model-{config['TIMESTAMP']}"
-                ).set_display_name("Deploy BQML Model").after(standard_endpoint_task, register_bqml_task)
+                    # Add traffic management without modifying the original flow
+                    with dsl.If(endpoint_check_task.outputs["is_new_endpoint"] == False,
+                               name="traffic_update_decision"):
+                        update_traffic_task = endpoint_management_comp.update_traffic_split(
+                            project_id=project_id,
+                            location=region,
+                            endpoint_resource_name=endpoint_check_task.outputs["endpoint_resource_name"],
+                            deployed_model_id="PLACEHOLDER_ID", # We'll update this in the component
+                            traffic_percentage=100,  # Give full traffic to new model
+                            # Pass registered model information for better tracking
+                            registered_model_id=register_automl_task.outputs["registered_model_id"],
+                            model_version_id=register_automl_task.outputs["model_version_id"]
+                        ).set_display_name("Update Traffic Split").after(automl_serving_validation_task)
+            
+                # For BQML model
+                with dsl.Elif(
+                    select_model_task.outputs["best_model_name"] == "BQML",
+                    name="register_bqml"
+                ):
+                    # Register BQML model
+                    register_bqml_task = model_registry_comp.register_best_model_in_registry(
+                        model=bqml_model_importer_task.outputs["artifact"],
+                        model_name=f"{config['PIPELINE_NAME']}-bqml-model",
+                        model_version=run_timestamp,
+                        metrics=collect_bqml_metrics_task.outputs["metrics"],
+                        project_id=project_id,
+                        location=region,
+                        description=f"BQML model selected by pipeline run at {run_timestamp}",
+                        additional_metadata={
+                            "pipeline_run_id": dsl.PIPELINE_JOB_ID_PLACEHOLDER,
+                            "model_type": "BQML",
+                            "comparison_metric": config["COMPARISON_METRIC"],
+                            "metric_source": "bqml_metrics"
+                        }
+                    ).set_display_name("Register BQML Model").after(select_model_task)
                 
-                # Add traffic management without modifying the original flow
-                with dsl.If(endpoint_check_task.outputs["is_new_endpoint"] == False,
-                           name="traffic_update_decision"):
-                    update_traffic_task = endpoint_management_comp.update_traffic_split(
+                    # Deploy BQML model - now using the registered model ID and version
+                    bqml_deploy_task = ModelDeployOp(
+                        model=bqml_model_importer_task.outputs["artifact"], # Use the imported VertexModel artifact
+                        endpoint=standard_endpoint_task.outputs["endpoint"],
+                        dedicated_resources_machine_type=deploy_machine_type,
+                        dedicated_resources_min_replica_count=deploy_min_replica_count,
+                        dedicated_resources_max_replica_count=deploy_max_replica_count,
+                        # The serving checks below reach the model through the endpoint's traffic
+                        # split, so it takes all traffic; a skew breach rolls the deployment back
+                        traffic_split={"0": 100},
+                        # Adding display metadata to track model info
+                        deployed_model_display_name=f"BQML-Model-{run_timestamp}"
+                    ).set_display_name("Deploy BQML Model").after(
+                        standard_endpoint_task, register_bqml_task,
+                        # Its traffic split snapshot must be taken before the deployment
+                        endpoint_check_task)
+
+                    # Smoke/load probe plus parity against ML.PREDICT on the same TEST rows
+                    bqml_serving_validation_task = serving_validation_comp.validate_serving_endpoint(
+                        project_id=project_id,
+                        location=region,
+                        bq_location=bq_location,
+                        endpoint=standard_endpoint_task.outputs["endpoint"],
+                        prepped_table_id=preprocess_task.outputs["preprocessed_table_id"],
+                        offline_bqml_model_id=f"{project_id}.{config['BQ_DATASET_STAGING']}.{bqml_model_name}",
+                        sample_size=serving_validation_sample_size,
+                        batch_size=serving_validation_batch_size,
+                        parity_abs_tolerance=serving_parity_abs_tolerance,
+                        max_mismatch_rate=serving_max_mismatch_rate,
+                        max_error_rate=serving_max_error_rate,
+                        max_p95_latency_ms=serving_max_p95_latency_ms,
+                        max_bytes_billed=max_bytes_billed("validate_serving_endpoint"),
+                    ).set_display_name("Validate BQML Serving").after(bqml_deploy_task)
+
+                    # Distribution-level offline/online skew; a breach skips the traffic update
+                    bqml_skew_task = skew_detection_comp.detect_prediction_skew(
                         project_id=project_id,
                         location=region,
-                        endpoint_resource_name=endpoint_check_task.outputs["endpoint_resource_name"],
-                        deployed_model_id="PLACEHOLDER_ID", # We'll update this in the component
-                        traffic_percentage=100,  # Give full traffic to new model
-                        # Pass registered model information for better tracking
-                        registered_model_id=register_bqml_task.outputs["registered_model_id"],
-                        model_version_id=register_bqml_task.outputs["model_version_id"]
-                    ).set_display_name("Update Traffic Split").after(bqml_deploy_task)
+                        bq_location=bq_location,
+                        endpoint=standard_endpoint_task.outputs["endpoint"],
+                        prepped_table_id=preprocess_task.outputs["preprocessed_table_id"],
+                        offline_bqml_model_id=f"{project_id}.{config['BQ_DATASET_STAGING']}.{bqml_model_name}",
+                        sample_size=skew_sample_size,
+                        max_mean_shift=skew_max_mean_shift,
+                        max_ks_statistic=skew_max_ks_statistic,
+                        max_group_mean_shift=skew_max_group_mean_shift,
+                        max_failed_rate=skew_max_failed_rate,
+                        max_bytes_billed=max_bytes_billed("detect_prediction_skew"),
+                    ).set_display_name("Detect BQML Prediction Skew").after(bqml_serving_validation_task)
+                
+                    with dsl.If(bqml_skew_task.outputs["promotion_decision"] == "true",
+                                name="skew_promotion_gate"):
+                        # The deployed model was trained on this data: compare the next run against it
+                        drift_detection_comp.promote_drift_reference(
+                            project_id=project_id,
+                            drift_report=drift_task.outputs["drift_report"],
+                            reference_uri=drift_reference_uri,
+                        ).set_display_name("Promote Drift Reference").after(bqml_skew_task)
+                        # Add traffic management without modifying the original flow
+                        with dsl.If(endpoint_check_task.outputs["is_new_endpoint"] == False,
+                                   name="traffic_update_decision"):
+                            update_traffic_task = endpoint_management_comp.update_traffic_split(
+                                project_id=project_id,
+                                location=region,
+                                endpoint_resource_name=endpoint_check_task.outputs["endpoint_resource_name"],
+                                deployed_model_id="PLACEHOLDER_ID", # We'll update this in the component
+                                traffic_percentage=100,  # Give full traffic to new model
+                                # Pass registered model information for better tracking
+                                registered_model_id=register_bqml_task.outputs["registered_model_id"],
+                                model_version_id=register_bqml_task.outputs["model_version_id"]
+                            ).set_display_name("Update Traffic Split").after(bqml_skew_task)
+                    with dsl.Else(name="skew_rollback"):
+                        # Skewed models must not keep serving: undeploy and restore the previous split
+                        endpoint_management_comp.rollback_deployment(
+                            project_id=project_id,
+                            location=region,
+                            endpoint_resource_name=endpoint_check_task.outputs["endpoint_resource_name"],
+                            deployed_model_display_name=f"BQML-Model-{run_timestamp}",
+                            previous_traffic_split_json=endpoint_check_task.outputs["traffic_split_json"],
+                        ).set_display_name("Roll Back BQML Deployment").after(bqml_skew_task)
 
     return modernized_full_pipeline_py
 
 # --- Main Execution ---
-def main():
-    parser = argparse.ArgumentParser(description="Compile and run the KFP ML pipeline.")
-    parser.add_argument("--compile-only", action="store_true", help="Compile the pipeline and exit.")
-    parser.add_argument("--run-pipeline", action="store_true", help="Compile and run the pipeline on Vertex AI.")
-    args = parser.parse_args()
+# Each subcommand imports only what it needs: `compile` pulls in kfp/GCPC only on a
+# spec cache miss, and the Vertex AI SDK is imported and initialized only by `run`.
+# benchmarks/bench_runner_startup.py tracks the cold-start cost of each path.
+COMPILED_JSON_OUTPUT_DIR = "compiled_pipeline_specs"
 
-    logging.info("Loading pipeline configuration...")
-    config = load_config()
 
-    logging.info(f"Project ID: {config['PROJECT_ID']}")
-    logging.info(f"Region: {config['REGION']}")
-    logging.info(f"Pipeline Name: {config['PIPELINE_NAME']}")
-    logging.info(f"Pipeline Root: {config['PIPELINE_ROOT']}")
+def get_compiled_spec(config: dict, no_spec_cache: bool = False) -> str:
+    """Returns the path of the compiled spec, compiling only on a cache miss."""
+    logging.info(f"Compiled pipeline JSON specifications will be saved in: {os.path.abspath(COMPILED_JSON_OUTPUT_DIR)}")
+
+    # Reuse the compiled spec when neither the sources nor the resolved config changed
+    spec_key = spec_cache.spec_cache_key(config, spec_cache.default_source_paths(Path(__file__).parent))
+    cache = spec_cache.SpecCache(
+        COMPILED_JSON_OUTPUT_DIR,
+        prefix=f"{config['PIPELINE_NAME']}-bqml-automl-train-eval",
+        max_entries=config["SPEC_CACHE_MAX_ENTRIES"],
+    )
+    cached_spec_path = None if no_spec_cache else cache.lookup(spec_key)
+
+    if cached_spec_path:
+        pipeline_json_spec_path = str(cached_spec_path)
+        logging.info(f"Spec cache hit ({spec_key[:16]}). Reusing {pipeline_json_spec_path}")
+    else:
+        from kfp import compiler
+
+        pipeline_func = create_pipeline_definition(config)
+        pipeline_json_spec_path = str(cache.path_for(spec_key))
+        logging.info(f"Compiling pipeline to {pipeline_json_spec_path}...")
+        compiler.Compiler().compile(
+            pipeline_func=pipeline_func,
+            package_path=pipeline_json_spec_path,
+        )
+        # Reject specs that schedule pods for pure parameter work, and keep them out of the cache
+        with open(pipeline_json_spec_path) as f:
+            compiled_spec = json.load(f)
+        try:
+            pipeline_rules.check_spec(compiled_spec)
+        except pipeline_rules.PipelineRuleViolation:
+            os.remove(pipeline_json_spec_path)
+            raise
+        logging.info("Pipeline compiled successfully.")
+    cache.gc(keep=Path(pipeline_json_spec_path))
+    return pipeline_json_spec_path
+
+
+def compile_command(args, config: dict):
+    get_compiled_spec(config, no_spec_cache=args.no_spec_cache)
+    logging.info("Compile-only mode. Exiting after compilation.")
+
+
+def run_command(args, config: dict):
+    pipeline_json_spec_path = get_compiled_spec(config, no_spec_cache=args.no_spec_cache)
+    # Components import shared modules that only the prebuilt images contain
+    component_images.check_images_for_submission()
+
+    from google.cloud import aiplatform as vertex_ai
 
     logging.info("Initializing Vertex AI SDK...")
     vertex_ai.init(
@@ -510,57 +736,172 @@ def main():
         staging_bucket=config["PIPELINE_ROOT"]
     )
 
-    pipeline_func = create_pipeline_definition(config)
+    pipeline_job = vertex_ai.PipelineJob(
+        display_name=f"{config['PIPELINE_NAME']}-bqml-automl-train-eval-run-{config['TIMESTAMP']}",
+        template_path=pipeline_json_spec_path,
+        parameter_values={"run_timestamp": config["TIMESTAMP"]},
+        # pipeline_root=config["PIPELINE_ROOT"], # Usually inherited from compiled spec
+        enable_caching=config["ENABLE_CACHING"],
+        project=config["PROJECT_ID"],
+        location=config["REGION"]
+    )
+    if args.dry_run:
+        logging.info(f"Dry run. Would submit {pipeline_job.display_name} from {pipeline_json_spec_path}")
+        return
+    submit_pipeline_job(pipeline_job, config)
 
-    # Define and create the directory for compiled pipeline specifications
-    COMPILED_JSON_OUTPUT_DIR = "compiled_pipeline_specs"
-    os.makedirs(COMPILED_JSON_OUTPUT_DIR, exist_ok=True)
-    logging.info(f"Compiled pipeline JSON specifications will be saved in: {os.path.abspath(COMPILED_JSON_OUTPUT_DIR)}")
 
-    pipeline_json_spec_path = os.path.join(
-        COMPILED_JSON_OUTPUT_DIR, 
-        f"{config['PIPELINE_NAME']}-bqml-automl-train-eval_{config['TIMESTAMP']}.json"
-    )
+def resume_command(args, config: dict):
+    """Reruns only the failed or invalidated steps of a prior job (see resume_planner.py)."""
+    pipeline_json_spec_path = get_compiled_spec(config, no_spec_cache=args.no_spec_cache)
+    # Components import shared modules that only the prebuilt images contain
+    component_images.check_images_for_submission()
+
+    from google.cloud import aiplatform as vertex_ai
+    from src.pipeline_2025 import resume_planner
 
-    logging.info(f"Compiling pipeline to {pipeline_json_spec_path}...")
-    compiler.Compiler().compile(
-        pipeline_func=pipeline_func,
-        package_path=pipeline_json_spec_path,
+    logging.info("Initializing Vertex AI SDK...")
+    vertex_ai.init(
+        project=config["PROJECT_ID"],
+        location=config["REGION"],
+        staging_bucket=config["PIPELINE_ROOT"]
     )
-    logging.info("Pipeline compiled successfully.")
+    job_name = args.job_id if args.job_id.startswith("projects/") else \
+        f"projects/{config['PROJECT_ID']}/locations/{config['REGION']}/pipelineJobs/{args.job_id}"
+    prior_job = vertex_ai.PipelineJob.get(resource_name=job_name)
+    prior_spec, prior_parameters = resume_planner.job_spec_and_parameters(prior_job.gca_resource)
+
+    with open(pipeline_json_spec_path) as f:
+        spec = json.load(f)
+    # Same run_timestamp as the prior job, so model IDs and versions of reused steps line up
+    parameter_values = {"run_timestamp": prior_parameters.get("run_timestamp", config["TIMESTAMP"])}
+    parameters = {**resume_planner.default_parameter_values(spec), **parameter_values}
+    plan = resume_planner.plan_resume(
+        spec, prior_spec,
+        resume_planner.prior_task_states(resume_planner.job_task_details(prior_job.gca_resource)),
+        prior_parameters, parameters, from_steps=args.from_step,
+    )
+    print(resume_planner.format_plan(plan))
+    uncached = [step.display_name for step in plan if step.reason == resume_planner.CACHE_DISABLED_REASON]
+    if uncached:
+        logging.warning(f"{args.job_id} ran {len(uncached)} steps with caching disabled, so they have no cache "
+                        f"entries to reuse and rerun: {uncached}")
+    if all(step.action == "reuse" for step in plan):
+        logging.info(f"Nothing to rerun for {args.job_id}")
+        return
 
-    if args.compile_only:
-        logging.info("Compile-only mode. Exiting after compilation.")
+    resume_spec_path = os.path.join(tempfile.mkdtemp(), os.path.basename(pipeline_json_spec_path))
+    with open(resume_spec_path, "w") as f:
+        json.dump(resume_planner.apply_plan(spec, plan), f)
+    pipeline_job = vertex_ai.PipelineJob(
+        display_name=f"{config['PIPELINE_NAME']}-bqml-automl-train-eval-resume-{config['TIMESTAMP']}",
+        template_path=resume_spec_path,
+        parameter_values=parameter_values,
+        # None keeps the per-step caching options set by the plan
+        enable_caching=None,
+        project=config["PROJECT_ID"],
+        location=config["REGION"]
+    )
+    if args.dry_run:
+        logging.info(f"Dry run. Would submit {pipeline_job.display_name} from {resume_spec_path}")
+        return
+    submit_pipeline_job(pipeline_job, config)
+
+
+def submit_pipeline_job(pipeline_job, config: dict):
+    """Runs the job to completion and records it in the run store, whether it succeeded or not."""
+    logging.info("Submitting pipeline job to Vertex AI...")
+    try:
+        # For unattended runs, use submit(). For interactive or script-based runs where you want to wait:
+        # pipeline_job.submit() # Does not wait
+        pipeline_job.run(service_account=config.get("SERVICE_ACCOUNT")) # Waits for completion
+        logging.info(f"Pipeline job {pipeline_job.display_name} submitted and finished with state: {pipeline_job.state}.")
+        logging.info(f"View in Vertex AI Pipelines: {pipeline_job._dashboard_uri()}")
+
+        # Basic cleanup (optional, extend as needed)
+        # if pipeline_job.state == vertex_ai.JobState.PIPELINE_STATE_SUCCEEDED:
+        #     logging.info("Pipeline run succeeded. Performing cleanup...")
+        #     # Add cleanup logic for BQ tables, models, endpoints if desired
+        # else:
+        #     logging.warning(f"Pipeline run did not succeed (state: {pipeline_job.state}). Skipping cleanup.")
+
+    except Exception as e:
+        logging.error(f"Error during pipeline job submission or execution: {e}")
+    finally:
+        # Record durations, metrics and the deploy decision of every finished run, failed ones
+        # included: failure trends and `resume` need them
+        record_finished_job(pipeline_job, config)
+
+
+# Job states after which a run no longer changes; the run store is append-only
+FINISHED_JOB_STATES = ("PIPELINE_STATE_SUCCEEDED", "PIPELINE_STATE_FAILED", "PIPELINE_STATE_CANCELLED")
+
+
+def record_finished_job(pipeline_job, config: dict):
+    try:
+        resource = pipeline_job.gca_resource
+    except Exception:
+        logging.warning("Pipeline job was never created; nothing to record in the run store")
         return
+    state = getattr(resource.state, "name", str(resource.state))
+    if state not in FINISHED_JOB_STATES:
+        logging.warning(f"Pipeline job is {state}; record it later with "
+                        f"`python -m src.pipeline_2025.run_store ingest --job-name {resource.name}`")
+        return
+    try:
+        with run_store.RunStore(config["RUN_STORE_PATH"]) as store:
+            store.ingest_pipeline_job(pipeline_job)
+    except Exception as store_error:
+        logging.warning(f"Could not record run in run store: {store_error}")
 
-    if args.run_pipeline:
-        logging.info("Submitting pipeline job to Vertex AI...")
-        pipeline_job = vertex_ai.PipelineJob(
-            display_name=f"{config['PIPELINE_NAME']}-bqml-automl-train-eval-run-{config['TIMESTAMP']}",
-            template_path=pipeline_json_spec_path,
-            # pipeline_root=config["PIPELINE_ROOT"], # Usually inherited from compiled spec
-            enable_caching=config["ENABLE_CACHING"],
-            project=config["PROJECT_ID"],
-            location=config["REGION"]
-        )
-        try:
-            # For unattended runs, use submit(). For interactive or script-based runs where you want to wait:
-            # pipeline_job.submit() # Does not wait
-            pipeline_job.run(service_account=config.get("SERVICE_ACCOUNT")) # Waits for completion
-            logging.info(f"Pipeline job {pipeline_job.display_name} submitted and finished with state: {pipeline_job.state}.")
-            logging.info(f"View in Vertex AI Pipelines: {pipeline_job._dashboard_uri()}")
-
-            # Basic cleanup (optional, extend as needed)
-            # if pipeline_job.state == vertex_ai.JobState.PIPELINE_STATE_SUCCEEDED:
-            #     logging.info("Pipeline run succeeded. Performing cleanup...")
-            #     # Add cleanup logic for BQ tables, models, endpoints if desired
-            # else:
-            #     logging.warning(f"Pipeline run did not succeed (state: {pipeline_job.state}). Skipping cleanup.")
-
-        except Exception as e:
-            logging.error(f"Error during pipeline job submission or execution: {e}")
-    else:
-        logging.info("To run the pipeline, use the --run-pipeline flag.")
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Compile and run the KFP ML pipeline.")
+    # Legacy flags, equivalent to the `compile` and `run` subcommands
+    parser.add_argument("--compile-only", action="store_true", help="Same as the `compile` subcommand.")
+    parser.add_argument("--run-pipeline", action="store_true", help="Same as the `run` subcommand.")
+    parser.add_argument("--no-spec-cache", action="store_true", help="Always recompile instead of reusing a cached spec.")
+    parser.set_defaults(handler=None, dry_run=False)
+
+    subparsers = parser.add_subparsers(dest="command")
+    compile_parser = subparsers.add_parser("compile", help="Compile the pipeline (or reuse the cached spec) and exit.")
+    compile_parser.set_defaults(handler=compile_command)
+
+    run_parser = subparsers.add_parser("run", help="Compile if needed and run the pipeline on Vertex AI.")
+    run_parser.add_argument("--dry-run", action="store_true", help="Build the pipeline job without submitting it.")
+    run_parser.set_defaults(handler=run_command)
+
+    resume_parser = subparsers.add_parser(
+        "resume", help="Rerun only the failed or invalidated steps of a prior pipeline job.")
+    resume_parser.add_argument("--job-id", required=True, help="Prior pipeline job ID or full resource name.")
+    resume_parser.add_argument("--from-step", action="append", default=[],
+                               help="Also rerun this step (display name) and everything after it. Repeatable.")
+    resume_parser.add_argument("--dry-run", action="store_true", help="Print the plan without submitting.")
+    resume_parser.set_defaults(handler=resume_command)
+    return parser
+
+
+def main(argv=None):
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    handler = args.handler
+    if handler is None:
+        if args.run_pipeline:
+            handler = run_command
+        else:
+            handler = compile_command
+            if not args.compile_only:
+                logging.info("To run the pipeline, use the `run` subcommand (or --run-pipeline).")
+
+    logging.info("Loading pipeline configuration...")
+    config = load_config()
+
+    logging.info(f"Project ID: {config['PROJECT_ID']}")
+    logging.info(f"Region: {config['REGION']}")
+    logging.info(f"Pipeline Name: {config['PIPELINE_NAME']}")
+    logging.info(f"Pipeline Root: {config['PIPELINE_ROOT']}")
+
+    handler(args, config)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
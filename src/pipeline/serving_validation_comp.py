@@ -33,16 +33,19 @@ def validate_serving(
         logging.info("deployed_model_id:", response.deployed_model_id)
         logging.info("predictions: ", response.predictions)
         # The predictions are a google.protobuf.Value representation of the model's predictions.
+        # Same schema detection as src/serving/response_decoder.py: AutoML returns
+        # {"value": x} dicts, BQML returns [x] lists. Detected once, applied to all.
         predictions = response.predictions
-
-        for pred in predictions:
-            if type(pred) is dict and "value" in pred.keys():
-                # AutoML predictions
-                prediction = pred["value"]
-            elif type(pred) is list:
-                # BQML predictions 
-                prediction = pred[0]
-            return prediction
+        if not predictions:
+            raise ValueError("No predictions returned from the endpoint")
+        first = predictions[0]
+        if hasattr(first, "keys") and "value" in first:
+            extract = lambda pred: pred["value"]
+        elif isinstance(first, (list, tuple)):
+            extract = lambda pred: pred[0]
+        else:
+            raise ValueError(f"Unrecognized prediction schema: {first}")
+        return [float(extract(pred)) for pred in predictions]
 
     endpoint_uri = endpoint.uri
     treated_uri = treat_uri(endpoint_uri)
@@ -58,7 +61,7 @@ def validate_serving(
     logging.info("Will use the following instance: " + instance_json)
 
     endpoint = aiplatform.Endpoint(treated_uri)
-    prediction = request_prediction(endpoint, instance)
+    prediction = request_prediction(endpoint, instance)[0]
     result_tuple = namedtuple("Outputs", ["instance", "prediction"])
 
     return result_tuple(instance=str(instance_json), prediction=float(prediction))
\ No newline at end of file
@@ -0,0 +1,262 @@
+"""Replica and machine type recommendation from measured load curves.
+
+Inputs:
+  * Load-test results per machine type: `traffic_replay` ramp reports (one
+    step per offered QPS), or JSON lists of {"qps", "p95_ms", "error_rate"}
+    points. Each test states how many replicas served it, so results are
+    normalized to QPS per replica.
+  * A traffic profile: per-minute QPS derived from prediction log files
+    (scaled up by the logging sample rate), or explicit peak/baseline QPS.
+
+For each machine type the planner finds the highest per-replica QPS that
+still meets the p95 target and error budget, interpolating between the last
+passing and first failing load step. It keeps `target_utilization` headroom
+and derives:
+  * min replicas to serve the `min_coverage_percentile` minute without
+    waiting for a scale-up,
+  * max replicas to serve the peak minute times `peak_multiplier`, and
+  * the expected hourly cost of autoscaling between the two over the
+    profile.
+The cheapest feasible machine type wins. Its values are written as
+DEPLOY_MACHINE_TYPE / DEPLOY_MIN_REPLICA_COUNT / DEPLOY_MAX_REPLICA_COUNT,
+and `run_modernized_pipeline.py` reads them through DEPLOY_CAPACITY_PLAN.
+
+Usage:
+    python -m src.pipeline_2025.capacity_planner \\
+        --load-test n1-standard-2=ramp_n1s2.json --load-test n1-standard-4:2=ramp_n1s4_2x.json \\
+        --traffic prediction_logs/ --log-sample-rate 0.1 --target-p95-ms 300 --output capacity_plan.json
+"""
+import argparse
+import json
+import logging
+import math
+import os
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+
+# Approximate Vertex AI online prediction list prices (USD per node hour,
+# us-central1). Override with --prices for other regions or current prices.
+DEFAULT_HOURLY_PRICES_USD = {
+    "e2-standard-2": 0.0771,
+    "e2-standard-4": 0.1541,
+    "e2-standard-8": 0.3082,
+    "n1-standard-2": 0.1095,
+    "n1-standard-4": 0.2190,
+    "n1-standard-8": 0.4380,
+    "n1-highcpu-4": 0.1633,
+    "n2-standard-2": 0.1257,
+    "n2-standard-4": 0.2514,
+}
+
+DEPLOY_PARAM_KEYS = ("DEPLOY_MACHINE_TYPE", "DEPLOY_MIN_REPLICA_COUNT", "DEPLOY_MAX_REPLICA_COUNT")
+
+
+class LoadPoint(NamedTuple):
+    qps_per_replica: float
+    p95_ms: float
+    error_rate: float
+    saturated: bool  # Achieved QPS fell well short of the offered QPS
+
+
+class TrafficProfile(NamedTuple):
+    minute_qps: List[float]  # QPS per minute of observed traffic
+    peak_qps: float
+
+
+class Recommendation(NamedTuple):
+    machine_type: str
+    feasible: bool
+    capacity_qps_per_replica: float
+    min_replicas: int
+    max_replicas: int
+    hourly_price_usd: float
+    expected_hourly_cost_usd: float
+    peak_hourly_cost_usd: float
+    note: str
+
+
+def load_curve(data, replicas: int = 1, saturation_ratio: float = 0.9) -> List[LoadPoint]:
+    """Normalizes a replay report or a list of points to per-replica load points."""
+    points = []
+    if isinstance(data, dict) and "steps" in data:
+        for step in data["steps"]:
+            offered = step["target_qps"] or step["achieved_qps"]
+            achieved = step["achieved_qps"] or 0.0
+            points.append(LoadPoint(offered / replicas, step["response_time"]["p95_ms"], step["error_rate"],
+                                    achieved < saturation_ratio * offered))
+    else:
+        for point in data:
+            points.append(LoadPoint(point["qps"] / replicas, point["p95_ms"], point.get("error_rate", 0.0),
+                                    point.get("saturated", False)))
+    return sorted(points)
+
+
+def replica_capacity(points: List[LoadPoint], target_p95_ms: float, max_error_rate: float = 0.001):
+    """Highest per-replica QPS meeting the targets, and a note on how it was found."""
+    passing = None
+    for point in points:
+        ok = (point.p95_ms is not None and not math.isnan(point.p95_ms) and point.p95_ms <= target_p95_ms
+              and point.error_rate <= max_error_rate and not point.saturated)
+        if ok:
+            passing = point
+            continue
+        if passing is None:
+            return 0.0, f"lowest tested load ({point.qps_per_replica:.1f} qps) misses the target"
+        # Interpolate the p95 crossing when only latency fails at the next step
+        if (point.error_rate <= max_error_rate and not point.saturated and point.p95_ms is not None
+                and point.p95_ms > passing.p95_ms):
+            fraction = (target_p95_ms - passing.p95_ms) / (point.p95_ms - passing.p95_ms)
+            capacity = passing.qps_per_replica + fraction * (point.qps_per_replica - passing.qps_per_replica)
+            return capacity, f"interpolated between {passing.qps_per_replica:.1f} and {point.qps_per_replica:.1f} qps"
+        return passing.qps_per_replica, f"last passing step before {point.qps_per_replica:.1f} qps"
+    if passing is None:
+        return 0.0, "no load points"
+    return passing.qps_per_replica, "all tested loads pass; capacity above the tested range is unknown"
+
+
+def traffic_from_logs(paths: List[str], sample_rate: float = 1.0) -> TrafficProfile:
+    """Per-minute QPS from prediction log files, scaled up by the logging sample rate."""
+    from src.serving.traffic_replay import load_requests
+
+    timestamps = [request.timestamp for request in load_requests(paths) if request.timestamp is not None]
+    if not timestamps:
+        raise ValueError("Traffic profile needs logged requests with timestamps")
+    per_minute = Counter(int(timestamp // 60) for timestamp in timestamps)
+    first, last = min(per_minute), max(per_minute)
+    # Minutes without requests count as zero load
+    minute_qps = [per_minute.get(minute, 0) / sample_rate / 60 for minute in range(first, last + 1)]
+    return TrafficProfile(minute_qps, max(minute_qps))
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def recommend(curves: Dict[str, List[LoadPoint]], traffic: TrafficProfile, target_p95_ms: float,
+              max_error_rate: float = 0.001, target_utilization: float = 0.7, peak_multiplier: float = 1.2,
+              min_coverage_percentile: float = 50.0, min_replicas_floor: int = 1, max_replicas_limit: int = 20,
+              prices: Optional[Dict[str, float]] = None) -> List[Recommendation]:
+    """Recommendations for every machine type, cheapest feasible first."""
+    prices = prices or DEFAULT_HOURLY_PRICES_USD
+    baseline_qps = _percentile(traffic.minute_qps, min_coverage_percentile)
+    recommendations = []
+    for machine_type, points in curves.items():
+        price = prices.get(machine_type)
+        capacity, note = replica_capacity(points, target_p95_ms, max_error_rate)
+        planned = capacity * target_utilization
+        if price is None or planned <= 0:
+            note = note if price is not None else f"no price for {machine_type}"
+            recommendations.append(Recommendation(machine_type, False, capacity, 0, 0, price or 0.0,
+                                                  math.inf, math.inf, note))
+            continue
+        min_replicas = max(min_replicas_floor, math.ceil(baseline_qps / planned))
+        max_replicas = max(min_replicas, math.ceil(traffic.peak_qps * peak_multiplier / planned))
+        replicas_by_minute = [min(max(math.ceil(qps / planned), min_replicas), max_replicas)
+                              for qps in traffic.minute_qps]
+        feasible = max_replicas <= max_replicas_limit
+        if not feasible:
+            note = f"needs {max_replicas} replicas at peak (limit {max_replicas_limit}); {note}"
+        recommendations.append(Recommendation(
+            machine_type, feasible, capacity, min_replicas, max_replicas, price,
+            price * sum(replicas_by_minute) / len(replicas_by_minute), price * max_replicas, note,
+        ))
+    return sorted(recommendations, key=lambda r: (not r.feasible, r.expected_hourly_cost_usd,
+                                                  r.peak_hourly_cost_usd))
+
+
+def deploy_params(recommendation: Recommendation) -> Dict[str, object]:
+    return {
+        "DEPLOY_MACHINE_TYPE": recommendation.machine_type,
+        "DEPLOY_MIN_REPLICA_COUNT": recommendation.min_replicas,
+        "DEPLOY_MAX_REPLICA_COUNT": recommendation.max_replicas,
+    }
+
+
+def load_deploy_params(path: str) -> Dict[str, object]:
+    """Deploy parameters from a capacity plan file; empty when no plan is configured."""
+    if not path:
+        return {}
+    with open(path) as f:
+        plan = json.load(f)
+    return {key: plan["deploy_params"][key] for key in DEPLOY_PARAM_KEYS}
+
+
+def _parse_load_test(spec: str):
+    """Parses `machine_type[:replicas]=path`."""
+    target, _, path = spec.partition("=")
+    machine_type, _, replicas = target.partition(":")
+    if not path:
+        raise argparse.ArgumentTypeError(f"Expected machine_type[:replicas]=path, got {spec}")
+    return machine_type, int(replicas or 1), path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend endpoint machine type and replica counts.")
+    parser.add_argument("--load-test", type=_parse_load_test, action="append", required=True,
+                        help="machine_type[:replicas]=path to a traffic_replay report or point list. Repeatable.")
+    parser.add_argument("--traffic", nargs="+", help="Prediction log files or directories for the traffic profile.")
+    parser.add_argument("--log-sample-rate", type=float, default=float(os.getenv("PREDICTION_LOG_SAMPLE_RATE", "0.1")),
+                        help="Sampling rate the prediction logs were written with.")
+    parser.add_argument("--peak-qps", type=float, help="Peak QPS, when no logs are given.")
+    parser.add_argument("--baseline-qps", type=float, help="Typical QPS, when no logs are given.")
+    parser.add_argument("--target-p95-ms", type=float, required=True)
+    parser.add_argument("--max-error-rate", type=float, default=0.001)
+    parser.add_argument("--target-utilization", type=float, default=0.7,
+                        help="Fraction of measured replica capacity to plan for.")
+    parser.add_argument("--peak-multiplier", type=float, default=1.2, help="Growth allowance on the peak.")
+    parser.add_argument("--min-coverage-percentile", type=float, default=50.0,
+                        help="Minute-QPS percentile served by the minimum replica count.")
+    parser.add_argument("--min-replicas-floor", type=int, default=1)
+    parser.add_argument("--max-replicas-limit", type=int, default=20)
+    parser.add_argument("--prices", help="JSON file of machine type -> USD per node hour.")
+    parser.add_argument("--output", help="Capacity plan JSON path (use as DEPLOY_CAPACITY_PLAN).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    curves: Dict[str, List[LoadPoint]] = {}
+    for machine_type, replicas, path in args.load_test:
+        with open(path) as f:
+            curves.setdefault(machine_type, []).extend(load_curve(json.load(f), replicas))
+    curves = {machine_type: sorted(points) for machine_type, points in curves.items()}
+
+    if args.traffic:
+        traffic = traffic_from_logs(args.traffic, args.log_sample_rate)
+    elif args.peak_qps is not None:
+        traffic = TrafficProfile([args.baseline_qps if args.baseline_qps is not None else args.peak_qps],
+                                 args.peak_qps)
+    else:
+        parser.error("Give --traffic or --peak-qps")
+    prices = dict(DEFAULT_HOURLY_PRICES_USD)
+    if args.prices:
+        with open(args.prices) as f:
+            prices.update(json.load(f))
+
+    recommendations = recommend(curves, traffic, args.target_p95_ms, args.max_error_rate, args.target_utilization,
+                                args.peak_multiplier, args.min_coverage_percentile, args.min_replicas_floor,
+                                args.max_replicas_limit, prices)
+    for r in recommendations:
+        logging.info(f"{r.machine_type}: feasible={r.feasible} capacity={r.capacity_qps_per_replica:.1f} qps/replica "
+                     f"replicas={r.min_replicas}-{r.max_replicas} expected=${r.expected_hourly_cost_usd:.3f}/h "
+                     f"peak=${r.peak_hourly_cost_usd:.3f}/h ({r.note})")
+    best = recommendations[0]
+    if not best.feasible:
+        raise SystemExit("No machine type meets the target; load-test larger machines or relax the target.")
+
+    plan = {
+        "deploy_params": deploy_params(best),
+        "target_p95_ms": args.target_p95_ms,
+        "traffic": {"minutes": len(traffic.minute_qps), "peak_qps": traffic.peak_qps,
+                    "median_qps": _percentile(traffic.minute_qps, 50)},
+        "candidates": [r._asdict() for r in recommendations],
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(plan, f, indent=2, default=str)
+        logging.info(f"Wrote capacity plan to {args.output}")
+    for key, value in plan["deploy_params"].items():
+        print(f"{key}={value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Prebuilt, digest-pinned container images for the pipeline's lightweight components.
+
+Without prebuilt images, every component pod starts from `python:3.10` and
+pip-installs kfp and its `packages_to_install` before running any code.
+That costs tens of seconds per step and resolves floating versions each
+time. Instead, the dependency sets below are baked into a few shared images:
+  * base: kfp only, for the pure-Python steps (metric parsing, model selection)
+  * bigquery: BigQuery, Cloud Storage and NumPy, for data prep and the data gates
+  * aiplatform: Vertex AI SDK, BigQuery and NumPy, for model, endpoint and serving steps
+The bigquery and aiplatform images also ship the repo modules in
+`SHARED_MODULES` under /opt/pipeline (on PYTHONPATH), so components import
+the query guard, the data quality checks, the drift math and the instance
+validator from the same code the tests exercise instead of carrying copies.
+
+`build` builds and pushes each image with the Docker CLI. Images are tagged
+with a hash of their requirements and shipped modules, so unchanged images
+are not rebuilt.
+The resolved `image@sha256:...` references are written to
+`component_images.lock.json`. Components are decorated with
+`component_kwargs(name)`, which reads the lock when the modules are imported:
+  * With a locked image, the component runs `image@sha256:...` directly,
+    with no pip step.
+  * Without one (images not built yet, or a shipped module changed since),
+    it falls back to `python:3.10` plus the same pinned requirements
+    installed at startup. That is enough to compile and analyze the
+    pipeline, but components that import shared modules cannot run there,
+    so `check_images_for_submission` stops the runner from submitting it.
+Commit the lock file so every compile pins the same images.
+`COMPONENT_IMAGES_LOCK` points at a different lock file.
+
+Usage:
+    python -m src.pipeline_2025.component_images build \\
+        --registry us-central1-docker.pkg.dev/my-project/pipeline-components
+    python -m src.pipeline_2025.component_images show
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_PYTHON_IMAGE = "python:3.10"
+BUILD_BASE_IMAGE = "python:3.10-slim"
+KFP_REQUIREMENT = "kfp==2.6.0"
+
+# Same pins as requirements.txt
+IMAGES: Dict[str, List[str]] = {
+    "base": [KFP_REQUIREMENT],
+    "bigquery": [KFP_REQUIREMENT, "google-cloud-bigquery==3.17.2", "google-cloud-storage==2.19.0", "numpy==1.26.4",
+                 "pandas==2.2.2"],
+    "aiplatform": [KFP_REQUIREMENT, "google-cloud-aiplatform==1.44.0", "google-cloud-bigquery==3.17.2",
+                   "numpy==1.26.4"],
+}
+
+# Repo modules (relative to the repo root) that components import, with their in-repo imports
+SHARED_MODULES: Dict[str, List[str]] = {
+    "base": [],
+    "bigquery": ["src/pipeline_2025/feature_registry.py", "src/pipeline_2025/query_guard.py",
+                 "src/pipeline_2025/data_quality.py", "src/pipeline_2025/drift_sketches.py"],
+    "aiplatform": ["src/pipeline_2025/query_guard.py", "src/serving/instance_validation.py"],
+}
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_LOCK_PATH = REPO_ROOT / "component_images.lock.json"
+
+DOCKERFILE = f"""FROM {BUILD_BASE_IMAGE}
+ENV PYTHONDONTWRITEBYTECODE=1 PIP_DISABLE_PIP_VERSION_CHECK=1 PIP_NO_CACHE_DIR=1
+COPY requirements.txt /tmp/requirements.txt
+RUN python3 -m pip install --no-warn-script-location -r /tmp/requirements.txt && rm /tmp/requirements.txt
+"""
+# Appended for images with shared modules; the build context holds them under src/
+SHARED_MODULES_DOCKERFILE = """COPY src /opt/pipeline/src
+ENV PYTHONPATH=/opt/pipeline
+"""
+
+
+def dockerfile(name: str) -> str:
+    return DOCKERFILE + (SHARED_MODULES_DOCKERFILE if SHARED_MODULES[name] else "")
+
+
+def lock_path() -> Path:
+    return Path(os.getenv("COMPONENT_IMAGES_LOCK", str(DEFAULT_LOCK_PATH)))
+
+
+def requirements_hash(name: str) -> str:
+    """Short hash of an image's build inputs (Dockerfile, requirements, shipped modules), used as its tag."""
+    digest = hashlib.sha256((dockerfile(name) + "\n".join(IMAGES[name])).encode())
+    for module in SHARED_MODULES[name]:
+        digest.update(module.encode())
+        digest.update((REPO_ROOT / module).read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def load_lock(path: Optional[Path] = None) -> Dict[str, dict]:
+    path = path or lock_path()
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        lock = json.load(f)
+    for name, entry in lock.items():
+        if "@sha256:" not in entry["image"]:
+            raise ValueError(f"{path}: image for {name!r} must be pinned by digest, got {entry['image']}")
+    return lock
+
+
+def is_locked(name: str, lock: Optional[Dict[str, dict]] = None) -> bool:
+    """Whether image `name` has a lock entry built from its current requirements and modules."""
+    entry = (load_lock() if lock is None else lock).get(name)
+    return bool(entry) and entry.get("requirements_hash") == requirements_hash(name)
+
+
+def component_kwargs(name: str) -> dict:
+    """`@component(...)` arguments for a component that runs in image `name`."""
+    # A lock entry built from other requirements is stale; fall back rather than run the wrong set
+    if is_locked(name):
+        return {"base_image": load_lock()[name]["image"], "install_kfp_package": False}
+    return {"base_image": BASE_PYTHON_IMAGE,
+            "packages_to_install": [req for req in IMAGES[name] if req != KFP_REQUIREMENT]}
+
+
+def check_images_for_submission():
+    """Raises RuntimeError if a component would run in a fallback image without its shared modules."""
+    lock = load_lock()
+    missing = [name for name in IMAGES if SHARED_MODULES[name] and not is_locked(name, lock)]
+    if missing:
+        modules = sorted({module for name in missing for module in SHARED_MODULES[name]})
+        raise RuntimeError(f"Component images {missing} are not built for the current requirements and shared "
+                           f"modules; their components cannot import {modules}. "
+                           f"Run `python -m src.pipeline_2025.component_images build --registry <path>` first.")
+
+
+def _docker(*args: str) -> str:
+    result = subprocess.run(["docker", *args], check=True, stdout=subprocess.PIPE, text=True)
+    return result.stdout.strip()
+
+
+def build_image(name: str, registry: str) -> dict:
+    """Builds and pushes image `name`, returning its lock entry."""
+    tag = f"{registry}/kfp-component-{name}:{requirements_hash(name)}"
+    with tempfile.TemporaryDirectory() as context:
+        Path(context, "Dockerfile").write_text(dockerfile(name))
+        Path(context, "requirements.txt").write_text("\n".join(IMAGES[name]) + "\n")
+        for module in SHARED_MODULES[name]:
+            target = Path(context, module)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes((REPO_ROOT / module).read_bytes())
+        logging.info(f"Building {tag}")
+        _docker("build", "--platform", "linux/amd64", "-t", tag, context)
+    _docker("push", tag)
+    repo = tag.rsplit(":", 1)[0]
+    digests = _docker("inspect", "--format", "{{join .RepoDigests \"\\n\"}}", tag).splitlines()
+    digest_ref = next(ref for ref in digests if ref.startswith(repo + "@"))
+    logging.info(f"Pushed {digest_ref}")
+    return {"image": digest_ref, "tag": tag, "requirements": IMAGES[name], "modules": SHARED_MODULES[name],
+            "requirements_hash": requirements_hash(name)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and pin the component images.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Build, push and lock images whose requirements changed.")
+    build.add_argument("--registry", required=True, help="Artifact Registry repository path.")
+    build.add_argument("--images", default=",".join(IMAGES), help="Comma-separated image names.")
+    build.add_argument("--force", action="store_true", help="Rebuild images that are already locked.")
+    sub.add_parser("show", help="Print the image each image set resolves to.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    lock = load_lock()
+    if args.command == "show":
+        for name in IMAGES:
+            print(f"{name:<12}{component_kwargs(name)}")
+        return
+    for name in args.images.split(","):
+        if name not in IMAGES:
+            parser.error(f"unknown image {name!r}; expected one of {list(IMAGES)}")
+        current = lock.get(name, {})
+        if not args.force and current.get("requirements_hash") == requirements_hash(name) \
+                and current.get("tag", "").startswith(args.registry + "/"):
+            logging.info(f"{name}: up to date ({current['image']})")
+            continue
+        lock[name] = build_image(name, args.registry)
+    with open(lock_path(), "w") as f:
+        json.dump(lock, f, indent=2, sort_keys=True)
+        f.write("\n")
+    logging.info(f"Wrote {lock_path()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,9 @@ from kfp.dsl import Artifact, Input, Metrics, Output, component
 from typing import NamedTuple
 import math
 
-@component(
-    base_image="python:3.10",
-    packages_to_install=["google-cloud-aiplatform>=1.10.0"],
-)
+from src.pipeline_2025 import component_images
+
+@component(**component_images.component_kwargs("aiplatform"))
 def collect_eval_metrics_automl(
     project_id: str,
     region: str, 
@@ -1,6 +1,9 @@
 from kfp.dsl import Artifact, Input, Metrics, Output, component
 from typing import NamedTuple
 
+from src.pipeline_2025 import component_images
+from src.pipeline_2025 import feature_registry
+
 def create_query_build_bqml_model(
     project: str,
     bq_dataset: str,
@@ -47,7 +50,7 @@ def create_query_build_bqml_model(
     OPTIONS(
         {options_str}
         ) AS
-    SELECT * EXCEPT(data_split),
+    SELECT {feature_registry.select_list(feature_registry.FEATURES + [var_target])},
         CASE
             WHEN data_split = 'VALIDATE' THEN 'EVAL'
             ELSE data_split
@@ -61,12 +64,15 @@ def create_query_build_bqml_model(
 
 
 @component(
-    base_image="python:3.10",
+    **component_images.component_kwargs("base"),
     #output_component_file="src/pipeline/collect_eval_metrics_bqml.yaml",
 )
 def collect_eval_metrics_bqml(
     eval_metrics_artifact: Input[Artifact],
     metrics: Output[Metrics],
+    project_id: str = "",
+    region: str = "",
+    vertex_model_id: str = "",
 ) -> NamedTuple(
     'outputs',[
         ("mean_absolute_error", float),
@@ -74,14 +80,23 @@ def collect_eval_metrics_bqml(
         ("root_mean_squared_error", float),
         ("r2_score", float),
         ("median_absolute_error", float),
-        ("framework", str)
+        ("framework", str),
+        ("vertex_model_resource_name", str)
     ]
 ):    
-    """Parses BQML evaluation metrics artifact and returns key metrics individually."""
+    """Parses BQML evaluation metrics artifact and returns key metrics individually.
+
+    Also returns the Vertex AI Model resource name the BQML model was
+    registered under (`projects/<project_id>/locations/<region>/models/<vertex_model_id>`),
+    so no separate pod is needed to format it (see pipeline_rules.py).
+    """
     import math
     from collections import namedtuple
     import json # For printing the full dict if needed
 
+    vertex_model_resource_name = f"projects/{project_id}/locations/{region}/models/{vertex_model_id}"
+    print(f"Vertex AI model resource name: {vertex_model_resource_name}")
+
     metadata = eval_metrics_artifact.metadata
     metrics_dict = {}
     # Initialize metrics with default values (e.g., NaN or specific error value)
@@ -95,8 +110,8 @@ def collect_eval_metrics_bqml(
     if not metadata or 'rows' not in metadata or not metadata['rows']:
         print("Warning: Evaluation metrics artifact metadata is empty or missing 'rows'. Returning NaN metrics.")
         # Return default/NaN values if metrics can't be parsed
-        Outputs = namedtuple('outputs', ["mean_absolute_error", "mean_squared_error", "root_mean_squared_error", "r2_score", "median_absolute_error", "framework"])
-        return Outputs(mean_absolute_error=mae, mean_squared_error=mse, root_mean_squared_error=rmse, r2_score=r2, median_absolute_error=med_ae, framework=framework)
+        Outputs = namedtuple('outputs', ["mean_absolute_error", "mean_squared_error", "root_mean_squared_error", "r2_score", "median_absolute_error", "framework", "vertex_model_resource_name"])
+        return Outputs(mean_absolute_error=mae, mean_squared_error=mse, root_mean_squared_error=rmse, r2_score=r2, median_absolute_error=med_ae, framework=framework, vertex_model_resource_name=vertex_model_resource_name)
 
     # Assuming the structure based on typical BQML EVALUATE output
     try:
@@ -141,13 +156,13 @@ def collect_eval_metrics_bqml(
     except (KeyError, IndexError, TypeError) as e:
         print(f"Error parsing metrics artifact metadata: {e}. Metadata structure might be different. Returning NaN metrics.")
         # Fallback to default/NaN values on parsing error
-        Outputs = namedtuple('outputs', ["mean_absolute_error", "mean_squared_error", "root_mean_squared_error", "r2_score", "median_absolute_error", "framework"])
-        return Outputs(mean_absolute_error=mae, mean_squared_error=mse, root_mean_squared_error=rmse, r2_score=r2, median_absolute_error=med_ae, framework=framework)
+        Outputs = namedtuple('outputs', ["mean_absolute_error", "mean_squared_error", "root_mean_squared_error", "r2_score", "median_absolute_error", "framework", "vertex_model_resource_name"])
+        return Outputs(mean_absolute_error=mae, mean_squared_error=mse, root_mean_squared_error=rmse, r2_score=r2, median_absolute_error=med_ae, framework=framework, vertex_model_resource_name=vertex_model_resource_name)
 
     print(f"Processed Metrics - MAE: {mae}, MSE: {mse}, RMSE: {rmse}, R2: {r2}, MedAE: {med_ae}")
     
     # Define the output tuple structure again before returning
-    Outputs = namedtuple('outputs', ["mean_absolute_error", "mean_squared_error", "root_mean_squared_error", "r2_score", "median_absolute_error", "framework"])
+    Outputs = namedtuple('outputs', ["mean_absolute_error", "mean_squared_error", "root_mean_squared_error", "r2_score", "median_absolute_error", "framework", "vertex_model_resource_name"])
 
     # Return individual metrics
     return Outputs(
@@ -156,5 +171,6 @@ def collect_eval_metrics_bqml(
         root_mean_squared_error=rmse, 
         r2_score=r2,
         median_absolute_error=med_ae,
-        framework=framework
+        framework=framework,
+        vertex_model_resource_name=vertex_model_resource_name
     )
@@ -0,0 +1,449 @@
+"""Static analysis of the compiled pipeline DAG.
+
+The pipeline graph in `create_pipeline_definition` mixes data dependencies
+with explicit `.after()` edges, nested in `dsl.If` groups. This module
+flattens a compiled spec into its executable steps and reports:
+  * the critical path, from historical step durations in the run store or
+    from per-component estimates
+  * the maximum parallel width of the as-soon-as-possible schedule. Both
+    branches of an If/Elif are counted, so this is an upper bound
+  * control-only edges (`.after()` without data flowing along them). For
+    each one it reports whether the edge is redundant (already implied by
+    another path) and how much shorter the critical path would be without it
+  * duplicated resource-creating steps: two steps that create the same kind
+    of resource from the same name and are not in exclusive branches
+  * violations of `pipeline_rules.py`
+
+`check` compares the critical path with a baseline file and exits non-zero
+when it got longer or gained steps.
+
+Both commands analyze `--spec` when given. Otherwise they compile the
+current sources through the runner's spec cache, which is a lookup when
+nothing changed; `--compile` bypasses the cache.
+
+Usage:
+    python -m src.pipeline_2025.dag_analyzer report [--spec <spec.json> | --compile] [--output dag_report.json]
+    python -m src.pipeline_2025.dag_analyzer check --baseline dag_baseline.json [--spec <spec.json>]
+    python -m src.pipeline_2025.dag_analyzer check --baseline dag_baseline.json --write-baseline
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+from src.pipeline_2025 import pipeline_rules
+
+DEFAULT_RUN_STORE_PATH = os.getenv("RUN_STORE_PATH", str(Path(__file__).resolve().parents[2] / "run_history" / "runs.sqlite"))
+
+# Rough wall-clock seconds per component, including pod startup, for specs without run history
+ESTIMATED_DURATIONS_S = {
+    "extract-source-data": 120,
+    "preprocess-data-and-split": 120,
+    "extract-and-preprocess-data": 180,
+    "validate-data-quality": 90,
+    "detect-data-drift": 90,
+    "preflight-query-cost": 60,
+    "bigquery-create-model-job": 900,
+    "bigquery-evaluate-model-job": 120,
+    "collect-eval-metrics-bqml": 60,
+    "importer": 5,
+    "tabular-dataset-create": 120,
+    "automl-tabular-training-job": 7200,
+    "collect-eval-metrics-automl": 90,
+    "select-best-model": 60,
+    "endpoint-create": 120,
+    "get-or-create-endpoint": 90,
+    "register-best-model-in-registry": 120,
+    "model-deploy": 1200,
+    "validate-serving-endpoint": 180,
+    "detect-prediction-skew": 180,
+    "update-traffic-split": 120,
+}
+DEFAULT_ESTIMATE_S = 60
+
+# Components that create a named resource: component -> (resource kind, input holding its name)
+RESOURCE_STEPS = {
+    "endpoint-create": ("endpoint", "display_name"),
+    "get-or-create-endpoint": ("endpoint", "display_name"),
+    "tabular-dataset-create": ("dataset", "display_name"),
+    "automl-tabular-training-job": ("model", "model_display_name"),
+    "register-best-model-in-registry": ("registered model", "model_name"),
+}
+
+
+class Step(NamedTuple):
+    node_id: str            # "/"-joined task keys from the root DAG
+    display_name: str
+    component: str          # component name without "comp-" and the numeric suffix
+    groups: Tuple[str, ...]  # task keys of the enclosing groups, outermost first
+    inputs: dict
+
+
+class DagEdge(NamedTuple):
+    dag: str                # node id of the enclosing group, "" for the root DAG
+    upstream: str           # task keys within that DAG
+    downstream: str
+    data: bool              # False for `.after()`-only edges
+
+
+def component_name(component_ref: str) -> str:
+    return re.sub(r"-\d+$", "", component_ref[len("comp-"):] if component_ref.startswith("comp-") else component_ref)
+
+
+def data_producers(task: dict) -> Set[str]:
+    """Tasks in the same DAG whose outputs `task` consumes."""
+    inputs = task.get("inputs", {})
+    producers = {value["taskOutputParameter"]["producerTask"]
+                 for value in inputs.get("parameters", {}).values() if "taskOutputParameter" in value}
+    producers |= {value["taskOutputArtifact"]["producerTask"]
+                  for value in inputs.get("artifacts", {}).values() if "taskOutputArtifact" in value}
+    return producers
+
+
+class DagGraph:
+    """Executable steps of a compiled spec and the dependencies between them.
+
+    Edges into or out of a group (a `dsl.If` or If/Elif branch set) are
+    expanded to the group's first or last steps.
+
+    Args:
+        spec: Compiled pipeline spec.
+        exclude: (dag, upstream, downstream) edges to leave out, for what-if analysis.
+    """
+
+    def __init__(self, spec: dict, exclude: FrozenSet[Tuple[str, str, str]] = frozenset()):
+        self.spec = spec
+        self.steps: Dict[str, Step] = {}
+        self.names: Dict[str, str] = {}
+        self.edges: Set[Tuple[str, str]] = set()
+        self.dag_edges: List[DagEdge] = []
+        self._walk(spec["root"]["dag"], (), exclude)
+
+    def _walk(self, dag: dict, groups: Tuple[str, ...], exclude) -> Tuple[Set[str], Set[str]]:
+        """Adds the DAG's steps and edges; returns its first and last steps."""
+        tasks = dag.get("tasks", {})
+        ends = {}
+        for name, task in tasks.items():
+            node_id = "/".join(groups + (name,))
+            self.names[node_id] = task["taskInfo"]["name"]
+            component = self.spec["components"][task["componentRef"]["name"]]
+            if "dag" in component:
+                ends[name] = self._walk(component["dag"], groups + (name,), exclude)
+            else:
+                self.steps[node_id] = Step(node_id, task["taskInfo"]["name"],
+                                           component_name(task["componentRef"]["name"]), groups,
+                                           task.get("inputs", {}))
+                ends[name] = ({node_id}, {node_id})
+
+        dag_id = "/".join(groups)
+        has_upstream, has_downstream = set(), set()
+        for name, task in tasks.items():
+            producers = data_producers(task)
+            for upstream in task.get("dependentTasks", []):
+                self.dag_edges.append(DagEdge(dag_id, upstream, name, upstream in producers))
+                if (dag_id, upstream, name) in exclude:
+                    continue
+                has_upstream.add(name)
+                has_downstream.add(upstream)
+                self.edges.update((a, b) for a in ends[upstream][1] for b in ends[name][0])
+        first = set().union(*[ends[name][0] for name in tasks if name not in has_upstream])
+        last = set().union(*[ends[name][1] for name in tasks if name not in has_downstream])
+        return first, last
+
+    def predecessors(self) -> Dict[str, Set[str]]:
+        preds = {node: set() for node in self.steps}
+        for a, b in self.edges:
+            preds[b].add(a)
+        return preds
+
+    def topological_order(self) -> List[str]:
+        preds = self.predecessors()
+        remaining = {node: len(p) for node, p in preds.items()}
+        successors = defaultdict(set)
+        for a, b in self.edges:
+            successors[a].add(b)
+        ready = sorted(node for node, count in remaining.items() if count == 0)
+        order = []
+        while ready:
+            node = ready.pop(0)
+            order.append(node)
+            for succ in sorted(successors[node]):
+                remaining[succ] -= 1
+                if remaining[succ] == 0:
+                    ready.append(succ)
+        if len(order) != len(self.steps):
+            raise ValueError("Pipeline spec has a dependency cycle")
+        return order
+
+
+def estimated_durations(graph: DagGraph) -> Dict[str, float]:
+    return {node: float(ESTIMATED_DURATIONS_S.get(step.component, DEFAULT_ESTIMATE_S))
+            for node, step in graph.steps.items()}
+
+
+def step_durations(graph: DagGraph, source: str = "auto", run_store_path: str = DEFAULT_RUN_STORE_PATH,
+                   pct: float = 50.0) -> Tuple[Dict[str, float], str]:
+    """Per-step durations and the source they came from ("history" or "estimated").
+
+    History is the `pct` percentile per task display name in the run store.
+    Steps without history fall back to their estimate.
+    """
+    durations = estimated_durations(graph)
+    if source == "estimated" or (source == "auto" and not os.path.exists(run_store_path)):
+        return durations, "estimated"
+    from src.pipeline_2025 import run_store
+
+    with run_store.RunStore(run_store_path) as store:
+        history = store.step_duration_percentiles(pct)
+    if not history and source == "auto":
+        return durations, "estimated"
+    missing = [step.display_name for node, step in graph.steps.items() if step.display_name not in history]
+    if missing:
+        logging.warning(f"No run history for {sorted(set(missing))}; using estimates for them")
+    for node, step in graph.steps.items():
+        if history.get(step.display_name) is not None:
+            durations[node] = history[step.display_name]
+    return durations, "history"
+
+
+def schedule(graph: DagGraph, durations: Dict[str, float]) -> Dict[str, Tuple[float, float]]:
+    """As-soon-as-possible (start, finish) seconds of every step."""
+    preds = graph.predecessors()
+    times = {}
+    for node in graph.topological_order():
+        start = max((times[p][1] for p in preds[node]), default=0.0)
+        times[node] = (start, start + durations[node])
+    return times
+
+
+def critical_path(graph: DagGraph, durations: Dict[str, float]) -> Tuple[float, List[str]]:
+    """Total seconds and steps of the longest duration-weighted path."""
+    if not graph.steps:
+        return 0.0, []
+    times = schedule(graph, durations)
+    preds = graph.predecessors()
+    node = max(times, key=lambda n: (times[n][1], n))
+    path = [node]
+    while preds[node]:
+        node = max(preds[node], key=lambda p: (times[p][1], p))
+        path.append(node)
+    return times[path[0]][1], path[::-1]
+
+
+def max_parallel_width(times: Dict[str, Tuple[float, float]]) -> Tuple[int, float, List[str]]:
+    """Largest number of steps running at once in the schedule, when, and which."""
+    events = sorted([(start, 1, node) for node, (start, finish) in times.items() if finish > start] +
+                    [(finish, 0, node) for node, (start, finish) in times.items() if finish > start])
+    running, best = set(), (0, 0.0, [])
+    for at, is_start, node in events:
+        if is_start:
+            running.add(node)
+            if len(running) > best[0]:
+                best = (len(running), at, sorted(running))
+        else:
+            running.discard(node)
+    return best
+
+
+def control_edges(graph: DagGraph, durations: Dict[str, float]) -> List[dict]:
+    """`.after()`-only edges, whether each is redundant, and the critical path saved without it."""
+    successors = defaultdict(set)
+    for edge in graph.dag_edges:
+        successors[(edge.dag, edge.upstream)].add(edge.downstream)
+
+    def reachable_without(edge: DagEdge) -> bool:
+        stack = [t for t in successors[(edge.dag, edge.upstream)] if t != edge.downstream]
+        seen = set(stack)
+        while stack:
+            task = stack.pop()
+            if task == edge.downstream:
+                return True
+            for succ in successors[(edge.dag, task)] - seen:
+                seen.add(succ)
+                stack.append(succ)
+        return False
+
+    baseline_s, _ = critical_path(graph, durations)
+    results = []
+    for edge in graph.dag_edges:
+        if edge.data:
+            continue
+        without = DagGraph(graph.spec, exclude=frozenset({(edge.dag, edge.upstream, edge.downstream)}))
+        without_s, _ = critical_path(without, durations)
+        prefix = edge.dag + "/" if edge.dag else ""
+        results.append({
+            "dag": graph.names.get(edge.dag, "root"),
+            "upstream": graph.names[prefix + edge.upstream],
+            "downstream": graph.names[prefix + edge.downstream],
+            "redundant": reachable_without(edge),
+            "critical_path_saving_s": round(baseline_s - without_s, 1),
+        })
+    return results
+
+
+def _input_source(inputs: dict, key: str) -> Optional[str]:
+    value = inputs.get("parameters", {}).get(key)
+    if value is None:
+        return None
+    if "componentInputParameter" in value:
+        return value["componentInputParameter"].replace("pipelinechannel--", "")
+    if "taskOutputParameter" in value:
+        return f"{value['taskOutputParameter']['producerTask']}.{value['taskOutputParameter']['outputParameterKey']}"
+    return json.dumps(value.get("runtimeValue", {}).get("constant"))
+
+
+def mutually_exclusive(a: Step, b: Step) -> bool:
+    """True when the steps are in different branches of the same If/Elif."""
+    common = 0
+    while common < min(len(a.groups), len(b.groups)) and a.groups[common] == b.groups[common]:
+        common += 1
+    return (0 < common < len(a.groups) and common < len(b.groups)
+            and a.groups[common - 1].startswith("condition-branches"))
+
+
+def duplicate_resource_steps(graph: DagGraph) -> List[dict]:
+    """Steps that create the same kind of resource from the same name in one run."""
+    by_identity = defaultdict(list)
+    for step in graph.steps.values():
+        if step.component in RESOURCE_STEPS:
+            kind, name_input = RESOURCE_STEPS[step.component]
+            by_identity[(kind, _input_source(step.inputs, name_input))].append(step)
+    duplicates = []
+    for (kind, identity), steps in sorted(by_identity.items(), key=lambda item: str(item[0])):
+        concurrent = [s for s in steps if any(not mutually_exclusive(s, other) for other in steps if other is not s)]
+        if len(concurrent) > 1:
+            duplicates.append({"resource": kind, "name_from": identity,
+                               "steps": sorted(s.display_name for s in concurrent)})
+    return duplicates
+
+
+def analyze(spec: dict, durations_source: str = "auto", run_store_path: str = DEFAULT_RUN_STORE_PATH,
+            pct: float = 50.0) -> dict:
+    """Full analysis report of a compiled spec (see module docstring)."""
+    graph = DagGraph(spec)
+    durations, source = step_durations(graph, durations_source, run_store_path, pct)
+    times = schedule(graph, durations)
+    total_s, path = critical_path(graph, durations)
+    width, width_at, width_steps = max_parallel_width(times)
+    return {
+        "pipeline": spec.get("pipelineInfo", {}).get("name"),
+        "durations": source,
+        "steps": len(graph.steps),
+        "edges": len(graph.edges),
+        "critical_path": {
+            "seconds": round(total_s, 1),
+            "steps": [{"step": graph.steps[n].display_name, "start_s": round(times[n][0], 1),
+                       "duration_s": round(durations[n], 1)} for n in path],
+        },
+        "max_parallel_width": {"width": width, "at_s": round(width_at, 1),
+                               "steps": [graph.steps[n].display_name for n in width_steps]},
+        "control_edges": control_edges(graph, durations),
+        "duplicate_resource_steps": duplicate_resource_steps(graph),
+        "rule_violations": pipeline_rules.parameter_only_components(spec),
+    }
+
+
+def print_report(report: dict):
+    print(f"Pipeline {report['pipeline']}: {report['steps']} steps, {report['edges']} edges "
+          f"(durations: {report['durations']})")
+    critical = report["critical_path"]
+    print(f"\nCritical path: {critical['seconds'] / 60:.1f} min over {len(critical['steps'])} steps")
+    for step in critical["steps"]:
+        print(f"  {step['start_s']:>8.0f}s  +{step['duration_s']:>6.0f}s  {step['step']}")
+    width = report["max_parallel_width"]
+    print(f"\nMax parallel width: {width['width']} at {width['at_s']:.0f}s (If/Elif branches counted together)")
+    for name in width["steps"]:
+        print(f"  {name}")
+    print("\nControl-only edges (.after() without data):")
+    for edge in sorted(report["control_edges"], key=lambda e: -e["critical_path_saving_s"]):
+        tag = "redundant" if edge["redundant"] else f"saves {edge['critical_path_saving_s']:.0f}s if removed"
+        print(f"  [{edge['dag']}] {edge['upstream']} -> {edge['downstream']}: {tag}")
+    print("\nDuplicated resource-creating steps:")
+    for duplicate in report["duplicate_resource_steps"] or [{"resource": "none"}]:
+        if duplicate["resource"] == "none":
+            print("  none")
+            continue
+        print(f"  {duplicate['resource']} named by {duplicate['name_from']}: {', '.join(duplicate['steps'])}")
+    print(f"\nPipeline rule violations: {report['rule_violations'] or 'none'}")
+
+
+def compile_spec(no_spec_cache: bool = False) -> str:
+    """Compiles the pipeline (or reuses the cached spec) with the runner's configuration."""
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    import run_modernized_pipeline as runner
+
+    return runner.get_compiled_spec(runner.load_config(), no_spec_cache=no_spec_cache)
+
+
+def main():
+    # Options shared by both commands, given after the command name
+    common = argparse.ArgumentParser(add_help=False)
+    spec_source = common.add_mutually_exclusive_group()
+    spec_source.add_argument("--spec", default="",
+                             help="Compiled spec (default: compile the current sources through the spec cache).")
+    spec_source.add_argument("--compile", action="store_true", help="Recompile, bypassing the spec cache.")
+    common.add_argument("--durations", choices=["auto", "history", "estimated"], default=None,
+                        help="Step duration source (default: auto; for check, the baseline's).")
+    common.add_argument("--run-store", default=DEFAULT_RUN_STORE_PATH)
+    common.add_argument("--percentile", type=float, default=50.0, help="Percentile of historical durations.")
+
+    parser = argparse.ArgumentParser(description="Analyze the compiled pipeline DAG.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report_parser = sub.add_parser("report", parents=[common], help="Print the analysis.")
+    report_parser.add_argument("--output", default="", help="Write the report as JSON to this path.")
+    check_parser = sub.add_parser("check", parents=[common], help="Fail if the critical path grew against a baseline.")
+    check_parser.add_argument("--baseline", required=True)
+    check_parser.add_argument("--tolerance", type=float, default=0.0,
+                              help="Allowed relative growth of the critical path seconds.")
+    check_parser.add_argument("--write-baseline", action="store_true", help="Record the current critical path.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    spec_path = args.spec or compile_spec(no_spec_cache=args.compile)
+    logging.info(f"Analyzing {spec_path}")
+    with open(spec_path) as f:
+        spec = json.load(f)
+
+    baseline = {}
+    if args.command == "check" and not args.write_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    source = args.durations or baseline.get("durations", "auto")
+    report = analyze(spec, source, args.run_store, args.percentile)
+    critical = report["critical_path"]
+
+    if args.command == "report":
+        print_report(report)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+        return
+
+    current = {"durations": report["durations"], "critical_path_s": critical["seconds"],
+               "critical_path": [step["step"] for step in critical["steps"]]}
+    if args.write_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {args.baseline}: critical path {current['critical_path_s']:.0f}s, "
+              f"{len(current['critical_path'])} steps")
+        return
+    if report["durations"] != baseline["durations"]:
+        logging.warning(f"Baseline used {baseline['durations']} durations, this check used {report['durations']}")
+    limit_s = baseline["critical_path_s"] * (1 + args.tolerance)
+    grew = current["critical_path_s"] > limit_s + 1e-6 or \
+        len(current["critical_path"]) > len(baseline["critical_path"])
+    print(f"Critical path: {current['critical_path_s']:.0f}s over {len(current['critical_path'])} steps "
+          f"(baseline {baseline['critical_path_s']:.0f}s over {len(baseline['critical_path'])} steps)")
+    if grew:
+        print(f"Critical path grew. Now: {' -> '.join(current['critical_path'])}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
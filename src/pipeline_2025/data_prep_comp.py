@@ -5,26 +5,44 @@ the initial stages of an ML workflow:
 1. Extracting relevant data from a source BigQuery table.
 2. Preprocessing the extracted data, including feature engineering and
    creating data splits (TRAIN, VALIDATE, TEST).
+
+`extract_and_preprocess_data` fuses both stages into one CTE-based statement
+that writes only the prepped table (DATA_PREP_MODE=fused). The two-step
+path materializes the extract table and stays available for debugging
+(DATA_PREP_MODE=split). Every component logs bytes processed/billed, bytes
+written and wall clock to its `data_prep_metrics` output, so the two modes
+can be compared run by run.
+
+The prepped table is clustered on `data_split` and has exactly the columns
+in `feature_registry.PREPPED_COLUMNS`, so readers of a single split (TEST
+sampling, evaluation, skew checks) scan only that split's blocks.
+
+Each statement is dry-run before it executes. A step whose estimate is over
+its `max_bytes_billed` budget fails before any bytes are billed, and the
+statement itself runs with `maximum_bytes_billed` set, so BigQuery enforces
+the same cap (see `query_guard.py`). The estimate is logged next to the
+actual bytes as `estimated_bytes`.
 """
 import logging
 from typing import NamedTuple
 
 from kfp import dsl
 
+from src.pipeline_2025 import component_images
+
 # Configure basic logging
 logging.basicConfig(level=logging.INFO)
 
 
-@dsl.component(
-    base_image="python:3.10",  # Updated Python version
-    packages_to_install=["google-cloud-bigquery>=3.0.0"],
-)
+@dsl.component(**component_images.component_kwargs("bigquery"))
 def extract_source_data(
     project_id: str,
     source_bq_table_id: str,
     extracted_bq_table_id: str,
     filter_year: int,
     region: str,  # Though not directly used by BQ client for multi-region, good for consistency
+    data_prep_metrics: dsl.Output[dsl.Metrics],
+    max_bytes_billed: int = 0,
 ) -> NamedTuple('outputs', [('extracted_table_uri', str), ('extracted_table_id', str)]):
     """Extracts and filters data from a source BigQuery table.
 
@@ -34,6 +52,8 @@ def extract_source_data(
         extracted_bq_table_id: Full ID for the output BigQuery table for extracted data.
         filter_year: The year used to filter the data (e.g., data > filter_year).
         region: The GCP region where the pipeline is running (for consistency).
+        data_prep_metrics: Output metrics: estimated and processed/billed/written bytes, wall clock.
+        max_bytes_billed: Bytes-billed budget for the statement; 0 disables the cap.
 
     Returns:
         NamedTuple with:
@@ -41,10 +61,15 @@ def extract_source_data(
             extracted_table_id: The ID of the newly created extracted table.
     """
     import logging # Ensure logging is imported within the component function
+    import time
     from google.cloud import bigquery
     import json
     from collections import namedtuple # Keep for instantiation
 
+    from src.pipeline_2025.query_guard import guarded_query
+
+    start_time = time.perf_counter()
+
     # Basic configuration for logging within this component
     # This ensures logs from this component are formatted and have a level set.
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -95,7 +120,7 @@ def extract_source_data(
         year > {filter_year}
         AND weight_pounds > 0
         AND mother_age > 0
-        AND plurality > 0
+        AND plurality BETWEEN 1 AND 5  -- plurality_category names only these
         AND gestation_weeks > 19
     );
     """
@@ -104,9 +129,7 @@ def extract_source_data(
     try:
         # Always use US location for the job to access public dataset
         logging.info(f"Explicitly setting job location to US for public dataset access")
-        job_config = bigquery.QueryJobConfig()
-        query_job = bq_client.query(query, job_config=job_config, location="US")
-        query_job.result()  # Wait for the job to complete
+        query_job, estimated_bytes = guarded_query(bq_client, "extract_source_data", query, max_bytes_billed, "US")
         logging.info(
             f"Successfully extracted data to {extracted_bq_table_id}. Job ID: {query_job.job_id}"
         )
@@ -114,6 +137,20 @@ def extract_source_data(
         logging.error(f"BigQuery job failed: {e}")
         raise
 
+    extracted_table = bq_client.get_table(extracted_bq_table_id)
+    prep_metrics = {
+        "estimated_bytes": estimated_bytes,
+        "bytes_processed": query_job.total_bytes_processed or 0,
+        "bytes_billed": query_job.total_bytes_billed or 0,
+        "bytes_written": extracted_table.num_bytes or 0,
+        "rows_written": extracted_table.num_rows or 0,
+        "slot_millis": query_job.slot_millis or 0,
+        "wall_clock_s": time.perf_counter() - start_time,
+    }
+    for name, value in prep_metrics.items():
+        data_prep_metrics.log_metric(name, value)
+    logging.info(f"Extraction cost: {json.dumps(prep_metrics)}")
+
     # Create output values
     extracted_table_uri_val = f"bq://{extracted_bq_table_id}"
     extracted_table_id_val = extracted_bq_table_id
@@ -127,16 +164,15 @@ def extract_source_data(
     return Outputs(extracted_table_uri=extracted_table_uri_val, extracted_table_id=extracted_table_id_val)
 
 
-@dsl.component(
-    base_image="python:3.10",  # Updated Python version
-    packages_to_install=["google-cloud-bigquery>=3.0.0"],
-)
+@dsl.component(**component_images.component_kwargs("bigquery"))
 def preprocess_data_and_split(
     project_id: str,
     input_bq_table_id: str,
     preprocessed_bq_table_id: str,
     data_limit: int,
     region: str,  # Though not directly used by BQ client, good for consistency
+    data_prep_metrics: dsl.Output[dsl.Metrics],
+    max_bytes_billed: int = 0,
 ) -> NamedTuple('outputs', [('preprocessed_table_uri', str), ('preprocessed_table_id', str)]):
     """Preprocesses data and splits it into TRAIN, VALIDATE, and TEST sets.
 
@@ -146,6 +182,8 @@ def preprocess_data_and_split(
         preprocessed_bq_table_id: Full ID for the output BigQuery table for preprocessed data.
         data_limit: The maximum number of rows to process from the input table.
         region: The GCP region where the pipeline is running (for consistency).
+        data_prep_metrics: Output metrics: estimated and processed/billed/written bytes, wall clock.
+        max_bytes_billed: Bytes-billed budget for the statement; 0 disables the cap.
 
     Returns:
         NamedTuple with:
@@ -153,10 +191,14 @@ def preprocess_data_and_split(
             preprocessed_table_id: ID of the newly created preprocessed table.
     """
     import logging # Ensure logging is imported within the component function
+    import time
     from google.cloud import bigquery
     import json
     from collections import namedtuple # Keep for instantiation
 
+    from src.pipeline_2025.query_guard import guarded_query
+
+    start_time = time.perf_counter()
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
     logging.info(f"Starting data preprocessing for {input_bq_table_id}")
@@ -182,8 +224,12 @@ def preprocess_data_and_split(
         dataset = bq_client.create_dataset(dataset, exists_ok=True)
         logging.info(f"Dataset {dataset_id} created with location: {dataset.location}")
 
+    # Clustered on data_split so readers of one split scan only its blocks
+    # (same columns as feature_registry.PREPPED_COLUMNS and CLUSTER_COLUMNS)
     query = f"""
-    CREATE OR REPLACE TABLE `{preprocessed_bq_table_id}` AS (
+    CREATE OR REPLACE TABLE `{preprocessed_bq_table_id}`
+    CLUSTER BY data_split
+    AS (
         WITH all_hash_limit AS (
             SELECT
                 weight_pounds,
@@ -195,7 +241,7 @@ def preprocess_data_and_split(
                     WHEN plurality = 3 THEN "Triplets(3)"
                     WHEN plurality = 4 THEN "Quadruplets(4)"
                     WHEN plurality = 5 THEN "Quintuplets(5)"
-                    ELSE CAST(plurality AS STRING)  -- Keep original if not in specific cases
+                    ELSE CAST(plurality AS STRING)  -- Not reached: extraction keeps plurality 1-5
                 END AS plurality_category, -- Renamed for clarity
                 gestation_weeks,
                 IFNULL(CAST(cigarette_use AS STRING), "Unknown") AS cigarette_use_str,
@@ -215,7 +261,13 @@ def preprocess_data_and_split(
             LIMIT {data_limit}
         )
         SELECT
-            * EXCEPT(hash_values), -- Exclude the temporary hash column
+            weight_pounds,
+            is_male,
+            mother_age,
+            plurality_category,
+            gestation_weeks,
+            cigarette_use_str,
+            alcohol_use_str,
             -- Create data splits (approx. 80% TRAIN, 10% VALIDATE, 10% TEST)
             CASE
                 WHEN MOD(hash_values, 10) < 8 THEN "TRAIN"
@@ -233,10 +285,9 @@ def preprocess_data_and_split(
         input_dataset = bq_client.get_dataset(bigquery.DatasetReference(project_id, input_dataset_id))
         location = input_dataset.location
         logging.info(f"Using location {location} for preprocessing job (matches input dataset)")
-        
-        job_config = bigquery.QueryJobConfig()
-        query_job = bq_client.query(query, location=location, job_config=job_config)
-        query_job.result()  # Wait for the job to complete
+
+        query_job, estimated_bytes = guarded_query(bq_client, "preprocess_data_and_split", query,
+                                                   max_bytes_billed, location)
         logging.info(
             f"Successfully preprocessed data to {preprocessed_bq_table_id}. Job ID: {query_job.job_id}"
         )
@@ -244,6 +295,20 @@ def preprocess_data_and_split(
         logging.error(f"BigQuery job failed: {e}")
         raise
 
+    preprocessed_table = bq_client.get_table(preprocessed_bq_table_id)
+    prep_metrics = {
+        "estimated_bytes": estimated_bytes,
+        "bytes_processed": query_job.total_bytes_processed or 0,
+        "bytes_billed": query_job.total_bytes_billed or 0,
+        "bytes_written": preprocessed_table.num_bytes or 0,
+        "rows_written": preprocessed_table.num_rows or 0,
+        "slot_millis": query_job.slot_millis or 0,
+        "wall_clock_s": time.perf_counter() - start_time,
+    }
+    for name, value in prep_metrics.items():
+        data_prep_metrics.log_metric(name, value)
+    logging.info(f"Preprocessing cost: {json.dumps(prep_metrics)}")
+
     # Create output values
     preprocessed_table_uri_val = f"bq://{preprocessed_bq_table_id}"
     preprocessed_table_id_val = preprocessed_bq_table_id
@@ -255,3 +320,172 @@ def preprocess_data_and_split(
     # Instantiate the inline NamedTuple for return
     Outputs = namedtuple('outputs', ['preprocessed_table_uri', 'preprocessed_table_id'])
     return Outputs(preprocessed_table_uri=preprocessed_table_uri_val, preprocessed_table_id=preprocessed_table_id_val)
+
+
+@dsl.component(**component_images.component_kwargs("bigquery"))
+def extract_and_preprocess_data(
+    project_id: str,
+    source_bq_table_id: str,
+    preprocessed_bq_table_id: str,
+    filter_year: int,
+    data_limit: int,
+    data_prep_metrics: dsl.Output[dsl.Metrics],
+    debug_extracted_bq_table_id: str = "",
+    max_bytes_billed: int = 0,
+) -> NamedTuple('outputs', [('preprocessed_table_uri', str), ('preprocessed_table_id', str)]):
+    """Extracts, preprocesses and splits the source data in a single BigQuery statement.
+
+    The filters of `extract_source_data` and the feature engineering and
+    split of `preprocess_data_and_split` run as CTEs of one
+    `CREATE OR REPLACE TABLE`, so the source is read once and no extract
+    table is written.
+
+    Args:
+        project_id: The GCP project ID.
+        source_bq_table_id: Full ID of the source BigQuery table (e.g., project.dataset.table).
+        preprocessed_bq_table_id: Full ID for the output BigQuery table for preprocessed data.
+        filter_year: The year used to filter the data (e.g., data > filter_year).
+        data_limit: The maximum number of rows to process.
+        data_prep_metrics: Output metrics: estimated and processed/billed/written bytes, wall clock.
+        debug_extracted_bq_table_id: If set, also materializes the filtered
+            extract to this table for debugging (one extra table write).
+        max_bytes_billed: Bytes-billed budget for the statement; 0 disables the cap.
+
+    Returns:
+        NamedTuple with:
+            preprocessed_table_uri: URI of the newly created preprocessed table.
+            preprocessed_table_id: ID of the newly created preprocessed table.
+    """
+    import json
+    import logging
+    import time
+    from collections import namedtuple
+
+    from google.cloud import bigquery
+
+    from src.pipeline_2025.query_guard import guarded_query
+
+    start_time = time.perf_counter()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    logging.info(f"Starting fused data preparation from {source_bq_table_id} into {preprocessed_bq_table_id}")
+    logging.info(f"Filtering data for year > {filter_year}, applying data limit: {data_limit}")
+
+    bq_client = bigquery.Client(project=project_id)
+
+    # The source is the US multi-region public dataset, so the output dataset must be in US too
+    dataset_ref = bigquery.DatasetReference(project_id, preprocessed_bq_table_id.split('.')[1])
+    dataset = bigquery.Dataset(dataset_ref)
+    dataset.location = "US"
+    dataset = bq_client.create_dataset(dataset, exists_ok=True)
+    if dataset.location != "US":
+        logging.warning(f"Dataset location is {dataset.location}, not US as required for public dataset access")
+
+    extract_select = f"""
+        SELECT
+            weight_pounds,
+            is_male,
+            mother_age,
+            plurality,
+            gestation_weeks,
+            cigarette_use,
+            alcohol_use,
+            year,
+            month,
+            wday,
+            state,
+            mother_birth_state
+        FROM
+            `{source_bq_table_id}`
+        WHERE
+            year > {filter_year}
+            AND weight_pounds > 0
+            AND mother_age > 0
+            AND plurality BETWEEN 1 AND 5  -- plurality_category names only these
+            AND gestation_weeks > 19
+    """
+    extracted_ref = f"`{debug_extracted_bq_table_id}`" if debug_extracted_bq_table_id else "extracted"
+    # Same feature engineering and split as preprocess_data_and_split
+    prep_select = f"""
+        WITH {"" if debug_extracted_bq_table_id else f"extracted AS ({extract_select}),"}
+        all_hash_limit AS (
+            SELECT
+                weight_pounds,
+                CAST(is_male AS STRING) AS is_male,
+                mother_age,
+                CASE
+                    WHEN plurality = 1 THEN "Single(1)"
+                    WHEN plurality = 2 THEN "Twins(2)"
+                    WHEN plurality = 3 THEN "Triplets(3)"
+                    WHEN plurality = 4 THEN "Quadruplets(4)"
+                    WHEN plurality = 5 THEN "Quintuplets(5)"
+                    ELSE CAST(plurality AS STRING)
+                END AS plurality_category,
+                gestation_weeks,
+                IFNULL(CAST(cigarette_use AS STRING), "Unknown") AS cigarette_use_str,
+                IFNULL(CAST(alcohol_use AS STRING), "Unknown") AS alcohol_use_str,
+                ABS(FARM_FINGERPRINT(
+                    CONCAT(
+                        CAST(year AS STRING),
+                        CAST(month AS STRING),
+                        CAST(COALESCE(wday, 0) AS STRING),
+                        CAST(IFNULL(state, "Unknown") AS STRING),
+                        CAST(IFNULL(mother_birth_state, "Unknown") AS STRING)
+                    )
+                )) AS hash_values
+            FROM {extracted_ref}
+            LIMIT {data_limit}
+        )
+        SELECT
+            weight_pounds,
+            is_male,
+            mother_age,
+            plurality_category,
+            gestation_weeks,
+            cigarette_use_str,
+            alcohol_use_str,
+            CASE
+                WHEN MOD(hash_values, 10) < 8 THEN "TRAIN"
+                WHEN MOD(hash_values, 10) = 8 THEN "VALIDATE"
+                ELSE "TEST"
+            END AS data_split
+        FROM all_hash_limit
+    """
+    # Same clustering and columns as preprocess_data_and_split
+    query = f"CREATE OR REPLACE TABLE `{preprocessed_bq_table_id}` CLUSTER BY data_split AS ({prep_select});"
+    estimate_query = query
+    if debug_extracted_bq_table_id:
+        # Debug only: keep the extract table, in the same job
+        estimate_query = f"CREATE OR REPLACE TABLE `{debug_extracted_bq_table_id}` AS ({extract_select});"
+        query = f"{estimate_query}\n{query}"
+        logging.info(f"Debug mode: also writing the extract table {debug_extracted_bq_table_id}")
+
+    logging.info("Executing fused BigQuery job for extraction, preprocessing and splitting...")
+    try:
+        # In debug mode the second statement reads a table that does not exist yet,
+        # so only the source scan of the first one is estimated.
+        query_job, estimated_bytes = guarded_query(bq_client, "extract_and_preprocess_data", query,
+                                                   max_bytes_billed, "US", dry_run_query=estimate_query)
+        logging.info(f"Successfully prepared data in {preprocessed_bq_table_id}. Job ID: {query_job.job_id}")
+    except Exception as e:
+        logging.error(f"BigQuery job failed: {e}")
+        raise
+
+    written_tables = [preprocessed_bq_table_id] + ([debug_extracted_bq_table_id] if debug_extracted_bq_table_id else [])
+    tables = [bq_client.get_table(table_id) for table_id in written_tables]
+    prep_metrics = {
+        "estimated_bytes": estimated_bytes,
+        "bytes_processed": query_job.total_bytes_processed or 0,
+        "bytes_billed": query_job.total_bytes_billed or 0,
+        "bytes_written": sum(table.num_bytes or 0 for table in tables),
+        "rows_written": sum(table.num_rows or 0 for table in tables),
+        "slot_millis": query_job.slot_millis or 0,
+        "wall_clock_s": time.perf_counter() - start_time,
+    }
+    for name, value in prep_metrics.items():
+        data_prep_metrics.log_metric(name, value)
+    logging.info(f"Fused data preparation cost: {json.dumps(prep_metrics)}")
+
+    Outputs = namedtuple('outputs', ['preprocessed_table_uri', 'preprocessed_table_id'])
+    return Outputs(preprocessed_table_uri=f"bq://{preprocessed_bq_table_id}",
+                   preprocessed_table_id=preprocessed_bq_table_id)
@@ -0,0 +1,226 @@
+"""Declarative data-quality expectations for the prepped table.
+
+An expectation bounds one statistic of the table:
+
+    {"check": "null_rate", "column": "weight_pounds", "max": 0.0}
+    {"check": "category_share", "column": "data_split", "value": "TEST", "min": 0.05, "max": 0.15}
+    {"check": "row_count", "min": 1000, "severity": "warn"}
+
+Checks:
+  * row_count: rows in the table
+  * null_rate: share of NULLs in `column`
+  * min_value, max_value, mean, stddev: numeric `column`
+  * distinct_count: distinct non-NULL values of a categorical `column`
+  * category_share: share of rows where `column` = `value`
+  * top_category_share: share of the most frequent value of `column`
+`min`/`max` are inclusive and either can be omitted. A failed check with
+severity "error" (the default) fails the gate; "warn" is only reported.
+
+All statistics come from one aggregate query (`profile_query`), so the gate
+costs one scan of the referenced columns. `profile_dataframe` computes the
+same profile from a DataFrame, and `evaluate_expectations` runs the checks
+on either, so expectations can be tried locally before they ship.
+`data_quality_comp.validate_data_quality` imports this module from its
+image (see `component_images.SHARED_MODULES`).
+
+Usage:
+    python -m src.pipeline_2025.data_quality --csv prepped_sample.csv
+    python -m src.pipeline_2025.data_quality --csv prepped_sample.csv --expectations expectations.json
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from src.pipeline_2025 import feature_registry
+
+NUMERIC_COLUMNS = feature_registry.NUMERIC_FEATURES + [feature_registry.LABEL]
+CATEGORICAL_COLUMNS = feature_registry.CATEGORICAL_FEATURES + [feature_registry.SPLIT_COLUMN]
+HISTOGRAM_TOP_K = 100
+
+DEFAULT_EXPECTATIONS = [
+    {"check": "row_count", "min": 1000},
+    # Label distribution
+    {"check": "null_rate", "column": "weight_pounds", "max": 0.0},
+    {"check": "min_value", "column": "weight_pounds", "min": 0.0},
+    {"check": "max_value", "column": "weight_pounds", "max": 20.0},
+    {"check": "mean", "column": "weight_pounds", "min": 5.0, "max": 9.5},
+    {"check": "stddev", "column": "weight_pounds", "min": 0.5, "max": 3.0},
+    # Feature ranges and completeness
+    {"check": "null_rate", "column": "mother_age", "max": 0.0},
+    {"check": "min_value", "column": "mother_age", "min": 10},
+    {"check": "max_value", "column": "mother_age", "max": 65},
+    {"check": "null_rate", "column": "gestation_weeks", "max": 0.0},
+    {"check": "min_value", "column": "gestation_weeks", "min": 20},
+    # natality codes unknown gestation as 99
+    {"check": "max_value", "column": "gestation_weeks", "max": 52, "severity": "warn"},
+    {"check": "null_rate", "column": "is_male", "max": 0.0},
+    {"check": "distinct_count", "column": "is_male", "min": 2, "max": 2},
+    # Category cardinalities; NULL cigarette/alcohol use is mapped to "Unknown"
+    {"check": "distinct_count", "column": "plurality_category", "min": 2},
+    {"check": "top_category_share", "column": "plurality_category", "max": 0.995},
+    {"check": "category_share", "column": "cigarette_use_str", "value": "Unknown", "max": 0.99},
+    {"check": "category_share", "column": "alcohol_use_str", "value": "Unknown", "max": 0.99},
+    # Split sizes (80/10/10 by hash)
+    {"check": "distinct_count", "column": "data_split", "min": 3, "max": 3},
+    {"check": "category_share", "column": "data_split", "value": "TRAIN", "min": 0.7, "max": 0.9},
+    {"check": "category_share", "column": "data_split", "value": "VALIDATE", "min": 0.05, "max": 0.15},
+    {"check": "category_share", "column": "data_split", "value": "TEST", "min": 0.05, "max": 0.15},
+]
+
+NUMERIC_CHECKS = {"min_value", "max_value", "mean", "stddev"}
+CATEGORICAL_CHECKS = {"distinct_count", "category_share", "top_category_share"}
+
+
+def load_expectations(path: str = "") -> List[dict]:
+    """Expectations from a JSON file (a list, or {"expectations": [...]}); the defaults when `path` is empty."""
+    if not path:
+        return DEFAULT_EXPECTATIONS
+    with open(path) as f:
+        data = json.load(f)
+    expectations = data["expectations"] if isinstance(data, dict) else data
+    for expectation in expectations:
+        check = expectation.get("check")
+        if check not in NUMERIC_CHECKS | CATEGORICAL_CHECKS | {"row_count", "null_rate"}:
+            raise ValueError(f"Unknown data quality check {check!r} in {path}")
+        if check != "row_count" and not expectation.get("column"):
+            raise ValueError(f"Data quality check {check!r} in {path} needs a column")
+    return expectations
+
+
+def profiled_columns(expectations: List[dict]) -> Dict[str, str]:
+    """Column -> "numeric" or "categorical" for every column the expectations reference."""
+    columns = {}
+    for expectation in expectations:
+        column = expectation.get("column")
+        if not column:
+            continue
+        if column in NUMERIC_COLUMNS or column in CATEGORICAL_COLUMNS:
+            columns[column] = "numeric" if column in NUMERIC_COLUMNS else "categorical"
+        elif expectation["check"] in CATEGORICAL_CHECKS:
+            columns[column] = "categorical"
+        else:
+            columns.setdefault(column, "numeric")
+    return columns
+
+
+def profile_query(table_id: str, expectations: List[dict]) -> str:
+    """One aggregate query with every statistic the expectations need, named <column>__<stat>."""
+    select = ["COUNT(*) AS row_count"]
+    for name, kind in profiled_columns(expectations).items():
+        select.append(f"COUNT({name}) AS {name}__count")
+        if kind == "numeric":
+            select += [f"MIN({name}) AS {name}__min", f"MAX({name}) AS {name}__max",
+                       f"AVG({name}) AS {name}__mean", f"STDDEV({name}) AS {name}__stddev"]
+        else:
+            select += [f"COUNT(DISTINCT {name}) AS {name}__distinct",
+                       f"APPROX_TOP_COUNT({name}, {HISTOGRAM_TOP_K}) AS {name}__histogram"]
+    select_str = ",\n        ".join(select)
+    return f"""
+    SELECT
+        {select_str}
+    FROM `{table_id}`
+    """
+
+
+def parse_profile_row(row) -> dict:
+    """Converts the `profile_query` result row into a profile."""
+    columns = {}
+    for key, value in row.items():
+        if "__" not in key:
+            continue
+        name, statistic = key.split("__", 1)
+        if statistic == "histogram":
+            value = {str(item["value"]): item["count"] for item in value or []}
+        columns.setdefault(name, {})[statistic] = value
+    return {"row_count": row["row_count"], "columns": columns}
+
+
+def profile_dataframe(df: pd.DataFrame, expectations: List[dict]) -> dict:
+    """The `profile_query` profile computed locally from a DataFrame."""
+    columns = {}
+    for name, kind in profiled_columns(expectations).items():
+        series = df[name] if name in df else pd.Series([None] * len(df), dtype=object)
+        stats = {"count": int(series.count())}
+        if kind == "numeric":
+            values = pd.to_numeric(series, errors="coerce").dropna()
+            stats.update({
+                "min": float(values.min()) if len(values) else None,
+                "max": float(values.max()) if len(values) else None,
+                "mean": float(values.mean()) if len(values) else None,
+                "stddev": float(values.std()) if len(values) > 1 else None,
+            })
+        else:
+            counts = series.dropna().astype(str).value_counts()
+            stats.update({"distinct": int(len(counts)),
+                          "histogram": {str(k): int(v) for k, v in counts.head(HISTOGRAM_TOP_K).items()}})
+        columns[name] = stats
+    return {"row_count": int(len(df)), "columns": columns}
+
+
+def observed_value(profile: dict, expectation: dict) -> Optional[float]:
+    """The statistic an expectation bounds, or None if the profile cannot provide it."""
+    check, row_count = expectation["check"], profile["row_count"]
+    if check == "row_count":
+        return row_count
+    stats = profile["columns"].get(expectation["column"], {})
+    if check == "null_rate":
+        return (row_count - stats.get("count", 0)) / row_count if row_count else None
+    if check in NUMERIC_CHECKS:
+        return stats.get({"min_value": "min", "max_value": "max"}.get(check, check))
+    if check == "distinct_count":
+        return stats.get("distinct")
+    histogram = stats.get("histogram") or {}
+    if not row_count:
+        return None
+    if check == "category_share":
+        return histogram.get(str(expectation["value"]), 0) / row_count
+    return max(histogram.values(), default=0) / row_count
+
+
+def evaluate_expectations(profile: dict, expectations: List[dict]) -> List[dict]:
+    """Checks every expectation against the profile; a missing statistic fails the check."""
+    results = []
+    for expectation in expectations:
+        value = observed_value(profile, expectation)
+        low, high = expectation.get("min"), expectation.get("max")
+        passed = value is not None and (low is None or value >= low) and (high is None or value <= high)
+        results.append({**expectation, "observed": value, "passed": passed,
+                        "severity": expectation.get("severity", "error")})
+    return results
+
+
+def failed_checks(results: List[dict], severity: str = "error") -> List[dict]:
+    return [result for result in results if not result["passed"] and result["severity"] == severity]
+
+
+def describe(result: dict) -> str:
+    target = result.get("column", "table")
+    if "value" in result:
+        target += f"={result['value']}"
+    bounds = " and ".join(part for part in [f">= {result['min']}" if "min" in result else "",
+                                            f"<= {result['max']}" if "max" in result else ""] if part)
+    observed = "n/a" if result["observed"] is None else f"{result['observed']:.6g}"
+    return f"{result['check']}({target}) = {observed}, expected {bounds}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check data-quality expectations against a CSV sample.")
+    parser.add_argument("--csv", required=True, help="Sample of the prepped table, e.g. a BigQuery export.")
+    parser.add_argument("--expectations", default="", help="Expectations JSON file (default: built-in).")
+    args = parser.parse_args()
+
+    expectations = load_expectations(args.expectations)
+    results = evaluate_expectations(profile_dataframe(pd.read_csv(args.csv), expectations), expectations)
+    for result in results:
+        status = "ok  " if result["passed"] else ("FAIL" if result["severity"] == "error" else "warn")
+        print(f"{status} {describe(result)}")
+    errors = failed_checks(results)
+    print(f"{len(results)} checks, {len(errors)} failed, {len(failed_checks(results, 'warn'))} warnings")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
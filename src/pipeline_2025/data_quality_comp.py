@@ -0,0 +1,130 @@
+"""KFP component that validates the prepped table before any training starts.
+
+`validate_data_quality` runs one aggregate BigQuery query (built at compile
+time by `data_quality.profile_query`) over the prepped table. It checks the
+resulting profile against declarative expectations: null rates, value
+ranges, category cardinalities, split sizes and the label distribution. Any
+failed check with severity "error" fails the run. The drift gate, training
+and deployment never see a broken extract, and the drift reference is not
+replaced by it.
+
+Run it locally against a CSV sample with:
+    python -m src.pipeline_2025.data_quality_comp --csv prepped_sample.csv
+"""
+from typing import NamedTuple
+
+from kfp.dsl import Artifact, Metrics, Output, component
+
+from src.pipeline_2025 import component_images
+
+
+@component(**component_images.component_kwargs("bigquery"))
+def validate_data_quality(
+    project_id: str,
+    bq_location: str,
+    profile_query: str,
+    expectations_json: str,
+    quality_report: Output[Artifact],
+    quality_metrics: Output[Metrics],
+    max_bytes_billed: int = 0,
+    local_profile_json: str = "",
+) -> NamedTuple('outputs', [('failed_checks', int), ('warnings', int)]):
+    """Profiles the prepped table in one query and fails the run on violated expectations.
+
+    Args:
+        project_id: The GCP project ID.
+        bq_location: Location of the queried dataset.
+        profile_query: Aggregate query from `data_quality.profile_query`.
+        expectations_json: JSON list of expectations (see `data_quality.py`).
+        quality_report: Output JSON report with the profile and every check result.
+        quality_metrics: Output metrics artifact.
+        max_bytes_billed: Bytes-billed budget for the profile query; 0 disables the cap.
+        local_profile_json: For local runs only: profile used instead of BigQuery.
+
+    Returns:
+        NamedTuple with the number of failed checks and warnings (only
+        reached when no "error" check failed).
+    """
+    import json
+    import logging
+    from collections import namedtuple
+
+    from src.pipeline_2025 import data_quality
+    from src.pipeline_2025.query_guard import guarded_query
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    expectations = json.loads(expectations_json)
+
+    # --- Profile: one aggregate query over the prepped table ---
+    if local_profile_json:
+        profile = json.loads(local_profile_json)
+    else:
+        from google.cloud import bigquery
+
+        bq_client = bigquery.Client(project=project_id)
+        query_job, estimated_bytes = guarded_query(bq_client, "validate_data_quality", profile_query,
+                                                   max_bytes_billed, bq_location)
+        row = list(query_job.result())[0]
+        quality_metrics.log_metric("estimated_bytes", estimated_bytes)
+        quality_metrics.log_metric("bytes_processed", query_job.total_bytes_processed or 0)
+        quality_metrics.log_metric("bytes_billed", query_job.total_bytes_billed or 0)
+        profile = data_quality.parse_profile_row(row)
+
+    # --- Checks ---
+    results = data_quality.evaluate_expectations(profile, expectations)
+    for result in results:
+        if result["passed"]:
+            continue
+        log = logging.error if result["severity"] == "error" else logging.warning
+        log(f"Data quality check failed: {json.dumps(result, default=str)}")
+
+    errors = [r for r in results if not r["passed"] and r["severity"] == "error"]
+    warnings = [r for r in results if not r["passed"] and r["severity"] != "error"]
+    with open(quality_report.path, "w") as f:
+        json.dump({"passed": not errors, "results": results, "profile": profile}, f, indent=2, default=str)
+    quality_metrics.log_metric("row_count", profile["row_count"])
+    quality_metrics.log_metric("checks", len(results))
+    quality_metrics.log_metric("failed_checks", len(errors))
+    quality_metrics.log_metric("warnings", len(warnings))
+    logging.info(f"{len(results)} data quality checks: {len(errors)} failed, {len(warnings)} warnings")
+
+    if errors:
+        raise RuntimeError(f"{len(errors)} data quality checks failed: "
+                           f"{[(r['check'], r.get('column'), r.get('value'), r['observed']) for r in errors]}")
+
+    Outputs = namedtuple('outputs', ['failed_checks', 'warnings'])
+    return Outputs(len(errors), len(warnings))
+
+
+def main():
+    """Runs the component body locally on a CSV sample of the prepped table."""
+    import argparse
+    import json
+    import logging
+    import os
+    import tempfile
+
+    import pandas as pd
+
+    from src.pipeline_2025.data_quality import load_expectations, profile_dataframe
+
+    parser = argparse.ArgumentParser(description="Run the data quality gate locally on a CSV sample.")
+    parser.add_argument("--csv", required=True)
+    parser.add_argument("--expectations", default="", help="Expectations JSON file (default: built-in).")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    expectations = load_expectations(args.expectations)
+    workdir = tempfile.mkdtemp()
+    report = Artifact(name="quality_report", uri=os.path.join(workdir, "quality_report.json"))
+    report.path = report.uri
+    result = validate_data_quality.python_func(
+        project_id="local", bq_location="local", profile_query="", expectations_json=json.dumps(expectations),
+        quality_report=report, quality_metrics=Metrics(name="quality_metrics", uri=workdir),
+        local_profile_json=json.dumps(profile_dataframe(pd.read_csv(args.csv), expectations)),
+    )
+    print(json.dumps(result._asdict()))
+
+
+if __name__ == "__main__":
+    main()
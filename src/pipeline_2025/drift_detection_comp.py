@@ -0,0 +1,225 @@
+"""KFP component that decides whether the new data warrants retraining.
+
+`detect_data_drift` runs one aggregate BigQuery query (built at compile time
+by `drift_sketches.sketch_query`) that sketches every feature of the prepped
+table. It then compares the sketches with those stored for the data the
+current model was trained on, scoring PSI per feature and KS per numeric
+feature. `retrain_needed` is "true" when:
+  * no reference is stored yet,
+  * more than `max_drifted_features` features drift, or
+  * `force_retrain` is set.
+The pipeline skips training, selection and deployment otherwise.
+
+The current sketches are written to the drift report. They only become
+the new reference through `promote_drift_reference`, which the pipeline runs
+after the retrained model is deployed and has passed the serving checks.
+If training or deployment fails, the reference stays on the data the
+serving model was trained on, so the next run still sees the drift.
+
+Run it locally against synthetic sketches with:
+    python -m src.pipeline_2025.drift_detection_comp --weight-shift 0.5
+"""
+from typing import NamedTuple
+
+from kfp.dsl import Artifact, Input, Metrics, Output, component
+
+from src.pipeline_2025 import component_images
+
+
+@component(**component_images.component_kwargs("bigquery"))
+def detect_data_drift(
+    project_id: str,
+    bq_location: str,
+    sketch_query: str,
+    reference_uri: str,
+    drift_report: Output[Artifact],
+    drift_metrics: Output[Metrics],
+    psi_threshold: float = 0.2,
+    ks_threshold: float = 0.1,
+    max_drifted_features: int = 0,
+    force_retrain: bool = False,
+    local_sketches_json: str = "",
+    max_bytes_billed: int = 0,
+) -> NamedTuple('outputs', [
+    ('retrain_needed', str),
+    ('drifted_features', int),
+    ('max_psi', float),
+    ('max_ks', float),
+]):
+    """Sketches the new data and compares it with the last training set's sketches.
+
+    Args:
+        project_id: The GCP project ID.
+        bq_location: Location of the queried dataset.
+        sketch_query: Aggregate query from `drift_sketches.sketch_query`.
+        reference_uri: gs:// (or, for local runs, file) path of the stored reference sketches.
+        drift_report: Output JSON report with the current sketches and per-feature statistics.
+        drift_metrics: Output metrics artifact.
+        psi_threshold: PSI above which a feature counts as drifted.
+        ks_threshold: KS statistic above which a numeric feature counts as drifted.
+        max_drifted_features: Drifted features tolerated without retraining.
+        force_retrain: Retrain regardless of drift.
+        local_sketches_json: For local runs only: current sketches used instead of BigQuery.
+        max_bytes_billed: Bytes-billed budget for the sketch query; 0 disables the cap.
+
+    Returns:
+        NamedTuple with the "true"/"false" retrain decision, the number of
+        drifted features and the largest PSI and KS values.
+    """
+    import json
+    import logging
+    from collections import namedtuple
+
+    from src.pipeline_2025 import drift_sketches
+    from src.pipeline_2025.query_guard import guarded_query
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    def read_text(uri):
+        if uri.startswith("gs://"):
+            from google.cloud import storage
+            bucket, _, name = uri[len("gs://"):].partition("/")
+            blob = storage.Client(project=project_id).bucket(bucket).blob(name)
+            return blob.download_as_text() if blob.exists() else None
+        try:
+            with open(uri) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # --- Current sketches: one aggregate query over the new data ---
+    if local_sketches_json:
+        current = json.loads(local_sketches_json)
+    else:
+        from google.cloud import bigquery
+
+        bq_client = bigquery.Client(project=project_id)
+        query_job, estimated_bytes = guarded_query(bq_client, "detect_data_drift", sketch_query,
+                                                   max_bytes_billed, bq_location)
+        row = list(query_job.result())[0]
+        drift_metrics.log_metric("estimated_bytes", estimated_bytes)
+        drift_metrics.log_metric("bytes_processed", query_job.total_bytes_processed or 0)
+        drift_metrics.log_metric("bytes_billed", query_job.total_bytes_billed or 0)
+        current = drift_sketches.parse_sketch_row(row)
+    logging.info(f"Sketched {len(current)} features: "
+                 f"{ {name: sketch['count'] for name, sketch in current.items()} }")
+
+    # --- Comparison ---
+    reference_text = read_text(reference_uri)
+    reference = json.loads(reference_text)["sketches"] if reference_text else None
+    features = {}
+    if reference is None:
+        logging.info(f"No reference sketches at {reference_uri}; retraining to establish one")
+    else:
+        features = drift_sketches.compare_sketches(reference, current, psi_threshold, ks_threshold)
+        for name, row in features.items():
+            logging.info(f"{name}: {row}")
+
+    drifted = sorted(name for name, row in features.items() if row["drifted"])
+    max_psi = max([row["psi"] for row in features.values() if "psi" in row], default=0.0)
+    max_ks = max([row["ks"] for row in features.values() if "ks" in row], default=0.0)
+    retrain = force_retrain or reference is None or len(drifted) > max_drifted_features
+    retrain_needed = "true" if retrain else "false"
+    reason = ("forced" if force_retrain else "no reference" if reference is None
+              else f"{len(drifted)} drifted features > {max_drifted_features}" if retrain
+              else f"{len(drifted)} drifted features <= {max_drifted_features}")
+    logging.info(f"retrain_needed={retrain_needed} ({reason}); drifted: {drifted}")
+
+    report = {"retrain_needed": retrain, "reason": reason, "drifted_features": drifted, "features": features,
+              "thresholds": {"psi": psi_threshold, "ks": ks_threshold, "max_drifted_features": max_drifted_features},
+              "reference_uri": reference_uri, "sketches": current}
+    with open(drift_report.path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    drift_metrics.log_metric("drifted_features", len(drifted))
+    drift_metrics.log_metric("max_psi", max_psi)
+    drift_metrics.log_metric("max_ks", max_ks)
+    drift_metrics.log_metric("retrain_needed", int(retrain))
+
+    Outputs = namedtuple('outputs', ['retrain_needed', 'drifted_features', 'max_psi', 'max_ks'])
+    return Outputs(retrain_needed, len(drifted), max_psi, max_ks)
+
+
+@component(**component_images.component_kwargs("bigquery"))
+def promote_drift_reference(
+    project_id: str,
+    drift_report: Input[Artifact],
+    reference_uri: str,
+):
+    """Stores the sketches of a drift report as the reference for the next drift check.
+
+    Args:
+        project_id: The GCP project ID.
+        drift_report: Report from `detect_data_drift` for the data the deployed model was trained on.
+        reference_uri: gs:// (or, for local runs, file) path of the stored reference sketches.
+    """
+    import json
+    import logging
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    with open(drift_report.path) as f:
+        text = json.dumps({"sketches": json.load(f)["sketches"]}, default=str)
+    if reference_uri.startswith("gs://"):
+        from google.cloud import storage
+        bucket, _, name = reference_uri[len("gs://"):].partition("/")
+        storage.Client(project=project_id).bucket(bucket).blob(name).upload_from_string(
+            text, content_type="application/json")
+    else:
+        with open(reference_uri, "w") as f:
+            f.write(text)
+    logging.info(f"Stored the sketches from {drift_report.uri} as the new reference at {reference_uri}")
+
+
+def main():
+    """Runs the component body locally on synthetic data, twice: establish the reference, then compare.
+
+    The first run's sketches are promoted as the reference, as the pipeline does after a deployment.
+    """
+    import argparse
+    import json
+    import logging
+    import os
+    import tempfile
+
+    import numpy as np
+
+    from src.pipeline_2025.drift_sketches import sketch_columns
+
+    parser = argparse.ArgumentParser(description="Run drift detection locally on synthetic data.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--weight-shift", type=float, default=0.0, help="Shift of weight_pounds in the new data.")
+    parser.add_argument("--twins-rate", type=float, default=0.03, help="Share of Twins(2) in the new data.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    def synthetic(seed, weight_shift=0.0, twins_rate=0.03):
+        rng = np.random.default_rng(seed)
+        return sketch_columns({
+            "mother_age": rng.integers(15, 45, args.rows).tolist(),
+            "gestation_weeks": rng.integers(30, 43, args.rows).tolist(),
+            "weight_pounds": rng.normal(7.2 + weight_shift, 1.2, args.rows).tolist(),
+            "is_male": rng.choice(["true", "false"], args.rows).tolist(),
+            "plurality_category": rng.choice(["Single(1)", "Twins(2)"], args.rows,
+                                             p=[1 - twins_rate, twins_rate]).tolist(),
+            "cigarette_use_str": rng.choice(["true", "false", "Unknown"], args.rows).tolist(),
+            "alcohol_use_str": rng.choice(["true", "false", "Unknown"], args.rows).tolist(),
+        })
+
+    workdir = tempfile.mkdtemp()
+    reference_uri = os.path.join(workdir, "reference_sketches.json")
+    for label, sketches in [("reference", synthetic(0)),
+                            ("new data", synthetic(1, args.weight_shift, args.twins_rate))]:
+        report = Artifact(name="drift_report", uri=os.path.join(workdir, f"{label}_report.json"))
+        report.path = report.uri
+        result = detect_data_drift.python_func(
+            project_id="local", bq_location="local", sketch_query="", reference_uri=reference_uri,
+            drift_report=report, drift_metrics=Metrics(name="drift_metrics", uri=workdir),
+            local_sketches_json=json.dumps(sketches),
+        )
+        print(f"{label}: {json.dumps(result._asdict())}")
+        if result.retrain_needed == "true":
+            promote_drift_reference.python_func(project_id="local", drift_report=report, reference_uri=reference_uri)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""Per-feature data sketches and drift statistics for the drift gate.
+
+A sketch summarizes one feature of a table in a few kilobytes:
+  * numeric features: count, nulls, approximate distinct count, mean,
+    standard deviation and 101 quantiles (0th to 100th percentile)
+  * categorical features: count, nulls, approximate distinct count and a
+    value -> count histogram of the most frequent values
+
+In the pipeline, BigQuery computes all sketches in one aggregate query
+(`sketch_query`): APPROX_QUANTILES, APPROX_COUNT_DISTINCT (HyperLogLog++) and
+APPROX_TOP_COUNT. `parse_sketch_row` turns the result row into the summary
+format. Locally, `FeatureSketch` builds the same summary from a stream of
+values. It uses a mergeable HyperLogLog, a histogram and a reservoir
+sample for the quantiles, so DataFrames and log files can be sketched in
+chunks.
+
+`compare_sketches` scores drift per feature:
+  * PSI: over categorical histograms, and for numeric features over the
+    reference deciles, with bin fractions read from both quantile sketches
+  * KS: the largest gap between the two step CDFs implied by the quantile
+    sketches (numeric features only)
+
+`drift_detection_comp.detect_data_drift` imports this module from its
+image (see `component_images.SHARED_MODULES`).
+
+Usage:
+    python -m src.pipeline_2025.drift_sketches sketch --csv sample.csv --output sketch.json
+    python -m src.pipeline_2025.drift_sketches compare reference.json current.json
+"""
+import argparse
+import base64
+import hashlib
+import json
+import math
+import random
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from src.pipeline_2025 import feature_registry
+
+# The label is sketched with the numeric features
+NUMERIC_FEATURES = feature_registry.NUMERIC_FEATURES + [feature_registry.LABEL]
+CATEGORICAL_FEATURES = feature_registry.CATEGORICAL_FEATURES
+QUANTILE_POINTS = 100    # APPROX_QUANTILES(x, 100) returns 101 boundaries
+HISTOGRAM_TOP_K = 100
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with 2**precision registers (~1.04/sqrt(m) error).
+
+    Args:
+        precision: Register index bits; 12 gives 4096 registers and ~1.6% error.
+    """
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    @staticmethod
+    def _hash(value) -> int:
+        return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+    def add(self, value):
+        hashed = self._hash(value)
+        index = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return m * math.log(m / zeros)
+        return estimate
+
+    def to_dict(self) -> dict:
+        return {"precision": self.precision, "registers": base64.b64encode(bytes(self.registers)).decode()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HyperLogLog":
+        sketch = cls(data["precision"])
+        sketch.registers = bytearray(base64.b64decode(data["registers"]))
+        return sketch
+
+
+class FeatureSketch:
+    """Mergeable sketch of one feature, summarized in the BigQuery sketch format.
+
+    Args:
+        kind: "numeric" or "categorical".
+        reservoir_size: Values kept for quantile estimates (numeric only).
+        seed: Seed for reservoir sampling.
+    """
+
+    def __init__(self, kind: str, reservoir_size: int = 4096, seed: int = 0):
+        if kind not in ("numeric", "categorical"):
+            raise ValueError(f"Unknown feature kind: {kind}")
+        self.kind = kind
+        self.reservoir_size = reservoir_size
+        self.count = 0
+        self.nulls = 0
+        self.histogram: Counter = Counter()
+        self.hll = HyperLogLog()
+        self.reservoir: List[float] = []
+        self._random = random.Random(seed)
+        self._sum = 0.0
+        self._sum_squares = 0.0
+
+    def update(self, values: Iterable):
+        for value in values:
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                self.nulls += 1
+                continue
+            self.count += 1
+            self.hll.add(value)
+            if self.kind == "categorical":
+                self.histogram[str(value)] += 1
+                continue
+            value = float(value)
+            self._sum += value
+            self._sum_squares += value * value
+            if len(self.reservoir) < self.reservoir_size:
+                self.reservoir.append(value)
+            else:
+                slot = self._random.randrange(self.count)
+                if slot < self.reservoir_size:
+                    self.reservoir[slot] = value
+        return self
+
+    def merge(self, other: "FeatureSketch"):
+        if other.kind != self.kind:
+            raise ValueError("Cannot merge sketches of different kinds")
+        if self.kind == "numeric" and other.count and not self.count:
+            self.reservoir = self._random.sample(other.reservoir, min(len(other.reservoir), self.reservoir_size))
+        elif self.kind == "numeric" and other.count:
+            # Keep each side's values in proportion to the rows it represents
+            weights = ([self.count / len(self.reservoir)] * len(self.reservoir)
+                       + [other.count / len(other.reservoir)] * len(other.reservoir))
+            pooled = self.reservoir + other.reservoir
+            keys = [self._random.random() ** (1 / weight) for weight in weights]
+            keep = sorted(range(len(pooled)), key=keys.__getitem__, reverse=True)[:self.reservoir_size]
+            self.reservoir = [pooled[i] for i in keep]
+        self.count += other.count
+        self.nulls += other.nulls
+        self.histogram.update(other.histogram)
+        self.hll.merge(other.hll)
+        self._sum += other._sum
+        self._sum_squares += other._sum_squares
+        return self
+
+    def summary(self) -> dict:
+        summary = {"kind": self.kind, "count": self.count, "nulls": self.nulls, "distinct": round(self.hll.count())}
+        if self.kind == "categorical":
+            summary["histogram"] = dict(self.histogram.most_common(HISTOGRAM_TOP_K))
+            return summary
+        mean = self._sum / self.count if self.count else None
+        variance = (self._sum_squares - self.count * mean * mean) / (self.count - 1) if self.count > 1 else 0.0
+        summary["mean"] = mean
+        summary["stddev"] = math.sqrt(max(variance, 0.0))
+        summary["quantiles"] = (np.quantile(self.reservoir, np.linspace(0, 1, QUANTILE_POINTS + 1)).tolist()
+                                if self.reservoir else [])
+        return summary
+
+
+def sketch_columns(columns: Dict[str, Sequence]) -> Dict[str, dict]:
+    """Sketch summaries for the known feature columns present in `columns` (e.g. a DataFrame)."""
+    sketches = {}
+    for name in NUMERIC_FEATURES + CATEGORICAL_FEATURES:
+        if name in columns:
+            kind = "numeric" if name in NUMERIC_FEATURES else "categorical"
+            sketches[name] = FeatureSketch(kind).update(list(columns[name])).summary()
+    return sketches
+
+
+def sketch_query(table_id: str, where: str = "") -> str:
+    """One aggregate query producing every feature sketch of `table_id`."""
+    select = ["COUNT(*) AS row_count"]
+    for name in NUMERIC_FEATURES:
+        select += [
+            f"COUNT({name}) AS {name}__count",
+            f"APPROX_COUNT_DISTINCT({name}) AS {name}__distinct",
+            f"AVG({name}) AS {name}__mean",
+            f"STDDEV({name}) AS {name}__stddev",
+            f"APPROX_QUANTILES({name}, {QUANTILE_POINTS}) AS {name}__quantiles",
+        ]
+    for name in CATEGORICAL_FEATURES:
+        select += [
+            f"COUNT({name}) AS {name}__count",
+            f"APPROX_COUNT_DISTINCT({name}) AS {name}__distinct",
+            f"APPROX_TOP_COUNT({name}, {HISTOGRAM_TOP_K}) AS {name}__histogram",
+        ]
+    select_str = ",\n        ".join(select)
+    return f"""
+    SELECT
+        {select_str}
+    FROM `{table_id}`
+    {f"WHERE {where}" if where else ""}
+    """
+
+
+def parse_sketch_row(row) -> Dict[str, dict]:
+    """Converts the `sketch_query` result row into sketch summaries."""
+    sketches = {}
+    for name in NUMERIC_FEATURES:
+        sketches[name] = {
+            "kind": "numeric", "count": row[f"{name}__count"], "nulls": row["row_count"] - row[f"{name}__count"],
+            "distinct": row[f"{name}__distinct"], "mean": row[f"{name}__mean"], "stddev": row[f"{name}__stddev"],
+            "quantiles": [float(q) for q in row[f"{name}__quantiles"] or []],
+        }
+    for name in CATEGORICAL_FEATURES:
+        sketches[name] = {
+            "kind": "categorical", "count": row[f"{name}__count"], "nulls": row["row_count"] - row[f"{name}__count"],
+            "distinct": row[f"{name}__distinct"],
+            "histogram": {str(item["value"]): item["count"] for item in row[f"{name}__histogram"] or []},
+        }
+    return sketches
+
+
+def step_cdf(quantiles: Sequence[float], x) -> np.ndarray:
+    """P(value <= x) implied by evenly spaced quantiles."""
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+    return np.searchsorted(quantiles, x, side="right") / len(quantiles)
+
+
+def psi(expected: Sequence[float], actual: Sequence[float], epsilon: float = 1e-4) -> float:
+    """Population stability index between two sets of bin fractions."""
+    expected = np.clip(np.asarray(expected, dtype=np.float64), epsilon, None)
+    actual = np.clip(np.asarray(actual, dtype=np.float64), epsilon, None)
+    expected, actual = expected / expected.sum(), actual / actual.sum()
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def histogram_psi(reference: Dict[str, int], current: Dict[str, int]) -> float:
+    keys = sorted(set(reference) | set(current))
+    ref_total, cur_total = sum(reference.values()) or 1, sum(current.values()) or 1
+    return psi([reference.get(key, 0) / ref_total for key in keys], [current.get(key, 0) / cur_total for key in keys])
+
+
+def quantile_psi(reference: Sequence[float], current: Sequence[float], bins: int = 10) -> float:
+    """PSI over the reference's `bins`-quantile bins (ties collapse into one bin)."""
+    step = QUANTILE_POINTS // bins
+    edges = np.unique(np.asarray(reference)[step:-1:step])
+    bounds = np.concatenate([[-np.inf], edges, [np.inf]])
+    ref_cdf, cur_cdf = step_cdf(reference, bounds), step_cdf(current, bounds)
+    ref_cdf[0] = cur_cdf[0] = 0.0
+    ref_cdf[-1] = cur_cdf[-1] = 1.0
+    return psi(np.diff(ref_cdf), np.diff(cur_cdf))
+
+
+def ks_from_quantiles(reference: Sequence[float], current: Sequence[float]) -> float:
+    """Largest CDF gap between two quantile sketches."""
+    points = np.union1d(reference, current)
+    return float(np.max(np.abs(step_cdf(reference, points) - step_cdf(current, points))))
+
+
+def compare_sketches(reference: Dict[str, dict], current: Dict[str, dict], psi_threshold: float = 0.2,
+                     ks_threshold: float = 0.1) -> Dict[str, dict]:
+    """Per-feature PSI/KS and drift flags; features missing from either side are flagged."""
+    report = {}
+    for name in sorted(set(reference) | set(current)):
+        ref, cur = reference.get(name), current.get(name)
+        if ref is None or cur is None or ref["kind"] != cur["kind"]:
+            report[name] = {"drifted": True, "reason": "feature missing or changed kind"}
+            continue
+        row = {"reference_count": ref["count"], "current_count": cur["count"],
+               "reference_distinct": ref["distinct"], "current_distinct": cur["distinct"]}
+        if ref["kind"] == "categorical":
+            row["psi"] = histogram_psi(ref["histogram"], cur["histogram"])
+            row["new_categories"] = sorted(set(cur["histogram"]) - set(ref["histogram"]))
+            row["drifted"] = row["psi"] > psi_threshold
+        elif not ref["quantiles"] or not cur["quantiles"]:
+            row["drifted"] = bool(ref["quantiles"]) != bool(cur["quantiles"])
+        else:
+            row["psi"] = quantile_psi(ref["quantiles"], cur["quantiles"])
+            row["ks"] = ks_from_quantiles(ref["quantiles"], cur["quantiles"])
+            row["mean_shift"] = (cur["mean"] or 0.0) - (ref["mean"] or 0.0)
+            row["drifted"] = row["psi"] > psi_threshold or row["ks"] > ks_threshold
+        report[name] = row
+    return report
+
+
+def _read_csv_columns(path: str) -> Dict[str, List[Optional[object]]]:
+    import csv
+
+    columns: Dict[str, List[Optional[object]]] = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            for key, value in row.items():
+                columns.setdefault(key, []).append(value if value != "" else None)
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and compare feature sketches.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sketch = sub.add_parser("sketch", help="Sketch the feature columns of a CSV file.")
+    sketch.add_argument("--csv", required=True)
+    sketch.add_argument("--output", required=True)
+    compare = sub.add_parser("compare", help="Compare two sketch files.")
+    compare.add_argument("reference")
+    compare.add_argument("current")
+    compare.add_argument("--psi-threshold", type=float, default=0.2)
+    compare.add_argument("--ks-threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.command == "sketch":
+        with open(args.output, "w") as f:
+            json.dump(sketch_columns(_read_csv_columns(args.csv)), f, indent=2)
+        return
+    with open(args.reference) as f:
+        reference = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    report = compare_sketches(reference.get("sketches", reference), current.get("sketches", current),
+                              args.psi_threshold, args.ks_threshold)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,9 @@
 from kfp.dsl import Artifact, Output, Input, component
 from typing import NamedTuple
 
-@component(
-    base_image="python:3.10",
-    packages_to_install=["google-cloud-aiplatform"],
-)
+from src.pipeline_2025 import component_images
+
+@component(**component_images.component_kwargs("aiplatform"))
 def get_or_create_endpoint(
     project_id: str,
     location: str,
@@ -12,7 +11,8 @@ def get_or_create_endpoint(
 ) -> NamedTuple("Outputs", [
     ("endpoint", Artifact),
     ("endpoint_resource_name", str),
-    ("is_new_endpoint", bool)
+    ("is_new_endpoint", bool),
+    ("traffic_split_json", str)
 ]):
     """Gets or creates a Vertex AI endpoint.
     
@@ -28,7 +28,10 @@ def get_or_create_endpoint(
         endpoint: The Vertex AI endpoint artifact
         endpoint_resource_name: The full resource name of the endpoint
         is_new_endpoint: Whether a new endpoint was created
+        traffic_split_json: JSON of the endpoint's traffic split before this
+            run deploys, restored by `rollback_deployment`
     """
+    import json
     import logging
     from google.cloud import aiplatform
     
@@ -60,21 +63,20 @@ def get_or_create_endpoint(
     
     # Prepare output values
     endpoint_resource_name = endpoint.resource_name
+    traffic_split_json = json.dumps(dict(endpoint.gca_resource.traffic_split))
+    logging.info(f"Current traffic split: {traffic_split_json}")
     
     from collections import namedtuple
-    outputs = namedtuple("Outputs", ["endpoint", "endpoint_resource_name", "is_new_endpoint"])
+    outputs = namedtuple("Outputs", ["endpoint", "endpoint_resource_name", "is_new_endpoint", "traffic_split_json"])
     
     # Create endpoint artifact
     endpoint_artifact = Artifact()
     endpoint_artifact.uri = endpoint_resource_name
     endpoint_artifact.metadata = {"resourceName": endpoint_resource_name}
     
-    return outputs(endpoint_artifact, endpoint_resource_name, is_new_endpoint)
+    return outputs(endpoint_artifact, endpoint_resource_name, is_new_endpoint, traffic_split_json)
 
-@component(
-    base_image="python:3.10",
-    packages_to_install=["google-cloud-aiplatform"],
-)
+@component(**component_images.component_kwargs("aiplatform"))
 def update_traffic_split(
     project_id: str,
     location: str, 
@@ -256,4 +258,75 @@ def update_traffic_split(
         # Even if there was an error, return the model ID if we found it
     
     outputs = namedtuple("Outputs", ["deployed_model_id", "model_details"])
-    return outputs(actual_model_id, model_details) 
\ No newline at end of file
+    return outputs(actual_model_id, model_details) 
+
+
+@component(**component_images.component_kwargs("aiplatform"))
+def rollback_deployment(
+    project_id: str,
+    location: str,
+    endpoint_resource_name: str,
+    deployed_model_display_name: str,
+    previous_traffic_split_json: str = "{}",
+) -> NamedTuple("Outputs", [
+    ("undeployed_model_id", str),
+    ("traffic_split_json", str)
+]):
+    """Undeploys a model that failed a promotion gate and restores the previous traffic split.
+    
+    The serving checks reach the new model through the endpoint's traffic
+    split, so it is deployed with all traffic. When a gate blocks promotion
+    this component takes it off the endpoint again.
+    
+    Args:
+        project_id: The GCP project ID
+        location: The GCP region
+        endpoint_resource_name: The full resource name of the endpoint
+        deployed_model_display_name: Display name the model was deployed with
+        previous_traffic_split_json: Traffic split before the deployment (from
+            `get_or_create_endpoint`). Models no longer deployed are dropped;
+            if none remain, the most recently deployed other model gets all traffic.
+        
+    Returns:
+        undeployed_model_id: ID of the deployed model that was removed
+        traffic_split_json: JSON of the traffic split after the rollback
+    """
+    import json
+    import logging
+    from collections import namedtuple
+    from google.cloud import aiplatform
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    aiplatform.init(project=project_id, location=location)
+    
+    endpoint = aiplatform.Endpoint(endpoint_name=endpoint_resource_name)
+    deployed_models = list(endpoint.gca_resource.deployed_models)
+    rejected = [m for m in deployed_models if m.display_name == deployed_model_display_name]
+    if not rejected:
+        raise ValueError(f"No model deployed as {deployed_model_display_name} on {endpoint_resource_name}")
+    rejected_ids = {m.id for m in rejected}
+    remaining = sorted((m for m in deployed_models if m.id not in rejected_ids),
+                       key=lambda m: m.create_time.timestamp() if m.create_time else 0, reverse=True)
+    
+    traffic_split = {}
+    if remaining:
+        remaining_ids = {m.id for m in remaining}
+        previous = {model_id: int(percent) for model_id, percent in json.loads(previous_traffic_split_json).items()
+                    if model_id in remaining_ids and int(percent) > 0}
+        if previous:
+            # Rescale in case a model of the previous split is gone; the remainder goes to the largest share
+            total = sum(previous.values())
+            traffic_split = {model_id: percent * 100 // total for model_id, percent in previous.items()}
+            traffic_split[max(previous, key=previous.get)] += 100 - sum(traffic_split.values())
+        else:
+            traffic_split = {remaining[0].id: 100}
+        logging.info(f"Restoring traffic split: {traffic_split}")
+    else:
+        logging.warning("No other model is deployed; the endpoint will serve no traffic")
+    
+    for model_id in sorted(rejected_ids):
+        logging.info(f"Undeploying {deployed_model_display_name} ({model_id})")
+        endpoint.undeploy(deployed_model_id=model_id, traffic_split=traffic_split or None)
+    
+    outputs = namedtuple("Outputs", ["undeployed_model_id", "traffic_split_json"])
+    return outputs(",".join(sorted(rejected_ids)), json.dumps(traffic_split))
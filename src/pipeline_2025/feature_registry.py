@@ -0,0 +1,45 @@
+"""Columns of the prepped table and which of them each reader needs.
+
+The prepped table written by `data_prep_comp` holds the model features,
+the label and the `data_split` column. It is clustered on `data_split`, so
+a reader that filters on one split scans only that split's blocks.
+Readers build their column lists from this module instead of `SELECT *`,
+so they read only the columns they use, and a new feature is added in one
+place. The SQL in `data_prep_comp.py` writes `PREPPED_COLUMNS` and
+`CLUSTER_COLUMNS` together with their feature engineering, so a new
+feature is also added there.
+
+`split_filter` and `select_list` are the building blocks for readers:
+    f"SELECT {select_list(FEATURES)} FROM `{table}` WHERE {split_filter('TEST')}"
+"""
+from typing import List, Sequence
+
+NUMERIC_FEATURES = ["mother_age", "gestation_weeks"]
+CATEGORICAL_FEATURES = ["is_male", "plurality_category", "cigarette_use_str", "alcohol_use_str"]
+# Order matches the prepped table and the serving instance format
+FEATURES = ["is_male", "mother_age", "plurality_category", "gestation_weeks", "cigarette_use_str", "alcohol_use_str"]
+LABEL = "weight_pounds"
+SPLIT_COLUMN = "data_split"
+SPLITS = ["TRAIN", "VALIDATE", "TEST"]
+
+PREPPED_COLUMNS = [LABEL] + FEATURES + [SPLIT_COLUMN]
+CLUSTER_COLUMNS = [SPLIT_COLUMN]
+
+
+def training_columns() -> List[str]:
+    """Features and label: what model training reads."""
+    return FEATURES + [LABEL]
+
+
+def select_list(columns: Sequence[str], alias: str = "") -> str:
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(f"{prefix}{column}" for column in columns)
+
+
+def split_filter(*splits: str) -> str:
+    """WHERE condition on the clustering column, e.g. split_filter("TEST")."""
+    unknown = set(splits) - set(SPLITS)
+    if unknown:
+        raise ValueError(f"Unknown splits {sorted(unknown)}; expected one of {SPLITS}")
+    values = ", ".join(f"'{split}'" for split in splits)
+    return f"{SPLIT_COLUMN} = {values}" if len(splits) == 1 else f"{SPLIT_COLUMN} IN ({values})"
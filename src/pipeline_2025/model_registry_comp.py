@@ -1,10 +1,9 @@
 from kfp.dsl import Artifact, Input, Metrics, Output, component
 from typing import NamedTuple
 
-@component(
-    base_image="python:3.10",
-    packages_to_install=["google-cloud-aiplatform"],
-)
+from src.pipeline_2025 import component_images
+
+@component(**component_images.component_kwargs("aiplatform"))
 def register_best_model_in_registry(
     model: Input[Artifact],
     model_name: str,
@@ -18,7 +17,8 @@ def register_best_model_in_registry(
     additional_metadata: dict = {},
 ) -> NamedTuple("Outputs", [
     ("registered_model_id", str),
-    ("model_version_id", str)
+    ("model_version_id", str),
+    ("model_info_json", str)
 ]):
     """Registers a model in the Vertex AI Model Registry.
     
@@ -37,9 +37,11 @@ def register_best_model_in_registry(
     Returns:
         registered_model_id: ID of the registered model
         model_version_id: ID of the model version
+        model_info_json: JSON string with the registration details, for tracking
     """
     import logging
     from google.cloud import aiplatform
+    import datetime
     import json
     import time
     import traceback
@@ -200,14 +202,25 @@ def register_best_model_in_registry(
         registered_model_id = "registration_failed"
         model_version_id = "registration_failed"
     
+    # Registration details for tracking (formerly the separate log_model_details step)
+    model_info = {
+        "model_id": registered_model_id,
+        "model_version": model_version_id,
+        "model_type": additional_metadata.get("model_type", ""),
+        "registration_time": datetime.datetime.now().isoformat(),
+    }
+    model_info_json = json.dumps(model_info, indent=2)
+    logging.info(f"Model Registration Information:")
+    logging.info(f"  - Model ID: {registered_model_id}")
+    logging.info(f"  - Model Version: {model_version_id}")
+    logging.info(f"  - Model Type: {model_info['model_type']}")
+    logging.info(f"  - Registration Time: {model_info['registration_time']}")
+    
     from collections import namedtuple
-    outputs = namedtuple("Outputs", ["registered_model_id", "model_version_id"])
-    return outputs(registered_model_id, model_version_id)
+    outputs = namedtuple("Outputs", ["registered_model_id", "model_version_id", "model_info_json"])
+    return outputs(registered_model_id, model_version_id, model_info_json)
 
-@component(
-    base_image="python:3.10",
-    packages_to_install=["google-cloud-aiplatform"],
-)
+@component(**component_images.component_kwargs("aiplatform"))
 def get_model_lineage(
     model_id: str,
     project_id: str,
@@ -0,0 +1,99 @@
+"""Structural rules checked on every compiled pipeline spec.
+
+Each lightweight component is its own pod: scheduling, image pull and
+interpreter startup cost tens of seconds, which is usually much longer
+than the component's actual work. A step that only formats strings or
+builds a dict from its parameter inputs does not justify a pod. Write it
+as a pipeline-level f-string over the parameters (KFP resolves those at
+runtime), or fold it into the neighbouring component that already has a
+pod.
+
+`parameter_only_components` flags lightweight Python components that:
+  * have no input or output artifacts, and
+  * import only modules from `PURE_MODULES`, so they do no I/O or API calls.
+`get_compiled_spec` in run_modernized_pipeline.py fails the compile on a
+violation.
+
+Usage:
+    python -m src.pipeline_2025.pipeline_rules compiled_pipeline_specs/<spec>.json
+"""
+import argparse
+import ast
+import json
+import sys
+from typing import Dict, List, Optional, Set
+
+# Standard library modules that cannot reach a service or the filesystem on their own
+PURE_MODULES = frozenset({
+    "collections", "dataclasses", "datetime", "decimal", "enum", "functools", "hashlib", "itertools",
+    "json", "logging", "math", "re", "statistics", "string", "textwrap", "typing",
+})
+# Imports that KFP adds to every lightweight component's source
+KFP_PREAMBLE_MODULES = frozenset({"kfp", "typing"})
+
+
+class PipelineRuleViolation(ValueError):
+    """A compiled spec breaks one of the structural rules."""
+
+
+def component_source(executor: dict) -> Optional[str]:
+    """The Python source of a lightweight component's executor, or None for other executors."""
+    container = executor.get("container", {})
+    if "--function_to_execute" not in container.get("args", []):
+        return None
+    return container.get("command", [])[-1]
+
+
+def imported_modules(source: str) -> Set[str]:
+    """Top-level names of every module imported anywhere in `source`."""
+    modules = set()
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.add(node.module.split(".")[0])
+    return modules
+
+
+def has_artifacts(component: dict) -> bool:
+    return any(component.get(side, {}).get("artifacts") for side in ("inputDefinitions", "outputDefinitions"))
+
+
+def parameter_only_components(spec: dict) -> List[str]:
+    """Names of lightweight components that only transform parameters (see module docstring)."""
+    executors: Dict[str, dict] = spec.get("deploymentSpec", {}).get("executors", {})
+    violations = []
+    for name, component in sorted(spec.get("components", {}).items()):
+        source = component_source(executors.get(component.get("executorLabel", ""), {}))
+        if source is None or has_artifacts(component):
+            continue
+        if imported_modules(source) - KFP_PREAMBLE_MODULES <= PURE_MODULES:
+            violations.append(name)
+    return violations
+
+
+def check_spec(spec: dict):
+    """Raises PipelineRuleViolation if the spec breaks a rule."""
+    violations = parameter_only_components(spec)
+    if violations:
+        raise PipelineRuleViolation(
+            f"Components only transform parameters and should not run as their own pods: {violations}. "
+            "Use a pipeline-level f-string over the parameters or fold them into a neighbouring component.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a compiled pipeline spec against the pipeline rules.")
+    parser.add_argument("spec", help="Compiled pipeline JSON spec.")
+    args = parser.parse_args()
+    with open(args.spec) as f:
+        spec = json.load(f)
+    try:
+        check_spec(spec)
+    except PipelineRuleViolation as e:
+        print(e)
+        sys.exit(1)
+    print(f"{args.spec}: OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""KFP component that dry-runs a statement executed by a prebuilt component.
+
+The BQML CREATE MODEL statement is submitted by `BigqueryCreateModelJobOp`,
+which cannot dry-run it first. `preflight_query_cost` runs before it and
+dry-runs the same statement. It fails the run if the estimate exceeds the
+step's budget, so training never starts, and it writes the estimate to a
+cost report. The op itself also gets the budget as `maximumBytesBilled`
+(see `query_guard.py`), which holds when the estimate is not available.
+"""
+from typing import NamedTuple
+
+from kfp.dsl import Artifact, Output, component
+
+from src.pipeline_2025 import component_images
+
+
+@component(**component_images.component_kwargs("bigquery"))
+def preflight_query_cost(
+    project_id: str,
+    location: str,
+    step: str,
+    query: str,
+    cost_report: Output[Artifact],
+    max_bytes_billed: int = 0,
+) -> NamedTuple('outputs', [('estimated_bytes', int)]):
+    """Dry-runs `query` and fails if its estimate is over `max_bytes_billed`.
+
+    Args:
+        project_id: The GCP project ID.
+        location: BigQuery job location.
+        step: Name of the step that will run the statement, used in logs and the report.
+        query: The statement to estimate.
+        cost_report: Output JSON with the estimate and the budget.
+        max_bytes_billed: Bytes-billed budget for the step; 0 disables the check.
+
+    Returns:
+        NamedTuple with the estimated bytes (-1 if the statement cannot be dry-run).
+    """
+    import json
+    import logging
+    from collections import namedtuple
+
+    from google.cloud import bigquery
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Same checks as query_guard.QueryGuard.estimate
+    bq_client = bigquery.Client(project=project_id)
+    try:
+        dry_run_job = bq_client.query(query, location=location,
+                                      job_config=bigquery.QueryJobConfig(dry_run=True, use_query_cache=False))
+        estimated_bytes = dry_run_job.total_bytes_processed or 0
+        error = None
+    except Exception as e:
+        # Not every statement supports dry runs; the server-side cap still applies
+        logging.warning(f"[{step}] dry run failed, relying on maximumBytesBilled only: {e}")
+        estimated_bytes, error = -1, str(e)
+
+    logging.info(f"[{step}] dry run estimate: {estimated_bytes} bytes (budget: {max_bytes_billed or 'none'})")
+    with open(cost_report.path, "w") as f:
+        json.dump({"step": step, "estimated_bytes": estimated_bytes, "max_bytes_billed": max_bytes_billed,
+                   "dry_run_error": error}, f, indent=2)
+    cost_report.metadata["estimated_bytes"] = estimated_bytes
+    cost_report.metadata["max_bytes_billed"] = max_bytes_billed
+
+    if max_bytes_billed and estimated_bytes > max_bytes_billed:
+        raise RuntimeError(f"[{step}] estimated {estimated_bytes} bytes exceeds max_bytes_billed="
+                           f"{max_bytes_billed}; not starting it")
+
+    Outputs = namedtuple('outputs', ['estimated_bytes'])
+    return Outputs(estimated_bytes)
@@ -0,0 +1,198 @@
+"""Dry-run cost estimation and bytes-billed guardrails for BigQuery statements.
+
+Every statement the pipeline generates is dry-run first. The estimate is
+logged and checked against a per-step budget, and the statement is then
+submitted with `maximum_bytes_billed` set to that budget, so BigQuery
+refuses the job itself if the estimate was wrong. A step over budget
+raises `QueryBudgetExceeded` before any bytes are billed.
+
+`guarded_query` does the three steps (dry run, budget check, capped run)
+for one statement; the pipeline components import it from their image
+(see `component_images.SHARED_MODULES`). `QueryGuard` wraps it
+with per-step budgets and a cost record for local tools, and
+`FakeBigQueryClient` exercises both without GCP. Statements run by Google Cloud Pipeline
+Components (BQML CREATE MODEL and ML.EVALUATE) get the cap through
+`job_configuration_query={"maximumBytesBilled": ...}` and are estimated
+up front by `query_cost_comp.preflight_query_costs`.
+
+Usage:
+    guard = QueryGuard(bigquery.Client(project=...), location="US",
+                       budgets={"extract_and_preprocess": 20 * 1024**3})
+    guard.run("extract_and_preprocess", query)
+    print(guard.report())
+"""
+import json
+import logging
+import re
+from types import SimpleNamespace
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+GIB = 1024 ** 3
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Raised when a statement's dry-run estimate exceeds its bytes-billed budget."""
+
+
+class StepCost(NamedTuple):
+    step: str
+    estimated_bytes: Optional[int]
+    max_bytes_billed: Optional[int]
+    bytes_processed: Optional[int] = None
+    bytes_billed: Optional[int] = None
+    job_id: Optional[str] = None
+
+
+def parse_budgets(budgets_json: str) -> Dict[str, int]:
+    """Parses {"step": bytes or "<n>GiB"} into bytes per step."""
+    budgets = {}
+    for step, value in (json.loads(budgets_json) if budgets_json else {}).items():
+        if isinstance(value, str) and value.upper().endswith("GIB"):
+            value = float(value[:-3]) * GIB
+        budgets[step] = int(value)
+    return budgets
+
+
+def guarded_query(client, step: str, query: str, max_bytes_billed: int = 0, location: Optional[str] = None,
+                  dry_run_query: Optional[str] = None, budget_error=RuntimeError, **job_config_kwargs):
+    """Dry-runs, budget-checks and runs `query` capped at `max_bytes_billed`.
+
+    Args:
+        client: `bigquery.Client` or `FakeBigQueryClient`.
+        step: Name used in logs and errors.
+        query: Statement to run.
+        max_bytes_billed: Budget; 0 disables the check and the cap.
+        location: Job location.
+        dry_run_query: Statement to estimate instead of `query`, when `query`
+            reads tables that only exist once it runs.
+        budget_error: Exception class raised over budget; it carries `estimated_bytes`.
+        **job_config_kwargs: Extra `QueryJobConfig` fields for the real run.
+
+    Returns:
+        The finished job and the dry-run estimate in bytes.
+    """
+    import logging
+
+    from google.cloud import bigquery
+
+    budget = max_bytes_billed or None
+    dry_run_job = client.query(dry_run_query or query, location=location,
+                               job_config=bigquery.QueryJobConfig(dry_run=True, use_query_cache=False))
+    estimated_bytes = dry_run_job.total_bytes_processed or 0
+    logging.info(f"[{step}] dry run estimate {estimated_bytes / 1024 ** 3:.3f} GiB"
+                 f"{f' (budget {budget / 1024 ** 3:.3f} GiB)' if budget else ''}")
+    if budget and estimated_bytes > budget:
+        error = budget_error(f"[{step}] estimated {estimated_bytes} bytes exceeds the budget of {budget} bytes; "
+                             f"check the filters/LIMIT or raise the step budget")
+        error.estimated_bytes = estimated_bytes
+        raise error
+    if budget:
+        # Only when set: QueryJobConfig stores maximum_bytes_billed=None as the string "None"
+        job_config_kwargs["maximum_bytes_billed"] = budget
+    job = client.query(query, location=location, job_config=bigquery.QueryJobConfig(**job_config_kwargs))
+    job.result()
+    logging.info(f"[{step}] estimated {estimated_bytes} bytes, processed {job.total_bytes_processed or 0} bytes, "
+                 f"billed {job.total_bytes_billed or 0} bytes (job {job.job_id})")
+    return job, estimated_bytes
+
+
+class QueryGuard:
+    """Dry-runs, budget-checks and runs BigQuery statements, keeping a cost record per step.
+
+    Args:
+        client: `bigquery.Client` or `FakeBigQueryClient`.
+        location: Job location.
+        budgets: Max bytes billed per step name.
+        default_max_bytes_billed: Budget for steps without one; 0 disables the check.
+    """
+
+    def __init__(self, client, location: Optional[str] = None, budgets: Optional[Dict[str, int]] = None,
+                 default_max_bytes_billed: int = 0):
+        self.client = client
+        self.location = location
+        self.budgets = budgets or {}
+        self.default_max_bytes_billed = default_max_bytes_billed
+        self.costs: List[StepCost] = []
+
+    def budget_for(self, step: str) -> Optional[int]:
+        return self.budgets.get(step, self.default_max_bytes_billed) or None
+
+    def estimate(self, step: str, query: str) -> Tuple[int, Optional[int]]:
+        """Dry-runs `query` and raises QueryBudgetExceeded if it is over the step budget."""
+        from google.cloud import bigquery
+
+        job = self.client.query(query, job_config=bigquery.QueryJobConfig(dry_run=True, use_query_cache=False),
+                                location=self.location)
+        estimated = job.total_bytes_processed or 0
+        budget = self.budget_for(step)
+        logging.info(f"[{step}] dry run estimate {estimated / GIB:.3f} GiB"
+                     f"{f' (budget {budget / GIB:.3f} GiB)' if budget else ''}")
+        if budget and estimated > budget:
+            self.costs.append(StepCost(step, estimated, budget))
+            raise QueryBudgetExceeded(f"[{step}] estimated {estimated} bytes exceeds the budget of {budget} bytes; "
+                                      f"check the filters/LIMIT or raise the step budget")
+        return estimated, budget
+
+    def run(self, step: str, query: str, **job_config_kwargs):
+        """Runs `query` through `guarded_query` at the step budget; returns the finished job."""
+        budget = self.budget_for(step)
+        try:
+            job, estimated = guarded_query(self.client, step, query, budget or 0, self.location,
+                                           budget_error=QueryBudgetExceeded, **job_config_kwargs)
+        except QueryBudgetExceeded as e:
+            self.costs.append(StepCost(step, e.estimated_bytes, budget))
+            raise
+        self.costs.append(StepCost(step, estimated, budget, job.total_bytes_processed, job.total_bytes_billed,
+                                   job.job_id))
+        return job
+
+    def report(self) -> List[dict]:
+        """Estimated against actual bytes per step, with the estimate error where both are known."""
+        rows = []
+        for cost in self.costs:
+            row = cost._asdict()
+            if cost.estimated_bytes and cost.bytes_processed is not None:
+                row["estimate_error"] = (cost.bytes_processed - cost.estimated_bytes) / cost.estimated_bytes
+            rows.append(row)
+        return rows
+
+
+class FakeBigQueryClient:
+    """BigQuery client stand-in for exercising guarded execution without GCP.
+
+    Args:
+        estimates: (regex, bytes) rules; the first pattern found in a query gives its estimate.
+        default_bytes: Estimate for queries matching no rule.
+        actual_ratio: Actual bytes processed as a fraction of the estimate.
+        rows: (regex, rows) rules; the first pattern found in a query gives the
+            rows its job's `result()` returns (no rule: no rows).
+    """
+
+    def __init__(self, estimates: Optional[List[Tuple[str, int]]] = None, default_bytes: int = 10 * 1024 ** 2,
+                 actual_ratio: float = 1.0, rows: Optional[List[Tuple[str, List[dict]]]] = None):
+        self.estimates = [(re.compile(pattern, re.IGNORECASE), size) for pattern, size in (estimates or [])]
+        self.rows = [(re.compile(pattern, re.IGNORECASE), result) for pattern, result in (rows or [])]
+        self.default_bytes = default_bytes
+        self.actual_ratio = actual_ratio
+        self.dry_runs: List[str] = []
+        self.jobs: List[str] = []
+
+    def _estimate(self, query: str) -> int:
+        return next((size for pattern, size in self.estimates if pattern.search(query)), self.default_bytes)
+
+    def query(self, query: str, job_config=None, location: Optional[str] = None):
+        estimated = self._estimate(query)
+        if job_config is not None and getattr(job_config, "dry_run", False):
+            self.dry_runs.append(query)
+            return SimpleNamespace(total_bytes_processed=estimated, job_id=None, result=lambda: None)
+        cap = getattr(job_config, "maximum_bytes_billed", None) if job_config is not None else None
+        if cap and estimated > cap:
+            # BigQuery rejects the job before running it
+            raise RuntimeError(f"Query exceeded limit for bytes billed: {cap}. {estimated} or higher required.")
+        self.jobs.append(query)
+        processed = int(estimated * self.actual_ratio)
+        # On-demand billing rounds up to at least 10 MiB per query
+        billed = max(processed, 10 * 1024 ** 2)
+        result = next((list(result) for pattern, result in self.rows if pattern.search(query)), [])
+        return SimpleNamespace(total_bytes_processed=processed, total_bytes_billed=billed, slot_millis=0,
+                               job_id=f"fake_job_{len(self.jobs)}", result=lambda: result)
@@ -0,0 +1,226 @@
+"""Plans a partial rerun of a prior pipeline job.
+
+Vertex AI Pipelines cannot start a job in the middle of its DAG, but it
+reuses a task's earlier execution when the task has caching enabled and its
+component and inputs are unchanged. A resumed run is the compiled spec with
+`cachingOptions.enableCache` set per task:
+  * reuse: the task succeeded in the prior job with caching enabled, and
+    neither its definition nor any pipeline parameter it reads has changed
+  * rerun: everything else, plus every step downstream of a rerun step and
+    the steps named with `--from-step` and their downstream steps
+The job is submitted with `enable_caching=None`, so these per-task settings
+apply instead of ENABLE_CACHING. It also reuses the prior job's parameter
+values (including `run_timestamp`) so reused steps see the same inputs.
+
+A task only writes a cache entry when its own caching is enabled, so the
+steps of a prior job that ran with ENABLE_CACHING=false (every task's
+`cachingOptions.enableCache` false) left nothing to reuse. They are
+planned as reruns, and `resume` warns about them.
+
+`run_modernized_pipeline.py resume --job-id <id>` prints the plan before
+submitting.
+"""
+import copy
+import json
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from src.pipeline_2025.dag_analyzer import DagGraph
+
+# Prior task states whose outputs can be reused
+REUSABLE_STATES = {"SUCCEEDED"}
+# Execution states of tasks that were themselves served from the cache
+REUSABLE_EXECUTION_STATES = {"CACHED", "COMPLETE"}
+CACHE_DISABLED_REASON = "prior job ran it with caching disabled"
+
+
+class PlannedStep(NamedTuple):
+    node_id: str
+    display_name: str
+    action: str     # "reuse" or "rerun"
+    reason: str
+
+
+def _canonical(value):
+    """Normalizes JSON from a protobuf Struct (all numbers floats) and from a spec file alike."""
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_canonical(v) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _task_at(spec: dict, node_id: str) -> Optional[dict]:
+    """The task dict for a "/"-joined task key path, or None if the spec has no such task."""
+    dag = spec["root"]["dag"]
+    task = None
+    for key in node_id.split("/"):
+        if dag is None or key not in dag.get("tasks", {}):
+            return None
+        task = dag["tasks"][key]
+        dag = spec["components"].get(task["componentRef"]["name"], {}).get("dag")
+    return task
+
+
+def step_fingerprint(spec: dict, node_id: str) -> Optional[str]:
+    """Canonical JSON of everything that defines a step: its task wiring, component and executor."""
+    task = _task_at(spec, node_id)
+    if task is None:
+        return None
+    component = spec["components"][task["componentRef"]["name"]]
+    executor = spec.get("deploymentSpec", {}).get("executors", {}).get(component.get("executorLabel", ""), {})
+    wiring = {k: v for k, v in task.items() if k not in ("taskInfo", "cachingOptions", "componentRef")}
+    return json.dumps(_canonical({"task": wiring, "component": component, "executor": executor}), sort_keys=True)
+
+
+def parameter_dependencies(spec: dict) -> Dict[str, Set[str]]:
+    """node_id -> pipeline parameters the step reads, directly or through its enclosing groups."""
+    dependencies = {}
+
+    def walk(dag: dict, prefix: Tuple[str, ...], scope: Dict[str, Set[str]]):
+        for name, task in dag.get("tasks", {}).items():
+            params = {}
+            for input_name, value in task.get("inputs", {}).get("parameters", {}).items():
+                params[input_name] = scope.get(value.get("componentInputParameter"), set())
+            component = spec["components"][task["componentRef"]["name"]]
+            if "dag" in component:
+                walk(component["dag"], prefix + (name,), params)
+            else:
+                dependencies["/".join(prefix + (name,))] = set().union(*params.values()) if params else set()
+
+    root_params = spec["root"].get("inputDefinitions", {}).get("parameters", {})
+    walk(spec["root"]["dag"], (), {name: {name} for name in root_params})
+    return dependencies
+
+
+def default_parameter_values(spec: dict) -> Dict[str, object]:
+    return {name: definition.get("defaultValue")
+            for name, definition in spec["root"].get("inputDefinitions", {}).get("parameters", {}).items()}
+
+
+def prior_task_states(task_details: Iterable[dict]) -> Dict[Tuple[str, ...], dict]:
+    """Path of task names below the root -> prior task detail.
+
+    Args:
+        task_details: Dicts with task_id, parent_task_id, task_name, state and
+            execution_state, one per task of the prior job (see `job_task_details`).
+    """
+    details = list(task_details)
+    by_id = {detail["task_id"]: detail for detail in details}
+    paths = {}
+    for detail in details:
+        path, parent = [], detail
+        while parent.get("parent_task_id") in by_id:
+            path.append(parent["task_name"])
+            parent = by_id[parent["parent_task_id"]]
+        if path:  # the root task spans the whole job and is not a step
+            paths[tuple(reversed(path))] = detail
+    return paths
+
+
+def _prior_detail(graph: DagGraph, node_id: str, prior: Dict[Tuple[str, ...], dict]) -> Optional[dict]:
+    keys = node_id.split("/")
+    path = tuple(graph.names["/".join(keys[:i + 1])] for i in range(len(keys)))
+    if path in prior:
+        return prior[path]
+    # Fall back to the display name alone when it is unique in the prior job
+    matches = [detail for prior_path, detail in prior.items() if prior_path[-1] == path[-1]]
+    return matches[0] if len(matches) == 1 else None
+
+
+def plan_resume(spec: dict, prior_spec: dict, prior_tasks: Dict[Tuple[str, ...], dict],
+                prior_parameters: Dict[str, object], parameters: Dict[str, object],
+                from_steps: Iterable[str] = ()) -> List[PlannedStep]:
+    """Decides, per step of `spec`, whether the resumed run reuses or reruns it.
+
+    Args:
+        spec: Newly compiled pipeline spec.
+        prior_spec: Spec the prior job ran.
+        prior_tasks: Output of `prior_task_states` for the prior job.
+        prior_parameters: Parameter values the prior job ran with.
+        parameters: Parameter values of the resumed run.
+        from_steps: Display names of steps to rerun regardless, with everything downstream.
+
+    Returns:
+        One PlannedStep per step, in topological order.
+    """
+    graph = DagGraph(spec)
+    dependencies = parameter_dependencies(spec)
+    changed_parameters = {name for name, value in parameters.items()
+                          if _canonical(value) != _canonical(prior_parameters.get(name))}
+    unknown = set(from_steps) - {step.display_name for step in graph.steps.values()}
+    if unknown:
+        raise ValueError(f"Unknown --from-step {sorted(unknown)}; steps are "
+                         f"{sorted({step.display_name for step in graph.steps.values()})}")
+
+    reasons = {}
+    for node_id, step in graph.steps.items():
+        detail = _prior_detail(graph, node_id, prior_tasks)
+        if step.display_name in from_steps:
+            reasons[node_id] = "requested with --from-step"
+        elif step_fingerprint(spec, node_id) != step_fingerprint(prior_spec, node_id):
+            reasons[node_id] = "step definition changed"
+        elif dependencies.get(node_id, set()) & changed_parameters:
+            reasons[node_id] = f"parameters changed: {sorted(dependencies[node_id] & changed_parameters)}"
+        elif detail is None:
+            reasons[node_id] = "did not run in the prior job"
+        elif detail["state"] not in REUSABLE_STATES and detail.get("execution_state") not in REUSABLE_EXECUTION_STATES:
+            reasons[node_id] = f"prior state {detail['state']}"
+        elif not _task_at(prior_spec, node_id).get("cachingOptions", {}).get("enableCache"):
+            reasons[node_id] = CACHE_DISABLED_REASON
+
+    # Everything downstream of a rerun step consumes new outputs
+    preds = graph.predecessors()
+    plan = []
+    for node_id in graph.topological_order():
+        if node_id not in reasons:
+            upstream = sorted(graph.steps[p].display_name for p in preds[node_id] if p in reasons)
+            if upstream:
+                reasons[node_id] = f"downstream of {', '.join(upstream)}"
+        action = "rerun" if node_id in reasons else "reuse"
+        plan.append(PlannedStep(node_id, graph.steps[node_id].display_name, action, reasons.get(node_id, "")))
+    return plan
+
+
+def apply_plan(spec: dict, plan: List[PlannedStep]) -> dict:
+    """Copy of `spec` with caching enabled for reused steps and disabled for rerun steps."""
+    resumed = copy.deepcopy(spec)
+    for step in plan:
+        task = _task_at(resumed, step.node_id)
+        task.setdefault("cachingOptions", {})["enableCache"] = step.action == "reuse"
+    return resumed
+
+
+def format_plan(plan: List[PlannedStep]) -> str:
+    lines = [f"Resume plan: reuse {sum(s.action == 'reuse' for s in plan)}, "
+             f"rerun {sum(s.action == 'rerun' for s in plan)} of {len(plan)} steps"]
+    lines += [f"  {step.action:<6} {step.display_name:<40} {step.reason}" for step in plan]
+    return "\n".join(lines)
+
+
+def job_task_details(resource) -> List[dict]:
+    """Task details of a `PipelineJob.gca_resource` in the form `prior_task_states` takes."""
+    details = []
+    for task in resource.job_detail.task_details:
+        execution = getattr(task, "execution", None)
+        details.append({
+            "task_id": task.task_id,
+            "parent_task_id": task.parent_task_id,
+            "task_name": task.task_name,
+            "state": task.state.name if hasattr(task.state, "name") else str(task.state),
+            "execution_state": execution.state.name if execution and hasattr(execution.state, "name") else None,
+        })
+    return details
+
+
+def job_spec_and_parameters(resource) -> Tuple[dict, Dict[str, object]]:
+    """Pipeline spec and runtime parameter values of a `PipelineJob.gca_resource`."""
+    from google.protobuf import json_format
+
+    pb = resource._pb
+    spec = json_format.MessageToDict(pb.pipeline_spec)
+    # Only the values passed at submission are stored; the rest are the spec defaults
+    parameters = default_parameter_values(spec)
+    parameters.update(json_format.MessageToDict(pb.runtime_config).get("parameterValues", {}))
+    return spec, parameters
@@ -0,0 +1,401 @@
+"""Append-only local store of historical pipeline run results.
+
+Run results are otherwise spread across Vertex ML Metadata and the
+registration details and registry metadata written by
+`register_best_model_in_registry`. This module keeps one SQLite file with
+per-run job details, per-task durations, metric values, the selected model and
+the deployment decision, so trend questions (MAE over time, p95 step duration,
+cost per run) can be answered without re-calling the Vertex AI APIs.
+
+`cost_usd` is filled from `--cost-usd` when the billed total is known.
+Otherwise it is an estimate of the pipeline's own compute: each executed
+step's duration at `RUN_STORE_TASK_USD_PER_HOUR` plus the per-run Vertex AI
+Pipelines fee (`RUN_STORE_RUN_FEE_USD`). Services billed separately
+(BigQuery bytes, AutoML node hours, endpoint serving) are not included.
+
+Rows are only ever inserted. Re-ingesting a run that is already stored is a
+no-op, so ingestion can safely be repeated after every pipeline run.
+
+Usage:
+    python -m src.pipeline_2025.run_store ingest --job-name <pipeline job resource name>
+    python -m src.pipeline_2025.run_store trend --metric mean_absolute_error
+    python -m src.pipeline_2025.run_store durations --percentile 95
+    python -m src.pipeline_2025.run_store costs
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_RUN_STORE_PATH = os.getenv("RUN_STORE_PATH", "run_history/runs.sqlite")
+# Cost estimate when the billed total is not given: hourly price of the machine
+# a pipeline step runs on (e2-standard-4 by default) and the fee per pipeline run
+TASK_USD_PER_HOUR = float(os.getenv("RUN_STORE_TASK_USD_PER_HOUR", "0.134"))
+RUN_FEE_USD = float(os.getenv("RUN_STORE_RUN_FEE_USD", "0.03"))
+# Executions that are not billed as a step: DAG groups and cache hits
+UNBILLED_EXECUTION_SCHEMAS = ("system.DagExecution",)
+UNBILLED_EXECUTION_STATES = ("CACHED",)
+
+# Task output parameters that carry the model selection result
+SELECTION_OUTPUT_KEYS = ("best_model_name", "deploy_decision", "best_metric_value")
+# Metric names returned by both collect_eval_metrics_* components
+STANDARD_METRIC_NAMES = (
+    "mean_absolute_error",
+    "mean_squared_error",
+    "root_mean_squared_error",
+    "r2_score",
+    "median_absolute_error",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    pipeline_name TEXT,
+    display_name TEXT,
+    state TEXT,
+    create_time TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    duration_s REAL,
+    cost_usd REAL,
+    selected_model TEXT,
+    deploy_decision TEXT,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    run_id TEXT NOT NULL,
+    task_name TEXT NOT NULL,
+    state TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    duration_s REAL,
+    cost_usd REAL,
+    PRIMARY KEY (run_id, task_name)
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id TEXT NOT NULL,
+    model_type TEXT NOT NULL,
+    metric_name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, model_type, metric_name)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_pipeline_time ON runs (pipeline_name, create_time);
+CREATE INDEX IF NOT EXISTS idx_tasks_name_duration ON tasks (task_name, duration_s);
+CREATE INDEX IF NOT EXISTS idx_metrics_name_model ON metrics (metric_name, model_type);
+"""
+
+
+def _to_iso(value) -> Optional[str]:
+    """Normalizes datetimes (or protobuf timestamps) to ISO-8601 strings."""
+    if value is None or value == "":
+        return None
+    if hasattr(value, "ToDatetime"):
+        value = value.ToDatetime()
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        # Unset protobuf timestamps come back as the epoch
+        if value.year <= 1970:
+            return None
+        return value.isoformat()
+    return str(value)
+
+
+def _duration_seconds(start_iso: Optional[str], end_iso: Optional[str]) -> Optional[float]:
+    if not start_iso or not end_iso:
+        return None
+    return (datetime.fromisoformat(end_iso) - datetime.fromisoformat(start_iso)).total_seconds()
+
+
+def estimate_task_cost(task_detail) -> Optional[float]:
+    """Compute cost of one executed step at TASK_USD_PER_HOUR; 0 for groups and cache hits."""
+    execution = getattr(task_detail, "execution", None)
+    if execution is not None:
+        state = getattr(execution.state, "name", str(execution.state))
+        if getattr(execution, "schema_title", "") in UNBILLED_EXECUTION_SCHEMAS or state in UNBILLED_EXECUTION_STATES:
+            return 0.0
+    duration = _duration_seconds(_to_iso(task_detail.start_time), _to_iso(task_detail.end_time))
+    return None if duration is None else duration / 3600.0 * TASK_USD_PER_HOUR
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Returns the linearly interpolated percentile of already sorted values."""
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    rank = (pct / 100.0) * (len(values) - 1)
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class RunStore:
+    """SQLite-backed, append-only history of pipeline runs."""
+
+    def __init__(self, path: str = DEFAULT_RUN_STORE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Writes ---
+    def has_run(self, run_id: str) -> bool:
+        row = self._conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return row is not None
+
+    def record_run(
+        self,
+        run_id: str,
+        pipeline_name: str = "",
+        display_name: str = "",
+        state: str = "",
+        create_time=None,
+        start_time=None,
+        end_time=None,
+        cost_usd: Optional[float] = None,
+        selected_model: Optional[str] = None,
+        deploy_decision: Optional[str] = None,
+        tasks: Iterable[Dict] = (),
+        metrics: Optional[Dict[str, Dict[str, float]]] = None,
+    ) -> bool:
+        """Appends one run with its tasks and metrics in a single transaction.
+
+        Args:
+            run_id: Pipeline job ID (or any unique run identifier).
+            pipeline_name: Pipeline name from the compiled spec.
+            display_name: Display name of the pipeline job.
+            state: Final job state, e.g. "PIPELINE_STATE_SUCCEEDED".
+            create_time, start_time, end_time: Datetimes or ISO strings.
+            cost_usd: Total run cost when known. Falls back to the sum of task costs.
+            selected_model: Model chosen by select_best_model ("BQML" or "AutoML").
+            deploy_decision: "true"/"false" deployment decision.
+            tasks: Dicts with task_name, state, start_time, end_time and optional cost_usd.
+            metrics: {model_type: {metric_name: value}}.
+
+        Returns:
+            True if the run was stored, False if it was already present.
+        """
+        if self.has_run(run_id):
+            logging.info(f"Run {run_id} already in run store, skipping")
+            return False
+
+        start_iso, end_iso = _to_iso(start_time), _to_iso(end_time)
+        task_rows = []
+        for task in tasks:
+            t_start, t_end = _to_iso(task.get("start_time")), _to_iso(task.get("end_time"))
+            task_rows.append((
+                run_id, task["task_name"], task.get("state"), t_start, t_end,
+                _duration_seconds(t_start, t_end), task.get("cost_usd"),
+            ))
+        if cost_usd is None:
+            task_costs = [row[6] for row in task_rows if row[6] is not None]
+            cost_usd = sum(task_costs) if task_costs else None
+
+        metric_rows = [
+            (run_id, model_type, name, float(value))
+            for model_type, values in (metrics or {}).items()
+            for name, value in values.items()
+            if value is not None
+        ]
+
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    run_id, pipeline_name, display_name, state, _to_iso(create_time),
+                    start_iso, end_iso, _duration_seconds(start_iso, end_iso), cost_usd,
+                    selected_model, deploy_decision, datetime.now(timezone.utc).isoformat(),
+                ),
+            )
+            self._conn.executemany("INSERT OR IGNORE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?)", task_rows)
+            self._conn.executemany("INSERT OR IGNORE INTO metrics VALUES (?, ?, ?, ?)", metric_rows)
+        logging.info(f"Stored run {run_id}: {len(task_rows)} tasks, {len(metric_rows)} metric values")
+        return True
+
+    def ingest_pipeline_job(self, pipeline_job, cost_usd: Optional[float] = None) -> bool:
+        """Ingests a finished (succeeded, failed or cancelled) `aiplatform.PipelineJob` or its gca_resource.
+
+        Without `cost_usd`, the run cost is estimated from the step durations
+        (see the module docstring).
+        """
+        resource = getattr(pipeline_job, "gca_resource", pipeline_job)
+        run_id = resource.name.split("/")[-1]
+        if self.has_run(run_id):
+            logging.info(f"Run {run_id} already in run store, skipping")
+            return False
+
+        tasks, outputs_by_task = [], {}
+        job_detail = getattr(resource, "job_detail", None)
+        for task_detail in (job_detail.task_details if job_detail else []):
+            # The root DAG task spans the whole run and is not a step
+            if task_detail.task_name == resource.pipeline_spec.get("pipelineInfo", {}).get("name"):
+                continue
+            tasks.append({
+                "task_name": task_detail.task_name,
+                "state": task_detail.state.name if hasattr(task_detail.state, "name") else str(task_detail.state),
+                "start_time": task_detail.start_time,
+                "end_time": task_detail.end_time,
+                "cost_usd": estimate_task_cost(task_detail),
+            })
+            outputs_by_task[task_detail.task_name] = _execution_outputs(task_detail)
+        if cost_usd is None:
+            cost_usd = RUN_FEE_USD + sum(task["cost_usd"] or 0.0 for task in tasks)
+
+        selected_model, deploy_decision, metrics = summarize_task_outputs(outputs_by_task)
+        state = resource.state.name if hasattr(resource.state, "name") else str(resource.state)
+        return self.record_run(
+            run_id=run_id,
+            pipeline_name=resource.pipeline_spec.get("pipelineInfo", {}).get("name", ""),
+            display_name=resource.display_name,
+            state=state,
+            create_time=resource.create_time,
+            start_time=resource.start_time,
+            end_time=resource.end_time,
+            cost_usd=cost_usd,
+            selected_model=selected_model,
+            deploy_decision=deploy_decision,
+            tasks=tasks,
+            metrics=metrics,
+        )
+
+    # --- Trend queries ---
+    def metric_trend(self, metric_name: str, model_type: Optional[str] = None,
+                     pipeline_name: Optional[str] = None) -> List[Tuple[str, str, str, float]]:
+        """Returns (run_id, create_time, model_type, value) ordered by run time."""
+        query = (
+            "SELECT r.run_id, r.create_time, m.model_type, m.value FROM metrics m "
+            "JOIN runs r ON r.run_id = m.run_id WHERE m.metric_name = ?"
+        )
+        params = [metric_name]
+        if model_type:
+            query += " AND m.model_type = ?"
+            params.append(model_type)
+        if pipeline_name:
+            query += " AND r.pipeline_name = ?"
+            params.append(pipeline_name)
+        query += " ORDER BY r.create_time"
+        return self._conn.execute(query, params).fetchall()
+
+    def step_duration_percentiles(self, pct: float = 95.0,
+                                  task_name: Optional[str] = None) -> Dict[str, Optional[float]]:
+        """Returns {task_name: percentile duration in seconds} over all stored runs."""
+        query = "SELECT task_name, duration_s FROM tasks WHERE duration_s IS NOT NULL"
+        params = []
+        if task_name:
+            query += " AND task_name = ?"
+            params.append(task_name)
+        # Served by idx_tasks_name_duration: rows arrive grouped and sorted
+        query += " ORDER BY task_name, duration_s"
+        durations: Dict[str, List[float]] = {}
+        for name, duration in self._conn.execute(query, params):
+            durations.setdefault(name, []).append(duration)
+        return {name: percentile(values, pct) for name, values in durations.items()}
+
+    def cost_per_run(self, pipeline_name: Optional[str] = None) -> List[Tuple[str, str, Optional[float], Optional[float]]]:
+        """Returns (run_id, create_time, cost_usd, duration_s) ordered by run time."""
+        query = "SELECT run_id, create_time, cost_usd, duration_s FROM runs"
+        params = []
+        if pipeline_name:
+            query += " WHERE pipeline_name = ?"
+            params.append(pipeline_name)
+        query += " ORDER BY create_time"
+        return self._conn.execute(query, params).fetchall()
+
+    def latest_runs(self, limit: int = 10) -> List[Tuple]:
+        """Returns the most recent runs with their selection outcome."""
+        return self._conn.execute(
+            "SELECT run_id, create_time, state, selected_model, deploy_decision, duration_s, cost_usd "
+            "FROM runs ORDER BY create_time DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+
+def _execution_outputs(task_detail) -> Dict[str, object]:
+    """Extracts output parameters ("output:<name>" keys) from a task's execution metadata."""
+    execution = getattr(task_detail, "execution", None)
+    metadata = getattr(execution, "metadata", None) if execution else None
+    if not metadata:
+        return {}
+    return {
+        key[len("output:"):]: value
+        for key, value in dict(metadata).items()
+        if key.startswith("output:")
+    }
+
+
+def summarize_task_outputs(outputs_by_task: Dict[str, Dict[str, object]]):
+    """Finds the selection result and per-framework metrics among task outputs.
+
+    Returns:
+        Tuple of (selected_model, deploy_decision, {model_type: {metric_name: value}}).
+    """
+    selected_model, deploy_decision, metrics = None, None, {}
+    for outputs in outputs_by_task.values():
+        if all(key in outputs for key in SELECTION_OUTPUT_KEYS[:2]):
+            selected_model = outputs["best_model_name"]
+            deploy_decision = str(outputs["deploy_decision"])
+        framework = outputs.get("framework")
+        if framework:
+            values = {}
+            for name in STANDARD_METRIC_NAMES:
+                try:
+                    values[name] = float(outputs[name])
+                except (KeyError, TypeError, ValueError):
+                    continue
+            metrics[framework] = values
+    return selected_model, deploy_decision, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query or populate the local pipeline run store.")
+    parser.add_argument("--store", default=DEFAULT_RUN_STORE_PATH, help="Path to the SQLite run store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="Ingest a finished Vertex AI pipeline job.")
+    ingest.add_argument("--job-name", required=True, help="Full pipeline job resource name.")
+    ingest.add_argument("--cost-usd", type=float, default=None, help="Known total cost of the run.")
+
+    trend = sub.add_parser("trend", help="Metric values over time.")
+    trend.add_argument("--metric", default="mean_absolute_error")
+    trend.add_argument("--model-type", default=None, help="BQML or AutoML.")
+
+    durations = sub.add_parser("durations", help="Percentile step durations.")
+    durations.add_argument("--percentile", type=float, default=95.0)
+
+    sub.add_parser("costs", help="Cost and duration per run.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    with RunStore(args.store) as store:
+        if args.command == "ingest":
+            from google.cloud import aiplatform
+            store.ingest_pipeline_job(aiplatform.PipelineJob.get(args.job_name), cost_usd=args.cost_usd)
+        elif args.command == "trend":
+            for run_id, created, model_type, value in store.metric_trend(args.metric, args.model_type):
+                print(f"{created}  {run_id}  {model_type:<7} {args.metric}={value:.4f}")
+        elif args.command == "durations":
+            for name, value in sorted(store.step_duration_percentiles(args.percentile).items()):
+                print(f"{name:<50} p{args.percentile:g}={value:.1f}s")
+        elif args.command == "costs":
+            for run_id, created, cost, duration in store.cost_per_run():
+                print(json.dumps({"run_id": run_id, "create_time": created,
+                                  "cost_usd": cost, "duration_s": duration}))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,9 @@ import os
 from kfp.dsl import Artifact, Input, Metrics, Output, component
 from typing import NamedTuple
 
-@component(
-    base_image="python:3.10",
-)
+from src.pipeline_2025 import component_images
+
+@component(**component_images.component_kwargs("base"))
 def select_best_model(
     automl_metrics: Input[Metrics],
     automl_model: Input[Artifact],
@@ -0,0 +1,309 @@
+"""KFP component that smoke-tests and load-probes a freshly deployed endpoint.
+
+Replaces the legacy `src/pipeline/serving_validation_comp.validate_serving`,
+which sent one hard-coded instance with fields from another project's schema.
+`validate_serving_endpoint`:
+1. Draws a sample from the TEST split, stratified by plurality and gender so
+   rare strata (twins and higher) are always exercised.
+2. Optionally scores the same rows offline with BQML `ML.PREDICT`.
+3. Validates and repairs the rows with the serving instance rules
+   (`src/serving/instance_validation.py`), so the endpoint gets the same
+   instances the app would send; rejected rows are reported, not sent.
+4. Sends the rows to the endpoint in batches, timing each call.
+5. Reports latency percentiles, error rate, rejected rows and
+   offline/online parity, and raises (failing the pipeline) when a threshold
+   is breached.
+
+Run it locally against `src.serving.fake_endpoint.FakeEndpoint` with:
+    python -m src.pipeline_2025.serving_validation_comp --sample-size 200 --online-skew 0.0
+"""
+from typing import NamedTuple
+
+from kfp.dsl import Artifact, Input, Metrics, Output, component
+
+from src.pipeline_2025 import component_images
+
+
+@component(**component_images.component_kwargs("aiplatform"))
+def validate_serving_endpoint(
+    project_id: str,
+    location: str,
+    bq_location: str,
+    endpoint: Input[Artifact],
+    prepped_table_id: str,
+    validation_metrics: Output[Metrics],
+    offline_bqml_model_id: str = "",
+    sample_size: int = 200,
+    batch_size: int = 32,
+    parity_abs_tolerance: float = 0.05,
+    max_mismatch_rate: float = 0.0,
+    max_error_rate: float = 0.0,
+    max_p95_latency_ms: float = 2000.0,
+    instance_schema_json: str = "",
+    max_bytes_billed: int = 0,
+    local_sample_json: str = "",
+) -> NamedTuple('outputs', [
+    ('p50_latency_ms', float),
+    ('p95_latency_ms', float),
+    ('p99_latency_ms', float),
+    ('error_rate', float),
+    ('mismatch_rate', float),
+    ('max_abs_diff', float),
+    ('rejected_rate', float),
+]):
+    """Validates a deployed endpoint with a stratified TEST sample.
+
+    Args:
+        project_id: The GCP project ID.
+        location: Region of the endpoint.
+        bq_location: Location of the prepped table's dataset.
+        endpoint: Endpoint artifact from EndpointCreateOp (metadata resourceName).
+        prepped_table_id: Full ID of the prepped table with the data_split column.
+        validation_metrics: Output metrics artifact.
+        offline_bqml_model_id: BQML model (project.dataset.model) for offline
+            parity. Empty skips the parity check, e.g. for AutoML models.
+        sample_size: Approximate number of TEST rows sent to the endpoint.
+        batch_size: Instances per predict call.
+        parity_abs_tolerance: Allowed |online - offline| per row, in pounds.
+        max_mismatch_rate: Allowed fraction of rows outside the tolerance.
+        max_error_rate: Allowed fraction of instances in failed predict calls.
+        max_p95_latency_ms: Allowed p95 predict-call latency.
+        instance_schema_json: Instance schema JSON (output of
+            `instance_validation derive`). Empty uses DEFAULT_SCHEMA.
+        max_bytes_billed: Bytes-billed budget for the sample query; 0 disables the cap.
+        local_sample_json: For local runs only: JSON list of rows (feature
+            columns plus optional offline_prediction) used instead of BigQuery.
+
+    Returns:
+        NamedTuple with latency percentiles, error rate, mismatch rate, the
+        largest offline/online difference and the fraction of rejected rows.
+
+    Raises:
+        RuntimeError: If any threshold is breached.
+    """
+    import json
+    import logging
+    import time
+    from collections import namedtuple
+
+    import numpy as np
+
+    from src.pipeline_2025.query_guard import guarded_query
+    from src.serving.instance_validation import InstanceValidator
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Same columns as feature_registry.FEATURES
+    feature_columns = ["is_male", "mother_age", "gestation_weeks", "plurality_category",
+                       "cigarette_use_str", "alcohol_use_str"]
+    endpoint_resource_name = endpoint.metadata.get("resourceName") or endpoint.uri[endpoint.uri.find("projects/"):]
+    logging.info(f"Validating endpoint {endpoint_resource_name}")
+
+    # --- 1./2. Stratified TEST sample, with offline predictions when a BQML model is given ---
+    if local_sample_json:
+        rows = json.loads(local_sample_json)
+    else:
+        from google.cloud import bigquery
+
+        bq_client = bigquery.Client(project=project_id)
+        # Equal share per (plurality, gender) stratum, deterministic across runs
+        sample_query = f"""
+        SELECT {", ".join(feature_columns)}
+        FROM (
+            -- Feature columns only (not the whole row) and one clustered split
+            SELECT {", ".join(feature_columns)},
+                ROW_NUMBER() OVER (
+                    PARTITION BY plurality_category, is_male
+                    ORDER BY FARM_FINGERPRINT(TO_JSON_STRING(STRUCT({", ".join(feature_columns)})))
+                ) AS stratum_rank,
+                COUNT(DISTINCT CONCAT(plurality_category, is_male)) OVER () AS strata
+            FROM `{prepped_table_id}`
+            WHERE data_split = 'TEST'
+        )
+        WHERE stratum_rank <= CAST(CEIL({sample_size} / strata) AS INT64)
+        """
+        if offline_bqml_model_id:
+            query = f"""
+            SELECT {", ".join(feature_columns)}, predicted_weight_pounds AS offline_prediction
+            FROM ML.PREDICT(MODEL `{offline_bqml_model_id}`, ({sample_query}))
+            """
+        else:
+            query = sample_query
+        query_job, estimated_bytes = guarded_query(bq_client, "validate_serving_endpoint", query,
+                                                   max_bytes_billed, bq_location)
+        rows = [dict(row) for row in query_job.result()]
+        validation_metrics.log_metric("estimated_bytes", estimated_bytes)
+        validation_metrics.log_metric("bytes_processed", query_job.total_bytes_processed or 0)
+        validation_metrics.log_metric("bytes_billed", query_job.total_bytes_billed or 0)
+    if not rows:
+        raise RuntimeError(f"No TEST rows sampled from {prepped_table_id}")
+    logging.info(f"Sampled {len(rows)} TEST rows")
+
+    # --- 3. Instance validation and repair ---
+    validator = InstanceValidator(json.loads(instance_schema_json) if instance_schema_json else None)
+    validation = validator.validate([{column: row[column] for column in feature_columns if column in row}
+                                     for row in rows])
+    instances = validation.valid_instances
+    offline_values = [row.get("offline_prediction", np.nan) for row, ok in zip(rows, validation.valid) if ok]
+    repaired_values = validation.repaired
+    rejections = validator.rejections
+    rejected_examples = [{"row": {column: row.get(column) for column in feature_columns}, "reasons": reasons}
+                         for row, reasons in zip(rows, validation.reasons) if reasons][:5]
+    rejected_rows = len(rows) - len(instances)
+    rejected_rate = rejected_rows / len(rows)
+    if rejected_rows:
+        logging.warning(f"Rejected {rejected_rows} of {len(rows)} sampled rows: {dict(rejections.most_common())}; "
+                        f"examples: {rejected_examples}")
+    if not instances:
+        raise RuntimeError(f"All {len(rows)} sampled rows were rejected by the instance schema: "
+                           f"{dict(rejections.most_common())}")
+    logging.info(f"Validated {len(rows)} rows: {rejected_rows} rejected, {repaired_values} values repaired")
+    offline = np.array(offline_values, dtype=np.float64)
+
+    # --- 4. Batched online predictions ---
+    if endpoint_resource_name.startswith("fake"):
+        # Local runs only; the repository is not available inside the pipeline pod
+        from src.serving.fake_endpoint import FakeEndpoint
+        endpoint_client = FakeEndpoint(**json.loads(endpoint.metadata.get("fake_endpoint_kwargs", "{}")))
+    else:
+        from google.cloud import aiplatform
+        aiplatform.init(project=project_id, location=location)
+        endpoint_client = aiplatform.Endpoint(endpoint_resource_name)
+
+    # Prediction schema is detected once, then applied to every batch
+    # (same rules as src/serving/response_decoder.py)
+    def detect_extractor(prediction):
+        if isinstance(prediction, (int, float)):
+            return lambda p: p
+        if hasattr(prediction, "keys"):
+            for key in ["value", "predicted_weight_pounds", "prediction"]:
+                if key in prediction:
+                    return lambda p, key=key: p[key]
+        if isinstance(prediction, (list, tuple)) and prediction:
+            return lambda p: p[0]
+        raise ValueError(f"Unrecognized prediction schema: {prediction}")
+
+    online = np.full(len(instances), np.nan)
+    latencies_ms = []
+    failed_instances = 0
+    extractor = None
+    for start in range(0, len(instances), batch_size):
+        batch = instances[start:start + batch_size]
+        call_start = time.perf_counter()
+        try:
+            response = endpoint_client.predict(instances=batch)
+            latencies_ms.append((time.perf_counter() - call_start) * 1000)
+            extractor = extractor or detect_extractor(response.predictions[0])
+            online[start:start + len(batch)] = [float(extractor(p)) for p in response.predictions]
+        except Exception as e:
+            logging.error(f"Predict call for rows {start}-{start + len(batch) - 1} failed: {e}")
+            failed_instances += len(batch)
+
+    # --- 5. Metrics and gates ---
+    def pct(values, q):
+        return float(np.percentile(values, q)) if len(values) else float("nan")
+
+    p50, p95, p99 = pct(latencies_ms, 50), pct(latencies_ms, 95), pct(latencies_ms, 99)
+    error_rate = failed_instances / len(instances)
+    compared = ~np.isnan(offline) & ~np.isnan(online)
+    diffs = np.abs(online[compared] - offline[compared])
+    mismatch_rate = float(np.mean(diffs > parity_abs_tolerance)) if diffs.size else 0.0
+    max_abs_diff = float(diffs.max()) if diffs.size else 0.0
+
+    metrics = {
+        "instances": len(instances),
+        "rejected_rows": rejected_rows,
+        "rejected_rate": rejected_rate,
+        "repaired_values": repaired_values,
+        "p50_latency_ms": p50,
+        "p95_latency_ms": p95,
+        "p99_latency_ms": p99,
+        "error_rate": error_rate,
+        "parity_rows": int(compared.sum()),
+        "mismatch_rate": mismatch_rate,
+        "max_abs_diff": max_abs_diff,
+    }
+    for name, value in metrics.items():
+        validation_metrics.log_metric(name, value)
+    logging.info(f"Serving validation metrics: {json.dumps(metrics)}")
+
+    failures = []
+    if error_rate > max_error_rate:
+        failures.append(f"error rate {error_rate:.3f} > {max_error_rate}")
+    if latencies_ms and p95 > max_p95_latency_ms:
+        failures.append(f"p95 latency {p95:.1f}ms > {max_p95_latency_ms}ms")
+    if not np.isnan(offline).all() and mismatch_rate > max_mismatch_rate:
+        worst = np.argsort(-np.nan_to_num(np.abs(online - offline)))[:5]
+        examples = [{"instance": instances[i], "offline": float(offline[i]), "online": float(online[i])}
+                    for i in worst]
+        failures.append(f"parity mismatch rate {mismatch_rate:.3f} > {max_mismatch_rate} "
+                        f"(tolerance {parity_abs_tolerance}); worst rows: {examples}")
+    if failures:
+        raise RuntimeError("Serving validation failed: " + "; ".join(failures))
+    logging.info("Serving validation passed")
+
+    Outputs = namedtuple('outputs', ['p50_latency_ms', 'p95_latency_ms', 'p99_latency_ms',
+                                     'error_rate', 'mismatch_rate', 'max_abs_diff', 'rejected_rate'])
+    return Outputs(p50, p95, p99, error_rate, mismatch_rate, max_abs_diff, rejected_rate)
+
+
+def _local_sample(sample_size: int, seed: int = 0) -> list:
+    """Synthetic TEST-like rows with offline predictions from the fake model."""
+    import random
+
+    from src.serving.fake_endpoint import score_instance
+
+    rng = random.Random(seed)
+    strata = [(plurality, is_male) for plurality in ["Single(1)", "Twins(2)", "Triplets(3)"]
+              for is_male in ["true", "false"]]
+    rows = []
+    for i in range(sample_size):
+        plurality, is_male = strata[i % len(strata)]
+        row = {
+            "is_male": is_male,
+            "mother_age": rng.randint(15, 45),
+            "gestation_weeks": rng.randint(28, 42),
+            "plurality_category": plurality,
+            "cigarette_use_str": rng.choice(["true", "false", "Unknown"]),
+            "alcohol_use_str": rng.choice(["true", "false", "Unknown"]),
+        }
+        row["offline_prediction"] = score_instance({key: str(value) for key, value in row.items()})[0]
+        rows.append(row)
+    return rows
+
+
+def main():
+    """Runs the component body locally against FakeEndpoint."""
+    import argparse
+    import json
+    import logging
+    import tempfile
+    from types import SimpleNamespace
+
+    parser = argparse.ArgumentParser(description="Run serving validation locally against a fake endpoint.")
+    parser.add_argument("--sample-size", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--online-skew", type=float, default=0.0,
+                        help="Shift added to offline predictions to simulate a parity mismatch.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    rows = _local_sample(args.sample_size)
+    for row in rows:
+        row["offline_prediction"] += args.online_skew
+    fake_kwargs = {"latency_s": args.latency_ms / 1000, "failure_rate": args.failure_rate}
+    endpoint = SimpleNamespace(uri="fake://local", metadata={
+        "resourceName": "fake://local", "fake_endpoint_kwargs": json.dumps(fake_kwargs)})
+    metrics = Metrics(name="validation_metrics", uri=tempfile.mkdtemp())
+    result = validate_serving_endpoint.python_func(
+        project_id="local", location="local", bq_location="local", endpoint=endpoint,
+        prepped_table_id="local.sample", validation_metrics=metrics,
+        batch_size=args.batch_size, local_sample_json=json.dumps(rows),
+    )
+    print(json.dumps(result._asdict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""KFP component that measures offline/online prediction skew before promotion.
+
+`validate_serving_endpoint` checks per-row parity on a small smoke sample.
+`detect_prediction_skew` looks at the distributions over a larger TEST
+sample. BQML `ML.PREDICT` scores the rows offline and the deployed endpoint
+scores them online, in batches. Per-batch streaming statistics (Welford
+mean/variance of the online - offline difference) are kept overall and per
+feature group: each category value, and fixed buckets for mother_age and
+gestation_weeks. The two prediction distributions are also compared with a
+two-sample Kolmogorov-Smirnov statistic.
+
+Rows whose predict call failed count against the gate too: a model that
+cannot score part of the sample is not promoted.
+
+The full breakdown is written as a JSON skew report artifact.
+`promotion_decision` is "false" when a threshold is breached, and the
+pipeline then undeploys the new model and restores the previous traffic
+split (`endpoint_management_comp.rollback_deployment`).
+
+Run it locally against `src.serving.fake_endpoint.FakeEndpoint` with:
+    python -m src.pipeline_2025.skew_detection_comp --sample-size 2000 --skew-feature plurality_category=Twins(2):0.4
+    python -m src.pipeline_2025.skew_detection_comp --failure-rate 0.1
+"""
+from typing import NamedTuple
+
+from kfp.dsl import Artifact, Input, Metrics, Output, component
+
+from src.pipeline_2025 import component_images
+
+
+@component(**component_images.component_kwargs("aiplatform"))
+def detect_prediction_skew(
+    project_id: str,
+    location: str,
+    bq_location: str,
+    endpoint: Input[Artifact],
+    prepped_table_id: str,
+    offline_bqml_model_id: str,
+    skew_report: Output[Artifact],
+    skew_metrics: Output[Metrics],
+    sample_size: int = 2000,
+    batch_size: int = 64,
+    max_mean_shift: float = 0.05,
+    max_ks_statistic: float = 0.05,
+    max_group_mean_shift: float = 0.1,
+    max_failed_rate: float = 0.0,
+    min_group_count: int = 20,
+    max_bytes_billed: int = 0,
+    local_sample_json: str = "",
+) -> NamedTuple('outputs', [
+    ('promotion_decision', str),
+    ('mean_shift', float),
+    ('ks_statistic', float),
+    ('skewed_groups', int),
+]):
+    """Compares offline and online predictions for sampled TEST rows.
+
+    Args:
+        project_id: The GCP project ID.
+        location: Region of the endpoint.
+        bq_location: Location of the prepped table's dataset.
+        endpoint: Endpoint artifact from EndpointCreateOp (metadata resourceName).
+        prepped_table_id: Full ID of the prepped table with the data_split column.
+        offline_bqml_model_id: BQML model (project.dataset.model) scored with ML.PREDICT.
+        skew_report: Output JSON report with overall and per-feature statistics.
+        skew_metrics: Output metrics artifact.
+        sample_size: Number of TEST rows compared.
+        batch_size: Instances per predict call.
+        max_mean_shift: Allowed |mean(online - offline)| over all rows, in pounds.
+        max_ks_statistic: Allowed KS distance between the two prediction distributions.
+        max_group_mean_shift: Allowed |mean(online - offline)| within a feature group.
+        max_failed_rate: Allowed fraction of rows in failed predict calls.
+        min_group_count: Groups with fewer rows are reported but not gated.
+        max_bytes_billed: Bytes-billed budget for the ML.PREDICT query; 0 disables the cap.
+        local_sample_json: For local runs only: JSON list of rows (feature
+            columns plus offline_prediction) used instead of BigQuery.
+
+    Returns:
+        NamedTuple with promotion_decision ("true"/"false"), the overall mean
+        shift, the KS statistic and the number of skewed groups.
+    """
+    import json
+    import logging
+    from collections import namedtuple
+
+    import numpy as np
+
+    from src.pipeline_2025.query_guard import guarded_query
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    # Same columns as feature_registry.FEATURES
+    feature_columns = ["is_male", "mother_age", "gestation_weeks", "plurality_category",
+                       "cigarette_use_str", "alcohol_use_str"]
+    numeric_buckets = {
+        "mother_age": [20, 25, 30, 35, 40],
+        "gestation_weeks": [32, 37, 42],
+    }
+
+    class RunningStats:
+        """Welford running mean/variance, merged batch by batch."""
+
+        def __init__(self):
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+
+        def update(self, values):
+            if len(values) == 0:
+                return
+            count, mean = len(values), float(np.mean(values))
+            m2 = float(np.sum((values - mean) ** 2))
+            delta = mean - self.mean
+            total = self.count + count
+            self.mean += delta * count / total
+            self.m2 += m2 + delta ** 2 * self.count * count / total
+            self.count = total
+
+        def to_dict(self):
+            std = (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
+            return {"count": self.count, "mean_diff": self.mean, "std_diff": std}
+
+    # --- Sample TEST rows with offline predictions ---
+    if local_sample_json:
+        rows = json.loads(local_sample_json)
+    else:
+        from google.cloud import bigquery
+
+        bq_client = bigquery.Client(project=project_id)
+        query = f"""
+        SELECT {", ".join(feature_columns)}, predicted_weight_pounds AS offline_prediction
+        FROM ML.PREDICT(MODEL `{offline_bqml_model_id}`, (
+            SELECT {", ".join(feature_columns)}
+            FROM `{prepped_table_id}`
+            WHERE data_split = 'TEST'
+            ORDER BY FARM_FINGERPRINT(TO_JSON_STRING(STRUCT({", ".join(feature_columns)})))
+            LIMIT {sample_size}
+        ))
+        """
+        query_job, estimated_bytes = guarded_query(bq_client, "detect_prediction_skew", query,
+                                                   max_bytes_billed, bq_location)
+        rows = [dict(row) for row in query_job.result()]
+        skew_metrics.log_metric("estimated_bytes", estimated_bytes)
+        skew_metrics.log_metric("bytes_processed", query_job.total_bytes_processed or 0)
+        skew_metrics.log_metric("bytes_billed", query_job.total_bytes_billed or 0)
+    if not rows:
+        raise RuntimeError(f"No TEST rows sampled from {prepped_table_id}")
+    logging.info(f"Comparing {len(rows)} TEST rows")
+
+    def group_of(feature, value):
+        if feature in numeric_buckets:
+            edges = numeric_buckets[feature]
+            index = int(np.searchsorted(edges, float(value), side="right"))
+            low = edges[index - 1] if index > 0 else None
+            high = edges[index] if index < len(edges) else None
+            return f"<{high}" if low is None else (f">={low}" if high is None else f"[{low},{high})")
+        return str(value)
+
+    # --- Online predictions in batches, with streaming statistics ---
+    endpoint_resource_name = endpoint.metadata.get("resourceName") or endpoint.uri[endpoint.uri.find("projects/"):]
+    if endpoint_resource_name.startswith("fake"):
+        # Local runs only; the repository is not available inside the pipeline pod
+        from src.serving.fake_endpoint import FakeEndpoint
+        endpoint_client = FakeEndpoint(**json.loads(endpoint.metadata.get("fake_endpoint_kwargs", "{}")))
+    else:
+        from google.cloud import aiplatform
+        aiplatform.init(project=project_id, location=location)
+        endpoint_client = aiplatform.Endpoint(endpoint_resource_name)
+
+    def extract(prediction):
+        if hasattr(prediction, "keys"):
+            return prediction["value"] if "value" in prediction else prediction["predicted_weight_pounds"]
+        if isinstance(prediction, (list, tuple)):
+            return prediction[0]
+        return prediction
+
+    overall = RunningStats()
+    groups = {feature: {} for feature in feature_columns}
+    offline_all, online_all = [], []
+    failed_rows = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        instances = [{column: str(row[column]) for column in feature_columns} for row in batch]
+        try:
+            response = endpoint_client.predict(instances=instances)
+            online = np.array([float(extract(p)) for p in response.predictions])
+        except Exception as e:
+            logging.error(f"Predict call for rows {start}-{start + len(batch) - 1} failed: {e}")
+            failed_rows += len(batch)
+            continue
+        offline = np.array([float(row["offline_prediction"]) for row in batch])
+        diffs = online - offline
+        overall.update(diffs)
+        offline_all.append(offline)
+        online_all.append(online)
+        for feature in feature_columns:
+            labels = np.array([group_of(feature, row[feature]) for row in batch])
+            for label in np.unique(labels):
+                groups[feature].setdefault(label, RunningStats()).update(diffs[labels == label])
+
+    if overall.count == 0:
+        raise RuntimeError("No online predictions succeeded; cannot measure skew")
+    failed_rate = failed_rows / len(rows)
+
+    # --- Distribution comparison ---
+    offline_all, online_all = np.concatenate(offline_all), np.concatenate(online_all)
+    grid = np.sort(np.concatenate([offline_all, online_all]))
+    cdf_offline = np.searchsorted(np.sort(offline_all), grid, side="right") / offline_all.size
+    cdf_online = np.searchsorted(np.sort(online_all), grid, side="right") / online_all.size
+    ks_statistic = float(np.max(np.abs(cdf_offline - cdf_online)))
+    quantiles = [5, 25, 50, 75, 95]
+
+    overall_stats = overall.to_dict()
+    mean_shift = overall_stats["mean_diff"]
+    breakdown = {}
+    skewed = []
+    for feature, feature_groups in groups.items():
+        breakdown[feature] = {}
+        for label, stats in sorted(feature_groups.items()):
+            entry = stats.to_dict()
+            entry["skewed"] = stats.count >= min_group_count and abs(stats.mean) > max_group_mean_shift
+            breakdown[feature][label] = entry
+            if entry["skewed"]:
+                skewed.append(f"{feature}={label} (mean diff {stats.mean:+.3f}, n={stats.count})")
+
+    reasons = []
+    if failed_rate > max_failed_rate:
+        reasons.append(f"{failed_rows} of {len(rows)} rows failed to score "
+                       f"(rate {failed_rate:.3f} exceeds {max_failed_rate})")
+    if abs(mean_shift) > max_mean_shift:
+        reasons.append(f"mean shift {mean_shift:+.3f} exceeds {max_mean_shift}")
+    if ks_statistic > max_ks_statistic:
+        reasons.append(f"KS statistic {ks_statistic:.3f} exceeds {max_ks_statistic}")
+    if skewed:
+        reasons.append(f"{len(skewed)} skewed groups: {', '.join(skewed)}")
+    promotion_decision = "false" if reasons else "true"
+
+    report = {
+        "endpoint": endpoint_resource_name,
+        "offline_model": offline_bqml_model_id,
+        "rows": len(rows),
+        "failed_rows": failed_rows,
+        "failed_rate": failed_rate,
+        "overall": overall_stats,
+        "ks_statistic": ks_statistic,
+        "offline_quantiles": dict(zip(quantiles, np.percentile(offline_all, quantiles).tolist())),
+        "online_quantiles": dict(zip(quantiles, np.percentile(online_all, quantiles).tolist())),
+        "by_feature": breakdown,
+        "thresholds": {"max_mean_shift": max_mean_shift, "max_ks_statistic": max_ks_statistic,
+                       "max_group_mean_shift": max_group_mean_shift, "max_failed_rate": max_failed_rate,
+                       "min_group_count": min_group_count},
+        "promotion_decision": promotion_decision,
+        "reasons": reasons,
+    }
+    with open(skew_report.path, "w") as f:
+        json.dump(report, f, indent=2)
+    skew_report.metadata.update({"promotion_decision": promotion_decision, "ks_statistic": ks_statistic})
+
+    skew_metrics.log_metric("mean_shift", mean_shift)
+    skew_metrics.log_metric("std_diff", overall_stats["std_diff"])
+    skew_metrics.log_metric("ks_statistic", ks_statistic)
+    skew_metrics.log_metric("skewed_groups", len(skewed))
+    skew_metrics.log_metric("failed_rows", failed_rows)
+    skew_metrics.log_metric("failed_rate", failed_rate)
+
+    if reasons:
+        logging.warning(f"Prediction skew blocks promotion: {'; '.join(reasons)}")
+    else:
+        logging.info(f"No prediction skew detected (mean shift {mean_shift:+.4f}, KS {ks_statistic:.4f})")
+
+    Outputs = namedtuple('outputs', ['promotion_decision', 'mean_shift', 'ks_statistic', 'skewed_groups'])
+    return Outputs(promotion_decision, mean_shift, ks_statistic, len(skewed))
+
+
+def main():
+    """Runs the component body locally against FakeEndpoint."""
+    import argparse
+    import json
+    import logging
+    import os
+    import tempfile
+    from types import SimpleNamespace
+
+    from src.pipeline_2025.serving_validation_comp import _local_sample
+
+    parser = argparse.ArgumentParser(description="Run skew detection locally against a fake endpoint.")
+    parser.add_argument("--sample-size", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--skew-feature", action="append", default=[],
+                        help="Shift offline predictions for one group, e.g. plurality_category=Twins(2):0.4")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    rows = _local_sample(args.sample_size)
+    for spec in args.skew_feature:
+        feature_value, shift = spec.rsplit(":", 1)
+        feature, value = feature_value.split("=", 1)
+        for row in rows:
+            if str(row[feature]) == value:
+                row["offline_prediction"] += float(shift)
+
+    output_dir = tempfile.mkdtemp()
+    endpoint = SimpleNamespace(uri="fake://local", metadata={
+        "resourceName": "fake://local", "fake_endpoint_kwargs": json.dumps({"failure_rate": args.failure_rate})})
+    report = Artifact(name="skew_report", uri=os.path.join(output_dir, "skew_report.json"))
+    metrics = Metrics(name="skew_metrics", uri=os.path.join(output_dir, "skew_metrics"))
+    result = detect_prediction_skew.python_func(
+        project_id="local", location="local", bq_location="local", endpoint=endpoint,
+        prepped_table_id="local.sample", offline_bqml_model_id="local.fake_model",
+        skew_report=report, skew_metrics=metrics, sample_size=args.sample_size,
+        batch_size=args.batch_size, local_sample_json=json.dumps(rows),
+    )
+    print(json.dumps(result._asdict(), indent=2))
+    print(f"Skew report: {report.path}")
+
+
+if __name__ == "__main__":
+    main()
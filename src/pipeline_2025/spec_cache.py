@@ -0,0 +1,107 @@
+"""Cache of compiled pipeline specs keyed by a hash of their inputs.
+
+Compiling the pipeline imports the whole `google_cloud_pipeline_components`
+suite and takes seconds, yet the compiled JSON only changes when the component
+sources, the runner itself, the resolved configuration, the files that
+configuration points at or the KFP/GCPC versions change. `spec_cache_key`
+hashes exactly those inputs; `SpecCache` maps the key to a JSON file in
+`compiled_pipeline_specs/` and garbage-collects old specs.
+
+Per-run values such as the run timestamp must not be part of the key. They are
+passed to the job as pipeline parameters at submission time instead.
+"""
+import hashlib
+import json
+import logging
+import os
+from importlib import metadata
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+# Config keys that do not shape the compiled spec: the per-run timestamp is
+# supplied at submit time, the others only affect the local runner
+NON_SPEC_CONFIG_KEYS = ("TIMESTAMP", "RUN_STORE_PATH", "SPEC_CACHE_MAX_ENTRIES")
+# Config keys naming a file whose contents are read at compile time and baked into the spec
+CONTENT_CONFIG_KEYS = ("DATA_QUALITY_EXPECTATIONS_PATH",)
+# Installed packages whose version affects the compiled output
+SPEC_AFFECTING_PACKAGES = ("kfp", "google-cloud-pipeline-components")
+
+
+def _package_version(name: str) -> str:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "not-installed"
+
+
+def default_source_paths(repo_root: Path) -> List[Path]:
+    """Returns the files that define the pipeline graph and its components."""
+    component_dir = repo_root / "src" / "pipeline_2025"
+    paths = [repo_root / "run_modernized_pipeline.py"] + sorted(component_dir.glob("*.py"))
+    # The pinned component images are baked into the spec (see component_images.py)
+    image_lock = Path(os.getenv("COMPONENT_IMAGES_LOCK", str(repo_root / "component_images.lock.json")))
+    return paths + ([image_lock] if image_lock.exists() else [])
+
+
+def spec_cache_key(config: dict, source_paths: Iterable[Path]) -> str:
+    """Hashes component sources, the resolved config, the files it names and toolchain versions.
+
+    Args:
+        config: Resolved configuration from `load_config()`.
+        source_paths: Files whose content determines the compiled spec.
+
+    Returns:
+        Hex digest identifying the compiled spec.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(Path(p) for p in source_paths):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    stable_config = {k: v for k, v in config.items() if k not in NON_SPEC_CONFIG_KEYS}
+    digest.update(json.dumps(stable_config, sort_keys=True, default=str).encode())
+    for key in CONTENT_CONFIG_KEYS:
+        # Editing the file in place must produce a new key, not only pointing at another path
+        if config.get(key):
+            digest.update(key.encode())
+            digest.update(Path(config[key]).read_bytes())
+    for package in SPEC_AFFECTING_PACKAGES:
+        digest.update(f"{package}=={_package_version(package)}".encode())
+    return digest.hexdigest()
+
+
+class SpecCache:
+    """Compiled spec files named `<prefix>_<key>.json` inside one directory."""
+
+    def __init__(self, directory: str, prefix: str, max_entries: int = 5):
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / f"{self.prefix}_{key[:16]}.json"
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """Returns the cached spec for `key`, refreshing its mtime, or None."""
+        path = self.path_for(key)
+        if not path.exists():
+            return None
+        os.utime(path)  # Keeps recently used specs out of garbage collection
+        return path
+
+    def gc(self, keep: Optional[Path] = None) -> List[Path]:
+        """Removes all but the `max_entries` most recently used specs for this prefix."""
+        specs = sorted(
+            self.directory.glob(f"{self.prefix}_*.json"),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
+        removed = []
+        for path in specs[self.max_entries:]:
+            if keep is not None and path == keep:
+                continue
+            path.unlink()
+            removed.append(path)
+        if removed:
+            logging.info(f"Garbage-collected {len(removed)} old compiled spec(s) from {self.directory}")
+        return removed
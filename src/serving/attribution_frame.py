@@ -0,0 +1,84 @@
+"""Columnar conversion of explanation batches for rendering and bulk jobs.
+
+`AttributionBatch.from_explanations` makes a single pass over a list of
+`Explanation`s and fills preallocated NumPy arrays: predictions and baselines
+of shape (instances,) and attributions of shape (instances, features).
+Everything downstream (the wide per-instance frame, the per-instance waterfall
+rows used by `ex_app.py`) is derived from those arrays with vectorized
+operations instead of rebuilding Python lists row by row.
+"""
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from src.serving.explanation_service import Explanation
+
+BASELINE_LABEL = "Baseline_Score"
+FINAL_LABEL = "Final_Prediction"
+
+
+class AttributionBatch(NamedTuple):
+    features: List[str]
+    predictions: np.ndarray   # (instances,)
+    baselines: np.ndarray     # (instances,)
+    attributions: np.ndarray  # (instances, features); NaN where a feature is missing
+
+    @classmethod
+    def from_explanations(cls, explanations: Sequence[Explanation],
+                          feature_columns: Sequence[str]) -> "AttributionBatch":
+        features = list(feature_columns)
+        count = len(explanations)
+        predictions = np.empty(count, dtype=np.float64)
+        baselines = np.empty(count, dtype=np.float64)
+        attributions = np.full((count, len(features)), np.nan, dtype=np.float64)
+        for row, explanation in enumerate(explanations):
+            predictions[row] = explanation.prediction
+            baselines[row] = explanation.baseline
+            values = explanation.attributions
+            attributions[row] = [values.get(feature, np.nan) for feature in features]
+        return cls(features, predictions, baselines, attributions)
+
+    def __len__(self) -> int:
+        return len(self.predictions)
+
+    @property
+    def totals(self) -> np.ndarray:
+        """Baseline plus the sum of attributions, per instance."""
+        return self.baselines + np.nansum(self.attributions, axis=1)
+
+    def to_frame(self, instances: Optional[Sequence[Dict[str, object]]] = None):
+        """Wide DataFrame with one row per instance.
+
+        Columns are the baseline, one attribution column per feature, the
+        attribution total and the endpoint's prediction. When `instances` is
+        given, their feature values are added as `value:<feature>` columns.
+        """
+        import pandas as pd
+
+        columns = {BASELINE_LABEL: self.baselines}
+        columns.update({feature: self.attributions[:, i] for i, feature in enumerate(self.features)})
+        columns[FINAL_LABEL] = self.totals
+        columns["prediction"] = self.predictions
+        if instances is not None:
+            for feature in self.features:
+                columns[f"value:{feature}"] = [instance.get(feature) for instance in instances]
+        return pd.DataFrame(columns)
+
+    def waterfall_frame(self, index: int = 0, instance: Optional[Dict[str, object]] = None):
+        """Long Feature/Value/Contribution frame for one instance.
+
+        Rows are the baseline, the features sorted by descending contribution,
+        then the final prediction (baseline plus attributions), matching the
+        layout the attribution app plots.
+        """
+        import pandas as pd
+
+        contributions = self.attributions[index]
+        order = np.argsort(-contributions, kind="stable")
+        features = np.asarray(self.features, dtype=object)[order]
+        values = ["--"] * len(order) if instance is None else [instance.get(feature) for feature in features]
+        return pd.DataFrame({
+            "Feature": [BASELINE_LABEL, *features, FINAL_LABEL],
+            "Value": ["--", *values, "--"],
+            "Contribution": np.concatenate(([self.baselines[index]], contributions[order], [self.totals[index]])),
+        })
@@ -0,0 +1,246 @@
+"""Precomputed predictions and feature attributions for the discrete input grid.
+
+The attribution app (`ex_app.py`) only accepts a small, discrete input space:
+gender (2), smoking (3), alcohol (3), plurality (4), mother age (10-100) and
+gestation weeks (10-50), about 270k combinations. This module precomputes the
+explain() result for the whole grid, or a configured subset, and stores it as
+a dense float32 `.npy` array indexed by the input tuple, plus a JSON sidecar
+describing the axes. The app memory-maps the array, so an interactive request
+is an O(1) local lookup instead of a network call.
+
+Cells that were not computed hold NaN. Building is resumable: cells that are
+already filled are skipped when the job is re-run against the same file.
+The sidecar also records the endpoint and deployed model IDs the table was
+built from. Resuming against a different deployment starts from an empty
+grid, and the app ignores a table built for another deployment.
+
+Usage:
+    python -m src.serving.attribution_table build --output attributions.npy \\
+        --endpoint projects/.../endpoints/... --batch-size 64 --max-concurrency 4
+    python -m src.serving.attribution_table build --output attributions.npy --fake \\
+        --axis mother_age=18:45 --axis gestation_weeks=30:42
+"""
+import argparse
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import product
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.serving.explanation_service import Explanation, parse_explain_response
+
+# Feature axes in storage order, with the values ex_app.py can send
+DEFAULT_AXES: Dict[str, List[str]] = {
+    "is_male": ["true", "false"],
+    "cigarette_use": ["Unknown", "true", "false"],
+    "alcohol_use": ["Unknown", "true", "false"],
+    "plurality": ["single(1)", "Twins(2)", "Triplets(3)", "Quadruplets(4)"],
+    "mother_age": [str(age) for age in range(10, 101)],
+    "gestation_weeks": [str(weeks) for weeks in range(10, 51)],
+}
+# Per-cell values: prediction, baseline, then one attribution per axis feature
+VALUE_FIELDS = ["prediction", "baseline"] + [f"attribution:{name}" for name in DEFAULT_AXES]
+
+
+def _sidecar_path(path: Path) -> Path:
+    return path.with_suffix(".json")
+
+
+def endpoint_model_identity(endpoint) -> Dict[str, object]:
+    """Endpoint resource name and sorted IDs of the models deployed to it.
+
+    Works for `aiplatform.Endpoint` (via `list_models()`) and for FakeEndpoint,
+    which reports a single `deployed_model_id`.
+    """
+    if hasattr(endpoint, "list_models"):
+        deployed_model_ids = [deployed_model.id for deployed_model in endpoint.list_models()]
+    else:
+        deployed_model_ids = [endpoint.deployed_model_id]
+    return {"endpoint": endpoint.resource_name, "deployed_model_ids": sorted(deployed_model_ids)}
+
+
+class AttributionTable:
+    """Read-only, memory-mapped lookup table of explanations.
+
+    Args:
+        path: Path of the `.npy` table.
+        expected_identity: Output of `endpoint_model_identity` for the endpoint
+            the app serves. Raises ValueError if the table was built for another
+            endpoint or deployment.
+    """
+
+    def __init__(self, path: str, expected_identity: Optional[Dict[str, object]] = None):
+        self.path = Path(path)
+        meta = json.loads(_sidecar_path(self.path).read_text())
+        self.axes: Dict[str, List[str]] = meta["axes"]
+        self.fields: List[str] = meta["fields"]
+        self.model_identity: Optional[Dict[str, object]] = meta.get("model_identity")
+        if expected_identity is not None and self.model_identity != expected_identity:
+            raise ValueError(f"Attribution table {self.path} was built for {self.model_identity}, "
+                             f"not the current deployment {expected_identity}")
+        self._index = {name: {value: i for i, value in enumerate(values)} for name, values in self.axes.items()}
+        self._values = np.load(self.path, mmap_mode="r")
+
+    def cell_index(self, instance: Dict[str, object]) -> Optional[tuple]:
+        """Maps an instance to its grid coordinates, or None if it is off-grid."""
+        try:
+            return tuple(self._index[name][str(instance[name])] for name in self.axes)
+        except KeyError:
+            return None
+
+    def lookup(self, instance: Dict[str, object]) -> Optional[Explanation]:
+        """Returns the precomputed Explanation, or None if it is off-grid or missing."""
+        index = self.cell_index(instance)
+        if index is None:
+            return None
+        cell = self._values[index]
+        if np.isnan(cell[0]):
+            return None
+        return Explanation(
+            prediction=float(cell[0]),
+            baseline=float(cell[1]),
+            attributions={name: float(value) for name, value in zip(self.axes, cell[2:])},
+        )
+
+    def coverage(self) -> float:
+        """Fraction of grid cells that hold a computed explanation."""
+        return float(np.count_nonzero(~np.isnan(self._values[..., 0]))) / float(np.prod(self._values.shape[:-1]))
+
+
+def parse_axis_overrides(overrides: Sequence[str]) -> Dict[str, List[str]]:
+    """Parses `name=lo:hi` (inclusive integer range) or `name=a,b,c` subset specs."""
+    axes = {name: list(values) for name, values in DEFAULT_AXES.items()}
+    for override in overrides:
+        name, spec = override.split("=", 1)
+        if name not in axes:
+            raise ValueError(f"Unknown axis {name}; expected one of {list(axes)}")
+        if ":" in spec:
+            low, high = (int(part) for part in spec.split(":"))
+            wanted = {str(value) for value in range(low, high + 1)}
+        else:
+            wanted = set(spec.split(","))
+        axes[name] = [value for value in DEFAULT_AXES[name] if value in wanted]
+    return axes
+
+
+def build_attribution_table(endpoint, output_path: str, axes: Optional[Dict[str, List[str]]] = None,
+                            batch_size: int = 64, max_concurrency: int = 4,
+                            request_timeout_s: Optional[float] = 60.0) -> dict:
+    """Computes explanations for every grid cell in `axes` and stores them.
+
+    The stored array always spans the full DEFAULT_AXES grid so lookups do not
+    depend on which subset was computed; cells outside `axes` stay NaN.
+
+    Args:
+        endpoint: Object exposing `explain(instances=..., timeout=...)`.
+        output_path: Path of the `.npy` file (created or resumed).
+        axes: Subset of DEFAULT_AXES values to compute. Defaults to the full grid.
+        batch_size: Instances per explain call.
+        max_concurrency: Maximum explain calls in flight.
+        request_timeout_s: Timeout per explain call.
+
+    Returns:
+        Summary dict with computed, skipped and failed cell counts and wall clock.
+    """
+    from numpy.lib.format import open_memmap
+
+    axes = axes or DEFAULT_AXES
+    path = Path(output_path)
+    identity = endpoint_model_identity(endpoint)
+    shape = tuple(len(values) for values in DEFAULT_AXES.values()) + (len(VALUE_FIELDS),)
+    if path.exists():
+        values = open_memmap(path, mode="r+")
+        if values.shape != shape:
+            raise ValueError(f"Existing table {path} has shape {values.shape}, expected {shape}")
+        sidecar = _sidecar_path(path)
+        previous = json.loads(sidecar.read_text()).get("model_identity") if sidecar.exists() else None
+        if previous != identity:
+            # Cells from another deployment are stale; recompute everything
+            logging.warning(f"Existing table {path} was built for {previous}; resetting for {identity}")
+            values[:] = np.nan
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        values = open_memmap(path, mode="w+", dtype=np.float32, shape=shape)
+        values[:] = np.nan
+    _sidecar_path(path).write_text(json.dumps(
+        {"axes": DEFAULT_AXES, "fields": VALUE_FIELDS, "model_identity": identity}, indent=2))
+
+    full_index = {name: {value: i for i, value in enumerate(vals)} for name, vals in DEFAULT_AXES.items()}
+    names = list(DEFAULT_AXES)
+    filled = ~np.isnan(values[..., 0])
+    pending = []
+    skipped = 0
+    for combo in product(*(axes[name] for name in names)):
+        index = tuple(full_index[name][value] for name, value in zip(names, combo))
+        if filled[index]:
+            skipped += 1
+            continue
+        pending.append((index, dict(zip(names, combo))))
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    logging.info(f"Computing {len(pending)} cells in {len(batches)} batches ({skipped} already present)")
+
+    def explain_batch(batch):
+        response = endpoint.explain(instances=[instance for _, instance in batch], timeout=request_timeout_s)
+        explanations = parse_explain_response(response)
+        if len(explanations) != len(batch):
+            raise ValueError(f"Explain returned {len(explanations)} explanations for {len(batch)} instances")
+        return batch, explanations
+
+    start = time.perf_counter()
+    computed = failed = 0
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        futures = {pool.submit(explain_batch, batch): batch for batch in batches}
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                batch, explanations = future.result()
+            except Exception as e:
+                # Failed cells stay NaN and are retried when the job is re-run
+                logging.error(f"Explain batch failed: {e}")
+                failed += len(futures[future])
+                continue
+            for (index, _), explanation in zip(batch, explanations):
+                values[index] = [explanation.prediction, explanation.baseline] + [
+                    explanation.attributions.get(name, np.nan) for name in names
+                ]
+            computed += len(batch)
+            if done % 100 == 0:
+                logging.info(f"{done}/{len(batches)} batches done")
+    values.flush()
+    summary = {"computed": computed, "skipped": skipped, "failed": failed,
+               "seconds": round(time.perf_counter() - start, 2)}
+    logging.info(f"Attribution table {path}: {summary}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the attribution lookup table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Compute (or resume) the table.")
+    build.add_argument("--output", required=True, help="Path of the .npy table.")
+    build.add_argument("--endpoint", help="Vertex AI endpoint resource name.")
+    build.add_argument("--fake", action="store_true", help="Use the local FakeEndpoint instead.")
+    build.add_argument("--axis", action="append", default=[], help="Subset, e.g. mother_age=18:45 or plurality=single(1)")
+    build.add_argument("--batch-size", type=int, default=64)
+    build.add_argument("--max-concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.fake:
+        from src.serving.fake_endpoint import FakeEndpoint
+        endpoint = FakeEndpoint()
+    elif args.endpoint:
+        from google.cloud import aiplatform
+        endpoint = aiplatform.Endpoint(args.endpoint)
+    else:
+        parser.error("Either --endpoint or --fake is required")
+    build_attribution_table(endpoint, args.output, parse_axis_overrides(args.axis),
+                            batch_size=args.batch_size, max_concurrency=args.max_concurrency)
+
+
+if __name__ == "__main__":
+    main()
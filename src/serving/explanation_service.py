@@ -0,0 +1,183 @@
+"""Memoized, batched feature-attribution lookups against a Vertex AI endpoint.
+
+`ex_app.py` used to call `endpoint.explain()` and then `endpoint.predict()` for
+the same instance on every Streamlit rerun. The explain response already holds
+the prediction (`instance_output_value`), and the app's input space is small and
+discrete, so `ExplanationService`:
+
+  * returns prediction, baseline and attributions from a single explain call,
+  * memoizes results keyed on the deployed model and the normalized instance
+    in an LRU with TTL, so a redeploy never serves the previous model's
+    explanations (as in `prediction_cache`),
+  * coalesces identical in-flight requests, and
+  * batches requests arriving from concurrent sessions within `max_wait_ms`
+    into one `explain(instances=[...])` call.
+
+Any object with an `explain(instances=...)` method works as the endpoint, e.g.
+`aiplatform.Endpoint` or `src.serving.fake_endpoint.FakeEndpoint`.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from src.serving.lru_cache import LRUCache
+
+
+class Explanation(NamedTuple):
+    prediction: float
+    baseline: float
+    attributions: Dict[str, float]
+
+
+def normalize_instance(instance: Dict[str, object]) -> Tuple[Tuple[str, str], ...]:
+    """Returns a hashable, order-independent key for an instance.
+
+    Values are compared as strings because the endpoint receives them as strings.
+    """
+    return tuple(sorted((str(key), str(value)) for key, value in instance.items()))
+
+
+def parse_explain_response(response) -> List[Explanation]:
+    """Converts an explain response into one Explanation per instance."""
+    explanations = []
+    for explanation in response.explanations:
+        attribution = explanation.attributions[0]
+        explanations.append(Explanation(
+            prediction=float(attribution.instance_output_value),
+            baseline=float(attribution.baseline_output_value),
+            attributions={key: float(value) for key, value in dict(attribution.feature_attributions).items()},
+        ))
+    return explanations
+
+
+class ExplanationService:
+    """Thread-safe explanation front end shared by all Streamlit sessions.
+
+    Args:
+        endpoint: Object exposing `explain(instances=...)`.
+        max_entries: Maximum number of memoized explanations.
+        ttl_seconds: How long a memoized explanation stays valid.
+        max_batch_size: Maximum instances sent in one explain call.
+        max_wait_ms: How long the batcher waits for more requests before sending.
+        request_timeout_s: Timeout passed to the endpoint's explain call.
+    """
+
+    _STOP = object()
+
+    def __init__(self, endpoint, max_entries: int = 4096, ttl_seconds: Optional[float] = 3600,
+                 max_batch_size: int = 16, max_wait_ms: float = 10.0,
+                 request_timeout_s: Optional[float] = None):
+        self.endpoint = endpoint
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.request_timeout_s = request_timeout_s
+        self._cache = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self.batches_sent = 0
+        self.instances_sent = 0
+
+    # --- Public API ---
+    def submit(self, instance: Dict[str, object], model_version: Optional[str] = None) -> Future:
+        """Returns a future resolving to the Explanation for `instance`.
+
+        `model_version` identifies the models deployed to the endpoint (e.g.
+        `endpoint_model_identity`); results are only shared within one version.
+        """
+        key = (model_version, normalize_instance(instance))
+        cached = self._cache.get(key)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future
+            future = Future()
+            self._in_flight[key] = future
+            self._ensure_worker()
+        self._queue.put((key, dict(instance)))
+        return future
+
+    def explain(self, instance: Dict[str, object], model_version: Optional[str] = None,
+                timeout: Optional[float] = None) -> Explanation:
+        return self.submit(instance, model_version).result(timeout=timeout)
+
+    def explain_many(self, instances: List[Dict[str, object]], model_version: Optional[str] = None,
+                     timeout: Optional[float] = None) -> List[Explanation]:
+        futures = [self.submit(instance, model_version) for instance in instances]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def stats(self) -> dict:
+        stats = self._cache.stats()
+        stats.update(batches_sent=self.batches_sent, instances_sent=self.instances_sent)
+        return stats
+
+    def close(self):
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(self._STOP)
+            worker.join()
+
+    # --- Batching ---
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="explanation-batcher", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    self._explain_batch(batch)
+                    return
+                batch.append(item)
+            self._explain_batch(batch)
+
+    def _explain_batch(self, batch: List[Tuple[Hashable, Dict]]):
+        keys = [key for key, _ in batch]
+        try:
+            response = self.endpoint.explain(instances=[instance for _, instance in batch],
+                                             timeout=self.request_timeout_s)
+            explanations = parse_explain_response(response)
+            if len(explanations) != len(batch):
+                raise ValueError(f"Expected {len(batch)} explanations, got {len(explanations)}")
+        except Exception as e:
+            logging.error(f"Explain call for {len(batch)} instance(s) failed: {e}")
+            for key in keys:
+                self._resolve(key, error=e)
+            return
+        self.batches_sent += 1
+        self.instances_sent += len(batch)
+        for key, explanation in zip(keys, explanations):
+            self._cache.put(key, explanation)
+            self._resolve(key, result=explanation)
+
+    def _resolve(self, key: Hashable, result: Explanation = None, error: Exception = None):
+        with self._lock:
+            future = self._in_flight.pop(key, None)
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
@@ -0,0 +1,164 @@
+"""Local stand-in for a deployed Vertex AI endpoint.
+
+`FakeEndpoint` mimics the parts of `aiplatform.Endpoint` the serving code uses
+(`predict` and `explain`) with a deterministic additive model over the
+baby-weight features, configurable latency and failure injection. It lets the
+serving helpers, benchmarks and replay tools run without GCP access.
+"""
+import asyncio
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+BASELINE_WEIGHT_LBS = 7.2
+
+# Contribution (lbs) per unit above the reference value for numeric features
+NUMERIC_EFFECTS = {
+    "mother_age": (0.01, 28.0),
+    "gestation_weeks": (0.3, 39.0),
+}
+# Contribution (lbs) per category for categorical features; unknown values add 0
+CATEGORICAL_EFFECTS = {
+    "is_male": {"true": 0.25, "True": 0.25, "1": 0.25, "false": -0.25, "False": -0.25, "0": -0.25},
+    "plurality": {"single(1)": 0.2, "Single(1)": 0.2, "Twins(2)": -1.5, "Triplets(3)": -2.6, "Quadruplets(4)": -3.4},
+    "plurality_category": {"Single(1)": 0.2, "Twins(2)": -1.5, "Triplets(3)": -2.6,
+                           "Quadruplets(4)": -3.4, "Quintuplets(5)": -4.0},
+    "cigarette_use": {"true": -0.4, "false": 0.05},
+    "cigarette_use_str": {"true": -0.4, "True": -0.4, "false": 0.05, "False": 0.05},
+    "alcohol_use": {"true": -0.3, "false": 0.02},
+    "alcohol_use_str": {"true": -0.3, "True": -0.3, "false": 0.02, "False": 0.02},
+}
+
+
+def score_instance(instance: Dict[str, object]):
+    """Returns (prediction, {feature: attribution}) for one instance."""
+    attributions = {}
+    for feature, value in instance.items():
+        if feature in NUMERIC_EFFECTS:
+            coefficient, reference = NUMERIC_EFFECTS[feature]
+            try:
+                attributions[feature] = coefficient * (float(value) - reference)
+            except (TypeError, ValueError):
+                attributions[feature] = 0.0
+        elif feature in CATEGORICAL_EFFECTS:
+            attributions[feature] = CATEGORICAL_EFFECTS[feature].get(str(value), 0.0)
+    return BASELINE_WEIGHT_LBS + sum(attributions.values()), attributions
+
+
+class FakeEndpointError(RuntimeError):
+    """Raised by FakeEndpoint for injected failures."""
+
+
+class FakeEndpoint:
+    """Deterministic endpoint stand-in with injectable latency and errors.
+
+    Args:
+        response_format: "automl" returns {"value": x} dicts, "bqml" returns [x] lists.
+        latency_s: Base latency added to every call.
+        jitter_s: Extra uniformly distributed latency in [0, jitter_s).
+        per_instance_latency_s: Latency added per instance in a call.
+        failure_rate: Probability that a call raises FakeEndpointError.
+        tail_rate: Probability that a call is a slow outlier.
+        tail_latency_s: Extra latency added to slow outliers.
+        max_concurrency: Calls served at once, like one replica's workers;
+            further calls queue. None serves every call immediately.
+        deployed_model_id: Reported deployed model ID.
+        seed: Seed for latency jitter and failure injection.
+    """
+
+    def __init__(self, response_format: str = "automl", latency_s: float = 0.0, jitter_s: float = 0.0,
+                 per_instance_latency_s: float = 0.0, failure_rate: float = 0.0,
+                 tail_rate: float = 0.0, tail_latency_s: float = 0.0, max_concurrency: Optional[int] = None,
+                 deployed_model_id: str = "fake-deployed-model", seed: Optional[int] = 0):
+        if response_format not in ("automl", "bqml"):
+            raise ValueError(f"Unknown response_format: {response_format}")
+        self.response_format = response_format
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.per_instance_latency_s = per_instance_latency_s
+        self.failure_rate = failure_rate
+        self.tail_rate = tail_rate
+        self.tail_latency_s = tail_latency_s
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        self.deployed_model_id = deployed_model_id
+        self.resource_name = f"projects/fake/locations/local/endpoints/{deployed_model_id}"
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.predict_calls = 0
+        self.explain_calls = 0
+        self.instances_seen = 0
+
+    def _draw_call(self, instances: List[Dict]):
+        """Returns (delay_s, fail) for one call."""
+        with self._lock:
+            self.instances_seen += len(instances)
+            delay = self.latency_s + self.per_instance_latency_s * len(instances)
+            if self.jitter_s:
+                delay += self._random.uniform(0, self.jitter_s)
+            if self.tail_rate and self._random.random() < self.tail_rate:
+                delay += self.tail_latency_s
+            fail = self.failure_rate and self._random.random() < self.failure_rate
+        return delay, fail
+
+    def _simulate_call(self, instances: List[Dict]):
+        delay, fail = self._draw_call(instances)
+        if self._slots:
+            self._slots.acquire()
+        try:
+            if delay:
+                time.sleep(delay)
+        finally:
+            if self._slots:
+                self._slots.release()
+        if fail:
+            raise FakeEndpointError("Injected endpoint failure")
+
+    async def _simulate_call_async(self, instances: List[Dict]):
+        delay, fail = self._draw_call(instances)
+        if self.max_concurrency and self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_concurrency)
+        if self._async_slots:
+            async with self._async_slots:
+                await asyncio.sleep(delay)
+        elif delay:
+            await asyncio.sleep(delay)
+        if fail:
+            raise FakeEndpointError("Injected endpoint failure")
+
+    def _format_prediction(self, value: float):
+        return {"value": value} if self.response_format == "automl" else [value]
+
+    def predict(self, instances: List[Dict], parameters=None, timeout: Optional[float] = None):
+        with self._lock:
+            self.predict_calls += 1
+        self._simulate_call(instances)
+        predictions = [self._format_prediction(score_instance(instance)[0]) for instance in instances]
+        return SimpleNamespace(predictions=predictions, deployed_model_id=self.deployed_model_id)
+
+    async def predict_async(self, instances: List[Dict], parameters=None, timeout: Optional[float] = None):
+        """Coroutine version of `predict`, like `aiplatform.Endpoint.predict_async`."""
+        with self._lock:
+            self.predict_calls += 1
+        await self._simulate_call_async(instances)
+        predictions = [self._format_prediction(score_instance(instance)[0]) for instance in instances]
+        return SimpleNamespace(predictions=predictions, deployed_model_id=self.deployed_model_id)
+
+    def explain(self, instances: List[Dict], parameters=None, timeout: Optional[float] = None):
+        with self._lock:
+            self.explain_calls += 1
+        self._simulate_call(instances)
+        predictions, explanations = [], []
+        for instance in instances:
+            prediction, attributions = score_instance(instance)
+            predictions.append(self._format_prediction(prediction))
+            explanations.append(SimpleNamespace(attributions=[SimpleNamespace(
+                baseline_output_value=BASELINE_WEIGHT_LBS,
+                instance_output_value=prediction,
+                feature_attributions=attributions,
+            )]))
+        return SimpleNamespace(predictions=predictions, explanations=explanations,
+                               deployed_model_id=self.deployed_model_id)
@@ -0,0 +1,212 @@
+"""Client-side validation of prediction instances against the training schema.
+
+Instances are checked locally before they cost an endpoint round trip. The
+schema lists, per feature, the numeric range or category set seen in the
+prepped training table (`preprocess_data_and_split`). `DEFAULT_SCHEMA` holds
+only what the data prep queries guarantee; `derive_schema` narrows it to the
+ranges and categories actually present in the table.
+
+`InstanceValidator.validate` works column-wise over a whole batch with NumPy:
+  * repairable spellings are canonicalized (e.g. "True" -> "true",
+    "1" -> "true" for is_male, "Multiple(2)" -> "Twins(2)"),
+  * rows with missing features, non-numeric or out-of-range values, or unseen
+    categories are rejected, and
+  * rejections are counted by `<feature>:<reason>` across calls.
+
+Usage:
+    python -m src.serving.instance_validation derive \\
+        --table project.dataset.babyweight_preprocessed --output instance_schema.json
+"""
+import argparse
+import json
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+# What data_prep_comp.py guarantees: extraction keeps mother_age > 0,
+# gestation_weeks > 19 and plurality 1-5 (the five plurality_category names);
+# booleans are CAST to "true"/"false" and missing smoking/drinking values
+# become "Unknown". The queries set no upper bounds, so neither does the
+# default (None); use `derive_schema` for the observed ranges.
+DEFAULT_SCHEMA = {
+    "numeric": {
+        "mother_age": [1.0, None],
+        "gestation_weeks": [20.0, None],
+    },
+    "categorical": {
+        "is_male": ["false", "true"],
+        "plurality_category": ["Single(1)", "Twins(2)", "Triplets(3)", "Quadruplets(4)", "Quintuplets(5)"],
+        "cigarette_use_str": ["Unknown", "false", "true"],
+        "alcohol_use_str": ["Unknown", "false", "true"],
+    },
+}
+
+# Alternative spellings clients send, mapped to the training value
+REPAIRS = {
+    "is_male": {"True": "true", "TRUE": "true", "1": "true", "False": "false", "FALSE": "false", "0": "false"},
+    "plurality_category": {
+        "single(1)": "Single(1)", "Multiple(2)": "Twins(2)", "Multiple(3)": "Triplets(3)",
+        "Multiple(4)": "Quadruplets(4)", "Multiple(5)": "Quintuplets(5)",
+    },
+    "cigarette_use_str": {"True": "true", "TRUE": "true", "False": "false", "FALSE": "false", "unknown": "Unknown"},
+    "alcohol_use_str": {"True": "true", "TRUE": "true", "False": "false", "FALSE": "false", "unknown": "Unknown"},
+}
+
+
+class ValidationResult(NamedTuple):
+    valid: np.ndarray               # (instances,) bool
+    instances: List[Dict[str, str]]  # Repaired instances, in input order
+    reasons: List[List[str]]         # Rejection reasons per instance
+    repaired: int                    # Number of values rewritten
+
+    @property
+    def valid_instances(self) -> List[Dict[str, str]]:
+        return [instance for instance, ok in zip(self.instances, self.valid) if ok]
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class InstanceValidator:
+    """Vectorized instance validator with rejection counters.
+
+    Args:
+        schema: Dict with "numeric" {feature: [min, max]} and "categorical"
+            {feature: [values]} sections; a None bound is open. Defaults to
+            DEFAULT_SCHEMA.
+        repair: Canonicalize known alternative spellings before checking.
+    """
+
+    def __init__(self, schema: Optional[dict] = None, repair: bool = True):
+        self.schema = schema or DEFAULT_SCHEMA
+        self.repair = repair
+        # Per categorical feature: accepted spelling -> training value
+        self._canonical: Dict[str, Dict[str, str]] = {}
+        for name, values in self.schema["categorical"].items():
+            canonical = dict(REPAIRS.get(name, {})) if repair else {}
+            canonical = {alias: value for alias, value in canonical.items() if value in values}
+            canonical.update({value: value for value in values})
+            self._canonical[name] = canonical
+        self._lock = threading.Lock()
+        self.rejections: Counter = Counter()
+        self.checked = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "InstanceValidator":
+        with open(path) as f:
+            return cls(json.load(f), **kwargs)
+
+    @property
+    def features(self) -> List[str]:
+        return list(self.schema["numeric"]) + list(self.schema["categorical"])
+
+    def validate(self, instances: Sequence[Dict[str, object]]) -> ValidationResult:
+        count = len(instances)
+        valid = np.ones(count, dtype=bool)
+        reasons: List[List[str]] = [[] for _ in range(count)]
+        repaired_instances = [{key: str(value) for key, value in instance.items()} for instance in instances]
+        repaired = 0
+
+        def reject(mask: np.ndarray, reason: str):
+            for row in np.flatnonzero(mask):
+                reasons[row].append(reason)
+            valid[mask] = False
+
+        for name, (low, high) in self.schema["numeric"].items():
+            column = [instance.get(name) for instance in repaired_instances]
+            try:
+                values = np.array(column, dtype=np.float64)
+            except (TypeError, ValueError):
+                # Only pay for per-value parsing when a value is malformed
+                values = np.array([_to_float(value) for value in column], dtype=np.float64)
+            missing = np.fromiter((value is None or value == "" for value in column), dtype=bool, count=count)
+            if missing.any():
+                reject(missing, f"{name}:missing")
+            not_numeric = np.isnan(values) & ~missing
+            if not_numeric.any():
+                reject(not_numeric, f"{name}:not_numeric")
+            low = -np.inf if low is None else low
+            high = np.inf if high is None else high
+            with np.errstate(invalid="ignore"):
+                out_of_range = (values < low) | (values > high)
+            if out_of_range.any():
+                reject(out_of_range, f"{name}:out_of_range")
+
+        for name, canonical in self._canonical.items():
+            column = [instance.get(name) for instance in repaired_instances]
+            mapped = [canonical.get(value) for value in column]
+            missing = np.fromiter((value is None or value == "" for value in column), dtype=bool, count=count)
+            if missing.any():
+                reject(missing, f"{name}:missing")
+            unknown = np.fromiter((value is None for value in mapped), dtype=bool, count=count) & ~missing
+            if unknown.any():
+                reject(unknown, f"{name}:unknown_category")
+            for row, (value, fixed) in enumerate(zip(column, mapped)):
+                if fixed is not None and fixed != value:
+                    repaired_instances[row][name] = fixed
+                    repaired += 1
+
+        rejected = count - int(np.count_nonzero(valid))
+        with self._lock:
+            self.checked += count
+            self.rejected += rejected
+            if rejected:
+                for row_reasons in reasons:
+                    self.rejections.update(row_reasons)
+        return ValidationResult(valid, repaired_instances, reasons, repaired)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"checked": self.checked, "rejected": self.rejected,
+                    "by_reason": dict(self.rejections.most_common())}
+
+
+def derive_schema(bq_client, table_id: str, split: str = "TRAIN") -> dict:
+    """Builds the schema from the value ranges and categories of the prepped table."""
+    numeric = list(DEFAULT_SCHEMA["numeric"])
+    categorical = list(DEFAULT_SCHEMA["categorical"])
+    select = ",\n        ".join(
+        [f"MIN({name}) AS min_{name}, MAX({name}) AS max_{name}" for name in numeric]
+        + [f"ARRAY_AGG(DISTINCT {name} IGNORE NULLS) AS values_{name}" for name in categorical]
+    )
+    query = f"""
+    SELECT
+        {select}
+    FROM `{table_id}`
+    WHERE data_split = '{split}'
+    """
+    row = list(bq_client.query(query).result())[0]
+    return {
+        "numeric": {name: [float(row[f"min_{name}"]), float(row[f"max_{name}"])] for name in numeric},
+        "categorical": {name: sorted(row[f"values_{name}"]) for name in categorical},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Derive the serving instance schema from the prepped table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    derive = sub.add_parser("derive", help="Query value ranges and categories from BigQuery.")
+    derive.add_argument("--table", required=True, help="Prepped table ID (project.dataset.table).")
+    derive.add_argument("--project", help="Billing project; defaults to the table's project.")
+    derive.add_argument("--output", required=True, help="Schema JSON path.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from google.cloud import bigquery
+    client = bigquery.Client(project=args.project or args.table.split(".")[0])
+    schema = derive_schema(client, args.table)
+    with open(args.output, "w") as f:
+        json.dump(schema, f, indent=2)
+    logging.info(f"Wrote instance schema to {args.output}: {schema}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Memoized endpoint predictions keyed on the instance and the deployed model.
+
+The app's form has a small, bounded input space and many users submit the same
+combinations, so predictions are cached under
+`(endpoint, deployed model, normalized instance)`. Because the deployed model
+is part of the key, deploying a new model makes old entries unreachable and
+they age out of the LRU on their own; nothing has to be flushed.
+
+`PredictionCache` keeps a per-process `LRUCache` in front of an optional
+shared backend so replicas can reuse each other's results:
+  * `SQLiteBackend`: a local file, shared by processes on one host
+  * `RedisBackend`: any Redis-compatible client (`get`/`set(..., ex=ttl)`)
+  * `InMemoryRedis`: an in-process stand-in with the same interface, for local
+    runs and benchmarks without a Redis server
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from src.serving.explanation_service import normalize_instance
+from src.serving.lru_cache import LRUCache
+
+
+def prediction_cache_key(instance: Dict[str, object], endpoint_id: str, model_version: Optional[str]) -> str:
+    """Stable string key for a prediction; identical across processes."""
+    payload = json.dumps([endpoint_id, model_version, normalize_instance(instance)], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class InMemoryRedis:
+    """Minimal thread-safe stand-in for a Redis client (`get`/`set` with `ex`)."""
+
+    def __init__(self, clock=time.time):
+        self._data: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and self._clock() >= expires_at:
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key: str, value, ex: Optional[int] = None):
+        data = value if isinstance(value, bytes) else str(value).encode()
+        with self._lock:
+            self._data[key] = (data, self._clock() + ex if ex else None)
+        return True
+
+
+class RedisBackend:
+    """Shared backend over a Redis-compatible client."""
+
+    def __init__(self, client, ttl_seconds: Optional[float] = None, prefix: str = "bw-prediction:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[float]:
+        value = self.client.get(self.prefix + key)
+        return float(value) if value is not None else None
+
+    def set(self, key: str, value: float):
+        self.client.set(self.prefix + key, repr(float(value)),
+                        ex=int(self.ttl_seconds) if self.ttl_seconds else None)
+
+
+class SQLiteBackend:
+    """Shared backend stored in a local SQLite file."""
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS predictions ("
+                         "key TEXT PRIMARY KEY, value REAL NOT NULL, created_at REAL NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[float]:
+        row = self._connection().execute(
+            "SELECT value, created_at FROM predictions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if self.ttl_seconds is not None and time.time() - row[1] >= self.ttl_seconds:
+            return None
+        return row[0]
+
+    def set(self, key: str, value: float):
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO predictions (key, value, created_at) VALUES (?, ?, ?)",
+                         (key, float(value), time.time()))
+
+
+def backend_from_url(url: Optional[str], ttl_seconds: Optional[float] = None):
+    """Builds a shared backend from `memory`, `file:<path>`, `redis://...` or `redis+memory://`.
+
+    Returns None (local LRU only) for an empty or `memory` URL.
+    """
+    if not url or url == "memory":
+        return None
+    if url.startswith("file:"):
+        return SQLiteBackend(url[len("file:"):], ttl_seconds=ttl_seconds)
+    if url.startswith("redis+memory://"):
+        return RedisBackend(InMemoryRedis(), ttl_seconds=ttl_seconds)
+    if url.startswith(("redis://", "rediss://")):
+        import redis
+        return RedisBackend(redis.Redis.from_url(url), ttl_seconds=ttl_seconds)
+    raise ValueError(f"Unsupported prediction cache backend: {url}")
+
+
+class PredictionCache:
+    """Two-level prediction cache: local LRU, then an optional shared backend.
+
+    Args:
+        max_entries: Size of the per-process LRU.
+        ttl_seconds: Lifetime of an entry in both levels.
+        backend: Optional shared backend with `get(key)`/`set(key, value)`.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: Optional[float] = 24 * 3600, backend=None):
+        self._local = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.backend_hits = 0
+        self.backend_errors = 0
+
+    def get(self, instance: Dict[str, object], endpoint_id: str, model_version: Optional[str]) -> Optional[float]:
+        key = prediction_cache_key(instance, endpoint_id, model_version)
+        value = self._local.get(key)
+        if value is not None or self.backend is None:
+            return value
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            # A shared cache outage must not fail predictions
+            logging.warning(f"Prediction cache backend read failed: {e}")
+            with self._lock:
+                self.backend_errors += 1
+            return None
+        if value is not None:
+            with self._lock:
+                self.backend_hits += 1
+            self._local.put(key, value)
+        return value
+
+    def put(self, instance: Dict[str, object], endpoint_id: str, model_version: Optional[str], value: float):
+        key = prediction_cache_key(instance, endpoint_id, model_version)
+        self._local.put(key, value)
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value)
+            except Exception as e:
+                logging.warning(f"Prediction cache backend write failed: {e}")
+                with self._lock:
+                    self.backend_errors += 1
+
+    def get_or_compute(self, instance: Dict[str, object], endpoint_id: str, model_version: Optional[str],
+                       compute) -> float:
+        """Returns the cached prediction, or calls `compute()` and caches its result."""
+        value = self.get(instance, endpoint_id, model_version)
+        if value is None:
+            value = compute()
+            self.put(instance, endpoint_id, model_version, value)
+        return value
+
+    def stats(self) -> dict:
+        stats = self._local.stats()
+        lookups = stats["hits"] + stats["misses"]
+        with self._lock:
+            stats.update(backend_hits=self.backend_hits, backend_errors=self.backend_errors)
+        # Local misses answered by the backend count as hits overall
+        stats["overall_hit_rate"] = round((stats["hits"] + self.backend_hits) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,227 @@
+"""Shared, non-blocking executor for endpoint prediction calls.
+
+The Streamlit app used to call `endpoint.predict()` on the script thread, so a
+slow endpoint froze the session and a burst of sessions tied up Streamlit's
+worker threads. `PredictionExecutor` runs calls on a bounded thread pool shared
+by all sessions and returns a `Future` the UI can poll. Each request gets:
+
+  * a deadline, after which its future fails with `TimeoutError`,
+  * a hedged retry: if the first attempt has not returned after the recent
+    p95 latency, a second identical attempt is started and the first result
+    wins, which trims the tail caused by a single slow replica, and
+  * cancellation when the same session submits again, so stale requests do
+    not start new attempts and their results are discarded.
+
+Calls must be idempotent because hedging may run them more than once.
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Callable, Dict, Hashable, List, Optional
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of `values` (0 < pct <= 100)."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class _Request:
+    """State of one logical request and its attempts."""
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict, deadline: float):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.deadline = deadline
+        self.future: Future = Future()
+        self.attempts: List[Future] = []
+        self.failures = 0
+        self.started_at = time.monotonic()
+
+
+class PredictionExecutor:
+    """Runs prediction calls off the caller's thread with deadlines and hedging.
+
+    Args:
+        max_workers: Maximum concurrent endpoint calls across all sessions.
+        deadline_s: Default per-request deadline.
+        hedge_percentile: Latency percentile after which a hedged attempt starts.
+        min_hedge_delay_s: Lower bound for the hedge delay.
+        initial_hedge_delay_s: Hedge delay used until enough latencies are observed.
+        max_attempts: Maximum attempts (first call plus hedges) per request.
+        latency_window: Number of recent successful latencies used for the percentile.
+    """
+
+    def __init__(self, max_workers: int = 32, deadline_s: float = 10.0, hedge_percentile: float = 95.0,
+                 min_hedge_delay_s: float = 0.05, initial_hedge_delay_s: float = 1.0,
+                 max_attempts: int = 2, latency_window: int = 512):
+        self.deadline_s = deadline_s
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay_s = min_hedge_delay_s
+        self.initial_hedge_delay_s = initial_hedge_delay_s
+        self.max_attempts = max_attempts
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prediction")
+        self._latencies: deque = deque(maxlen=latency_window)
+        self._sessions: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        # Timer heap of (due, seq, callback) served by one scheduler thread
+        self._timers: list = []
+        self._timer_seq = itertools.count()
+        self._timer_cv = threading.Condition(self._lock)
+        self._scheduler: Optional[threading.Thread] = None
+        self._closed = False
+        self.stats_counters = {"requests": 0, "hedges": 0, "hedge_wins": 0, "timeouts": 0,
+                               "cancelled": 0, "errors": 0}
+
+    # --- Public API ---
+    def submit(self, fn: Callable, *args, session_key: Optional[Hashable] = None,
+               deadline_s: Optional[float] = None, **kwargs) -> Future:
+        """Schedules `fn(*args, **kwargs)` and returns a future for its result.
+
+        If `session_key` is given, an unfinished request previously submitted
+        under the same key is cancelled.
+        """
+        request = _Request(fn, args, kwargs, time.monotonic() + (deadline_s or self.deadline_s))
+        previous = None
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("PredictionExecutor is closed")
+            self.stats_counters["requests"] += 1
+            if session_key is not None:
+                previous = self._sessions.get(session_key)
+                self._sessions[session_key] = request.future
+        # Cancel outside the lock: done callbacks run synchronously and take it
+        if previous is not None and previous.cancel():
+            with self._lock:
+                self.stats_counters["cancelled"] += 1
+        request.future.add_done_callback(lambda _: self._finish(request, session_key))
+        self._start_attempt(request)
+        self._schedule(request.deadline, lambda: self._expire(request))
+        self._schedule(request.started_at + self.hedge_delay(), lambda: self._hedge(request))
+        return request.future
+
+    def hedge_delay(self) -> float:
+        """Current hedge delay: the recent latency percentile, bounded below."""
+        with self._lock:
+            latencies = list(self._latencies)
+        if len(latencies) < 20:
+            return self.initial_hedge_delay_s
+        return max(self.min_hedge_delay_s, percentile(latencies, self.hedge_percentile))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats_counters)
+            latencies = list(self._latencies)
+        if latencies:
+            stats.update(p50_s=round(percentile(latencies, 50), 4), p95_s=round(percentile(latencies, 95), 4))
+        return stats
+
+    def close(self, wait: bool = True):
+        with self._lock:
+            self._closed = True
+            self._timer_cv.notify_all()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    # --- Attempts ---
+    def _start_attempt(self, request: _Request):
+        with self._lock:
+            if request.future.done() or len(request.attempts) >= self.max_attempts:
+                return False
+            attempt_number = len(request.attempts)
+            try:
+                attempt = self._pool.submit(self._run_attempt, request, attempt_number)
+            except RuntimeError:
+                return False
+            request.attempts.append(attempt)
+        return True
+
+    def _run_attempt(self, request: _Request, attempt_number: int):
+        if request.future.done():
+            return
+        start = time.monotonic()
+        try:
+            result = request.fn(*request.args, **request.kwargs)
+        except Exception as e:
+            with self._lock:
+                request.failures += 1
+                exhausted = len(request.attempts) >= self.max_attempts
+                all_failed = request.failures >= len(request.attempts)
+            if not exhausted:
+                # Fail fast into the next attempt instead of waiting for the hedge timer
+                logging.warning(f"Prediction attempt {attempt_number} failed, retrying: {e}")
+                self._start_attempt(request)
+            elif all_failed:
+                with self._lock:
+                    self.stats_counters["errors"] += 1
+                self._settle(request, error=e)
+            return
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+            if attempt_number > 0 and not request.future.done():
+                self.stats_counters["hedge_wins"] += 1
+        self._settle(request, result=result)
+
+    def _settle(self, request: _Request, result=None, error: Exception = None):
+        if request.future.done():
+            return
+        try:
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                request.future.set_result(result)
+        except Exception:
+            # Lost the race against cancellation or expiry
+            pass
+
+    def _hedge(self, request: _Request):
+        if request.future.done():
+            return
+        if self._start_attempt(request):
+            with self._lock:
+                self.stats_counters["hedges"] += 1
+
+    def _expire(self, request: _Request):
+        if request.future.done():
+            return
+        with self._lock:
+            self.stats_counters["timeouts"] += 1
+        self._settle(request, error=TimeoutError(
+            f"Prediction did not complete within {request.deadline - request.started_at:.2f}s"))
+
+    def _finish(self, request: _Request, session_key: Optional[Hashable]):
+        with self._lock:
+            if session_key is not None and self._sessions.get(session_key) is request.future:
+                del self._sessions[session_key]
+            attempts = list(request.attempts)
+        for attempt in attempts:
+            # Only queued attempts can be cancelled; running ones finish and are ignored
+            attempt.cancel()
+
+    # --- Timers ---
+    def _schedule(self, due: float, callback: Callable[[], None]):
+        with self._lock:
+            heapq.heappush(self._timers, (due, next(self._timer_seq), callback))
+            if self._scheduler is None or not self._scheduler.is_alive():
+                self._scheduler = threading.Thread(target=self._run_timers, name="prediction-timers", daemon=True)
+                self._scheduler.start()
+            self._timer_cv.notify()
+
+    def _run_timers(self):
+        while True:
+            with self._lock:
+                while not self._closed and (not self._timers or self._timers[0][0] > time.monotonic()):
+                    timeout = self._timers[0][0] - time.monotonic() if self._timers else None
+                    self._timer_cv.wait(timeout)
+                if self._closed:
+                    return
+                _, _, callback = heapq.heappop(self._timers)
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"Prediction timer callback failed: {e}")
@@ -0,0 +1,218 @@
+"""Sampled, buffered request/response logging for the serving path.
+
+`PredictionLogger.log()` is called on the request path, so it does only
+constant-time work. It takes a sampling decision, builds a dict and does a
+non-blocking put into a bounded queue. When the queue is full the record is
+dropped and counted; the caller is never blocked. A background thread drains
+the queue and writes compressed batches to a sink whenever `batch_size`
+records are buffered or `flush_interval_s` has passed.
+
+Sinks, chosen with `sink_from_url`:
+  * `file:<dir>`: gzip-compressed JSONL files (local runs and tests)
+  * `file:<dir>?format=parquet`: zstd Parquet files instead (needs pyarrow)
+  * `gs://bucket/prefix`: the same files uploaded to Cloud Storage
+  * `bq://project.dataset.table`: streaming inserts into BigQuery
+
+Each record holds request_id, timestamp, endpoint_id, model_version,
+instance, prediction, latency_ms, error and cache_hit. The replay tools read the same
+files.
+"""
+import gzip
+import io
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+
+def encode_jsonl(records: List[dict]) -> bytes:
+    payload = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+    return gzip.compress(payload.encode(), compresslevel=5)
+
+
+def encode_parquet(records: List[dict]) -> bytes:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Nested instances are stored as JSON strings to keep one flat schema
+    rows = [dict(record, instance=json.dumps(record["instance"], separators=(",", ":"))) for record in records]
+    buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_pylist(rows), buffer, compression="zstd")
+    return buffer.getvalue()
+
+
+ENCODERS = {"jsonl": (encode_jsonl, ".jsonl.gz"), "parquet": (encode_parquet, ".parquet")}
+
+
+class FileSink:
+    """Writes each batch as one compressed JSONL or Parquet file in a local directory."""
+
+    def __init__(self, directory: str, file_format: str = "jsonl"):
+        self.directory = directory
+        self._encode, self._extension = ENCODERS[file_format]
+        self._seq = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def next_name(self) -> str:
+        self._seq += 1
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        return f"predictions-{stamp}-{os.getpid()}-{self._seq:06d}{self._extension}"
+
+    def write(self, records: List[dict]):
+        payload = self._encode(records)
+        with open(os.path.join(self.directory, self.next_name()), "wb") as f:
+            f.write(payload)
+
+
+class GCSSink(FileSink):
+    """Uploads JSONL or Parquet batch files to a Cloud Storage prefix."""
+
+    def __init__(self, url: str, file_format: str = "jsonl"):
+        from google.cloud import storage
+
+        bucket_name, _, prefix = url[len("gs://"):].partition("/")
+        self._bucket = storage.Client().bucket(bucket_name)
+        self._prefix = prefix.rstrip("/")
+        self._encode, self._extension = ENCODERS[file_format]
+        self._seq = 0
+
+    def write(self, records: List[dict]):
+        name = f"{self._prefix}/{self.next_name()}" if self._prefix else self.next_name()
+        self._bucket.blob(name).upload_from_string(self._encode(records))
+
+
+class BigQuerySink:
+    """Streams records into a BigQuery table (instance stored as a JSON string)."""
+
+    def __init__(self, table_id: str):
+        from google.cloud import bigquery
+
+        self.table_id = table_id
+        self._client = bigquery.Client(project=table_id.split(".")[0])
+
+    def write(self, records: List[dict]):
+        rows = [dict(record, instance=json.dumps(record["instance"])) for record in records]
+        errors = self._client.insert_rows_json(self.table_id, rows)
+        if errors:
+            raise RuntimeError(f"BigQuery insert errors: {errors[:3]}")
+
+
+def sink_from_url(url: str):
+    """Builds a sink from `file:<dir>[?format=parquet]`, `gs://...[?format=parquet]` or `bq://table`."""
+    url, _, query = url.partition("?")
+    file_format = dict(part.split("=", 1) for part in query.split("&") if "=" in part).get("format", "jsonl")
+    if url.startswith("file:"):
+        return FileSink(url[len("file:"):], file_format)
+    if url.startswith("gs://"):
+        return GCSSink(url, file_format)
+    if url.startswith("bq://"):
+        return BigQuerySink(url[len("bq://"):])
+    raise ValueError(f"Unsupported prediction log sink: {url}")
+
+
+class PredictionLogger:
+    """Samples prediction requests and writes them in batches off the request thread.
+
+    Args:
+        sink: Object with `write(records)`.
+        sample_rate: Fraction of requests recorded (0-1).
+        max_buffer: Maximum records waiting to be written; beyond it, records are dropped.
+        batch_size: Records per sink write.
+        flush_interval_s: Maximum time a record waits before being written.
+        seed: Seed for the sampling decision.
+    """
+
+    _STOP = object()
+
+    def __init__(self, sink, sample_rate: float = 0.1, max_buffer: int = 10000, batch_size: int = 500,
+                 flush_interval_s: float = 5.0, seed: Optional[int] = None):
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_buffer)
+        self._random = random.Random(seed)
+        self._worker = threading.Thread(target=self._run, name="prediction-logger", daemon=True)
+        self._worker.start()
+        # Counters are updated without a lock; they are approximate under contention
+        self.seen = 0
+        self.sampled = 0
+        self.dropped = 0
+        self.written = 0
+        self.write_errors = 0
+
+    def log(self, instance: Dict[str, object], prediction: Optional[float], latency_ms: float,
+            endpoint_id: str = "", model_version: Optional[str] = None, error: Optional[str] = None,
+            cache_hit: bool = False) -> bool:
+        """Records one request if sampled. Never blocks; returns False if dropped or not sampled."""
+        self.seen += 1
+        if self._random.random() >= self.sample_rate:
+            return False
+        record = {
+            "request_id": uuid.uuid4().hex,
+            "timestamp": time.time(),
+            "endpoint_id": endpoint_id,
+            "model_version": model_version,
+            "instance": instance,
+            "prediction": prediction,
+            "latency_ms": latency_ms,
+            "error": error,
+            "cache_hit": cache_hit,
+        }
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.sampled += 1
+        return True
+
+    def stats(self) -> dict:
+        return {"seen": self.seen, "sampled": self.sampled, "dropped": self.dropped,
+                "written": self.written, "write_errors": self.write_errors, "buffered": self._queue.qsize()}
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Writes buffered records and stops the writer thread."""
+        while True:
+            try:
+                self._queue.put(self._STOP, timeout=1.0)
+                break
+            except queue.Full:
+                if not self._worker.is_alive():
+                    return
+        self._worker.join(timeout)
+
+    def _run(self):
+        batch: List[dict] = []
+        deadline = time.monotonic() + self.flush_interval_s
+        while True:
+            try:
+                record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                record = None
+            if record is self._STOP:
+                self._write(batch)
+                return
+            if record is not None:
+                batch.append(record)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval_s
+
+    def _write(self, batch: List[dict]):
+        if not batch:
+            return
+        try:
+            self.sink.write(batch)
+            self.written += len(batch)
+        except Exception as e:
+            # Logging must never affect serving; the batch is lost and counted
+            self.write_errors += len(batch)
+            logging.error(f"Prediction log write of {len(batch)} records failed: {e}")
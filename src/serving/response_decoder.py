@@ -0,0 +1,157 @@
+"""Prediction response decoding, specialized once per deployed model.
+
+AutoML tabular endpoints return `{"value": x, ...}` dicts, BQML endpoints
+return `[x]` lists, and custom containers may return bare numbers or dicts with
+another key. Instead of probing every prediction with `isinstance` checks and
+key searches, `DecoderRegistry` detects the schema once per deployed model
+(from the model's prediction schema or its first response), caches the matching
+`Decoder`, and decodes whole batches into a float64 NumPy array in one pass.
+
+Usage:
+    registry = DecoderRegistry()
+    values = registry.decode(endpoint.predict(instances=instances))
+"""
+import logging
+import threading
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+# Keys probed, in order, when a dict prediction has several entries
+CANDIDATE_KEYS = ("value", "prediction", "result", "weight", "output")
+
+
+class ResponseDecodeError(ValueError):
+    """Raised when predictions do not match the expected schema."""
+
+
+class Decoder:
+    """Decodes a batch of predictions that share one schema.
+
+    Args:
+        name: Schema name, e.g. "automl", "bqml", "scalar" or "dict:<key>".
+        extract: Function mapping one prediction to a number.
+    """
+
+    def __init__(self, name: str, extract: Callable[[object], float]):
+        self.name = name
+        self._extract = extract
+
+    def decode(self, predictions: Sequence) -> np.ndarray:
+        try:
+            return np.fromiter((self._extract(p) for p in predictions), dtype=np.float64, count=len(predictions))
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            bad = next((i for i, p in enumerate(predictions) if not _extracts(self._extract, p)), None)
+            raise ResponseDecodeError(
+                f"Prediction {bad} does not match schema {self.name}: {predictions[bad] if bad is not None else e}"
+            ) from e
+
+    def __repr__(self) -> str:
+        return f"Decoder({self.name})"
+
+
+def _extracts(extract: Callable[[object], float], prediction) -> bool:
+    try:
+        float(extract(prediction))
+        return True
+    except (KeyError, IndexError, TypeError, ValueError):
+        return False
+
+
+def dict_key_decoder(key: str) -> Decoder:
+    name = "automl" if key == "value" else f"dict:{key}"
+    return Decoder(name, lambda p: p[key])
+
+
+AUTOML_DECODER = dict_key_decoder("value")
+BQML_DECODER = Decoder("bqml", lambda p: p[0])
+SCALAR_DECODER = Decoder("scalar", lambda p: p)
+
+
+def _is_number(value) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    if isinstance(value, str):
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+    return False
+
+
+def detect_decoder(prediction) -> Decoder:
+    """Inspects one prediction and returns the decoder for its schema."""
+    if _is_number(prediction):
+        return SCALAR_DECODER
+    # Protobuf-backed containers from the SDK behave like dicts and lists
+    if hasattr(prediction, "keys"):
+        keys = list(prediction.keys())
+        if len(keys) == 1 and _is_number(prediction[keys[0]]):
+            return dict_key_decoder(keys[0])
+        for key in CANDIDATE_KEYS:
+            if key in prediction and _is_number(prediction[key]):
+                return dict_key_decoder(key)
+        for key in keys:
+            if _is_number(prediction[key]):
+                return dict_key_decoder(key)
+    elif isinstance(prediction, Sequence) and not isinstance(prediction, str):
+        if len(prediction) > 0 and _is_number(prediction[0]):
+            return BQML_DECODER
+    raise ResponseDecodeError(f"Could not find a numeric prediction in: {prediction}")
+
+
+def decoder_from_model(model) -> Optional[Decoder]:
+    """Decoder implied by a Vertex AI model's metadata, or None if unknown.
+
+    AutoML tabular regression models declare a regression prediction schema
+    and always return `{"value": ...}`; other models are detected from their
+    first response.
+    """
+    try:
+        schema_uri = model.predict_schemata.prediction_schema_uri
+    except AttributeError:
+        return None
+    if schema_uri and "regression" in schema_uri:
+        return AUTOML_DECODER
+    return None
+
+
+class DecoderRegistry:
+    """Thread-safe cache of decoders keyed by deployed model ID."""
+
+    def __init__(self):
+        self._decoders: Dict[str, Decoder] = {}
+        self._lock = threading.Lock()
+
+    def register(self, deployed_model_id: str, decoder: Decoder):
+        with self._lock:
+            self._decoders[deployed_model_id] = decoder
+
+    def register_model(self, deployed_model_id: str, model) -> Optional[Decoder]:
+        """Registers the decoder implied by model metadata, if any."""
+        decoder = decoder_from_model(model)
+        if decoder is not None:
+            self.register(deployed_model_id, decoder)
+        return decoder
+
+    def decoder_for(self, deployed_model_id: Optional[str], sample_prediction) -> Decoder:
+        with self._lock:
+            decoder = self._decoders.get(deployed_model_id)
+        if decoder is None:
+            decoder = detect_decoder(sample_prediction)
+            logging.info(f"Detected {decoder.name} prediction schema for deployed model {deployed_model_id}")
+            if deployed_model_id:
+                self.register(deployed_model_id, decoder)
+        return decoder
+
+    def decode_predictions(self, predictions: Sequence, deployed_model_id: Optional[str] = None) -> np.ndarray:
+        if len(predictions) == 0:
+            raise ResponseDecodeError("No predictions returned from the endpoint")
+        return self.decoder_for(deployed_model_id, predictions[0]).decode(predictions)
+
+    def decode(self, response) -> np.ndarray:
+        """Decodes a predict response into a float64 array, one value per instance."""
+        return self.decode_predictions(list(response.predictions), getattr(response, "deployed_model_id", None))
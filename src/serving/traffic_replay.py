@@ -0,0 +1,449 @@
+"""Replays logged prediction traffic against an endpoint and compares runs.
+
+Requests come from the files written by `prediction_logger.PredictionLogger`
+(`*.jsonl.gz`, `*.parquet`) or from plain JSON/JSONL files of instances
+(either one instance per line or `{"instances": [...]}` request bodies).
+Logged timestamps give the original inter-arrival times. Plain instance
+files have none and can only be used in the constant and ramp modes.
+
+Arrival schedules (all open loop: requests are sent at their scheduled time
+whether or not earlier ones have finished):
+  * preserve: original inter-arrival times, divided by `--speedup`
+  * constant: fixed `--qps` for `--duration-s`
+  * ramp: `--start-qps`, raised by `--step-qps` every `--step-duration-s`
+    for `--steps` steps; each step is reported separately
+
+Latency goes into `LatencyHistogram`, a log-bucketed (HDR-style) histogram
+with bounded relative error. Response time is measured from each request's
+scheduled send time, so a client that falls behind does not hide queueing
+(coordinated omission). Service time is measured from the actual send.
+
+Usage:
+    python -m src.serving.traffic_replay run --input prediction_logs/ --mode preserve --speedup 4 \\
+        --endpoint fake --output baseline.json
+    python -m src.serving.traffic_replay run --input prediction_logs/ --mode ramp --start-qps 10 \\
+        --step-qps 10 --steps 8 --endpoint projects/.../endpoints/123 --output ramp.json
+    python -m src.serving.traffic_replay compare baseline.json candidate.json --max-regression-pct 10
+"""
+import argparse
+import asyncio
+import glob
+import gzip
+import json
+import logging
+import math
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+REPORTED_PERCENTILES = (50, 90, 95, 99, 99.9)
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (HDR-style) with bounded relative error.
+
+    Values are counted in buckets whose bounds grow by a factor of
+    1 + 10**-significant_digits. Percentiles are therefore accurate to that
+    relative error whatever the value range, and histograms from several runs
+    or workers can be merged by adding counts.
+
+    Args:
+        significant_digits: 2 gives 1% relative error.
+        lowest_ms: Values below this are counted in the lowest bucket.
+    """
+
+    def __init__(self, significant_digits: int = 2, lowest_ms: float = 0.001):
+        self.significant_digits = significant_digits
+        self.lowest_ms = lowest_ms
+        self._log_base = math.log1p(10 ** -significant_digits)
+        self.counts: Counter = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, value_ms: float):
+        self.counts[int(math.floor(math.log(max(value_ms, self.lowest_ms)) / self._log_base))] += 1
+        self.count += 1
+        self.total += value_ms
+        self.min = min(self.min, value_ms)
+        self.max = max(self.max, value_ms)
+
+    def merge(self, other: "LatencyHistogram"):
+        if other.significant_digits != self.significant_digits:
+            raise ValueError("Cannot merge histograms with different precision")
+        self.counts.update(other.counts)
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, pct: float) -> float:
+        """Value at `pct` (0-100), as the geometric middle of its bucket."""
+        if not self.count:
+            return math.nan
+        rank = max(1, math.ceil(pct / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(max(math.exp((index + 0.5) * self._log_base), self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    def summary(self) -> Dict[str, float]:
+        summary = {"count": self.count, "mean_ms": round(self.mean, 3),
+                   "min_ms": round(self.min, 3) if self.count else None, "max_ms": round(self.max, 3)}
+        for pct in REPORTED_PERCENTILES:
+            summary[f"p{pct:g}_ms"] = round(self.percentile(pct), 3)
+        return summary
+
+    def to_dict(self) -> dict:
+        return {"significant_digits": self.significant_digits, "lowest_ms": self.lowest_ms,
+                "counts": {str(index): n for index, n in sorted(self.counts.items())},
+                "count": self.count, "total": self.total, "min": self.min if self.count else None, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls(data["significant_digits"], data["lowest_ms"])
+        histogram.counts = Counter({int(index): n for index, n in data["counts"].items()})
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"] if data["min"] is not None else math.inf
+        histogram.max = data["max"]
+        return histogram
+
+
+class LoggedRequest(NamedTuple):
+    timestamp: Optional[float]  # Epoch seconds, None for plain instance files
+    instance: Dict[str, str]
+
+
+class ScheduledRequest(NamedTuple):
+    send_at: float  # Seconds after the start of the run
+    step: int       # Ramp step (0 for the other modes)
+    instance: Dict[str, str]
+
+
+def _read_file(path: str) -> Iterable[LoggedRequest]:
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for row in pq.read_table(path, columns=["timestamp", "instance"]).to_pylist():
+            yield LoggedRequest(row["timestamp"], json.loads(row["instance"]))
+        return
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        if path.endswith((".json", ".json.gz")):
+            lines = [f.read()]
+        else:
+            lines = f
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "instances" in record:
+                for instance in record["instances"]:
+                    yield LoggedRequest(None, instance)
+            elif "instance" in record:
+                yield LoggedRequest(record.get("timestamp"), record["instance"])
+            else:
+                yield LoggedRequest(None, record)
+
+
+def load_requests(paths: List[str]) -> List[LoggedRequest]:
+    """Reads logged requests from files or directories, ordered by timestamp."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(p for p in glob.glob(os.path.join(path, "*"))
+                                if p.endswith((".jsonl", ".jsonl.gz", ".json", ".json.gz", ".parquet"))))
+        else:
+            files.append(path)
+    requests = [request for path in files for request in _read_file(path)]
+    if not requests:
+        raise ValueError(f"No requests found in {paths}")
+    if all(request.timestamp is not None for request in requests):
+        requests.sort(key=lambda request: request.timestamp)
+    return requests
+
+
+def build_schedule(requests: List[LoggedRequest], mode: str, speedup: float = 1.0, qps: float = 10.0,
+                   duration_s: Optional[float] = None, start_qps: float = 5.0, step_qps: float = 5.0,
+                   step_duration_s: float = 30.0, steps: int = 5) -> List[ScheduledRequest]:
+    """Turns logged requests into send times; instances are reused round-robin when needed."""
+    if mode == "preserve":
+        if any(request.timestamp is None for request in requests):
+            raise ValueError("preserve mode needs logged timestamps; use constant or ramp for plain instance files")
+        first = requests[0].timestamp
+        return [ScheduledRequest((request.timestamp - first) / speedup, 0, request.instance) for request in requests]
+
+    if mode == "constant":
+        total = int(round(qps * duration_s)) if duration_s else len(requests)
+        return [ScheduledRequest(i / qps, 0, requests[i % len(requests)].instance) for i in range(total)]
+
+    if mode == "ramp":
+        schedule = []
+        for step in range(steps):
+            step_rate = start_qps + step * step_qps
+            step_start = step * step_duration_s
+            for i in range(int(round(step_rate * step_duration_s))):
+                schedule.append(ScheduledRequest(step_start + i / step_rate, step,
+                                                 requests[len(schedule) % len(requests)].instance))
+        return schedule
+
+    raise ValueError(f"Unknown replay mode: {mode}")
+
+
+class _StepStats:
+    def __init__(self):
+        self.response = LatencyHistogram()
+        self.service = LatencyHistogram()
+        self.errors: Counter = Counter()
+        self.sent = 0
+        self.first_send = math.inf
+        self.last_done = 0.0
+
+    def to_dict(self, target_qps: Optional[float]) -> dict:
+        elapsed = self.last_done - self.first_send if self.sent else 0.0
+        return {
+            "target_qps": target_qps,
+            "sent": self.sent,
+            "errors": sum(self.errors.values()),
+            "error_rate": round(sum(self.errors.values()) / self.sent, 4) if self.sent else 0.0,
+            "errors_by_type": dict(self.errors),
+            "achieved_qps": round(self.response.count / elapsed, 2) if elapsed > 0 else None,
+            "response_time": self.response.summary(),
+            "service_time": self.service.summary(),
+            "response_histogram": self.response.to_dict(),
+        }
+
+
+async def replay(schedule: List[ScheduledRequest], client, timeout_s: float = 10.0,
+                 max_in_flight: int = 1000) -> Dict[int, _StepStats]:
+    """Sends the schedule open loop and returns per-step statistics.
+
+    `client` needs `predict_async(instances=...)` (Vertex AI SDK, FakeEndpoint)
+    or `predict(instances=...)`, which is then run on a thread pool. Requests
+    that would exceed `max_in_flight` are not sent and count as
+    `client_overload` errors.
+    """
+    loop = asyncio.get_running_loop()
+    steps: Dict[int, _StepStats] = {}
+    in_flight = 0
+    pool = None
+    if hasattr(client, "predict_async"):
+        def call(instances):
+            return client.predict_async(instances=instances)
+    else:
+        pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="replay")
+
+        def call(instances):
+            return loop.run_in_executor(pool, lambda: client.predict(instances=instances))
+
+    async def send(request: ScheduledRequest, scheduled: float, stats: _StepStats):
+        nonlocal in_flight
+        sent = loop.time()
+        try:
+            response = await asyncio.wait_for(call([request.instance]), timeout_s)
+            if not response.predictions:
+                raise ValueError("empty predictions")
+            done = loop.time()
+            stats.response.record((done - scheduled) * 1000)
+            stats.service.record((done - sent) * 1000)
+        except asyncio.TimeoutError:
+            stats.errors["timeout"] += 1
+        except Exception as e:
+            stats.errors[type(e).__name__] += 1
+        finally:
+            in_flight -= 1
+            stats.last_done = max(stats.last_done, loop.time())
+
+    start = loop.time() + 0.05
+    tasks = []
+    for request in schedule:
+        scheduled = start + request.send_at
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        stats = steps.setdefault(request.step, _StepStats())
+        stats.sent += 1
+        stats.first_send = min(stats.first_send, scheduled)
+        if in_flight >= max_in_flight:
+            stats.errors["client_overload"] += 1
+            continue
+        in_flight += 1
+        tasks.append(asyncio.create_task(send(request, scheduled, stats)))
+    await asyncio.gather(*tasks)
+    if pool is not None:
+        pool.shutdown(wait=False)
+    return steps
+
+
+def run_replay(schedule: List[ScheduledRequest], client, config: dict, timeout_s: float = 10.0,
+               max_in_flight: int = 1000) -> dict:
+    """Runs `replay` and returns the JSON-serializable run report."""
+    started = time.time()
+    steps = asyncio.run(replay(schedule, client, timeout_s, max_in_flight))
+    overall = _StepStats()
+    for stats in steps.values():
+        overall.response.merge(stats.response)
+        overall.service.merge(stats.service)
+        overall.errors.update(stats.errors)
+        overall.sent += stats.sent
+        overall.first_send = min(overall.first_send, stats.first_send)
+        overall.last_done = max(overall.last_done, stats.last_done)
+
+    def step_qps(step):
+        if config.get("mode") == "ramp":
+            return config["start_qps"] + step * config["step_qps"]
+        return config.get("qps") if config.get("mode") == "constant" else None
+
+    return {
+        "config": config,
+        "started_at": started,
+        "overall": overall.to_dict(None),
+        "steps": [dict(step=step, **steps[step].to_dict(step_qps(step))) for step in sorted(steps)],
+    }
+
+
+def compare_runs(baseline: dict, candidate: dict, max_regression_pct: Optional[float] = None) -> dict:
+    """Compares two run reports; response-time percentiles and error rate drive regressions."""
+    def metrics(report):
+        values = dict(report["overall"]["response_time"])
+        values["error_rate"] = report["overall"]["error_rate"]
+        values["achieved_qps"] = report["overall"]["achieved_qps"]
+        return values
+
+    base, cand = metrics(baseline), metrics(candidate)
+    rows, regressions = [], []
+    for name in base:
+        if name == "count" or base[name] is None or cand.get(name) is None:
+            continue
+        delta = cand[name] - base[name]
+        delta_pct = delta / base[name] * 100 if base[name] else (0.0 if not delta else math.inf)
+        rows.append({"metric": name, "baseline": base[name], "candidate": cand[name],
+                     "delta": round(delta, 3), "delta_pct": round(delta_pct, 1)})
+        # Single extreme values are too noisy to gate on
+        gated = (name.startswith("p") and name.endswith("_ms")) or name in ("mean_ms", "error_rate")
+        if max_regression_pct is not None and gated and delta_pct > max_regression_pct:
+            regressions.append(name)
+
+    step_rows = []
+    if len(baseline["steps"]) > 1 and len(baseline["steps"]) == len(candidate["steps"]):
+        for base_step, cand_step in zip(baseline["steps"], candidate["steps"]):
+            step_rows.append({
+                "step": base_step["step"],
+                "target_qps": base_step["target_qps"],
+                "baseline_p95_ms": base_step["response_time"]["p95_ms"],
+                "candidate_p95_ms": cand_step["response_time"]["p95_ms"],
+                "baseline_error_rate": base_step["error_rate"],
+                "candidate_error_rate": cand_step["error_rate"],
+            })
+    return {"metrics": rows, "steps": step_rows, "regressions": regressions}
+
+
+def format_comparison(comparison: dict) -> str:
+    lines = [f"{'metric':<14}{'baseline':>12}{'candidate':>12}{'delta':>12}{'delta %':>10}"]
+    for row in comparison["metrics"]:
+        lines.append(f"{row['metric']:<14}{row['baseline']:>12}{row['candidate']:>12}"
+                     f"{row['delta']:>12}{row['delta_pct']:>10}")
+    if comparison["steps"]:
+        lines.append("")
+        lines.append(f"{'step':<6}{'qps':>8}{'base p95':>12}{'cand p95':>12}{'base err':>10}{'cand err':>10}")
+        for row in comparison["steps"]:
+            lines.append(f"{row['step']:<6}{row['target_qps']:>8}{row['baseline_p95_ms']:>12}"
+                         f"{row['candidate_p95_ms']:>12}{row['baseline_error_rate']:>10}{row['candidate_error_rate']:>10}")
+    if comparison["regressions"]:
+        lines.append("")
+        lines.append(f"Regressions: {', '.join(comparison['regressions'])}")
+    return "\n".join(lines)
+
+
+def _client(args):
+    if args.endpoint == "fake":
+        from src.serving.fake_endpoint import FakeEndpoint
+
+        return FakeEndpoint(latency_s=args.fake_latency_ms / 1000, jitter_s=args.fake_jitter_ms / 1000,
+                            failure_rate=args.fake_failure_rate, max_concurrency=args.fake_max_concurrency, seed=0)
+    from google.cloud import aiplatform
+
+    aiplatform.init(project=args.project, location=args.region)
+    return aiplatform.Endpoint(args.endpoint)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay logged prediction traffic and compare runs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Replay requests against an endpoint.")
+    run.add_argument("--input", nargs="+", required=True, help="Logged request files or directories.")
+    run.add_argument("--mode", choices=["preserve", "constant", "ramp"], default="preserve")
+    run.add_argument("--speedup", type=float, default=1.0, help="preserve: divide inter-arrival times by this.")
+    run.add_argument("--qps", type=float, default=10.0, help="constant: request rate.")
+    run.add_argument("--duration-s", type=float, help="constant: run length (default: one pass over the input).")
+    run.add_argument("--start-qps", type=float, default=5.0)
+    run.add_argument("--step-qps", type=float, default=5.0)
+    run.add_argument("--step-duration-s", type=float, default=30.0)
+    run.add_argument("--steps", type=int, default=5)
+    run.add_argument("--endpoint", default="fake", help="Endpoint resource name or ID, or 'fake'.")
+    run.add_argument("--project", default=os.getenv("PROJECT"))
+    run.add_argument("--region", default=os.getenv("REGION", "us-central1"))
+    run.add_argument("--timeout-s", type=float, default=10.0)
+    run.add_argument("--max-in-flight", type=int, default=1000)
+    run.add_argument("--fake-latency-ms", type=float, default=50.0)
+    run.add_argument("--fake-jitter-ms", type=float, default=20.0)
+    run.add_argument("--fake-failure-rate", type=float, default=0.0)
+    run.add_argument("--fake-max-concurrency", type=int, help="Simulated replica capacity (concurrent calls).")
+    run.add_argument("--output", required=True, help="Run report JSON path.")
+
+    compare = sub.add_parser("compare", help="Compare two run reports.")
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+    compare.add_argument("--max-regression-pct", type=float, help="Exit non-zero if a latency or error metric "
+                                                                    "regresses by more than this percentage.")
+    compare.add_argument("--output", help="Write the comparison as JSON to this file.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.command == "run":
+        requests = load_requests(args.input)
+        config = {key: value for key, value in vars(args).items() if key not in ("command", "output")}
+        try:
+            schedule = build_schedule(requests, args.mode, speedup=args.speedup, qps=args.qps,
+                                      duration_s=args.duration_s, start_qps=args.start_qps, step_qps=args.step_qps,
+                                      step_duration_s=args.step_duration_s, steps=args.steps)
+        except ValueError as e:
+            parser.error(str(e))
+        logging.info(f"Replaying {len(schedule)} requests ({len(requests)} logged) in {args.mode} mode "
+                     f"over {schedule[-1].send_at:.1f}s against {args.endpoint}")
+        report = run_replay(schedule, _client(args), config, args.timeout_s, args.max_in_flight)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        for step in report["steps"]:
+            logging.info(f"step {step['step']} target_qps={step['target_qps']} achieved_qps={step['achieved_qps']} "
+                         f"p50={step['response_time']['p50_ms']}ms p95={step['response_time']['p95_ms']}ms "
+                         f"p99={step['response_time']['p99_ms']}ms error_rate={step['error_rate']}")
+        logging.info(f"Wrote run report to {args.output}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.candidate) as f:
+            candidate = json.load(f)
+        comparison = compare_runs(baseline, candidate, args.max_regression_pct)
+        print(format_comparison(comparison))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(comparison, f, indent=2)
+        if comparison["regressions"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
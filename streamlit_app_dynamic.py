@@ -1,13 +1,20 @@
 import os
-import pandas as pd
 import streamlit as st
-from google.cloud import aiplatform as vertex_ai
 import logging
 from dotenv import load_dotenv
 from typing import Dict, List, Optional, Union, Tuple
 import datetime
+import functools
 import pathlib
 import json
+import time
+import uuid
+
+from src.serving.prediction_cache import PredictionCache, backend_from_url
+from src.serving.prediction_executor import PredictionExecutor
+from src.serving.prediction_logger import PredictionLogger, sink_from_url
+from src.serving.instance_validation import InstanceValidator
+from src.serving.response_decoder import DecoderRegistry
 
 # --- Load Environment Variables ---
 env_path = pathlib.Path('.env')
@@ -20,6 +27,23 @@ else:
 # --- Required Environment Variables ---
 REQUIRED_ENV_VARS = ["PROJECT"]
 
+# Per-request deadline for endpoint predictions, in seconds
+PREDICTION_DEADLINE_S = float(os.getenv("PREDICTION_DEADLINE_S", "10"))
+# Prediction cache: "memory" (per process), "file:<path>" or "redis://host:port/db" (shared)
+PREDICTION_CACHE_BACKEND = os.getenv("PREDICTION_CACHE_BACKEND", "memory")
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_MAX_ENTRIES", "10000"))
+PREDICTION_CACHE_TTL_S = float(os.getenv("PREDICTION_CACHE_TTL_S", str(24 * 3600)))
+
+# Sampled request/response log: "" (off), "file:<dir>[?format=parquet]", "gs://bucket/prefix" or "bq://table"
+PREDICTION_LOG_SINK = os.getenv("PREDICTION_LOG_SINK", "")
+PREDICTION_LOG_SAMPLE_RATE = float(os.getenv("PREDICTION_LOG_SAMPLE_RATE", "0.1"))
+
+# Training-derived instance schema (`python -m src.serving.instance_validation derive`); optional
+INSTANCE_SCHEMA_PATH = os.getenv("INSTANCE_SCHEMA_PATH", "instance_schema.json")
+
+# Prediction response decoders, cached per deployed model (used from executor threads)
+RESPONSE_DECODERS = DecoderRegistry()
+
 # --- Configure Logging ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -37,13 +61,16 @@ st.set_page_config(
 )
 
 # --- Create Theme Config ---
-# This will create the .streamlit folder and config.toml if they don't exist
-config_dir = pathlib.Path('.streamlit')
-config_dir.mkdir(exist_ok=True)
+# This will create the .streamlit folder and config.toml if they don't exist.
+# Cached so it runs once per server process instead of on every rerun.
+@st.cache_resource(show_spinner=False)
+def ensure_theme_config() -> pathlib.Path:
+    config_dir = pathlib.Path('.streamlit')
+    config_dir.mkdir(exist_ok=True)
 
-config_file = config_dir / 'config.toml'
-if not config_file.exists():
-    config_file.write_text("""
+    config_file = config_dir / 'config.toml'
+    if not config_file.exists():
+        config_file.write_text("""
 [theme]
 primaryColor = "#4F8BF9"
 backgroundColor = "#FFFFFF"
@@ -52,10 +79,15 @@ textColor = "#262730"
 font = "sans serif"
 base = "light"
     """)
-    logging.info("Created custom theme configuration")
+        logging.info("Created custom theme configuration")
+    return config_file
+
+ensure_theme_config()
 
 # --- Custom CSS ---
-st.markdown("""
+# Streamlit rebuilds the page on every rerun, so the style block has to be emitted
+# each time; keeping it a module constant means it is only built once per process.
+CUSTOM_CSS = """
 <style>
     /* Global styles */
     .main .block-container {
@@ -174,7 +206,8 @@ st.markdown("""
         animation: pulse 1.5s infinite ease-in-out;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 # --- Helper Functions ---
 def check_environment_variables() -> bool:
@@ -203,6 +236,20 @@ def check_environment_variables() -> bool:
     
     return True
 
+@st.cache_resource(show_spinner=False)
+def _init_vertex_ai(project_id: str, region: str):
+    """
+    Import and initialize the Vertex AI SDK once per server process.
+    
+    The SDK is the heaviest import in the app, so it is deferred until first use
+    and shared by all sessions. Failures raise and are therefore not cached.
+    """
+    from google.cloud import aiplatform as vertex_ai
+
+    vertex_ai.init(project=project_id, location=region)
+    logging.info(f"Initialized Vertex AI with project: {project_id}, region: {region}")
+    return vertex_ai
+
 def initialize_vertex_ai() -> bool:
     """
     Initialize Vertex AI with the project from environment variables.
@@ -219,22 +266,37 @@ def initialize_vertex_ai() -> bool:
             logging.error("PROJECT environment variable is required but not set.")
             return False
         
-        # Initialize Vertex AI
-        vertex_ai.init(project=project_id, location=region)
-        logging.info(f"Initialized Vertex AI with project: {project_id}, region: {region}")
+        # Initialize Vertex AI (cached across reruns and sessions)
+        _init_vertex_ai(project_id, region)
         return True
     except Exception as e:
         st.error(f"Failed to initialize Vertex AI: {str(e)}")
         logging.error(f"Vertex AI initialization error: {str(e)}")
         return False
 
-def get_available_endpoints() -> List[Tuple[str, str, datetime.datetime, Optional[str]]]:
+def deployment_key(endpoint_dict: Dict) -> Optional[str]:
+    """
+    Identifies what an endpoint currently serves: each deployed model's ID
+    and model version. Both change on every redeploy, unlike the Model
+    resource ID, which stays the same when retraining adds a version.
+    """
+    deployed_models = endpoint_dict.get("deployedModels") or []
+    if not deployed_models:
+        return None
+    return ",".join(sorted(
+        f"{deployed_model.get('id', '')}@{deployed_model.get('modelVersionId', '')}"
+        for deployed_model in deployed_models
+    ))
+
+def get_available_endpoints() -> List[Tuple[str, str, datetime.datetime, Optional[str], Optional[str]]]:
     """
     Find all available endpoints for baby weight prediction.
     
     Returns:
-        List of tuples containing (endpoint_id, display_name, creation_time, model_id)
+        List of tuples containing (endpoint_id, display_name, creation_time, model_id, deployment_key)
     """
+    from google.cloud import aiplatform as vertex_ai
+
     try:
         # List all endpoints
         endpoints = vertex_ai.Endpoint.list()
@@ -260,11 +322,13 @@ def get_available_endpoints() -> List[Tuple[str, str, datetime.datetime, Optiona
         endpoint_info = []
         for endpoint in sorted_endpoints:
             model_id = None
+            deployed = None
             # Get detailed endpoint information
             try:
                 # Get a fresh endpoint object to ensure we have the latest data
                 endpoint_detail = vertex_ai.Endpoint(endpoint.name)
                 endpoint_dict = endpoint_detail.to_dict()
+                deployed = deployment_key(endpoint_dict)
                 
                 # Try to extract model ID from deployedModels array if it exists
                 if "deployedModels" in endpoint_dict and endpoint_dict["deployedModels"]:
@@ -287,12 +351,14 @@ def get_available_endpoints() -> List[Tuple[str, str, datetime.datetime, Optiona
             except Exception as e:
                 logging.warning(f"Error extracting model ID for endpoint {endpoint.display_name}: {str(e)}")
                 model_id = None
+                deployed = None
             
             endpoint_info.append((
                 endpoint.name, 
                 endpoint.display_name, 
                 endpoint.create_time,
-                model_id
+                model_id,
+                deployed
             ))
         
         return endpoint_info
@@ -301,96 +367,147 @@ def get_available_endpoints() -> List[Tuple[str, str, datetime.datetime, Optiona
         logging.error(f"Endpoint discovery error: {str(e)}")
         return []
 
-def predict_baby_weight(
+@functools.lru_cache(maxsize=16)
+def _get_endpoint(endpoint_id: str):
+    """
+    Returns a cached Endpoint handle; safe to call from executor threads.
+    
+    Registers a response decoder for each deployed model whose metadata
+    implies its schema; the others are detected from their first response.
+    """
+    from google.cloud import aiplatform as vertex_ai
+    endpoint = vertex_ai.Endpoint(endpoint_id)
+    try:
+        for deployed_model in endpoint.list_models():
+            RESPONSE_DECODERS.register_model(deployed_model.id, vertex_ai.Model(deployed_model.model))
+    except Exception as e:
+        logging.warning(f"Could not read deployed model metadata for {endpoint_id}: {e}")
+    return endpoint
+
+def build_prediction_instance(
     is_male: int,
     mother_age: int,
     gestation_weeks: int,
     plurality: int,
     cigarette_use: int,
-    alcohol_use: int,
-    endpoint_id: str
-) -> float:
+    alcohol_use: int
+) -> Dict[str, str]:
+    """Builds the endpoint request instance from the form values."""
+    return {
+        "is_male": str(is_male),
+        "mother_age": str(mother_age), 
+        "gestation_weeks": str(gestation_weeks),
+        "plurality_category": f"Single({plurality})" if plurality == 1 else f"Multiple({plurality})",
+        "cigarette_use_str": "True" if cigarette_use == 1 else "False",
+        "alcohol_use_str": "True" if alcohol_use == 1 else "False"
+    }
+
+def predict_baby_weight(instance: Dict[str, str], endpoint_id: str) -> float:
     """
     Make prediction for baby weight using the Vertex AI endpoint.
     
+    Runs on the shared prediction executor's threads, so it must not call
+    Streamlit APIs.
+    
     Args:
-        is_male: 1 if male, 0 if female
-        mother_age: Age of the mother in years
-        gestation_weeks: Number of gestation weeks
-        plurality: Type of pregnancy (1=single, 2=twins, etc.)
-        cigarette_use: 1 if the mother smokes, 0 if not
-        alcohol_use: 1 if the mother consumes alcohol, 0 if not
+        instance: Request instance built by `build_prediction_instance`
         endpoint_id: The Vertex AI endpoint ID to use for prediction
     
     Returns:
         Predicted baby weight in pounds
     """
     try:
-        # Create Endpoint instance
-        endpoint = vertex_ai.Endpoint(endpoint_id)
-        
-        # Prepare the instance for prediction
-        instance = {
-            "is_male": str(is_male),
-            "mother_age": str(mother_age), 
-            "gestation_weeks": str(gestation_weeks),
-            "plurality_category": f"Single({plurality})" if plurality == 1 else f"Multiple({plurality})",
-            "cigarette_use_str": "True" if cigarette_use == 1 else "False",
-            "alcohol_use_str": "True" if alcohol_use == 1 else "False"
-        }
+        endpoint = _get_endpoint(endpoint_id)
         
         # Log the request (for debugging)
         logging.info(f"Sending prediction request: {instance}")
         
-        # Add a little delay for visual effect
-        with st.spinner("Getting prediction..."):
-            # Make the prediction
-            response = endpoint.predict(instances=[instance])
-            
-            # Extract and validate the prediction
-            predictions = response.predictions
-            if not predictions or len(predictions) == 0:
-                raise ValueError("No predictions returned from the endpoint")
-            
-            # For debugging
-            logging.info(f"Prediction type: {type(predictions[0])}")
-            logging.info(f"Prediction content: {predictions[0]}")
-            
-            # Return the predicted value, handling different response formats
-            prediction = predictions[0]
-            
-            # Case 1: Direct float value
-            if isinstance(prediction, (int, float)):
-                return float(prediction)
-                
-            # Case 2: Dictionary with a single value
-            elif isinstance(prediction, dict):
-                if len(prediction) == 1:
-                    # If there's only one value, use it
-                    return float(list(prediction.values())[0])
-                
-                # Try to find a key that might contain the prediction
-                for key in ['value', 'prediction', 'result', 'weight', 'output']:
-                    if key in prediction:
-                        return float(prediction[key])
-                
-                # If we haven't found a value yet, try to use any numeric value we can find
-                for value in prediction.values():
-                    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace('.', '', 1).isdigit()):
-                        return float(value)
-            
-            # Case 3: List or array - take first element if it's a number
-            elif isinstance(prediction, list) and len(prediction) > 0:
-                return float(prediction[0])
-            
-            # If we reach here, we couldn't parse the prediction
-            raise ValueError(f"Could not extract a numeric prediction from the response: {prediction}")
+        response = endpoint.predict(instances=[instance], timeout=PREDICTION_DEADLINE_S)
+        
+        # Decoder is detected on the first response per deployed model, then reused
+        return float(RESPONSE_DECODERS.decode(response)[0])
             
     except Exception as e:
         error_msg = f"Prediction error: {str(e)}"
         logging.error(error_msg)
         raise RuntimeError(error_msg)
 
+def get_session_id() -> str:
+    """Stable identifier for the current browser session."""
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
+    return st.session_state["session_id"]
+
+@st.cache_resource(show_spinner=False)
+def get_prediction_executor() -> PredictionExecutor:
+    """Prediction executor shared by all sessions for the life of the server."""
+    return PredictionExecutor(deadline_s=PREDICTION_DEADLINE_S)
+
+@st.cache_resource(show_spinner=False)
+def get_prediction_cache() -> PredictionCache:
+    """Prediction cache shared by all sessions, optionally backed by a shared store."""
+    try:
+        backend = backend_from_url(PREDICTION_CACHE_BACKEND, ttl_seconds=PREDICTION_CACHE_TTL_S)
+    except Exception as e:
+        logging.warning(f"Prediction cache backend unavailable, using in-process cache only: {e}")
+        backend = None
+    return PredictionCache(max_entries=PREDICTION_CACHE_MAX_ENTRIES, ttl_seconds=PREDICTION_CACHE_TTL_S,
+                           backend=backend)
+
+@st.cache_resource(show_spinner=False)
+def get_instance_validator() -> InstanceValidator:
+    """Validator for request instances, from the derived schema file if present."""
+    if os.path.exists(INSTANCE_SCHEMA_PATH):
+        return InstanceValidator.from_file(INSTANCE_SCHEMA_PATH)
+    return InstanceValidator()
+
+@st.cache_resource(show_spinner=False)
+def get_prediction_logger() -> Optional[PredictionLogger]:
+    """Sampled request/response logger shared by all sessions, or None when disabled."""
+    if not PREDICTION_LOG_SINK:
+        return None
+    try:
+        return PredictionLogger(sink_from_url(PREDICTION_LOG_SINK), sample_rate=PREDICTION_LOG_SAMPLE_RATE)
+    except Exception as e:
+        logging.warning(f"Prediction logging disabled, sink unavailable: {e}")
+        return None
+
+def predict_and_cache(
+    prediction_cache: PredictionCache,
+    instance: Dict[str, str],
+    endpoint_id: str,
+    model_version: Optional[str]
+) -> float:
+    """
+    Calls the endpoint and stores the result; runs on the prediction executor.
+    
+    Hedged attempts each run this function, so it does not log: the caller
+    logs once per user request.
+    """
+    prediction = predict_baby_weight(instance, endpoint_id)
+    if model_version is not None:
+        prediction_cache.put(instance, endpoint_id, model_version, prediction)
+    return prediction
+
+def wait_for_prediction(future, poll_interval_s: float = 0.05) -> float:
+    """
+    Poll the prediction future instead of blocking on the network call.
+    
+    Each poll updates a status placeholder. Streamlit only checks for a
+    pending rerun when the script sends an element, so this is what lets a
+    new widget interaction interrupt the wait; the resubmitted request then
+    cancels this one.
+    """
+    status = st.empty()
+    start = time.perf_counter()
+    try:
+        while not future.done():
+            status.caption(f"⏳ Getting prediction... {time.perf_counter() - start:.1f}s")
+            time.sleep(poll_interval_s)
+    finally:
+        status.empty()
+    return future.result()
+
 def get_weight_category(weight: float) -> Tuple[str, str, str]:
     """
     Categorize baby weight and return status info.
@@ -447,11 +564,12 @@ def main():
     
     # Process endpoint options with proper handling for the model ID
     endpoint_options = []
-    for endpoint_id, display_name, created_time, model_id in available_endpoints:
+    for endpoint_id, display_name, created_time, model_id, deployed in available_endpoints:
         endpoint_options.append({
             "endpoint_id": endpoint_id,
             "display_name": display_name,
-            "created_time": created_time
+            "created_time": created_time,
+            "deployment_key": deployed
         })
     
     # Ensure endpoint_options is not empty before accessing elements
@@ -477,7 +595,7 @@ def main():
         
         # Get model ID (from the available_endpoints data)
         model_id = None
-        for endpoint_id, display_name, created_time, model_id_value in available_endpoints:
+        for endpoint_id, display_name, created_time, model_id_value, _ in available_endpoints:
             if endpoint_id == selected_endpoint["endpoint_id"]:
                 model_id = model_id_value
                 break
@@ -661,16 +779,51 @@ def main():
     # Make prediction when form is submitted
     if submit_button:
         try:
-            # Call the prediction function
-            predicted_weight = predict_baby_weight(
+            # Submit to the shared executor; resubmitting cancels this session's previous request
+            instance = build_prediction_instance(
                 is_male=is_male,
                 mother_age=mother_age,
                 gestation_weeks=gestation_weeks,
                 plurality=plurality,
                 cigarette_use=cigarette_use,
-                alcohol_use=alcohol_use,
-                endpoint_id=selected_endpoint["endpoint_id"]
+                alcohol_use=alcohol_use
             )
+            # Reject out-of-schema inputs locally and canonicalize spellings to the training values
+            validator = get_instance_validator()
+            validation = validator.validate([instance])
+            if not validation.valid[0]:
+                logging.warning(f"Rejected instance {instance}: {validation.reasons[0]}; totals: {validator.stats()}")
+                raise ValueError(f"Invalid input ({', '.join(validation.reasons[0])})")
+            instance = validation.instances[0]
+            
+            # The deployed model ID and version are part of the cache key, so a new deployment invalidates it.
+            # Without them the cache is bypassed: nothing else tells the deployments apart.
+            model_version = selected_endpoint["deployment_key"]
+            prediction_cache = get_prediction_cache()
+            prediction_logger = get_prediction_logger()
+            start = time.perf_counter()
+            predicted_weight = None
+            if model_version is not None:
+                predicted_weight = prediction_cache.get(instance, selected_endpoint["endpoint_id"], model_version)
+            cache_hit = predicted_weight is not None
+            if not cache_hit:
+                future = get_prediction_executor().submit(
+                    predict_and_cache, prediction_cache, instance,
+                    selected_endpoint["endpoint_id"], model_version,
+                    session_key=get_session_id()
+                )
+                try:
+                    predicted_weight = wait_for_prediction(future)
+                except Exception as e:
+                    if prediction_logger is not None:
+                        prediction_logger.log(instance, None, (time.perf_counter() - start) * 1000,
+                                              selected_endpoint["endpoint_id"], model_version, error=str(e))
+                    raise
+            if prediction_logger is not None:
+                # One record per user request, cache hits included; non-blocking: sampled, queued, written in batches
+                prediction_logger.log(instance, predicted_weight, (time.perf_counter() - start) * 1000,
+                                      selected_endpoint["endpoint_id"], model_version, cache_hit=cache_hit)
+            logging.info(f"Prediction cache stats: {prediction_cache.stats()}")
             
             # Show success toast
             st.toast(f"Prediction successful: {predicted_weight:.2f} lbs", icon="✅")
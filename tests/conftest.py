@@ -0,0 +1,68 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from kfp import compiler, dsl
+
+# Tests import the repo the same way the runner does: `from src.pipeline_2025 import ...`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@dsl.component(base_image="python:3.10")
+def extract_source_data(table: str) -> str:
+    return table
+
+
+@dsl.component(base_image="python:3.10")
+def select_best_model(source: str, threshold: float) -> str:
+    return "bqml"
+
+
+@dsl.component(base_image="python:3.10")
+def endpoint_create(display_name: str) -> str:
+    return display_name
+
+
+@dsl.component(base_image="python:3.10")
+def model_deploy(model: str, endpoint: str) -> str:
+    return model
+
+
+@dsl.component(base_image="python:3.10")
+def update_traffic_split(endpoint: str, deployed: str):
+    pass
+
+
+@dsl.pipeline(name="small-pipeline")
+def small_pipeline(table: str = "p.d.source", threshold: float = 1.0, endpoint_name: str = "endpoint",
+                   traffic: str = "canary"):
+    """Shape of the real pipeline in miniature: a nested If/Elif with the same step names in both branches."""
+    extract = extract_source_data(table=table).set_display_name("Extract Data")
+    best = select_best_model(source=extract.output, threshold=threshold).set_display_name("Select Best Model")
+    with dsl.If(best.output == "bqml"):
+        endpoint = endpoint_create(display_name=endpoint_name).set_display_name("Create Endpoint")
+        deploy = model_deploy(model=best.output, endpoint=endpoint.output).set_display_name("Deploy BQML Model")
+        with dsl.If(traffic == "canary"):
+            update_traffic_split(endpoint=endpoint.output, deployed=deploy.output) \
+                .set_display_name("Update Traffic Split")
+    with dsl.Elif(best.output == "automl"):
+        endpoint = endpoint_create(display_name=endpoint_name).set_display_name("Create Endpoint AutoML")
+        deploy = model_deploy(model=best.output, endpoint=endpoint.output).set_display_name("Deploy AutoML Model")
+        with dsl.If(traffic == "canary"):
+            update_traffic_split(endpoint=endpoint.output, deployed=deploy.output) \
+                .set_display_name("Update Traffic Split")
+
+
+@pytest.fixture(scope="session")
+def small_spec_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("spec") / "small_pipeline.json"
+    compiler.Compiler().compile(small_pipeline, str(path))
+    return path
+
+
+@pytest.fixture
+def small_spec(small_spec_path):
+    """A fresh copy of the compiled `small_pipeline` spec, safe to modify."""
+    with open(small_spec_path) as f:
+        return json.load(f)
@@ -0,0 +1,40 @@
+import pytest
+
+from src.serving.attribution_table import AttributionTable, build_attribution_table
+from src.serving.fake_endpoint import FakeEndpoint
+
+AXES = {"is_male": ["true"], "cigarette_use": ["false"], "alcohol_use": ["false"],
+        "plurality": ["single(1)"], "mother_age": ["30", "31"], "gestation_weeks": ["38"]}
+INSTANCE = {"is_male": "true", "cigarette_use": "false", "alcohol_use": "false",
+            "plurality": "single(1)", "mother_age": "30", "gestation_weeks": "38"}
+
+
+class ShortEndpoint(FakeEndpoint):
+    """Drops the last explanation of every response."""
+
+    def explain(self, instances, parameters=None, timeout=None):
+        response = super().explain(instances, parameters, timeout)
+        response.explanations = response.explanations[:-1]
+        return response
+
+
+def test_table_is_tied_to_the_deployment(tmp_path):
+    path = tmp_path / "attributions.npy"
+    build_attribution_table(FakeEndpoint(deployed_model_id="model-a"), str(path), AXES)
+    table = AttributionTable(str(path), expected_identity={
+        "endpoint": "projects/fake/locations/local/endpoints/model-a", "deployed_model_ids": ["model-a"]})
+    assert table.lookup(INSTANCE) is not None
+
+    with pytest.raises(ValueError, match="not the current deployment"):
+        AttributionTable(str(path), expected_identity={"endpoint": "other", "deployed_model_ids": ["model-b"]})
+
+    # Resuming against a redeployed model recomputes every cell
+    summary = build_attribution_table(FakeEndpoint(deployed_model_id="model-b"), str(path), AXES)
+    assert summary["computed"] == 2 and summary["skipped"] == 0
+
+
+def test_short_explain_response_fails_the_batch(tmp_path):
+    path = tmp_path / "attributions.npy"
+    summary = build_attribution_table(ShortEndpoint(), str(path), AXES)
+    assert summary["computed"] == 0 and summary["failed"] == 2
+    assert AttributionTable(str(path)).lookup(INSTANCE) is None
@@ -0,0 +1,59 @@
+import math
+
+import pytest
+
+from src.pipeline_2025.capacity_planner import LoadPoint, TrafficProfile, load_curve, recommend, replica_capacity
+
+
+def curve(*points, saturated_at=None):
+    return [LoadPoint(qps, p95, error, qps == saturated_at) for qps, p95, error in points]
+
+
+def test_capacity_interpolates_p95_crossing():
+    capacity, note = replica_capacity(curve((10, 100, 0.0), (20, 300, 0.0)), target_p95_ms=200)
+    assert capacity == pytest.approx(15.0)
+    assert note.startswith("interpolated")
+
+
+@pytest.mark.parametrize("points, saturated_at, expected, note", [
+    # Errors or saturation at the next step: no interpolation
+    (((10, 100, 0.0), (20, 150, 0.05)), None, 10.0, "last passing step"),
+    (((10, 100, 0.0), (20, 150, 0.0)), 20, 10.0, "last passing step"),
+    (((10, 250, 0.0), (20, 300, 0.0)), None, 0.0, "lowest tested load"),
+    (((10, 100, 0.0), (20, 150, 0.0)), None, 20.0, "all tested loads pass"),
+    ((), None, 0.0, "no load points"),
+])
+def test_capacity_without_interpolation(points, saturated_at, expected, note):
+    capacity, reason = replica_capacity(curve(*points, saturated_at=saturated_at), target_p95_ms=200)
+    assert capacity == expected and reason.startswith(note)
+
+
+def test_load_curve_normalizes_replay_report_per_replica():
+    report = {"steps": [
+        {"target_qps": 40, "achieved_qps": 40, "error_rate": 0.0, "response_time": {"p95_ms": 90}},
+        {"target_qps": 80, "achieved_qps": 60, "error_rate": 0.0, "response_time": {"p95_ms": 400}},
+    ]}
+    assert load_curve(report, replicas=2) == [LoadPoint(20, 90, 0.0, False), LoadPoint(40, 400, 0.0, True)]
+
+
+def test_recommend_picks_cheapest_feasible_machine():
+    curves = {
+        "e2-standard-2": curve((5, 50, 0.0), (10, 100, 0.0)),     # 10 qps/replica
+        "n1-standard-4": curve((20, 50, 0.0), (40, 100, 0.0)),    # 40 qps/replica
+        "unpriced-machine": curve((100, 10, 0.0)),
+    }
+    traffic = TrafficProfile([7, 7, 14, 28], peak_qps=28)
+    best, second, unpriced = recommend(curves, traffic, target_p95_ms=200)
+
+    # 70% of 10 qps per replica: 1 replica at the median minute, 5 for 1.2 x peak
+    assert (best.machine_type, best.min_replicas, best.max_replicas) == ("e2-standard-2", 1, 5)
+    # Autoscaling over the profile averages (1 + 1 + 2 + 4) / 4 replicas
+    assert best.expected_hourly_cost_usd == pytest.approx(0.0771 * 2)
+    assert best.peak_hourly_cost_usd == pytest.approx(0.0771 * 5)
+    assert (second.machine_type, second.min_replicas, second.max_replicas) == ("n1-standard-4", 1, 2)
+    assert not unpriced.feasible and unpriced.expected_hourly_cost_usd == math.inf
+
+    # With at most 4 replicas the small machine cannot cover the peak
+    best, second, _ = recommend(curves, traffic, target_p95_ms=200, max_replicas_limit=4)
+    assert best.machine_type == "n1-standard-4"
+    assert not second.feasible and "needs 5 replicas" in second.note
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from src.pipeline_2025 import component_images
+
+
+def write_lock(path, names):
+    lock = {name: {"image": f"registry/{name}@sha256:{'0' * 64}",
+                   "requirements_hash": component_images.requirements_hash(name)} for name in names}
+    path.write_text(json.dumps(lock))
+
+
+def test_submission_needs_images_with_shared_modules(tmp_path, monkeypatch):
+    lock = tmp_path / "lock.json"
+    monkeypatch.setenv("COMPONENT_IMAGES_LOCK", str(lock))
+
+    with pytest.raises(RuntimeError, match="query_guard.py"):
+        component_images.check_images_for_submission()
+
+    # The base image ships no modules, so its fallback can still run
+    write_lock(lock, ["bigquery", "aiplatform"])
+    component_images.check_images_for_submission()
+    assert component_images.component_kwargs("bigquery")["base_image"] == f"registry/bigquery@sha256:{'0' * 64}"
+
+
+def test_editing_a_shared_module_makes_its_images_stale(tmp_path, monkeypatch):
+    module = tmp_path / "src" / "shared.py"
+    module.parent.mkdir()
+    module.write_text("VALUE = 1\n")
+    monkeypatch.setattr(component_images, "REPO_ROOT", tmp_path)
+    monkeypatch.setitem(component_images.SHARED_MODULES, "bigquery", ["src/shared.py"])
+    monkeypatch.setitem(component_images.SHARED_MODULES, "aiplatform", [])
+    lock = tmp_path / "lock.json"
+    monkeypatch.setenv("COMPONENT_IMAGES_LOCK", str(lock))
+    write_lock(lock, ["bigquery"])
+    assert component_images.is_locked("bigquery")
+
+    module.write_text("VALUE = 2\n")
+
+    assert not component_images.is_locked("bigquery")
+    assert component_images.component_kwargs("bigquery")["base_image"] == component_images.BASE_PYTHON_IMAGE
+    with pytest.raises(RuntimeError, match="src/shared.py"):
+        component_images.check_images_for_submission()
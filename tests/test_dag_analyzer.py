@@ -0,0 +1,78 @@
+import json
+import sys
+
+import pytest
+
+from src.pipeline_2025 import dag_analyzer
+from src.pipeline_2025.dag_analyzer import DagGraph
+
+
+def by_name(graph):
+    return {step.display_name: node_id for node_id, step in graph.steps.items()
+            if step.display_name != "Update Traffic Split"}
+
+
+def test_nested_condition_groups_flatten_to_steps(small_spec):
+    graph = DagGraph(small_spec)
+    names = by_name(graph)
+
+    assert len(graph.steps) == 8
+    # Edges into a group reach its first steps; groups themselves are not steps
+    assert (names["Select Best Model"], names["Create Endpoint"]) in graph.edges
+    assert (names["Select Best Model"], names["Create Endpoint AutoML"]) in graph.edges
+    traffic = [node_id for node_id, step in graph.steps.items() if step.display_name == "Update Traffic Split"]
+    assert all(len(graph.steps[node_id].groups) == 3 for node_id in traffic)
+    assert {graph.steps[node_id].groups[0] for node_id in traffic} == {graph.steps[names["Create Endpoint"]].groups[0]}
+
+
+def test_critical_path_and_width(small_spec):
+    graph = DagGraph(small_spec)
+    names = by_name(graph)
+    durations = {node_id: 10.0 for node_id in graph.steps}
+    durations[names["Deploy AutoML Model"]] = 100.0
+
+    total_s, path = dag_analyzer.critical_path(graph, durations)
+    width, at_s, steps = dag_analyzer.max_parallel_width(dag_analyzer.schedule(graph, durations))
+
+    assert total_s == 140.0
+    assert [graph.steps[node_id].display_name for node_id in path] == [
+        "Extract Data", "Select Best Model", "Create Endpoint AutoML", "Deploy AutoML Model", "Update Traffic Split"]
+    # Both branches of the If/Elif are counted together
+    assert (width, at_s) == (2, 20.0)
+    assert {graph.steps[node_id].display_name for node_id in steps} == {"Create Endpoint", "Create Endpoint AutoML"}
+
+
+def test_exclusive_branches_are_not_duplicates(small_spec):
+    assert dag_analyzer.duplicate_resource_steps(DagGraph(small_spec)) == []
+
+    # The same endpoint created again outside the If/Elif runs alongside either branch
+    small_spec["root"]["dag"]["tasks"]["endpoint-create-early"] = {
+        "taskInfo": {"name": "Create Endpoint Early"}, "componentRef": {"name": "comp-endpoint-create"},
+        "inputs": {"parameters": {"display_name": {"componentInputParameter": "endpoint_name"}}}}
+
+    (duplicate,) = dag_analyzer.duplicate_resource_steps(DagGraph(small_spec))
+    assert duplicate["name_from"] == "endpoint_name"
+    assert duplicate["steps"] == ["Create Endpoint", "Create Endpoint AutoML", "Create Endpoint Early"]
+
+
+def run_check(monkeypatch, spec_path, baseline_path, *args):
+    monkeypatch.setattr(sys, "argv", ["dag_analyzer", "check", "--spec", str(spec_path),
+                                      "--baseline", str(baseline_path), "--durations", "estimated", *args])
+    dag_analyzer.main()
+
+
+def test_check_fails_when_critical_path_grows(small_spec_path, tmp_path, monkeypatch, capsys):
+    baseline = tmp_path / "dag_baseline.json"
+    run_check(monkeypatch, small_spec_path, baseline, "--write-baseline")
+    run_check(monkeypatch, small_spec_path, baseline)
+
+    recorded = json.loads(baseline.read_text())
+    recorded["critical_path_s"] -= 60
+    baseline.write_text(json.dumps(recorded))
+    with pytest.raises(SystemExit) as exit_info:
+        run_check(monkeypatch, small_spec_path, baseline)
+    assert exit_info.value.code == 1
+    assert "Critical path grew" in capsys.readouterr().out
+
+    # Within the tolerance the check passes
+    run_check(monkeypatch, small_spec_path, baseline, "--tolerance", "0.5")
@@ -0,0 +1,117 @@
+import json
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pytest
+from kfp.dsl import Artifact, Metrics
+
+from src.pipeline_2025 import data_quality
+from src.pipeline_2025.data_quality_comp import validate_data_quality
+from src.pipeline_2025.query_guard import FakeBigQueryClient
+
+
+def prepped(rows=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "weight_pounds": rng.normal(7.2, 1.2, rows).clip(1.0, 15.0),
+        "mother_age": rng.integers(15, 45, rows),
+        "gestation_weeks": rng.integers(30, 43, rows),
+        "is_male": rng.choice(["true", "false"], rows),
+        "plurality_category": rng.choice(["Single(1)", "Twins(2)"], rows, p=[0.97, 0.03]),
+        "cigarette_use_str": rng.choice(["true", "false", "Unknown"], rows),
+        "alcohol_use_str": rng.choice(["true", "false", "Unknown"], rows),
+        "data_split": rng.choice(["TRAIN", "VALIDATE", "TEST"], rows, p=[0.8, 0.1, 0.1]),
+    })
+
+
+def evaluate(df, expectations=data_quality.DEFAULT_EXPECTATIONS):
+    return data_quality.evaluate_expectations(data_quality.profile_dataframe(df, expectations), expectations)
+
+
+def run_component(expectations, **kwargs):
+    report = Artifact(name="quality_report", uri=tempfile.mktemp())
+    metrics = Metrics(name="quality_metrics", uri=tempfile.mkdtemp())
+    try:
+        result = validate_data_quality.python_func(
+            project_id="p", bq_location="US", profile_query=data_quality.profile_query("p.d.prepped", expectations),
+            expectations_json=json.dumps(expectations), quality_report=report, quality_metrics=metrics, **kwargs)
+        error = None
+    except RuntimeError as e:
+        result, error = None, e
+    with open(report.path) as f:
+        return result, error, json.load(f)
+
+
+def test_clean_table_passes_default_expectations():
+    assert data_quality.failed_checks(evaluate(prepped())) == []
+
+
+def test_broken_table_fails_the_right_checks():
+    df = prepped()
+    df.loc[:99, "weight_pounds"] = None          # 5% NULL labels
+    df.loc[100, "mother_age"] = 80               # out of range
+    df.loc[:, "data_split"] = "TRAIN"            # no TEST/VALIDATE rows
+    df.loc[200, "gestation_weeks"] = 99          # warn-only check
+
+    results = evaluate(df)
+    failed = {(r["check"], r.get("column"), r.get("value")) for r in data_quality.failed_checks(results)}
+    warned = {(r["check"], r.get("column")) for r in data_quality.failed_checks(results, "warn")}
+
+    assert failed == {
+        ("null_rate", "weight_pounds", None),
+        ("max_value", "mother_age", None),
+        ("distinct_count", "data_split", None),
+        ("category_share", "data_split", "TRAIN"),
+        ("category_share", "data_split", "VALIDATE"),
+        ("category_share", "data_split", "TEST"),
+    }
+    assert warned == {("max_value", "gestation_weeks")}
+    null_rate = next(r for r in results if r["check"] == "null_rate" and r["column"] == "weight_pounds")
+    assert null_rate["observed"] == pytest.approx(0.05)
+
+
+def test_missing_statistic_fails_the_check():
+    expectations = [{"check": "mean", "column": "not_a_column", "min": 0}]
+    (result,) = evaluate(prepped(), expectations)
+    assert result["observed"] is None and not result["passed"]
+
+
+@pytest.mark.parametrize("break_table", [False, True])
+def test_component_checks_match_library(break_table):
+    df = prepped(seed=1)
+    if break_table:
+        df.loc[:49, "mother_age"] = None
+        df.loc[:, "plurality_category"] = "Single(1)"
+    expectations = data_quality.DEFAULT_EXPECTATIONS
+    profile = data_quality.profile_dataframe(df, expectations)
+
+    result, error, report = run_component(expectations, local_profile_json=json.dumps(profile))
+
+    expected = data_quality.evaluate_expectations(profile, expectations)
+    assert report["results"] == json.loads(json.dumps(expected))
+    assert report["passed"] == (not data_quality.failed_checks(expected))
+    assert (error is not None) == break_table
+    if not break_table:
+        assert result.warnings == len(data_quality.failed_checks(expected, "warn"))
+
+
+def test_component_parses_profile_query_row_like_library():
+    expectations = data_quality.DEFAULT_EXPECTATIONS
+    profile = data_quality.profile_dataframe(prepped(seed=2), expectations)
+    # The row BigQuery returns for profile_query: <column>__<statistic>, APPROX_TOP_COUNT as value/count structs
+    row = {"row_count": profile["row_count"]}
+    for name, stats in profile["columns"].items():
+        for statistic, value in stats.items():
+            if statistic == "histogram":
+                value = [{"value": key, "count": count} for key, count in value.items()]
+            row[f"{name}__{statistic}"] = value
+    client = FakeBigQueryClient(rows=[("FROM `p.d.prepped`", [row])])
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr("google.cloud.bigquery.Client", lambda *args, **kwargs: client)
+        _, error, report = run_component(expectations, max_bytes_billed=1024 ** 3)
+
+    assert error is None and len(client.jobs) == 1
+    assert report["profile"] == data_quality.parse_profile_row(row)
+    assert report["results"] == json.loads(json.dumps(evaluate(prepped(seed=2))))
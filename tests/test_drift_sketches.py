@@ -0,0 +1,112 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from kfp.dsl import Artifact, Metrics
+
+from src.pipeline_2025 import drift_sketches
+from src.pipeline_2025.drift_detection_comp import detect_data_drift, promote_drift_reference
+from src.pipeline_2025.drift_sketches import FeatureSketch, HyperLogLog
+
+
+def synthetic(seed, rows=20000, weight_shift=0.0, twins_rate=0.03):
+    rng = np.random.default_rng(seed)
+    return drift_sketches.sketch_columns({
+        "mother_age": rng.integers(15, 45, rows).tolist(),
+        "gestation_weeks": rng.integers(30, 43, rows).tolist(),
+        "weight_pounds": rng.normal(7.2 + weight_shift, 1.2, rows).tolist(),
+        "is_male": rng.choice(["true", "false"], rows).tolist(),
+        "plurality_category": rng.choice(["Single(1)", "Twins(2)"], rows, p=[1 - twins_rate, twins_rate]).tolist(),
+        "cigarette_use_str": rng.choice(["true", "false", "Unknown"], rows).tolist(),
+        "alcohol_use_str": rng.choice(["true", "false", "Unknown"], rows).tolist(),
+    })
+
+
+@pytest.mark.parametrize("distinct", [1000, 100000])
+def test_hyperloglog_within_error_bound(distinct):
+    hll = HyperLogLog(precision=12)
+    for value in range(distinct):
+        hll.add(value)
+    # Three standard errors of 1.04 / sqrt(4096)
+    assert abs(hll.count() - distinct) / distinct < 3 * 1.04 / 64
+
+
+def test_merged_sketch_matches_single_pass():
+    values = np.random.default_rng(0).normal(7.0, 1.0, 20000).tolist()
+    whole = FeatureSketch("numeric").update(values).summary()
+    merged = FeatureSketch("numeric").update(values[:5000]).merge(FeatureSketch("numeric").update(values[5000:]))
+    merged = merged.summary()
+
+    assert merged["count"] == whole["count"] and merged["distinct"] == whole["distinct"]
+    assert merged["mean"] == pytest.approx(whole["mean"]) and merged["stddev"] == pytest.approx(whole["stddev"])
+    assert drift_sketches.ks_from_quantiles(whole["quantiles"], merged["quantiles"]) < 0.05
+
+    categorical = FeatureSketch("categorical").update(["a", "b"]).merge(FeatureSketch("categorical").update(["a"]))
+    assert categorical.summary()["histogram"] == {"a": 2, "b": 1}
+
+
+def test_merge_with_empty_sketch():
+    filled = FeatureSketch("numeric").update([1.0, 2.0])
+    assert FeatureSketch("numeric").merge(filled).summary()["mean"] == 1.5
+    assert FeatureSketch("numeric").update([1.0, 2.0]).merge(FeatureSketch("numeric")).summary()["mean"] == 1.5
+    with pytest.raises(ValueError):
+        FeatureSketch("numeric").merge(FeatureSketch("categorical"))
+
+
+def test_psi_and_ks_on_known_shifts():
+    # Categorical PSI by hand: 0.3 * ln(1.6) + 0.3 * ln(2.5)
+    assert drift_sketches.histogram_psi({"a": 50, "b": 50}, {"a": 80, "b": 20}) == pytest.approx(
+        0.3 * np.log(1.6) + 0.3 * np.log(2.5))
+    assert drift_sketches.histogram_psi({"a": 50, "b": 50}, {"a": 5, "b": 5}) == pytest.approx(0.0)
+
+    rng = np.random.default_rng(1)
+    reference = np.quantile(rng.normal(0, 1, 100000), np.linspace(0, 1, 101))
+    same = np.quantile(rng.normal(0, 1, 100000), np.linspace(0, 1, 101))
+    shifted = np.quantile(rng.normal(0.5, 1, 100000), np.linspace(0, 1, 101))
+    assert drift_sketches.ks_from_quantiles(reference, same) < 0.03
+    assert drift_sketches.quantile_psi(reference, same) < 0.01
+    # A half-sigma shift: KS = 2 * Phi(0.25) - 1 ~ 0.197, PSI ~ 0.25
+    assert drift_sketches.ks_from_quantiles(reference, shifted) == pytest.approx(0.197, abs=0.02)
+    assert 0.15 < drift_sketches.quantile_psi(reference, shifted) < 0.35
+
+
+def run_component(tmp_path, label, sketches, reference_uri, **kwargs):
+    report = Artifact(name="drift_report", uri=str(tmp_path / f"{label}_report.json"))
+    report.path = report.uri
+    result = detect_data_drift.python_func(
+        project_id="local", bq_location="local", sketch_query="", reference_uri=reference_uri,
+        drift_report=report, drift_metrics=Metrics(name="drift_metrics", uri=str(tmp_path)),
+        local_sketches_json=json.dumps(sketches), **kwargs)
+    with open(report.path) as f:
+        return result, report, json.load(f)
+
+
+def test_component_matches_library(tmp_path):
+    reference_uri = str(tmp_path / "reference.json")
+    reference, current = synthetic(0), synthetic(1, weight_shift=0.5, twins_rate=0.1)
+    _, report, _ = run_component(tmp_path, "reference", reference, reference_uri)
+    promote_drift_reference.python_func(project_id="local", drift_report=report, reference_uri=reference_uri)
+
+    result, _, payload = run_component(tmp_path, "current", current, reference_uri)
+    expected = drift_sketches.compare_sketches(reference, current)
+    for name, row in expected.items():
+        got = payload["features"][name]
+        assert got["drifted"] == row["drifted"], name
+        for statistic in ("psi", "ks", "mean_shift"):
+            if statistic in row:
+                assert got[statistic] == pytest.approx(row[statistic]), (name, statistic)
+    assert result.retrain_needed == "true"
+    assert sorted(payload["drifted_features"]) == sorted(n for n, row in expected.items() if row["drifted"])
+
+
+def test_reference_changes_only_when_promoted(tmp_path):
+    reference_uri = str(tmp_path / "reference.json")
+    _, report, _ = run_component(tmp_path, "first", synthetic(0), reference_uri)
+    assert not os.path.exists(reference_uri)
+    promote_drift_reference.python_func(project_id="local", drift_report=report, reference_uri=reference_uri)
+
+    # A drifted run whose training fails is never promoted, so the next run still sees the drift
+    for label in ("failed", "retry"):
+        result, _, _ = run_component(tmp_path, label, synthetic(1, weight_shift=0.5), reference_uri)
+        assert result.retrain_needed == "true"
@@ -0,0 +1,55 @@
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from google.cloud import aiplatform
+
+from src.pipeline_2025.endpoint_management_comp import rollback_deployment
+
+
+class FakeEndpoint:
+    def __init__(self, deployed_models):
+        self.gca_resource = SimpleNamespace(deployed_models=deployed_models)
+        self.undeployed = []
+
+    def undeploy(self, deployed_model_id, traffic_split=None):
+        self.undeployed.append((deployed_model_id, traffic_split))
+
+
+def deployed(model_id, display_name, day):
+    return SimpleNamespace(id=model_id, display_name=display_name,
+                           create_time=datetime(2026, 1, day, tzinfo=timezone.utc))
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    fake = FakeEndpoint([deployed("old", "BQML-Model-1", 1), deployed("prev", "BQML-Model-2", 2),
+                         deployed("new", "BQML-Model-3", 3)])
+    monkeypatch.setattr(aiplatform, "init", lambda **kwargs: None)
+    monkeypatch.setattr(aiplatform, "Endpoint", lambda endpoint_name: fake)
+    return fake
+
+
+def rollback(previous):
+    return rollback_deployment.python_func(
+        project_id="p", location="l", endpoint_resource_name="projects/p/locations/l/endpoints/1",
+        deployed_model_display_name="BQML-Model-3", previous_traffic_split_json=json.dumps(previous))
+
+
+def test_restores_previous_split(endpoint):
+    result = rollback({"old": 20, "prev": 80})
+    assert endpoint.undeployed == [("new", {"old": 20, "prev": 80})]
+    assert result.undeployed_model_id == "new"
+
+
+def test_falls_back_to_newest_remaining_model(endpoint):
+    # A stale snapshot naming models that are gone
+    rollback({"gone": 100})
+    assert endpoint.undeployed == [("new", {"prev": 100})]
+
+
+def test_only_model_leaves_endpoint_without_traffic(endpoint):
+    endpoint.gca_resource.deployed_models = [deployed("new", "BQML-Model-3", 3)]
+    rollback({})
+    assert endpoint.undeployed == [("new", None)]
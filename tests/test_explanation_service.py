@@ -0,0 +1,98 @@
+import pytest
+
+from src.serving.explanation_service import ExplanationService
+from src.serving.fake_endpoint import FakeEndpoint, FakeEndpointError, score_instance
+
+INSTANCE = {"is_male": "true", "mother_age": "30", "plurality": "Single(1)", "gestation_weeks": "38",
+            "cigarette_use": "false", "alcohol_use": "false"}
+
+
+def instances(count):
+    return [{**INSTANCE, "mother_age": str(20 + i)} for i in range(count)]
+
+
+@pytest.fixture
+def service():
+    services = []
+
+    def create(endpoint, **kwargs):
+        services.append(ExplanationService(endpoint, **kwargs))
+        return services[-1]
+
+    yield create
+    for created in services:
+        created.close()
+
+
+def test_one_explain_call_returns_prediction_and_attributions(service):
+    endpoint = FakeEndpoint()
+    explanation = service(endpoint).explain(INSTANCE)
+
+    prediction, attributions = score_instance(INSTANCE)
+    assert explanation.prediction == pytest.approx(prediction)
+    assert explanation.attributions == pytest.approx(attributions)
+    assert endpoint.explain_calls == 1 and endpoint.predict_calls == 0
+
+
+def test_memoized_per_instance_and_model_version(service):
+    endpoint = FakeEndpoint()
+    explanations = service(endpoint)
+
+    first = explanations.explain(INSTANCE, model_version="model-a")
+    # Key order and value types do not matter
+    reordered = {**dict(reversed(list(INSTANCE.items()))), "mother_age": 30}
+    assert explanations.explain(reordered, model_version="model-a") == first
+    assert endpoint.explain_calls == 1
+
+    # A redeployed model never gets the previous model's explanation
+    explanations.explain(INSTANCE, model_version="model-b")
+    assert endpoint.explain_calls == 2
+    assert explanations.stats()["hits"] == 1
+
+
+def test_identical_in_flight_requests_are_coalesced(service):
+    endpoint = FakeEndpoint(latency_s=0.2)
+    explanations = service(endpoint)
+
+    futures = [explanations.submit(INSTANCE) for _ in range(3)]
+
+    assert futures[0] is futures[1] is futures[2]
+    assert futures[0].result(timeout=5).prediction == pytest.approx(score_instance(INSTANCE)[0])
+    assert endpoint.instances_seen == 1
+
+
+def test_concurrent_requests_are_batched(service):
+    endpoint = FakeEndpoint()
+    explanations = service(endpoint, max_batch_size=4, max_wait_ms=200)
+
+    results = explanations.explain_many(instances(6), timeout=5)
+
+    assert [r.prediction for r in results] == pytest.approx([score_instance(i)[0] for i in instances(6)])
+    # Four fill the first batch; the other two go out when the wait ends
+    assert endpoint.explain_calls == explanations.batches_sent == 2
+    assert explanations.instances_sent == 6
+
+
+def test_failed_call_fails_every_waiter_and_is_not_cached(service):
+    explanations = service(FakeEndpoint(failure_rate=1.0), max_wait_ms=50)
+
+    futures = [explanations.submit(instance) for instance in instances(3)]
+    for future in futures:
+        with pytest.raises(FakeEndpointError):
+            future.result(timeout=5)
+    assert explanations.batches_sent == 0
+
+    explanations.endpoint = FakeEndpoint()
+    assert explanations.explain(instances(1)[0], timeout=5).prediction == pytest.approx(
+        score_instance(instances(1)[0])[0])
+
+
+def test_short_response_is_an_error(service):
+    class ShortEndpoint(FakeEndpoint):
+        def explain(self, instances, parameters=None, timeout=None):
+            response = super().explain(instances, parameters, timeout)
+            response.explanations = response.explanations[:-1]
+            return response
+
+    with pytest.raises(ValueError, match="Expected 2 explanations, got 1"):
+        service(ShortEndpoint(), max_wait_ms=200).explain_many(instances(2), timeout=5)
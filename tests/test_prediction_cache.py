@@ -0,0 +1,113 @@
+import pytest
+
+from src.serving.lru_cache import LRUCache
+from src.serving.prediction_cache import (InMemoryRedis, PredictionCache, RedisBackend, SQLiteBackend,
+                                          backend_from_url, prediction_cache_key)
+
+INSTANCE = {"is_male": "true", "mother_age": "30", "plurality": "Single(1)", "gestation_weeks": "38"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class BrokenBackend:
+    def get(self, key):
+        raise ConnectionError("backend down")
+
+    def set(self, key, value):
+        raise ConnectionError("backend down")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1   # "b" is now the least recently used
+    cache.put("c", 3)
+
+    assert "b" not in cache and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_lru_entries_expire_after_ttl():
+    clock = Clock()
+    cache = LRUCache(ttl_seconds=10, clock=clock)
+    cache.put("a", 1)
+
+    clock.now += 9.9
+    assert cache.get("a") == 1
+    clock.now += 0.1
+    assert cache.get("a") is None and "a" not in cache
+    assert cache.stats() == {"entries": 0, "hits": 1, "misses": 1, "evictions": 0, "hit_rate": 0.5}
+
+
+def test_key_ignores_instance_order_and_value_types():
+    reordered = {**dict(reversed(list(INSTANCE.items()))), "mother_age": 30}
+    assert prediction_cache_key(reordered, "endpoint", "model@1") == prediction_cache_key(INSTANCE, "endpoint", "model@1")
+
+
+def test_other_deployed_model_or_version_misses():
+    cache = PredictionCache()
+    cache.put(INSTANCE, "endpoint", "model-a@1", 7.5)
+
+    assert cache.get(INSTANCE, "endpoint", "model-a@1") == 7.5
+    assert cache.get(INSTANCE, "endpoint", "model-b@1") is None
+    assert cache.get(INSTANCE, "endpoint", "model-a@2") is None
+    assert cache.get(INSTANCE, "other-endpoint", "model-a@1") is None
+
+
+@pytest.mark.parametrize("make_backend", [
+    lambda tmp_path: RedisBackend(InMemoryRedis()),
+    lambda tmp_path: SQLiteBackend(str(tmp_path / "predictions.sqlite")),
+], ids=["redis", "sqlite"])
+def test_replicas_share_results_through_the_backend(tmp_path, make_backend):
+    backend = make_backend(tmp_path)
+    replica_a, replica_b = PredictionCache(backend=backend), PredictionCache(backend=backend)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 7.5
+
+    assert replica_a.get_or_compute(INSTANCE, "endpoint", "model@1", compute) == 7.5
+    assert replica_b.get_or_compute(INSTANCE, "endpoint", "model@1", compute) == 7.5
+    assert replica_b.get_or_compute(INSTANCE, "endpoint", "model@1", compute) == 7.5
+
+    assert len(calls) == 1
+    # Replica B: one local miss answered by the backend, then a local hit
+    stats = replica_b.stats()
+    assert (stats["hits"], stats["misses"], stats["backend_hits"]) == (1, 1, 1)
+    assert stats["overall_hit_rate"] == 1.0
+
+
+def test_backend_outage_falls_back_to_computing():
+    cache = PredictionCache(backend=BrokenBackend())
+
+    assert cache.get_or_compute(INSTANCE, "endpoint", "model@1", lambda: 7.5) == 7.5
+    # The write failed too, but the local LRU still has the value
+    assert cache.get(INSTANCE, "endpoint", "model@1") == 7.5
+    assert cache.stats()["backend_errors"] == 2
+
+
+def test_backend_entries_expire():
+    clock = Clock()
+    backend = RedisBackend(InMemoryRedis(clock=clock), ttl_seconds=60)
+    backend.set("key", 7.5)
+
+    clock.now += 59
+    assert backend.get("key") == 7.5
+    clock.now += 1
+    assert backend.get("key") is None
+
+
+def test_backend_from_url(tmp_path):
+    assert backend_from_url("") is None and backend_from_url("memory") is None
+    assert isinstance(backend_from_url(f"file:{tmp_path / 'cache.sqlite'}"), SQLiteBackend)
+    assert isinstance(backend_from_url("redis+memory://"), RedisBackend)
+    with pytest.raises(ValueError, match="Unsupported"):
+        backend_from_url("memcached://localhost")
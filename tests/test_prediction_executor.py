@@ -0,0 +1,130 @@
+import threading
+import time
+from concurrent.futures import CancelledError, TimeoutError
+
+import pytest
+
+from src.serving.fake_endpoint import FakeEndpoint, FakeEndpointError
+from src.serving.prediction_executor import PredictionExecutor, percentile
+
+INSTANCES = [{"is_male": "true", "mother_age": "30", "plurality": "Single(1)", "gestation_weeks": "38"}]
+
+
+class FlakyEndpoint(FakeEndpoint):
+    """Fails its first `failures` predict calls."""
+
+    def __init__(self, failures: int, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+
+    def predict(self, instances, parameters=None, timeout=None):
+        with self._lock:
+            fail = self.predict_calls < self.failures
+            if fail:
+                self.predict_calls += 1
+        if fail:
+            raise FakeEndpointError("Injected endpoint failure")
+        return super().predict(instances, parameters, timeout)
+
+
+class StuckFirstCallEndpoint(FakeEndpoint):
+    """The first predict call blocks until `release` is set, like a slow replica."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.release = threading.Event()
+        self.calls_started = 0
+
+    def predict(self, instances, parameters=None, timeout=None):
+        with self._lock:
+            self.calls_started += 1
+            first = self.calls_started == 1
+        if first:
+            self.release.wait(5)
+        return super().predict(instances, parameters, timeout)
+
+
+@pytest.fixture
+def executor():
+    executors = []
+
+    def create(**kwargs):
+        executors.append(PredictionExecutor(**kwargs))
+        return executors[-1]
+
+    yield create
+    for created in executors:
+        created.close(wait=False)
+
+
+def test_deadline_fails_the_future(executor):
+    predictions = executor(deadline_s=0.05, initial_hedge_delay_s=10)
+    endpoint = FakeEndpoint(latency_s=0.5)
+
+    future = predictions.submit(endpoint.predict, instances=INSTANCES)
+
+    with pytest.raises(TimeoutError, match="did not complete within 0.05s"):
+        future.result(timeout=2)
+    assert predictions.stats()["timeouts"] == 1
+
+
+def test_resubmit_cancels_the_session_previous_request(executor):
+    predictions = executor(max_workers=1, initial_hedge_delay_s=10)
+    endpoint = StuckFirstCallEndpoint()
+
+    stale = predictions.submit(endpoint.predict, instances=INSTANCES, session_key="session-1")
+    other = predictions.submit(endpoint.predict, instances=INSTANCES, session_key="session-2")
+    current = predictions.submit(endpoint.predict, instances=INSTANCES, session_key="session-1")
+
+    assert stale.cancelled() and not other.cancelled()
+    endpoint.release.set()
+    assert current.result(timeout=2).predictions and other.result(timeout=2).predictions
+    with pytest.raises(CancelledError):
+        stale.result()
+    assert predictions.stats()["cancelled"] == 1
+
+
+def test_slow_attempt_is_hedged(executor):
+    predictions = executor(initial_hedge_delay_s=0.05)
+    endpoint = StuckFirstCallEndpoint()
+
+    started = time.monotonic()
+    response = predictions.submit(endpoint.predict, instances=INSTANCES).result(timeout=2)
+
+    # The hedge answered while the first attempt was still stuck
+    assert time.monotonic() - started < 1 and not endpoint.release.is_set()
+    assert response.predictions and endpoint.calls_started == 2
+    assert predictions.stats()["hedges"] == predictions.stats()["hedge_wins"] == 1
+    endpoint.release.set()
+
+
+def test_hedge_delay_follows_recent_latencies(executor):
+    predictions = executor(initial_hedge_delay_s=1.0, min_hedge_delay_s=0.05)
+    assert predictions.hedge_delay() == 1.0
+
+    predictions._latencies.extend([0.1] * 18 + [0.4, 0.8])
+    assert predictions.hedge_delay() == percentile(list(predictions._latencies), 95) == 0.4
+
+    predictions._latencies.clear()
+    predictions._latencies.extend([0.01] * 20)
+    assert predictions.hedge_delay() == 0.05
+
+
+def test_failed_attempt_retries_without_waiting_for_the_hedge(executor):
+    predictions = executor(initial_hedge_delay_s=10)
+    endpoint = FlakyEndpoint(failures=1)
+
+    response = predictions.submit(endpoint.predict, instances=INSTANCES).result(timeout=2)
+
+    assert response.predictions and endpoint.predict_calls == 2
+    assert predictions.stats()["hedges"] == 0 and predictions.stats()["errors"] == 0
+
+
+def test_every_attempt_failing_fails_the_request(executor):
+    predictions = executor(initial_hedge_delay_s=10, max_attempts=3)
+    endpoint = FakeEndpoint(failure_rate=1.0)
+
+    with pytest.raises(FakeEndpointError):
+        predictions.submit(endpoint.predict, instances=INSTANCES).result(timeout=2)
+    assert endpoint.predict_calls == 3
+    assert predictions.stats()["errors"] == 1
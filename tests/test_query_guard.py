@@ -0,0 +1,111 @@
+import json
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+from kfp.dsl import Artifact, Metrics
+
+from src.pipeline_2025 import query_guard
+from src.pipeline_2025.query_guard import FakeBigQueryClient, QueryBudgetExceeded, QueryGuard
+from src.pipeline_2025.serving_validation_comp import _local_sample, validate_serving_endpoint
+from src.pipeline_2025.skew_detection_comp import detect_prediction_skew
+
+MIB = 1024 ** 2
+
+
+def test_over_budget_fails_before_any_job():
+    client = FakeBigQueryClient(estimates=[("big_table", 500 * MIB)])
+    guard = QueryGuard(client, budgets={"extract": 100 * MIB})
+
+    with pytest.raises(QueryBudgetExceeded):
+        guard.run("extract", "SELECT * FROM big_table")
+
+    assert client.dry_runs and not client.jobs
+    assert guard.report() == [{"step": "extract", "estimated_bytes": 500 * MIB, "max_bytes_billed": 100 * MIB,
+                               "bytes_processed": None, "bytes_billed": None, "job_id": None}]
+
+
+def test_run_is_capped_and_reports_estimate_error():
+    client = FakeBigQueryClient(default_bytes=200 * MIB, actual_ratio=1.25)
+    guard = QueryGuard(client, default_max_bytes_billed=1024 * MIB)
+
+    job = guard.run("profile", "SELECT 1")
+
+    assert job.total_bytes_processed == 250 * MIB
+    (row,) = guard.report()
+    assert row["max_bytes_billed"] == 1024 * MIB and row["estimated_bytes"] == 200 * MIB
+    assert row["estimate_error"] == pytest.approx(0.25)
+
+
+def test_cap_stops_a_job_whose_estimate_was_wrong():
+    client = FakeBigQueryClient(default_bytes=50 * MIB)
+    # The estimate is within the budget, the real job is not: BigQuery refuses it via maximum_bytes_billed
+    client.query = lambda query, job_config=None, location=None, _query=client.query: (
+        SimpleNamespace(total_bytes_processed=10 * MIB, job_id=None, result=lambda: None)
+        if job_config.dry_run else _query(query, job_config=job_config, location=location))
+
+    with pytest.raises(RuntimeError, match="exceeded limit for bytes billed"):
+        query_guard.guarded_query(client, "step", "SELECT 1", max_bytes_billed=20 * MIB)
+
+
+def test_no_budget_runs_uncapped():
+    client = FakeBigQueryClient(default_bytes=500 * MIB)
+    job, estimated = query_guard.guarded_query(client, "step", "SELECT 1")
+    assert estimated == 500 * MIB and client.jobs == ["SELECT 1"]
+
+
+@pytest.fixture
+def fake_bigquery(monkeypatch):
+    """Makes `bigquery.Client(...)` inside the component bodies return a FakeBigQueryClient."""
+    def install(**kwargs):
+        client = FakeBigQueryClient(**kwargs)
+        monkeypatch.setattr("google.cloud.bigquery.Client", lambda *args, **client_kwargs: client)
+        return client
+    return install
+
+
+def fake_endpoint():
+    return SimpleNamespace(uri="fake://local", metadata={"resourceName": "fake://local"})
+
+
+def test_serving_validation_query_is_guarded(fake_bigquery):
+    client = fake_bigquery(estimates=[("ML.PREDICT", 30 * MIB)], actual_ratio=0.5,
+                           rows=[("ML.PREDICT", _local_sample(40))])
+    metrics = Metrics(name="validation_metrics", uri=tempfile.mkdtemp())
+
+    validate_serving_endpoint.python_func(
+        project_id="p", location="l", bq_location="US", endpoint=fake_endpoint(), prepped_table_id="p.d.prepped",
+        validation_metrics=metrics, offline_bqml_model_id="p.d.model", max_bytes_billed=100 * MIB)
+
+    assert len(client.dry_runs) == 1 and len(client.jobs) == 1
+    assert metrics.metadata["estimated_bytes"] == 30 * MIB
+    assert metrics.metadata["bytes_processed"] == 15 * MIB
+
+
+def test_skew_query_over_budget_never_runs(fake_bigquery):
+    client = fake_bigquery(estimates=[("ML.PREDICT", 300 * MIB)], rows=[("ML.PREDICT", _local_sample(40))])
+    report = Artifact(name="skew_report", uri=tempfile.mktemp())
+    metrics = Metrics(name="skew_metrics", uri=tempfile.mkdtemp())
+
+    with pytest.raises(RuntimeError, match="exceeds the budget"):
+        detect_prediction_skew.python_func(
+            project_id="p", location="l", bq_location="US", endpoint=fake_endpoint(),
+            prepped_table_id="p.d.prepped", offline_bqml_model_id="p.d.model", skew_report=report,
+            skew_metrics=metrics, max_bytes_billed=100 * MIB)
+
+    assert client.dry_runs and not client.jobs
+
+
+def test_skew_records_estimate_and_actual(fake_bigquery):
+    fake_bigquery(estimates=[("ML.PREDICT", 30 * MIB)], rows=[("ML.PREDICT", _local_sample(200))])
+    report = Artifact(name="skew_report", uri=tempfile.mktemp())
+    metrics = Metrics(name="skew_metrics", uri=tempfile.mkdtemp())
+
+    detect_prediction_skew.python_func(
+        project_id="p", location="l", bq_location="US", endpoint=fake_endpoint(),
+        prepped_table_id="p.d.prepped", offline_bqml_model_id="p.d.model", skew_report=report,
+        skew_metrics=metrics, max_bytes_billed=100 * MIB)
+
+    assert metrics.metadata["estimated_bytes"] == metrics.metadata["bytes_processed"] == 30 * MIB
+    with open(report.path) as f:
+        assert json.load(f)["overall"]["count"] == 200
@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.serving.fake_endpoint import FakeEndpoint
+from src.serving.response_decoder import (AUTOML_DECODER, DecoderRegistry, ResponseDecodeError,
+                                          decoder_from_model, detect_decoder)
+
+INSTANCES = [
+    {"is_male": "True", "mother_age": "30", "gestation_weeks": "39", "plurality_category": "Single(1)",
+     "cigarette_use_str": "False", "alcohol_use_str": "False"},
+    {"is_male": "False", "mother_age": "22", "gestation_weeks": "35", "plurality_category": "Multiple(2)",
+     "cigarette_use_str": "True", "alcohol_use_str": "False"},
+]
+
+
+@pytest.mark.parametrize("response_format, schema", [("automl", "automl"), ("bqml", "bqml")])
+def test_decodes_fake_endpoint_responses(response_format, schema):
+    registry = DecoderRegistry()
+    automl = DecoderRegistry().decode(FakeEndpoint("automl").predict(INSTANCES))
+    values = registry.decode(FakeEndpoint(response_format, deployed_model_id=schema).predict(INSTANCES))
+
+    assert values.dtype == np.float64 and values.shape == (2,)
+    np.testing.assert_allclose(values, automl)
+    assert registry.decoder_for(schema, None).name == schema
+
+
+@pytest.mark.parametrize("prediction, schema", [
+    (7.5, "scalar"), ("7.5", "scalar"), ({"value": 7.5, "lower_bound": 6.0}, "automl"),
+    ({"predicted_weight": 7.5}, "dict:predicted_weight"), ([7.5], "bqml"),
+])
+def test_detects_schema(prediction, schema):
+    assert detect_decoder(prediction).name == schema
+
+
+@pytest.mark.parametrize("prediction", [None, True, "heavy", {"label": "heavy"}, [], ["heavy"]])
+def test_rejects_prediction_without_a_number(prediction):
+    with pytest.raises(ResponseDecodeError):
+        detect_decoder(prediction)
+
+
+def test_malformed_batch_names_the_bad_prediction():
+    registry = DecoderRegistry()
+    registry.decode(SimpleNamespace(predictions=[{"value": 7.0}], deployed_model_id="m"))
+    with pytest.raises(ResponseDecodeError, match="Prediction 1 does not match schema automl"):
+        registry.decode(SimpleNamespace(predictions=[{"value": 7.0}, [7.0]], deployed_model_id="m"))
+    with pytest.raises(ResponseDecodeError, match="No predictions"):
+        registry.decode(SimpleNamespace(predictions=[], deployed_model_id="m"))
+
+
+def test_model_metadata_registers_decoder_before_first_response():
+    regression = SimpleNamespace(predict_schemata=SimpleNamespace(
+        prediction_schema_uri="gs://google-cloud-aiplatform/schema/predict/prediction/tables_regression_1.0.0.yaml"))
+    assert decoder_from_model(regression) is AUTOML_DECODER
+    assert decoder_from_model(SimpleNamespace()) is None
+
+    registry = DecoderRegistry()
+    registry.register_model("m", regression)
+    # The registered decoder is used as is, so a BQML-shaped response is rejected
+    with pytest.raises(ResponseDecodeError):
+        registry.decode(SimpleNamespace(predictions=[[7.0]], deployed_model_id="m"))
@@ -0,0 +1,132 @@
+import copy
+
+import pytest
+
+from src.pipeline_2025 import resume_planner
+from src.pipeline_2025.dag_analyzer import DagGraph
+
+PARAMETERS = {"table": "p.d.source", "threshold": 1.0, "endpoint_name": "endpoint", "traffic": "canary"}
+
+
+def prior_job(spec, states=None, group_names=None):
+    """Task details of a finished job of `spec`, in the form `job_task_details` returns.
+
+    Args:
+        states: Step display name -> state; other steps SUCCEEDED.
+        group_names: Group task name -> the name the prior job gave it.
+    """
+    states, group_names = states or {}, group_names or {}
+    graph = DagGraph(spec)
+    details = [{"task_id": 1, "parent_task_id": 0, "task_name": "small-pipeline", "state": "SUCCEEDED",
+                "execution_state": None}]
+    ids = {"": 1}
+    # Sorted node ids list every group before the tasks inside it
+    for node_id in sorted(graph.names):
+        name = graph.names[node_id]
+        state = states.get(name, "SUCCEEDED")
+        ids[node_id] = len(details) + 1
+        details.append({"task_id": ids[node_id], "parent_task_id": ids[node_id.rpartition("/")[0]],
+                        "task_name": group_names.get(name, name), "state": state,
+                        "execution_state": "COMPLETE" if state == "SUCCEEDED" and node_id in graph.steps else None})
+    return resume_planner.prior_task_states(details)
+
+
+def plan(spec, prior_spec=None, prior_tasks=None, parameters=None, from_steps=()):
+    return {step.node_id: step for step in resume_planner.plan_resume(
+        spec, prior_spec or spec, prior_job(spec) if prior_tasks is None else prior_tasks, PARAMETERS,
+        {**PARAMETERS, **(parameters or {})}, from_steps)}
+
+
+def node(spec, display_name, branch=""):
+    """Node id of the step named `display_name`, in the If/Elif branch holding `branch` when names repeat."""
+    graph = DagGraph(spec)
+    nodes = [node_id for node_id, step in graph.steps.items() if step.display_name == display_name]
+    if branch:
+        group = node(spec, branch).rpartition("/")[0]
+        nodes = [node_id for node_id in nodes if node_id.startswith(group + "/")]
+    (node_id,) = nodes
+    return node_id
+
+
+def reruns(steps):
+    return {node_id for node_id, step in steps.items() if step.action == "rerun"}
+
+
+def test_nested_condition_steps_of_a_successful_job_are_reused(small_spec):
+    steps = plan(small_spec)
+
+    assert len(steps) == 8 and not reruns(steps)
+    resumed = resume_planner.apply_plan(small_spec, list(steps.values()))
+    assert all(resume_planner._task_at(resumed, node_id)["cachingOptions"]["enableCache"] for node_id in steps)
+
+
+def test_failed_step_reruns_with_everything_downstream(small_spec):
+    steps = plan(small_spec, prior_tasks=prior_job(small_spec, states={"Deploy BQML Model": "FAILED"}))
+
+    deploy = node(small_spec, "Deploy BQML Model")
+    traffic = node(small_spec, "Update Traffic Split", branch="Deploy BQML Model")
+    assert reruns(steps) == {deploy, traffic}
+    assert steps[deploy].reason == "prior state FAILED"
+    assert steps[traffic].reason == "downstream of Deploy BQML Model"
+    resumed = resume_planner.apply_plan(small_spec, list(steps.values()))
+    assert resume_planner._task_at(resumed, deploy)["cachingOptions"]["enableCache"] is False
+
+
+def test_changed_parameter_invalidates_only_its_readers(small_spec):
+    steps = plan(small_spec, parameters={"endpoint_name": "endpoint-v2"})
+
+    assert {steps[node(small_spec, name)].action for name in ("Extract Data", "Select Best Model")} == {"reuse"}
+    for create, deploy in [("Create Endpoint", "Deploy BQML Model"), ("Create Endpoint AutoML", "Deploy AutoML Model")]:
+        assert steps[node(small_spec, create)].reason == "parameters changed: ['endpoint_name']"
+        assert steps[node(small_spec, deploy)].reason == f"downstream of {create}"
+    assert len(reruns(steps)) == 6
+
+
+def test_changed_component_invalidates_its_step(small_spec):
+    prior_spec = copy.deepcopy(small_spec)
+    select = node(small_spec, "Select Best Model")
+    executor = small_spec["components"][resume_planner._task_at(small_spec, select)["componentRef"]["name"]]
+    small_spec["deploymentSpec"]["executors"][executor["executorLabel"]]["container"]["image"] = "python:3.11"
+
+    steps = plan(small_spec, prior_spec=prior_spec)
+
+    assert steps[select].reason == "step definition changed"
+    assert steps[node(small_spec, "Extract Data")].action == "reuse"
+    assert reruns(steps) == set(steps) - {node(small_spec, "Extract Data")}
+
+
+def test_from_step_reruns_it_and_downstream(small_spec):
+    steps = plan(small_spec, from_steps=["Create Endpoint AutoML"])
+
+    create = node(small_spec, "Create Endpoint AutoML")
+    assert steps[create].reason == "requested with --from-step"
+    assert reruns(steps) == {create, node(small_spec, "Deploy AutoML Model"),
+                             node(small_spec, "Update Traffic Split", branch="Deploy AutoML Model")}
+    with pytest.raises(ValueError, match="Unknown --from-step"):
+        plan(small_spec, from_steps=["Deploy Model"])
+
+
+def test_renamed_groups_fall_back_to_unique_display_names(small_spec):
+    # The prior job was compiled with other condition numbering, so its task paths differ
+    graph = DagGraph(small_spec)
+    groups = {name for node_id, name in graph.names.items() if node_id not in graph.steps}
+    prior_tasks = prior_job(small_spec, group_names={name: f"{name}-prior" for name in groups})
+
+    steps = plan(small_spec, prior_tasks=prior_tasks)
+
+    # "Update Traffic Split" runs in both branches, so its prior task is ambiguous
+    traffic = {node_id for node_id, step in steps.items() if step.display_name == "Update Traffic Split"}
+    assert len(traffic) == 2 and reruns(steps) == traffic
+    assert {steps[node_id].reason for node_id in traffic} == {"did not run in the prior job"}
+
+
+def test_steps_run_without_caching_rerun(small_spec):
+    # What `PipelineJob(enable_caching=False)` submits
+    prior_spec = copy.deepcopy(small_spec)
+    for node_id in DagGraph(prior_spec).steps:
+        resume_planner._task_at(prior_spec, node_id)["cachingOptions"] = {}
+
+    steps = plan(small_spec, prior_spec=prior_spec)
+
+    assert reruns(steps) == set(steps)
+    assert {step.reason for step in steps.values()} == {resume_planner.CACHE_DISABLED_REASON}
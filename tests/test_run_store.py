@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from src.pipeline_2025 import run_store
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def task(name, minutes, state="SUCCEEDED", schema="system.ContainerExecution", execution_state="COMPLETE"):
+    return SimpleNamespace(
+        task_name=name, state=SimpleNamespace(name=state), start_time=START,
+        end_time=START + timedelta(minutes=minutes),
+        execution=SimpleNamespace(schema_title=schema, state=SimpleNamespace(name=execution_state), metadata={}),
+    )
+
+
+def job(state, tasks):
+    return SimpleNamespace(
+        name="projects/p/locations/l/pipelineJobs/job-1", display_name="job-1",
+        state=SimpleNamespace(name=state), pipeline_spec={"pipelineInfo": {"name": "pipe"}},
+        create_time=START, start_time=START, end_time=START + timedelta(hours=1),
+        job_detail=SimpleNamespace(task_details=[task("pipe", 60)] + tasks),
+    )
+
+
+def test_failed_run_is_ingested_with_estimated_cost():
+    tasks = [
+        task("Train BQML Model", 60),
+        task("drift_retrain_gate", 60, schema="system.DagExecution"),
+        task("Extract, Preprocess and Split Data", 30, execution_state="CACHED"),
+        task("Update Traffic Split", 6, state="FAILED", execution_state="FAILED"),
+    ]
+    with run_store.RunStore(":memory:") as store:
+        assert store.ingest_pipeline_job(job("PIPELINE_STATE_FAILED", tasks))
+        (run_id, _, cost, _), = store.cost_per_run()
+        state = store.latest_runs()[0][2]
+
+    # Only the two executed steps are billed: 1 h + 0.1 h of compute plus the run fee
+    assert run_id == "job-1" and state == "PIPELINE_STATE_FAILED"
+    assert cost == pytest.approx(run_store.RUN_FEE_USD + 1.1 * run_store.TASK_USD_PER_HOUR)
+
+
+def test_known_cost_overrides_estimate():
+    with run_store.RunStore(":memory:") as store:
+        store.ingest_pipeline_job(job("PIPELINE_STATE_SUCCEEDED", [task("Train BQML Model", 60)]), cost_usd=12.5)
+        assert store.cost_per_run()[0][2] == 12.5
@@ -0,0 +1,60 @@
+import json
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+from kfp.dsl import Metrics
+
+from src.pipeline_2025.serving_validation_comp import _local_sample, validate_serving_endpoint
+from src.serving.instance_validation import InstanceValidator
+
+FEATURES = ["is_male", "mother_age", "gestation_weeks", "plurality_category", "cigarette_use_str", "alcohol_use_str"]
+
+
+def run(rows, **kwargs):
+    endpoint = SimpleNamespace(uri="fake://local", metadata={"resourceName": "fake://local"})
+    metrics = Metrics(name="validation_metrics", uri=tempfile.mkdtemp())
+    result = validate_serving_endpoint.python_func(
+        project_id="local", location="local", bq_location="local", endpoint=endpoint,
+        prepped_table_id="local.sample", validation_metrics=metrics, local_sample_json=json.dumps(rows), **kwargs)
+    return result, metrics.metadata
+
+
+def test_rejected_rows_match_instance_validator():
+    rows = _local_sample(24)
+    rows[0]["mother_age"] = 0                   # out of range
+    rows[1]["plurality_category"] = "Twins(7)"  # unknown category
+    rows[2]["gestation_weeks"] = "soon"         # not numeric
+    del rows[3]["alcohol_use_str"]              # missing
+    rows[4]["is_male"] = "True"                 # repaired, not rejected
+    rows[5]["cigarette_use_str"] = "FALSE"      # repaired, not rejected
+
+    result, metrics = run(rows)
+    expected = InstanceValidator().validate([{k: v for k, v in row.items() if k in FEATURES} for row in rows])
+
+    assert metrics["rejected_rows"] == len(rows) - expected.valid.sum() == 4
+    assert metrics["repaired_values"] == expected.repaired == 2
+    assert result.rejected_rate == pytest.approx(4 / 24)
+    # Repaired rows score the same offline and online
+    assert result.mismatch_rate == 0.0
+
+
+def test_all_rows_rejected_fails():
+    rows = _local_sample(6)
+    for row in rows:
+        row["mother_age"] = -1
+    with pytest.raises(RuntimeError, match="mother_age:out_of_range"):
+        run(rows)
+
+
+def test_default_schema_follows_data_prep_filters():
+    validator = InstanceValidator()
+    rows = [{k: v for k, v in row.items() if k in FEATURES} for row in _local_sample(4)]
+    rows[0]["mother_age"] = 70                  # no upper bound in data prep
+    rows[1]["gestation_weeks"] = 19             # data prep keeps gestation_weeks > 19
+    rows[2]["plurality_category"] = "6"         # extraction keeps plurality 1-5
+
+    result = validator.validate(rows)
+
+    assert result.valid.tolist() == [True, False, False, True]
+    assert result.reasons[1:3] == [["gestation_weeks:out_of_range"], ["plurality_category:unknown_category"]]
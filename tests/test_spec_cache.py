@@ -0,0 +1,29 @@
+import json
+
+from src.pipeline_2025 import spec_cache
+
+
+def test_key_follows_expectations_file_contents(tmp_path):
+    source = tmp_path / "component.py"
+    source.write_text("print('component')\n")
+    expectations = tmp_path / "expectations.json"
+    expectations.write_text(json.dumps([{"check": "row_count", "min": 1000}]))
+    config = {"DATA_QUALITY_EXPECTATIONS_PATH": str(expectations), "BQ_DATASET": "staging"}
+
+    key = spec_cache.spec_cache_key(config, [source])
+    assert spec_cache.spec_cache_key(config, [source]) == key
+
+    # Same path, edited contents: the compiled spec embeds the new expectations
+    expectations.write_text(json.dumps([{"check": "row_count", "min": 5000}]))
+    assert spec_cache.spec_cache_key(config, [source]) != key
+
+
+def test_key_ignores_per_run_config(tmp_path):
+    source = tmp_path / "component.py"
+    source.write_text("print('component')\n")
+    config = {"BQ_DATASET": "staging", "DATA_QUALITY_EXPECTATIONS_PATH": "", "TIMESTAMP": "20260101000000"}
+
+    key = spec_cache.spec_cache_key(config, [source])
+
+    assert spec_cache.spec_cache_key({**config, "TIMESTAMP": "20260102000000"}, [source]) == key
+    assert spec_cache.spec_cache_key({**config, "BQ_DATASET": "other"}, [source]) != key